@@ -21,8 +21,10 @@ from dataclasses import dataclass, field, asdict
 from typing import Optional
 from enum import Enum
 
+from .state_store import RETENTION, StateStore
+
 DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "collaboration"
-VOTES_FILE = DATA_DIR / "votes.jsonl"
+VOTES_FILE = DATA_DIR / "votes.jsonl"  # v1 full-request log (no longer written)
 
 
 class Protocol(str, Enum):
@@ -58,11 +60,17 @@ class ConsensusRequest:
     metadata: dict = field(default_factory=dict)
 
 
+def _request_active(d: dict) -> bool:
+    # open requests nobody resolved are dropped once retention past the deadline
+    return d.get("status") == "open" and time.time() < d.get("deadline", 0) + RETENTION
+
+
 class Consensus:
     """Multi-agent voting and validation."""
 
-    def __init__(self):
-        VOTES_FILE.parent.mkdir(parents=True, exist_ok=True)
+    def __init__(self, store: Optional[StateStore] = None):
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        self._store = store or StateStore.open(DATA_DIR, "votes", is_active=_request_active)
 
     def create_request(
         self,
@@ -86,9 +94,13 @@ class Consensus:
             created_at=now,
             deadline=now + timeout,
         )
-        self._append(req)
+        self._store.put(req.request_id, asdict(req))
         return req
 
+    def get_request(self, request_id: str) -> Optional[ConsensusRequest]:
+        d = self._store.get(request_id)
+        return ConsensusRequest(**json.loads(json.dumps(d))) if d else None
+
     def cast_vote(
         self,
         request: ConsensusRequest,
@@ -114,10 +126,14 @@ class Consensus:
             timestamp=time.time(),
         )
         request.votes.append(asdict(vote))
-        self._append(request)
 
-        # auto-resolve if possible
+        # auto-resolve if possible; log only the new vote and any outcome change
         self._try_resolve(request)
+        self._store.update(
+            request.request_id,
+            set={"status": request.status, "decision": request.decision},
+            append={"votes": asdict(vote)},
+        )
         return True
 
     def _try_resolve(self, req: ConsensusRequest):
@@ -206,10 +222,6 @@ class Consensus:
             ],
         }
 
-    def _append(self, req: ConsensusRequest):
-        with open(VOTES_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(asdict(req), ensure_ascii=False) + "\n")
-
 
 # ── convenience: quick 2-agent cross-check ──
 
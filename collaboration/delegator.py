@@ -18,11 +18,26 @@ from pathlib import Path
 from dataclasses import dataclass, field, asdict
 from typing import Optional
 
+from core.dag_runtime import (
+    BLOCKED, DONE, FAILED, PENDING, RUNNING, DagRuntime, get_duration_stats,
+)
+
 from .registry import AgentRegistry
 from .messenger import Messenger, MsgType
+from .state_store import StateStore
 
 DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "collaboration"
-TASKS_FILE = DATA_DIR / "tasks.jsonl"
+TASKS_FILE = DATA_DIR / "tasks.jsonl"  # v1 append-only file, read once for migration
+
+# SubTask.status -> DAG node status
+DAG_STATUS = {
+    "pending": PENDING,
+    "assigned": RUNNING,
+    "running": RUNNING,
+    "done": DONE,
+    "failed": FAILED,
+    "timeout": FAILED,
+}
 
 
 @dataclass
@@ -67,17 +82,48 @@ class Delegation:
 class Delegator:
     """Decomposes tasks, assigns to agents, tracks and aggregates."""
 
-    def __init__(self, registry: AgentRegistry, agent_id: str = "orchestrator"):
+    def __init__(
+        self,
+        registry: AgentRegistry,
+        agent_id: str = "orchestrator",
+        transport="file",
+        store: Optional[StateStore] = None,
+    ):
         self.registry = registry
-        self.messenger = Messenger(agent_id)
+        self.messenger = Messenger(agent_id, transport=transport)
         self.agent_id = agent_id
+        self._store = store or StateStore.open(
+            DATA_DIR, "delegations", is_active=lambda d: d.get("status") == "active"
+        )
         self._delegations: dict[str, Delegation] = {}
         self._tasks: dict[str, SubTask] = {}
+        self._dags: dict[str, DagRuntime] = {}
         self._load()
 
     # ── persistence ──
+    # One store object per delegation: asdict(Delegation) whose "subtasks" list
+    # holds the live SubTask state. Only active delegations are loaded.
 
     def _load(self):
+        if not self._store.exists() and TASKS_FILE.exists():
+            self._migrate_v1()
+        for dlg_id, d in self._store.items():
+            try:
+                self._adopt(d)
+            except TypeError:
+                pass
+
+    def _adopt(self, d: dict) -> Delegation:
+        dlg = Delegation(**{**d, "subtasks": [dict(st) for st in d["subtasks"]]})
+        self._delegations[dlg.delegation_id] = dlg
+        for st in dlg.subtasks:
+            task = SubTask(**st)
+            self._tasks[task.task_id] = task
+        return dlg
+
+    def _migrate_v1(self):
+        """Replay the old tasks.jsonl once into the state store."""
+        delegations, tasks = {}, {}
         if TASKS_FILE.exists():
             for line in TASKS_FILE.read_text(encoding="utf-8").strip().split("\n"):
                 if not line.strip():
@@ -86,17 +132,34 @@ class Delegator:
                     d = json.loads(line)
                     if d.get("_type") == "delegation":
                         dlg = Delegation(**{k: v for k, v in d.items() if k != "_type"})
-                        self._delegations[dlg.delegation_id] = dlg
+                        delegations[dlg.delegation_id] = dlg
                     elif d.get("_type") == "subtask":
                         st = SubTask(**{k: v for k, v in d.items() if k != "_type"})
-                        self._tasks[st.task_id] = st
+                        tasks[st.task_id] = st
                 except (json.JSONDecodeError, TypeError):
                     pass
+        for dlg in delegations.values():
+            dlg.subtasks = [
+                asdict(tasks[f"{dlg.delegation_id}_{i}"])
+                for i in range(len(dlg.subtasks))
+                if f"{dlg.delegation_id}_{i}" in tasks
+            ]
+            self._store.put(dlg.delegation_id, asdict(dlg))
 
-    def _append(self, record: dict):
-        TASKS_FILE.parent.mkdir(parents=True, exist_ok=True)
-        with open(TASKS_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    def _save_task(self, task: SubTask, with_delegation: bool = False):
+        """Log one subtask's state (and the delegation's status fields) as a delta."""
+        dlg = self._delegations.get(task.parent_id)
+        if not dlg:
+            return
+        index = int(task.task_id.rsplit("_", 1)[1])
+        changes = {("subtasks", index): asdict(task)}
+        if with_delegation:
+            changes.update(
+                status=dlg.status,
+                finished_at=dlg.finished_at,
+                aggregated_result=dlg.aggregated_result,
+            )
+        self._store.update(dlg.delegation_id, set=changes)
 
     # ── create delegation ──
 
@@ -107,6 +170,7 @@ class Delegator:
         Create a delegation with subtasks.
 
         subtask_specs: [{"description": str, "caps": [...], "depends_on": [...], "timeout": int, "priority": int}]
+        Raises CycleError if depends_on forms a cycle.
         """
         dlg_id = uuid.uuid4().hex[:10]
         now = time.time()
@@ -125,7 +189,6 @@ class Delegator:
             )
             self._tasks[st.task_id] = st
             subtasks.append(asdict(st))
-            self._append({**asdict(st), "_type": "subtask"})
 
         dlg = Delegation(
             delegation_id=dlg_id,
@@ -134,11 +197,53 @@ class Delegator:
             subtasks=subtasks,
             created_at=now,
         )
+        try:
+            self._dags[dlg_id] = self._build_dag(dlg_id, len(subtasks))
+        except ValueError:
+            for i in range(len(subtasks)):
+                self._tasks.pop(f"{dlg_id}_{i}", None)
+            raise
         self._delegations[dlg_id] = dlg
-        self._append({**asdict(dlg), "_type": "delegation"})
+        self._store.put(dlg_id, asdict(dlg))
 
         return dlg
 
+    # ── dependency graph ──
+
+    def _build_dag(self, delegation_id: str, count: int) -> DagRuntime:
+        dag = DagRuntime(stats=get_duration_stats())
+        for i in range(count):
+            task = self._tasks.get(f"{delegation_id}_{i}")
+            if task:
+                dag.add(
+                    task.task_id,
+                    task.depends_on,
+                    priority=task.priority,
+                    kind=",".join(task.required_caps),
+                    status=DAG_STATUS.get(task.status, BLOCKED),
+                    started_at=task.started_at,
+                )
+        return dag.build()
+
+    def _dag(self, dlg: Delegation) -> DagRuntime:
+        dag = self._dags.get(dlg.delegation_id)
+        if dag is None:
+            dag = self._build_dag(dlg.delegation_id, len(dlg.subtasks))
+            self._dags[dlg.delegation_id] = dag
+        return dag
+
+    def _subtasks_of(self, dlg: Delegation) -> list[SubTask]:
+        return [
+            self._tasks[f"{dlg.delegation_id}_{i}"]
+            for i in range(len(dlg.subtasks))
+            if self._tasks.get(f"{dlg.delegation_id}_{i}")
+        ]
+
+    def estimate_remaining(self, delegation_id: str) -> float:
+        """Estimated seconds to finish, from historical durations per capability set."""
+        dlg = self.get_delegation(delegation_id)
+        return self._dag(dlg).eta() if dlg else 0.0
+
     # ── assignment ──
 
     def assign_ready_tasks(self, delegation_id: str) -> list[SubTask]:
@@ -147,27 +252,12 @@ class Delegator:
         if not dlg or dlg.status != "active":
             return []
 
-        completed = {
-            tid
-            for tid, t in self._tasks.items()
-            if t.parent_id == delegation_id and t.status == "done"
-        }
-
+        dag = self._dag(dlg)
         assigned = []
-        pending = [
-            self._tasks[f"{delegation_id}_{i}"]
-            for i in range(len(dlg.subtasks))
-            if self._tasks.get(f"{delegation_id}_{i}")
-            and self._tasks[f"{delegation_id}_{i}"].status == "pending"
-        ]
-
-        # sort by priority
-        pending.sort(key=lambda t: t.priority)
-
-        for task in pending:
-            if not task.is_ready(completed):
-                continue
 
+        # ready set is ordered by priority, then critical path length
+        for task_id in dag.ready():
+            task = self._tasks[task_id]
             agent = self.registry.best_for(task.required_caps)
             if not agent:
                 continue
@@ -175,6 +265,7 @@ class Delegator:
             task.assigned_to = agent.agent_id
             task.status = "assigned"
             task.started_at = time.time()
+            dag.start(task_id)
 
             # notify agent
             self.messenger.send(
@@ -192,6 +283,7 @@ class Delegator:
             self.registry.heartbeat(
                 agent.agent_id, load=min(agent.load + 0.3, 1.0), status="busy"
             )
+            self._save_task(task)
             assigned.append(task)
 
         return assigned
@@ -216,17 +308,16 @@ class Delegator:
         # check if delegation is complete
         dlg = self._delegations.get(task.parent_id)
         if dlg:
-            all_tasks = [
-                self._tasks[f"{dlg.delegation_id}_{i}"]
-                for i in range(len(dlg.subtasks))
-                if self._tasks.get(f"{dlg.delegation_id}_{i}")
-            ]
-
-            if all(t.status == "done" for t in all_tasks):
+            dag = self._dag(dlg)
+            dag.set_status(task_id, DAG_STATUS.get(status, BLOCKED))
+            if dag.all_done():
                 dlg.status = "completed"
                 dlg.finished_at = time.time()
-                dlg.aggregated_result = self._aggregate(all_tasks)
-            elif any(t.status == "failed" for t in all_tasks):
+                dlg.aggregated_result = self._aggregate(self._subtasks_of(dlg))
+            elif dag.failed_count() and any(
+                t.status == "failed" for t in self._subtasks_of(dlg)
+            ):
+                all_tasks = self._subtasks_of(dlg)
                 # check if failed task has no dependents still pending
                 failed_ids = {t.task_id for t in all_tasks if t.status == "failed"}
                 blocked = [
@@ -243,6 +334,8 @@ class Delegator:
                     dlg.status = "failed"
                     dlg.finished_at = time.time()
 
+        self._save_task(task, with_delegation=True)
+
     def check_timeouts(self) -> list[SubTask]:
         """Find and mark timed-out tasks."""
         timed_out = []
@@ -251,6 +344,10 @@ class Delegator:
                 task.status = "timeout"
                 task.finished_at = time.time()
                 task.error = f"Timed out after {task.timeout}s"
+                dlg = self._delegations.get(task.parent_id)
+                if dlg:
+                    self._dag(dlg).fail(task.task_id)
+                self._save_task(task)
                 timed_out.append(task)
         return timed_out
 
@@ -266,10 +363,16 @@ class Delegator:
     # ── query ──
 
     def get_delegation(self, delegation_id: str) -> Optional[Delegation]:
-        return self._delegations.get(delegation_id)
+        dlg = self._delegations.get(delegation_id)
+        if dlg is None:
+            # finished delegations are archived; load on demand
+            d = self._store.get(delegation_id)
+            if d is not None:
+                dlg = self._adopt(d)
+        return dlg
 
     def get_status(self, delegation_id: str) -> dict:
-        dlg = self._delegations.get(delegation_id)
+        dlg = self.get_delegation(delegation_id)
         if not dlg:
             return {"error": "not found"}
 
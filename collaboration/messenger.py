@@ -8,6 +8,7 @@ Message types:
 - HEARTBEAT: "I'm alive"
 
 Reuses AIOS EventBus pattern (file queue for cross-session).
+Storage is pluggable, see transport.py (file-per-message or single SQLite WAL queue).
 """
 
 import json
@@ -15,9 +16,11 @@ import time
 import uuid
 from pathlib import Path
 from dataclasses import dataclass, field, asdict
-from typing import Optional
+from typing import Optional, Union
 from enum import Enum
 
+from .transport import Transport, make_transport
+
 DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "collaboration"
 INBOX_DIR = DATA_DIR / "inboxes"
 
@@ -45,13 +48,30 @@ class Message:
 
 
 class Messenger:
-    """File-based message passing between agents."""
+    """Message passing between agents over a pluggable transport."""
 
-    def __init__(self, agent_id: str, base_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        agent_id: str,
+        base_dir: Optional[Path] = None,
+        transport: Union[str, Transport] = "file",
+    ):
+        """
+        transport: "file" (one file per message, default), "sqlite" (single WAL
+        database under base_dir) or a Transport instance shared between agents.
+        """
         self.agent_id = agent_id
         self.base_dir = base_dir or INBOX_DIR
-        self.inbox = self.base_dir / agent_id
-        self.inbox.mkdir(parents=True, exist_ok=True)
+        self.transport = (
+            transport
+            if isinstance(transport, Transport)
+            else make_transport(transport, self.base_dir)
+        )
+        self.transport.register(agent_id)
+
+    @property
+    def inbox(self) -> Path:
+        return self.base_dir / self.agent_id
 
     def send(
         self,
@@ -72,17 +92,7 @@ class Messenger:
             reply_to=reply_to,
             ttl=ttl,
         )
-
-        if receiver == "*":
-            # broadcast: write to all inboxes
-            for inbox in self.base_dir.iterdir():
-                if inbox.is_dir() and inbox.name != self.agent_id:
-                    self._write_msg(inbox, msg)
-        else:
-            target_inbox = self.base_dir / receiver
-            target_inbox.mkdir(parents=True, exist_ok=True)
-            self._write_msg(target_inbox, msg)
-
+        self.transport.deliver(asdict(msg))
         return msg
 
     def request(self, receiver: str, payload: dict, ttl: int = 300) -> Message:
@@ -94,66 +104,44 @@ class Messenger:
     def broadcast(self, payload: dict, ttl: int = 120) -> Message:
         return self.send("*", MsgType.BROADCAST, payload, ttl=ttl)
 
-    def receive(self, limit: int = 20, include_expired: bool = False) -> list[Message]:
-        """Read messages from own inbox, oldest first. Consumed messages are deleted."""
-        messages = []
-        files = sorted(self.inbox.glob("*.msg.json"))
-
-        for f in files[: limit * 2]:  # read extra to account for expired
-            try:
-                data = json.loads(f.read_text(encoding="utf-8"))
-                msg = Message(**data)
-                if msg.is_expired() and not include_expired:
-                    f.unlink(missing_ok=True)
-                    continue
-                messages.append(msg)
-                f.unlink(missing_ok=True)  # consume
-            except (json.JSONDecodeError, TypeError):
-                f.unlink(missing_ok=True)
-
-            if len(messages) >= limit:
-                break
-
-        return messages
+    def receive(
+        self, limit: int = 20, include_expired: bool = False, timeout: float = 0
+    ) -> list[Message]:
+        """
+        Read messages from own inbox, oldest first. Consumed messages are deleted.
+
+        timeout: if the inbox is empty, block up to this many seconds for new messages.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            messages = self._decode(
+                self.transport.receive(self.agent_id, limit, include_expired)
+            )
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            self.transport.wait(self.agent_id, remaining)
 
     def peek(self, limit: int = 10) -> list[Message]:
         """Peek at inbox without consuming."""
-        messages = []
-        files = sorted(self.inbox.glob("*.msg.json"))
-        for f in files[:limit]:
-            try:
-                data = json.loads(f.read_text(encoding="utf-8"))
-                msg = Message(**data)
-                if not msg.is_expired():
-                    messages.append(msg)
-            except (json.JSONDecodeError, TypeError):
-                pass
-        return messages
+        return self._decode(self.transport.peek(self.agent_id, limit))
 
     def pending_count(self) -> int:
-        return len(list(self.inbox.glob("*.msg.json")))
+        return self.transport.pending_count(self.agent_id)
 
     def purge_expired(self) -> int:
         """Clean up expired messages from inbox."""
-        count = 0
-        for f in self.inbox.glob("*.msg.json"):
+        return self.transport.purge_expired(self.agent_id)
+
+    @staticmethod
+    def _decode(items: list) -> list[Message]:
+        messages = []
+        for data in items:
             try:
-                data = json.loads(f.read_text(encoding="utf-8"))
-                msg = Message(**data)
-                if msg.is_expired():
-                    f.unlink(missing_ok=True)
-                    count += 1
-            except (json.JSONDecodeError, TypeError):
-                f.unlink(missing_ok=True)
-                count += 1
-        return count
-
-    def _write_msg(self, inbox: Path, msg: Message):
-        # filename: timestamp_msgid.msg.json (sortable)
-        fname = f"{msg.timestamp:.0f}_{msg.msg_id}.msg.json"
-        (inbox / fname).write_text(
-            json.dumps(asdict(msg), ensure_ascii=False), encoding="utf-8"
-        )
+                messages.append(Message(**data))
+            except TypeError:
+                pass
+        return messages
 
 
 # ── CLI ──
@@ -15,16 +15,34 @@ v2 新增：
 6. orchestrator.build_report(plan) → 生成降级感知报告
 """
 
+import copy
 import json
 import time
 from pathlib import Path
 from dataclasses import dataclass, field, asdict
 from typing import Optional
 
+from core.dag_runtime import (
+    BLOCKED, DONE, FAILED, PENDING, RUNNING, DagRuntime, get_duration_stats,
+)
+
+from .state_store import StateStore
+
 DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "collaboration"
-PLANS_FILE = DATA_DIR / "plans.json"
+PLANS_FILE = DATA_DIR / "plans.json"  # v1 全量文件，仅用于首次迁移
 FAILURE_LOG = DATA_DIR / "failure_log.jsonl"
 
+# 计划级字段（子任务之外），状态更新时随增量一起记录
+PLAN_STATE_FIELDS = ("status", "finished_at", "degraded", "failed_agents", "confidence")
+
+
+# 子任务状态 → DAG 节点状态
+DAG_STATUS = {"pending": PENDING, "spawned": RUNNING, "done": DONE, "failed": FAILED}
+
+
+def _plan_active(d: dict) -> bool:
+    return d.get("status") in ("draft", "executing")
+
 
 # ── 失败分类 ──
 
@@ -185,30 +203,35 @@ class Orchestrator:
     DEFAULT_RETRY = RetryPolicy()
     DEFAULT_SLA = ExecutionSLA()
 
-    def __init__(self):
+    def __init__(self, store: Optional[StateStore] = None):
         DATA_DIR.mkdir(parents=True, exist_ok=True)
+        self._store = store or StateStore.open(DATA_DIR, "plans", is_active=_plan_active)
         self._plans: dict[str, Plan] = {}
+        self._dags: dict[str, DagRuntime] = {}
         self._breaker = CircuitBreaker()
         self._load()
 
-    # ── 持久化 ──
+    # ── 持久化（快照 + 增量日志，只加载未结束的计划）──
 
     def _load(self):
-        if PLANS_FILE.exists():
+        if not self._store.exists() and PLANS_FILE.exists():
+            # 从 v1 的 plans.json 迁移一次
+            try:
+                for d in json.loads(PLANS_FILE.read_text(encoding="utf-8")):
+                    self._store.put(d["plan_id"], d)
+            except (json.JSONDecodeError, TypeError, KeyError):
+                pass
+        for plan_id, d in self._store.items():
             try:
-                data = json.loads(PLANS_FILE.read_text(encoding="utf-8"))
-                for d in data:
-                    self._plans[d["plan_id"]] = Plan(**d)
-            except (json.JSONDecodeError, TypeError):
+                self._plans[plan_id] = Plan(**copy.deepcopy(d))
+            except TypeError:
                 pass
 
-    def _save(self):
-        PLANS_FILE.write_text(
-            json.dumps(
-                [asdict(p) for p in self._plans.values()], ensure_ascii=False, indent=2
-            ),
-            encoding="utf-8",
-        )
+    def _save(self, plan: Plan, *indices: int):
+        """记录增量：指定子任务 + 计划级状态字段"""
+        changes = {("subtasks", i): plan.subtasks[i] for i in indices}
+        changes.update({f: getattr(plan, f) for f in PLAN_STATE_FIELDS})
+        self._store.update(plan.plan_id, set=changes)
 
     def _log_failure(
         self,
@@ -243,6 +266,8 @@ class Orchestrator:
                      "role": "coder", "model": "", "timeout": 120,
                      "depends_on": []}]
         sla: {"required_roles": [...], "max_failures": 1, "total_timeout": 180}
+
+        依赖成环时抛出 CycleError。
         """
         specs = []
         for st in subtasks:
@@ -264,26 +289,86 @@ class Orchestrator:
             created_at=time.time(),
             sla=sla or asdict(self.DEFAULT_SLA),
         )
+        self._dags[plan_id] = self._build_dag(plan)  # 环检测
         self._plans[plan_id] = plan
-        self._save()
+        self._store.put(plan_id, asdict(plan))
         return plan
 
     def get_plan(self, plan_id: str) -> Optional[Plan]:
-        return self._plans.get(plan_id)
+        return self._get(plan_id)
+
+    def _get(self, plan_id: str) -> Optional[Plan]:
+        """内存中的计划；已归档的按需从磁盘读回"""
+        plan = self._plans.get(plan_id)
+        if plan is None:
+            d = self._store.get(plan_id)
+            if d is not None:
+                plan = self._plans[plan_id] = Plan(**copy.deepcopy(d))
+        return plan
 
     # ── 任务调度 ──
 
-    def get_ready_tasks(self, plan: Plan) -> list[dict]:
-        """获取所有依赖已满足且未执行的子任务"""
-        done_ids = {st["id"] for st in plan.subtasks if st["status"] == "done"}
-        ready = []
+    @staticmethod
+    def _build_dag(plan: Plan) -> DagRuntime:
+        dag = DagRuntime(stats=get_duration_stats())
         for st in plan.subtasks:
-            if st["status"] != "pending":
-                continue
-            deps_met = all(d in done_ids for d in st["depends_on"])
-            if deps_met:
-                ready.append(st)
-        return ready
+            dag.add(
+                st["id"],
+                st["depends_on"],
+                priority=st.get("priority", 5),
+                kind=st.get("role", "general"),
+                status=DAG_STATUS.get(st["status"], BLOCKED),
+                started_at=st.get("spawned_at", 0.0),
+            )
+        return dag.build()
+
+    def _dag(self, plan: Plan) -> DagRuntime:
+        """
+        缓存的 DAG。子任务状态只经 _set_status 修改，同时更新 DAG，
+        这里不再逐个对齐；子任务或依赖在外部被改动后调用 refresh_plan()
+        """
+        dag = self._dags.get(plan.plan_id)
+        if dag is None:
+            dag = self._dags[plan.plan_id] = self._build_dag(plan)
+        return dag
+
+    @staticmethod
+    def _set_status(plan: Plan, dag: DagRuntime, task_id: str, status: str) -> int:
+        """改子任务状态并同步 DAG（O(下游数)），返回子任务下标"""
+        i = dag.index(task_id)
+        plan.subtasks[i]["status"] = status
+        dag.set_status(task_id, DAG_STATUS.get(status, BLOCKED))
+        return i
+
+    def set_subtask_status(self, plan_id: str, task_id: str, status: str) -> bool:
+        """
+        在 mark_* 之外改子任务状态（如人工暂停 / 恢复）；
+        不认识的状态视为阻塞，不会被派发，下游也保持阻塞
+        """
+        plan = self._get(plan_id)
+        if not plan:
+            return False
+        dag = self._dag(plan)
+        if task_id not in dag:
+            return False
+        i = self._set_status(plan, dag, task_id, status)
+        self._evaluate_completion(plan)
+        self._save(plan, i)
+        return True
+
+    def refresh_plan(self, plan_id: str) -> None:
+        """子任务列表或依赖在外部被改动后调用：丢弃缓存的 DAG，下次访问时重建"""
+        self._dags.pop(plan_id, None)
+
+    def get_ready_tasks(self, plan: Plan) -> list[dict]:
+        """获取所有依赖已满足且未执行的子任务（按优先级、关键路径排序）"""
+        dag = self._dag(plan)
+        return [plan.subtasks[dag.index(task_id)] for task_id in dag.ready()]
+
+    def estimate_remaining(self, plan_id: str) -> float:
+        """按各角色历史耗时估算的剩余完成时间（秒）"""
+        plan = self._get(plan_id)
+        return self._dag(plan).eta() if plan else 0.0
 
     def build_spawn_args(self, subtask: dict) -> dict:
         """为一个子任务生成 sessions_spawn 调用参数"""
@@ -304,30 +389,34 @@ class Orchestrator:
     # ── 状态更新 ──
 
     def mark_spawned(self, plan_id: str, task_id: str, label: str):
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return
-        for st in plan.subtasks:
-            if st["id"] == task_id:
-                st["status"] = "spawned"
-                st["session_label"] = label
-                st["spawned_at"] = time.time()
-                break
+        dag = self._dag(plan)
+        touched = []
+        if task_id in dag:
+            i = self._set_status(plan, dag, task_id, "spawned")
+            st = plan.subtasks[i]
+            st["session_label"] = label
+            st["spawned_at"] = time.time()
+            touched.append(i)
         plan.status = "executing"
-        self._save()
+        self._save(plan, *touched)
 
     def mark_done(self, plan_id: str, task_id: str, result: str):
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return
-        for st in plan.subtasks:
-            if st["id"] == task_id:
-                st["status"] = "done"
-                st["result"] = result
-                st["finished_at"] = time.time()
-                break
+        dag = self._dag(plan)
+        touched = []
+        if task_id in dag:
+            i = self._set_status(plan, dag, task_id, "done")
+            st = plan.subtasks[i]
+            st["result"] = result
+            st["finished_at"] = time.time()
+            touched.append(i)
         self._evaluate_completion(plan)
-        self._save()
+        self._save(plan, *touched)
 
     def mark_failed(
         self, plan_id: str, task_id: str, error: str, retry: bool = False
@@ -338,16 +427,17 @@ class Orchestrator:
         返回: {"action": "retry"|"circuit_break"|"degrade"|"abort",
                "failure_type": str, "retry_delay": float}
         """
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return {"action": "abort", "failure_type": "unknown"}
 
         failure_type = FailureType.classify(error)
         result = {"failure_type": failure_type, "retry_delay": 0.0}
 
-        for st in plan.subtasks:
-            if st["id"] != task_id:
-                continue
+        dag = self._dag(plan)
+        touched = [dag.index(task_id)] if task_id in dag else []
+        for i in touched:
+            st = plan.subtasks[i]
 
             st["retry_count"] = st.get("retry_count", 0) + 1
             st["failure_type"] = failure_type
@@ -363,7 +453,7 @@ class Orchestrator:
                 self.DEFAULT_RETRY.circuit_breaker_threshold,
                 self.DEFAULT_RETRY.circuit_breaker_window,
             ):
-                st["status"] = "failed"
+                self._set_status(plan, dag, task_id, "failed")
                 st["result"] = f"CIRCUIT_BREAK: {failure_type} ({error[:200]})"
                 st["finished_at"] = time.time()
                 result["action"] = "circuit_break"
@@ -371,14 +461,14 @@ class Orchestrator:
 
             # 判定：还能重试？
             if st["retry_count"] <= self.DEFAULT_RETRY.max_retries:
-                st["status"] = "pending"  # 重置为 pending，等待重新 spawn
+                self._set_status(plan, dag, task_id, "pending")  # 等待重新 spawn
                 delay = self.DEFAULT_RETRY.delay_for_attempt(st["retry_count"])
                 result["action"] = "retry"
                 result["retry_delay"] = delay
                 break
 
             # 重试耗尽
-            st["status"] = "failed"
+            self._set_status(plan, dag, task_id, "failed")
             st["result"] = (
                 f"EXHAUSTED: {failure_type} after {st['retry_count']} retries ({error[:200]})"
             )
@@ -387,7 +477,7 @@ class Orchestrator:
             break
 
         self._evaluate_completion(plan)
-        self._save()
+        self._save(plan, *touched)
         return result
 
     # ── SLA 判定 ──
@@ -404,7 +494,7 @@ class Orchestrator:
             "reason": str
         }
         """
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return {"verdict": "abort", "reason": "plan not found"}
 
@@ -495,8 +585,8 @@ class Orchestrator:
 
     def _evaluate_completion(self, plan: Plan):
         """内部：检查计划是否可以结束"""
-        all_terminal = all(st["status"] in ("done", "failed") for st in plan.subtasks)
-        if not all_terminal:
+        counts = self._dag(plan).counts()
+        if counts["done"] + counts["failed"] < counts["total"]:
             return
 
         failed = [st for st in plan.subtasks if st["status"] == "failed"]
@@ -521,7 +611,7 @@ class Orchestrator:
     # ── 查询 ──
 
     def get_status(self, plan_id: str) -> dict:
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return {"error": "plan not found"}
 
@@ -542,6 +632,7 @@ class Orchestrator:
             "degraded": plan.degraded,
             "confidence": plan.confidence,
             "failed_agents": plan.failed_agents,
+            "eta_seconds": round(self._dag(plan).eta(), 1),
             "subtasks": [
                 {
                     "id": st["id"],
@@ -559,7 +650,7 @@ class Orchestrator:
 
     def build_report(self, plan_id: str) -> str:
         """生成降级感知的汇总报告"""
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return "Plan not found"
 
@@ -630,7 +721,7 @@ class Orchestrator:
 
     def should_retry(self, plan_id: str, task_id: str) -> dict:
         """检查某个失败任务是否应该重试"""
-        plan = self._plans.get(plan_id)
+        plan = self._get(plan_id)
         if not plan:
             return {"retry": False, "reason": "plan not found"}
 
@@ -0,0 +1,350 @@
+"""
+StateStore - Snapshot + delta log persistence for coordinator state.
+
+Shared by Delegator, Consensus and Orchestrator. Per store name, in DATA_DIR:
+- <name>.snapshot.json  active objects as of log seq N (rewritten on compaction)
+- <name>.log.jsonl      append-only deltas after the snapshot (put / set / append / del)
+- <name>.log.old.jsonl  the log being folded into a new snapshot (exists only mid-compaction)
+- <name>.archive.jsonl  finished objects moved out of memory; read lazily, pruned past retention
+
+Startup reads the snapshot plus at most `snapshot_every` log records; an update
+appends one small delta. Compaction runs on a background thread once the log
+reaches `snapshot_every` records, so neither cost grows with history. It only
+holds the store lock to copy the state and rotate the log; the archive and
+snapshot writes happen outside it, so writers are not stalled by disk I/O.
+
+Paths in set/append are a field name or a tuple like ("subtasks", 2, "status").
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+
+SNAPSHOT_EVERY = 500  # log records before a compaction is triggered
+RETENTION = 7 * 86400  # seconds finished objects stay in the archive
+
+PathKey = Union[str, tuple]
+
+logger = logging.getLogger(__name__)
+
+
+def _finished_at(d: dict) -> float:
+    return d.get("finished_at") or d.get("created_at") or 0.0
+
+
+def _walk(obj, path: list):
+    for key in path:
+        obj = obj[key]
+    return obj
+
+
+class StateStore:
+    """In-memory active objects backed by snapshot + delta log (thread-safe)."""
+
+    _instances: dict = {}
+    _guard = threading.Lock()
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        is_active: Callable[[dict], bool],
+        finished_at: Callable[[dict], float] = _finished_at,
+        retention: float = RETENTION,
+        snapshot_every: int = SNAPSHOT_EVERY,
+        background: bool = True,
+    ):
+        self.dir = Path(directory)
+        self.name = name
+        self.is_active = is_active
+        self.finished_at = finished_at
+        self.retention = retention
+        self.snapshot_every = snapshot_every
+        self.background = background
+
+        self.snapshot_path = self.dir / f"{name}.snapshot.json"
+        self.log_path = self.dir / f"{name}.log.jsonl"
+        self.old_log_path = self.dir / f"{name}.log.old.jsonl"
+        self.archive_path = self.dir / f"{name}.archive.jsonl"
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()  # one compaction at a time; taken before _lock
+        self._objects: dict[str, dict] = {}
+        self._seq = 0
+        self._log_records = 0
+        self._archive_index: Optional[dict] = None  # id -> byte offset, built on demand
+        self._archive_oldest = 0.0
+        self._archiving: dict = {}  # finished objects removed from memory, not yet archived
+        self._compactor: Optional[threading.Thread] = None
+        self._log = None
+        self._load()
+        if self.old_log_path.exists():
+            self.compact()  # a compaction was interrupted: finish folding the old log in
+
+    @classmethod
+    def open(cls, directory: Path, name: str, **kwargs) -> "StateStore":
+        """One store per file set per process, so every coordinator sees the same state."""
+        key = str((Path(directory) / name).resolve())
+        with cls._guard:
+            store = cls._instances.get(key)
+            if store is None:
+                store = cls._instances[key] = cls(directory, name, **kwargs)
+            return store
+
+    # ── load ──
+
+    def exists(self) -> bool:
+        return self.snapshot_path.exists() or self.log_path.exists()
+
+    def _load(self):
+        if self.snapshot_path.exists():
+            try:
+                snap = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+                self._objects = snap.get("objects", {})
+                self._seq = snap.get("seq", 0)
+                self._archive_oldest = snap.get("archive_oldest", 0.0)
+            except (json.JSONDecodeError, OSError):
+                self._objects = {}
+        for path in (self.old_log_path, self.log_path):
+            if path.exists():
+                self._replay(path)
+
+    def _replay(self, path: Path) -> None:
+        with open(path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # torn tail after a crash: drop it so the next append starts on a fresh line
+            os.truncate(path, end)
+        for line in data[:end].splitlines():
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("%s: skipping unreadable log line", path)
+                continue
+            seq = rec.get("seq", 0) if isinstance(rec, dict) else 0
+            if seq <= self._seq:
+                continue
+            try:
+                self._apply(rec)
+            except (KeyError, IndexError, TypeError, AttributeError) as e:
+                logger.warning("%s: skipping bad record seq=%s: %r", path, seq, e)
+            self._seq = seq
+            self._log_records += 1
+
+    # ── read ──
+
+    def get(self, obj_id: str) -> Optional[dict]:
+        """Object by id; archived (finished) objects are read from disk on demand."""
+        with self._lock:
+            obj = self._objects.get(obj_id)
+            if obj is None:
+                obj = self._archiving.get(obj_id)
+            if obj is not None:
+                return obj
+            return self._archived(obj_id)
+
+    def items(self) -> Iterator[tuple]:
+        """Objects held in memory: active ones plus finished ones not yet compacted."""
+        with self._lock:
+            return iter(list(self._objects.items()))
+
+    def active(self) -> dict:
+        with self._lock:
+            return {k: v for k, v in self._objects.items() if self.is_active(v)}
+
+    # ── write ──
+
+    def put(self, obj_id: str, obj: dict) -> None:
+        self._write({"op": "put", "id": obj_id, "obj": obj})
+
+    def update(
+        self, obj_id: str, set: Optional[dict] = None, append: Optional[dict] = None
+    ) -> None:
+        """Log a delta: set {path: value} and/or append {path: item}."""
+        rec = {"op": "update", "id": obj_id}
+        if set:
+            rec["set"] = [[_path(p), v] for p, v in set.items()]
+        if append:
+            rec["append"] = [[_path(p), v] for p, v in append.items()]
+        self._write(rec)
+
+    def delete(self, obj_id: str) -> None:
+        self._write({"op": "del", "id": obj_id})
+
+    def _write(self, rec: dict) -> None:
+        with self._lock:
+            if rec["op"] == "update" and rec["id"] not in self._objects:
+                archived = self._archiving.get(rec["id"]) or self._archived(rec["id"])
+                if archived is None:
+                    return
+                # a late update revives an archived object: log it back in first
+                self._append({"op": "put", "id": rec["id"], "obj": archived})
+            self._append(rec)
+            due = self._log_records >= self.snapshot_every
+        if due:
+            self._schedule_compaction()
+
+    def _append(self, rec: dict) -> None:
+        self._seq += 1
+        rec["seq"] = self._seq
+        # store private copies so later caller mutations don't leak in
+        rec = json.loads(json.dumps(rec, ensure_ascii=False))
+        self._apply(rec)
+        line = json.dumps(rec, ensure_ascii=False)
+        if self._log is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self._log.write(line + "\n")
+        self._log.flush()
+        self._log_records += 1
+
+    def _apply(self, rec: dict) -> None:
+        op, obj_id = rec["op"], rec["id"]
+        if op == "put":
+            self._objects[obj_id] = rec["obj"]
+        elif op == "del":
+            self._objects.pop(obj_id, None)
+        elif op == "update":
+            obj = self._objects.get(obj_id)
+            if obj is None:
+                return
+            for path, value in rec.get("set", ()):
+                _walk(obj, path[:-1])[path[-1]] = value
+            for path, value in rec.get("append", ()):
+                _walk(obj, path).append(value)
+
+    # ── compaction ──
+
+    def _schedule_compaction(self) -> None:
+        if not self.background:
+            self.compact()
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(
+            target=self.compact, name=f"state-compact-{self.name}", daemon=True
+        )
+        self._compactor.start()
+
+    def compact(self) -> dict:
+        """Archive finished objects, write a snapshot, truncate the log, prune the archive."""
+        with self._compact_lock:
+            now = time.time()
+            with self._lock:
+                # copy the state and rotate the log; writers resume on a fresh log
+                finished = [(k, v) for k, v in self._objects.items() if not self.is_active(v)]
+                for k, v in finished:
+                    del self._objects[k]
+                    self._archiving[k] = v
+                entries, oldest = [], self._archive_oldest
+                for k, v in finished:
+                    ts = self.finished_at(v)
+                    entries.append((k, json.dumps({"id": k, "ts": ts, "obj": v}, ensure_ascii=False)))
+                    if not oldest or ts < oldest:
+                        oldest = ts
+                snapshot = json.dumps(
+                    {"seq": self._seq, "objects": self._objects, "archive_oldest": oldest},
+                    ensure_ascii=False,
+                )
+                active = len(self._objects)
+                self.dir.mkdir(parents=True, exist_ok=True)
+                if self._log is not None:
+                    self._log.close()
+                if self.old_log_path.exists():
+                    # an interrupted compaction left its old log: keep both until the snapshot lands
+                    with open(self.old_log_path, "ab") as old:
+                        old.write(self.log_path.read_bytes() if self.log_path.exists() else b"")
+                elif self.log_path.exists():
+                    os.replace(self.log_path, self.old_log_path)
+                self._log = open(self.log_path, "w", encoding="utf-8")
+                self._log_records = 0
+
+            # the archive goes first: once the snapshot lands, it is the only copy
+            offsets = self._write_archive(entries)
+            tmp = self.snapshot_path.with_suffix(".tmp")
+            tmp.write_text(snapshot, encoding="utf-8")
+            os.replace(tmp, self.snapshot_path)
+            self.old_log_path.unlink(missing_ok=True)
+
+            with self._lock:
+                if self._archive_index is not None:
+                    self._archive_index.update(offsets)
+                for k, _ in finished:
+                    self._archiving.pop(k, None)
+                self._archive_oldest = oldest
+
+            pruned = 0
+            if oldest and oldest < now - self.retention:
+                pruned = self._prune_archive(now - self.retention)
+            return {"archived": len(finished), "active": active, "pruned": pruned}
+
+    def _write_archive(self, entries: list) -> dict:
+        """Append (id, json line) entries; returns id -> byte offset."""
+        offsets = {}
+        if not entries:
+            return offsets
+        with open(self.archive_path, "ab") as f:
+            for obj_id, line in entries:
+                offsets[obj_id] = f.tell()
+                f.write(line.encode("utf-8") + b"\n")
+        return offsets
+
+    def _prune_archive(self, cutoff: float) -> int:
+        # only compaction appends to the archive and it holds _compact_lock,
+        # so the file can be read and rewritten here without the store lock
+        kept, dropped, oldest = [], 0, 0.0
+        with open(self.archive_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    dropped += 1
+                    continue
+                if entry["ts"] < cutoff:
+                    dropped += 1
+                    continue
+                kept.append(line)
+                oldest = entry["ts"] if not oldest else min(oldest, entry["ts"])
+        tmp = self.archive_path.with_suffix(".tmp")
+        tmp.write_bytes(b"".join(kept))
+        with self._lock:
+            os.replace(tmp, self.archive_path)
+            self._archive_index = None
+            self._archive_oldest = oldest
+        return dropped
+
+    def _archived(self, obj_id: str) -> Optional[dict]:
+        if not self.archive_path.exists():
+            return None
+        if self._archive_index is None:
+            index = {}
+            with open(self.archive_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        index[json.loads(line)["id"]] = offset
+                    except (json.JSONDecodeError, KeyError):
+                        pass
+                    offset += len(line)
+            self._archive_index = index
+        offset = self._archive_index.get(obj_id)
+        if offset is None:
+            return None
+        with open(self.archive_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["obj"]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def _path(p: PathKey) -> list:
+    return list(p) if isinstance(p, tuple) else [p]
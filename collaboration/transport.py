@@ -0,0 +1,404 @@
+"""
+Transport - Storage backends for Messenger.
+
+Backends:
+- FileTransport:   one *.msg.json file per message per inbox (original layout,
+                   kept for compatibility with existing data directories)
+- SQLiteTransport: single WAL-mode database file shared by all agents
+    * direct messages are rows addressed to one receiver, deleted on consume
+    * a broadcast is written once; each agent keeps a cursor and reads
+      broadcasts past its cursor (fan-out by cursor, not by copy)
+    * per-agent pending counter, so pending_count() is a single-row lookup
+    * TTL expiry via an index on expires_at instead of scanning inboxes
+
+Blocking receive: senders in the same process wake waiters through a shared
+condition variable; writers in other processes are picked up by a cheap
+change check (PRAGMA data_version / inbox mtime) every POLL_INTERVAL seconds.
+
+Transports speak plain dicts (asdict(Message)); Messenger owns the dataclass.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+POLL_INTERVAL = 0.5  # seconds between cross-process change checks while waiting
+
+
+def _expired(d: dict, now: float) -> bool:
+    ts = d.get("timestamp", 0.0)
+    return now - ts > d.get("ttl", 300) if ts else False
+
+
+class _Notifier:
+    """Version counter + condition variable shared by every transport on one location."""
+
+    _instances: dict = {}
+    _guard = threading.Lock()
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.version = 0
+
+    @classmethod
+    def for_location(cls, key: str) -> "_Notifier":
+        with cls._guard:
+            if key not in cls._instances:
+                cls._instances[key] = cls()
+            return cls._instances[key]
+
+    def notify(self):
+        with self.cond:
+            self.version += 1
+            self.cond.notify_all()
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """Wait until version moves past `since`. Returns True if it did."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.version != since, timeout)
+
+
+class Transport:
+    """Backend interface used by Messenger."""
+
+    def __init__(self, location: str):
+        self._notifier = _Notifier.for_location(location)
+
+    def register(self, agent_id: str) -> None:
+        raise NotImplementedError
+
+    def deliver(self, msg: dict) -> None:
+        """Store a message; receiver '*' means broadcast to everyone but the sender."""
+        raise NotImplementedError
+
+    def receive(self, agent_id: str, limit: int = 20, include_expired: bool = False) -> list:
+        raise NotImplementedError
+
+    def peek(self, agent_id: str, limit: int = 10) -> list:
+        raise NotImplementedError
+
+    def pending_count(self, agent_id: str) -> int:
+        raise NotImplementedError
+
+    def purge_expired(self, agent_id: str) -> int:
+        raise NotImplementedError
+
+    def _changed_externally(self, agent_id: str) -> bool:
+        """Cheap check for writes from other processes."""
+        return False
+
+    def wait(self, agent_id: str, timeout: float) -> bool:
+        """Block until something may have arrived for agent_id, or timeout."""
+        deadline = time.monotonic() + timeout
+        since = self._notifier.version
+        self._changed_externally(agent_id)  # reset baseline
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._notifier.wait(since, min(remaining, POLL_INTERVAL)):
+                return True
+            if self._changed_externally(agent_id):
+                return True
+
+
+# ── file-per-message (compatibility) ──
+
+
+class FileTransport(Transport):
+    """Original layout: <base_dir>/<agent_id>/<ts>_<msg_id>.msg.json"""
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._mtimes: dict = {}
+        super().__init__(str(self.base_dir.resolve()))
+
+    def _inbox(self, agent_id: str) -> Path:
+        return self.base_dir / agent_id
+
+    def register(self, agent_id: str) -> None:
+        self._inbox(agent_id).mkdir(parents=True, exist_ok=True)
+
+    def deliver(self, msg: dict) -> None:
+        if msg["receiver"] == "*":
+            # broadcast: write to all inboxes
+            for inbox in self.base_dir.iterdir():
+                if inbox.is_dir() and inbox.name != msg["sender"]:
+                    self._write_msg(inbox, msg)
+        else:
+            target_inbox = self._inbox(msg["receiver"])
+            target_inbox.mkdir(parents=True, exist_ok=True)
+            self._write_msg(target_inbox, msg)
+        self._notifier.notify()
+
+    def receive(self, agent_id: str, limit: int = 20, include_expired: bool = False) -> list:
+        messages = []
+        now = time.time()
+        files = sorted(self._inbox(agent_id).glob("*.msg.json"))
+
+        for f in files[: limit * 2]:  # read extra to account for expired
+            try:
+                data = json.loads(f.read_text(encoding="utf-8"))
+                if _expired(data, now) and not include_expired:
+                    f.unlink(missing_ok=True)
+                    continue
+                messages.append(data)
+                f.unlink(missing_ok=True)  # consume
+            except (json.JSONDecodeError, TypeError):
+                f.unlink(missing_ok=True)
+
+            if len(messages) >= limit:
+                break
+
+        return messages
+
+    def peek(self, agent_id: str, limit: int = 10) -> list:
+        messages = []
+        now = time.time()
+        files = sorted(self._inbox(agent_id).glob("*.msg.json"))
+        for f in files[:limit]:
+            try:
+                data = json.loads(f.read_text(encoding="utf-8"))
+                if not _expired(data, now):
+                    messages.append(data)
+            except (json.JSONDecodeError, TypeError):
+                pass
+        return messages
+
+    def pending_count(self, agent_id: str) -> int:
+        return len(list(self._inbox(agent_id).glob("*.msg.json")))
+
+    def purge_expired(self, agent_id: str) -> int:
+        count = 0
+        now = time.time()
+        for f in self._inbox(agent_id).glob("*.msg.json"):
+            try:
+                data = json.loads(f.read_text(encoding="utf-8"))
+                if _expired(data, now):
+                    f.unlink(missing_ok=True)
+                    count += 1
+            except (json.JSONDecodeError, TypeError):
+                f.unlink(missing_ok=True)
+                count += 1
+        return count
+
+    def _changed_externally(self, agent_id: str) -> bool:
+        try:
+            mtime = self._inbox(agent_id).stat().st_mtime_ns
+        except OSError:
+            return False
+        changed = self._mtimes.get(agent_id, mtime) != mtime
+        self._mtimes[agent_id] = mtime
+        return changed
+
+    @staticmethod
+    def _write_msg(inbox: Path, msg: dict):
+        # filename: timestamp_msgid.msg.json (sortable, microsecond precision)
+        fname = f"{msg['timestamp']:.6f}_{msg['msg_id']}.msg.json"
+        (inbox / fname).write_text(json.dumps(msg, ensure_ascii=False), encoding="utf-8")
+
+
+# ── single-file WAL queue ──
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    receiver   TEXT NOT NULL,
+    sender     TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    body       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver, seq);
+CREATE INDEX IF NOT EXISTS idx_messages_expires ON messages(expires_at);
+CREATE TABLE IF NOT EXISTS agents (
+    agent_id TEXT PRIMARY KEY,
+    cursor   INTEGER NOT NULL DEFAULT 0,
+    pending  INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_SELECT = """
+SELECT * FROM (
+    SELECT * FROM (SELECT seq, receiver, expires_at, body FROM messages
+                    WHERE receiver = ?1 AND seq > ?2 ORDER BY seq LIMIT ?4)
+    UNION ALL
+    SELECT * FROM (SELECT seq, receiver, expires_at, body FROM messages
+                    WHERE receiver = '*' AND seq > ?3 AND sender != ?1 ORDER BY seq LIMIT ?4)
+) ORDER BY seq LIMIT ?4
+"""
+
+
+class SQLiteTransport(Transport):
+    """All inboxes in one SQLite database (WAL journal, safe across processes)."""
+
+    def __init__(self, db_path: Path):
+        self.path = Path(db_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._data_version = None
+        super().__init__(str(self.path.resolve()))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, fn, *args):
+        """Run fn(conn, *args) inside one IMMEDIATE transaction."""
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, *args)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def _ensure_agent(conn, agent_id: str) -> None:
+        # new agents only see broadcasts sent after they joined
+        conn.execute(
+            "INSERT OR IGNORE INTO agents(agent_id, cursor) "
+            "VALUES (?, (SELECT COALESCE(MAX(seq), 0) FROM messages))",
+            (agent_id,),
+        )
+
+    def register(self, agent_id: str) -> None:
+        self._write(self._ensure_agent, agent_id)
+
+    def deliver(self, msg: dict) -> None:
+        self._write(self._deliver, msg)
+        self._notifier.notify()
+
+    def _deliver(self, conn, msg: dict) -> None:
+        receiver, sender = msg["receiver"], msg["sender"]
+        if receiver != "*":
+            self._ensure_agent(conn, receiver)
+        conn.execute(
+            "INSERT INTO messages(receiver, sender, expires_at, body) VALUES (?, ?, ?, ?)",
+            (receiver, sender, msg["timestamp"] + msg["ttl"],
+             json.dumps(msg, ensure_ascii=False)),
+        )
+        if receiver == "*":
+            conn.execute("UPDATE agents SET pending = pending + 1 WHERE agent_id != ?", (sender,))
+        else:
+            conn.execute("UPDATE agents SET pending = pending + 1 WHERE agent_id = ?", (receiver,))
+
+    def receive(self, agent_id: str, limit: int = 20, include_expired: bool = False) -> list:
+        return self._write(self._receive, agent_id, limit, include_expired)
+
+    def _receive(self, conn, agent_id: str, limit: int, include_expired: bool) -> list:
+        self._ensure_agent(conn, agent_id)
+        (cursor,) = conn.execute("SELECT cursor FROM agents WHERE agent_id = ?", (agent_id,)).fetchone()
+        now = time.time()
+        messages, direct, consumed = [], [], 0
+        last_direct, consumed_any = 0, False
+        while len(messages) < limit:
+            rows = conn.execute(_SELECT, (agent_id, last_direct, cursor, limit)).fetchall()
+            if not rows:
+                # nothing left but our own broadcasts: move the cursor past them
+                (top,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM messages").fetchone()
+                if top > cursor:
+                    cursor = top
+                    consumed_any = True
+                break
+            for seq, receiver, expires_at, body in rows:
+                if receiver == "*":
+                    cursor = seq
+                else:
+                    direct.append((seq,))
+                    last_direct = seq
+                consumed += 1
+                if now > expires_at and not include_expired:
+                    continue
+                try:
+                    messages.append(json.loads(body))
+                except json.JSONDecodeError:
+                    continue
+                if len(messages) >= limit:
+                    break
+        if consumed or consumed_any:
+            conn.executemany("DELETE FROM messages WHERE seq = ?", direct)
+            conn.execute(
+                "UPDATE agents SET cursor = ?, pending = MAX(pending - ?, 0) WHERE agent_id = ?",
+                (cursor, consumed, agent_id),
+            )
+        return messages
+
+    def peek(self, agent_id: str, limit: int = 10) -> list:
+        with self._lock:
+            row = self._conn.execute("SELECT cursor FROM agents WHERE agent_id = ?", (agent_id,)).fetchone()
+            if row is None:
+                return []
+            rows = self._conn.execute(_SELECT, (agent_id, 0, row[0], limit)).fetchall()
+        now = time.time()
+        messages = []
+        for _, _, expires_at, body in rows:
+            if now > expires_at:
+                continue
+            try:
+                messages.append(json.loads(body))
+            except json.JSONDecodeError:
+                pass
+        return messages
+
+    def pending_count(self, agent_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT pending FROM agents WHERE agent_id = ?", (agent_id,)).fetchone()
+        return row[0] if row else 0
+
+    def purge_expired(self, agent_id: str) -> int:
+        """Drop every expired message (index range scan) and fully-read broadcasts."""
+        return self._write(self._purge, time.time())
+
+    def _purge(self, conn, now: float) -> int:
+        rows = conn.execute(
+            "SELECT seq, receiver, sender FROM messages WHERE expires_at < ?", (now,)
+        ).fetchall()
+        for seq, receiver, sender in rows:
+            if receiver == "*":
+                # only agents whose cursor has not passed it were still counting it
+                conn.execute(
+                    "UPDATE agents SET pending = MAX(pending - 1, 0) "
+                    "WHERE agent_id != ? AND cursor < ?",
+                    (sender, seq),
+                )
+            else:
+                conn.execute(
+                    "UPDATE agents SET pending = MAX(pending - 1, 0) WHERE agent_id = ?",
+                    (receiver,),
+                )
+        conn.executemany("DELETE FROM messages WHERE seq = ?", [(r[0],) for r in rows])
+        # broadcasts every agent has already read
+        conn.execute(
+            "DELETE FROM messages WHERE receiver = '*' "
+            "AND seq <= (SELECT COALESCE(MIN(cursor), 0) FROM agents)"
+        )
+        return len(rows)
+
+    def _changed_externally(self, agent_id: str) -> bool:
+        # data_version changes whenever another connection commits
+        with self._lock:
+            (version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        changed = self._data_version is not None and version != self._data_version
+        self._data_version = version
+        return changed
+
+
+def make_transport(kind: str, base_dir: Path) -> Transport:
+    """Build a transport rooted at base_dir ('sqlite' stores base_dir/messages.db)."""
+    if kind == "sqlite":
+        return SQLiteTransport(Path(base_dir) / "messages.db")
+    if kind == "file":
+        return FileTransport(base_dir)
+    raise ValueError(f"Unknown transport: {kind}")
@@ -20,18 +20,22 @@ Budget Config Schema:
   "weekly_token_budget": int,
   "heartbeat_time_limit_seconds": int
 }
+
+用量和心跳查询走 BudgetLedger（core/budget_ledger.py）的分桶计数，
+不再每次全量扫描 JSONL；并发 worker 用 reserve_tokens() 先预占再提交。
 """
 
 import json
+import threading
 import time
 from pathlib import Path
 from typing import Dict, Optional
-from datetime import datetime, timedelta
 
 import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from core.config import get_path
+from core.budget_ledger import BudgetLedger, Reservation, local_day_start
 
 
 def _usage_path() -> Path:
@@ -63,11 +67,26 @@ def _baseline_path() -> Path:
     return Path(__file__).resolve().parent.parent / "learning" / "baseline.jsonl"
 
 
-def _append_jsonl(path: Path, obj: dict):
-    """追加 JSONL 记录"""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+_ledgers: Dict[Path, BudgetLedger] = {}
+_ledgers_lock = threading.Lock()
+
+
+def _ledger(path: Path, value_key: str, histogram: bool = False) -> BudgetLedger:
+    """每个日志文件一个进程内共享的 ledger（状态文件与日志同目录）"""
+    with _ledgers_lock:
+        ledger = _ledgers.get(path)
+        if ledger is None:
+            state = path.with_name(path.stem + ".ledger.json")
+            ledger = _ledgers[path] = BudgetLedger(path, state, value_key, histogram)
+        return ledger
+
+
+def _token_ledger() -> BudgetLedger:
+    return _ledger(_usage_path(), "total_tokens")
+
+
+def _heartbeat_ledger() -> BudgetLedger:
+    return _ledger(_heartbeat_path(), "seconds", histogram=True)
 
 
 def _load_config() -> Dict:
@@ -109,7 +128,14 @@ def record_usage(
         model: 模型名称
         task: 任务描述
     """
-    record = {
+    _token_ledger().append(make_usage_record(input_tokens, output_tokens, model, task))
+
+
+def make_usage_record(
+    input_tokens: int, output_tokens: int, model: str, task: str = "unknown"
+) -> Dict:
+    """构造一条 token 使用记录（record_usage / Reservation.commit 共用）"""
+    return {
         "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime()),
         "epoch": int(time.time()),
         "input_tokens": input_tokens,
@@ -118,7 +144,35 @@ def record_usage(
         "model": model,
         "task": task,
     }
-    _append_jsonl(_usage_path(), record)
+
+
+def _budget_windows(now: Optional[float] = None) -> Dict[str, int]:
+    """今日 / 本周（周一零点起）的起点 epoch"""
+    now = time.time() if now is None else now
+    today_start = local_day_start(now)
+    week_start = today_start - time.localtime(now).tm_wday * 86400
+    return {"daily": today_start, "weekly": week_start}
+
+
+def reserve_tokens(tokens: int, ttl: float = 300.0) -> Optional[Reservation]:
+    """
+    预占 token：今日/本周的 已用 + 已预占 + tokens 均不超预算时返回预占，否则 None。
+
+    用法：
+        res = reserve_tokens(2000)
+        if res is None:
+            ...  # 预算不足
+        with res:
+            ...  # 调用模型
+            res.commit(make_usage_record(input_tokens, output_tokens, model, task))
+    """
+    config = _load_config()
+    windows = _budget_windows()
+    limits = [
+        (windows["daily"], config.get("daily_token_budget", 100000)),
+        (windows["weekly"], config.get("weekly_token_budget", 500000)),
+    ]
+    return _token_ledger().reserve(tokens, limits, ttl=ttl)
 
 
 def record_heartbeat_time(seconds: float):
@@ -133,28 +187,12 @@ def record_heartbeat_time(seconds: float):
         "epoch": int(time.time()),
         "seconds": round(seconds, 3),
     }
-    _append_jsonl(_heartbeat_path(), record)
+    _heartbeat_ledger().append(record)
 
 
 def _get_usage_in_period(since_epoch: int) -> int:
     """获取指定时间段内的 token 使用量"""
-    path = _usage_path()
-    if not path.exists():
-        return 0
-
-    total = 0
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                record = json.loads(line)
-                if record.get("epoch", 0) >= since_epoch:
-                    total += record.get("total_tokens", 0)
-            except Exception:
-                continue
-
-    return total
+    return _token_ledger().used_since(since_epoch)
 
 
 def _load_baseline_tokens() -> int:
@@ -181,18 +219,17 @@ def check_budget() -> Dict:
             "weekly_used": int,
             "weekly_budget": int,
             "weekly_pct": float,
+            "reserved": int,
             "alert_level": "ok|warn|crit"
         }
     """
     config = _load_config()
-    now = int(time.time())
 
-    # 计算今日和本周的起始时间
-    today_start = now - (now % 86400) + time.timezone
-    week_start = today_start - (datetime.now().weekday() * 86400)
+    # 今日和本周（周一）的本地零点
+    windows = _budget_windows()
 
-    daily_used = _get_usage_in_period(today_start)
-    weekly_used = _get_usage_in_period(week_start)
+    daily_used = _get_usage_in_period(windows["daily"])
+    weekly_used = _get_usage_in_period(windows["weekly"])
 
     daily_budget = config.get("daily_token_budget", 100000)
     weekly_budget = config.get("weekly_token_budget", 500000)
@@ -216,6 +253,7 @@ def check_budget() -> Dict:
         "weekly_used": weekly_used,
         "weekly_budget": weekly_budget,
         "weekly_pct": round(weekly_pct, 3),
+        "reserved": _token_ledger().reserved(),
         "alert_level": alert_level,
     }
 
@@ -232,32 +270,11 @@ def get_heartbeat_stats(days: int = 7) -> Dict:
             "over_limit_count": int
         }
     """
-    path = _heartbeat_path()
-    if not path.exists():
-        return {
-            "count": 0,
-            "avg_seconds": 0.0,
-            "max_seconds": 0.0,
-            "over_limit_count": 0,
-        }
-
     config = _load_config()
     limit = config.get("heartbeat_time_limit_seconds", 30)
-    cutoff = time.time() - days * 86400
+    stats = _heartbeat_ledger().window(time.time() - days * 86400)
 
-    times = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                record = json.loads(line)
-                if record.get("epoch", 0) >= cutoff:
-                    times.append(record.get("seconds", 0))
-            except Exception:
-                continue
-
-    if not times:
+    if not stats["count"]:
         return {
             "count": 0,
             "avg_seconds": 0.0,
@@ -265,11 +282,12 @@ def get_heartbeat_stats(days: int = 7) -> Dict:
             "over_limit_count": 0,
         }
 
+    # 直方图按 ceil(seconds) 分桶：ceil(t) > limit 等价于 t > limit（limit 为整数）
     return {
-        "count": len(times),
-        "avg_seconds": round(sum(times) / len(times), 2),
-        "max_seconds": round(max(times), 2),
-        "over_limit_count": sum(1 for t in times if t > limit),
+        "count": stats["count"],
+        "avg_seconds": round(stats["total"] / stats["count"], 2),
+        "max_seconds": round(stats["max"], 2),
+        "over_limit_count": sum(n for k, n in stats["histogram"].items() if k > limit),
     }
 
 
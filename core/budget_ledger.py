@@ -0,0 +1,322 @@
+"""
+AIOS Budget Ledger - 分桶滚动计数 + 预占
+
+token_usage.jsonl / heartbeat_time.jsonl 仍是唯一的事实来源（追加写），
+Ledger 只增量读取文件尾部，把记录累加进分钟/小时/天三级时间桶：
+- 窗口查询只合并覆盖窗口的少量桶（今日 1 个天桶，本周 ≤7 个），与历史长度无关
+- 桶 + 已读偏移持久化到一个紧凑 JSON 文件，重启后从偏移处继续读，不再全量扫描
+- 其他进程（如 CLI）追加的记录在下次查询时从尾部读入
+- reserve() 在锁内检查「已用 + 已预占 + 本次」是否超出各窗口预算，
+  并发 worker 先预占再 commit 实际用量，不会一起越过上限
+  （预占只在本进程内可见；跨进程只能看到已提交的用量）
+
+用法：
+    ledger = BudgetLedger(usage_path, usage_path.with_name("token_usage.ledger.json"))
+    res = ledger.reserve(2000, [(day_start, 100000), (week_start, 500000)])
+    if res:
+        ...
+        res.commit({"input_tokens": 800, "output_tokens": 400, "total_tokens": 1200, ...})
+    ledger.window(day_start)["total"]
+"""
+
+import atexit
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# (名称, 桶宽秒数, 保留桶数)
+RESOLUTIONS = (
+    ("minute", 60, 180),
+    ("hour", 3600, 24 * 35),
+    ("day", 86400, 400),
+)
+SAVE_INTERVAL = 5.0  # 状态文件最短写盘间隔（秒）
+RESERVATION_TTL = 300.0  # 未提交的预占自动失效时间（秒）
+
+# 本地时区偏移（东为正），天桶按本地零点切分
+LOCAL_OFFSET = -time.timezone
+
+
+def local_day_start(epoch: float) -> int:
+    """epoch 所在本地日的零点"""
+    return int((epoch + LOCAL_OFFSET) // 86400 * 86400 - LOCAL_OFFSET)
+
+
+def _bucket(epoch: float, width: int) -> int:
+    return int((epoch + LOCAL_OFFSET) // width)
+
+
+class RollingCounter:
+    """按分钟/小时/天分桶的 [count, total, max]，可选按 ceil(value) 的直方图"""
+
+    def __init__(self, histogram: bool = False):
+        self.histogram = histogram
+        self.buckets: Dict[str, Dict[int, list]] = {name: {} for name, _, _ in RESOLUTIONS}
+
+    def add(self, epoch: float, value: float) -> None:
+        for name, width, _ in RESOLUTIONS:
+            b = self.buckets[name].get(_bucket(epoch, width))
+            if b is None:
+                b = self.buckets[name][_bucket(epoch, width)] = [0, 0, 0, {}] if self.histogram else [0, 0, 0]
+            b[0] += 1
+            b[1] += value
+            if value > b[2]:
+                b[2] = value
+            if self.histogram:
+                key = str(math.ceil(value))
+                b[3][key] = b[3].get(key, 0) + 1
+
+    def prune(self, now: float) -> None:
+        for name, width, keep in RESOLUTIONS:
+            oldest = _bucket(now, width) - keep + 1
+            stale = [idx for idx in self.buckets[name] if idx < oldest]
+            for idx in stale:
+                del self.buckets[name][idx]
+
+    def window(self, start: float, now: Optional[float] = None) -> Dict:
+        """
+        [start, now] 内的合计。从 start 起贪心取对齐的最粗桶；start 不对齐时
+        用包含它的最细仍保留的桶（3 小时内为分钟桶，更早为小时桶），
+        其 count / total / 直方图按落在窗口内的时长比例折算（假设桶内均匀分布），
+        max 无法拆分仍取整个桶的。桶数有上界，与记录数无关。
+        """
+        now = time.time() if now is None else now
+        count, total, peak, hist = 0, 0, 0, {}
+        t = start
+        while t <= now:
+            chosen = None
+            for name, width, keep in reversed(RESOLUTIONS):
+                idx = _bucket(t, width)
+                if (t + LOCAL_OFFSET) % width == 0 and idx > _bucket(now, width) - keep:
+                    chosen = (name, width, idx)
+                    break
+            if chosen is None:
+                for name, width, keep in RESOLUTIONS:
+                    idx = _bucket(t, width)
+                    if idx > _bucket(now, width) - keep:
+                        chosen = (name, width, idx)
+                        break
+            if chosen is None:
+                # 早于所有保留期：从最老的天桶开始
+                _, width, keep = RESOLUTIONS[-1]
+                t = (_bucket(now, width) - keep + 1) * width - LOCAL_OFFSET
+                continue
+            name, width, idx = chosen
+            end = (idx + 1) * width - LOCAL_OFFSET
+            b = self.buckets[name].get(idx)
+            if b is not None:
+                # 只有首个桶可能从 start 之前开始
+                share = min(1.0, (end - t) / width)
+                count += b[0] if share == 1.0 else round(b[0] * share)
+                total += b[1] if share == 1.0 else b[1] * share
+                peak = max(peak, b[2])
+                if self.histogram:
+                    for k, v in b[3].items():
+                        hist[k] = hist.get(k, 0) + (v if share == 1.0 else round(v * share))
+            t = end
+        result = {"count": count, "total": total, "max": peak}
+        if self.histogram:
+            result["histogram"] = {int(k): v for k, v in hist.items() if v}
+        return result
+
+    def to_dict(self) -> Dict:
+        return {name: {str(k): v for k, v in b.items()} for name, b in self.buckets.items()}
+
+    def load(self, data: Dict) -> None:
+        for name, _, _ in RESOLUTIONS:
+            self.buckets[name] = {int(k): v for k, v in data.get(name, {}).items()}
+
+
+class Reservation:
+    """一次预占；commit 记录实际用量，release/超时归还"""
+
+    def __init__(self, ledger: "BudgetLedger", rid: int, tokens: int, expires_at: float):
+        self.ledger = ledger
+        self.id = rid
+        self.tokens = tokens
+        self.expires_at = expires_at
+        self.open = True
+
+    def commit(self, record: Dict) -> None:
+        """写入实际用量记录（可以与预占量不同）并释放预占"""
+        self.ledger._commit(self, record)
+
+    def release(self) -> None:
+        self.ledger._release(self)
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.open:
+            self.release()
+
+
+class BudgetLedger:
+    """
+    增量读取一个 JSONL 日志并维护分桶计数。
+
+    Args:
+        log_path: 事实来源 JSONL（每行一个带 epoch 的记录）
+        state_path: 分桶状态文件
+        value_key: 累加的字段（如 total_tokens / seconds）
+        histogram: 是否维护按整数值的直方图
+    """
+
+    def __init__(self, log_path: Path, state_path: Path, value_key: str = "total_tokens",
+                 histogram: bool = False):
+        self.log_path = Path(log_path)
+        self.state_path = Path(state_path)
+        self.value_key = value_key
+        self.counter = RollingCounter(histogram=histogram)
+        self._offset = 0
+        self._dirty = False
+        self._saved_at = 0.0
+        self._lock = threading.RLock()
+        self._reservations: Dict[int, Reservation] = {}
+        self._ids = itertools.count(1)
+        self._load_state()
+        self._sync()
+        _open_ledgers.add(self)
+
+    # ── 状态 ──
+
+    def _load_state(self) -> None:
+        if not self.state_path.exists():
+            return
+        try:
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+            if data.get("value_key") != self.value_key:
+                return
+            self.counter.load(data.get("buckets", {}))
+            self._offset = int(data.get("offset", 0))
+        except (json.JSONDecodeError, OSError, ValueError, TypeError):
+            self.counter = RollingCounter(histogram=self.counter.histogram)
+            self._offset = 0
+
+    def flush(self) -> None:
+        """把分桶状态写盘（原子替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_suffix(".tmp")
+            tmp.write_text(
+                json.dumps(
+                    {"value_key": self.value_key, "offset": self._offset,
+                     "buckets": self.counter.to_dict()},
+                    separators=(",", ":"),
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.state_path)
+            self._dirty = False
+            self._saved_at = time.time()
+
+    def _sync(self) -> None:
+        """读入日志新追加的部分；日志被截断/轮转时从头重建"""
+        with self._lock:
+            try:
+                size = self.log_path.stat().st_size
+            except OSError:
+                size = 0
+            if size < self._offset:
+                self.counter = RollingCounter(histogram=self.counter.histogram)
+                self._offset = 0
+                self._dirty = True
+            if size > self._offset:
+                with open(self.log_path, "rb") as f:
+                    f.seek(self._offset)
+                    chunk = f.read(size - self._offset)
+                end = chunk.rfind(b"\n") + 1  # 只处理完整的行
+                for line in chunk[:end].splitlines():
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        self.counter.add(record.get("epoch", 0), record.get(self.value_key, 0))
+                    except (json.JSONDecodeError, TypeError, AttributeError):
+                        continue
+                if end:
+                    self._offset += end
+                    self.counter.prune(time.time())
+                    self._dirty = True
+            if self._dirty and time.time() - self._saved_at >= SAVE_INTERVAL:
+                self.flush()
+
+    # ── 写入 / 查询 ──
+
+    def append(self, record: Dict) -> None:
+        """追加一条记录到日志并计入桶"""
+        with self._lock:
+            self._sync()  # 先读入别人的追加，保证偏移对齐
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.log_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._sync()
+
+    def window(self, start: float, now: Optional[float] = None) -> Dict:
+        with self._lock:
+            self._sync()
+            return self.counter.window(start, now)
+
+    def used_since(self, start: float) -> int:
+        return int(self.window(start)["total"])
+
+    # ── 预占 ──
+
+    def reserved(self) -> int:
+        with self._lock:
+            self._expire()
+            return sum(r.tokens for r in self._reservations.values())
+
+    def reserve(self, tokens: int, limits: Iterable[Tuple[float, int]],
+                ttl: float = RESERVATION_TTL) -> Optional[Reservation]:
+        """
+        预占 tokens。limits 为 [(窗口起点 epoch, 预算)]；任一窗口的
+        已用 + 已预占 + tokens 超出预算即返回 None。
+        """
+        with self._lock:
+            self._sync()
+            self._expire()
+            pending = sum(r.tokens for r in self._reservations.values())
+            now = time.time()
+            for start, limit in limits:
+                if limit and self.counter.window(start, now)["total"] + pending + tokens > limit:
+                    return None
+            res = Reservation(self, next(self._ids), tokens, now + ttl)
+            self._reservations[res.id] = res
+            return res
+
+    def _expire(self) -> None:
+        now = time.time()
+        for rid in [rid for rid, r in self._reservations.items() if r.expires_at < now]:
+            self._reservations.pop(rid).open = False
+
+    def _commit(self, res: Reservation, record: Dict) -> None:
+        with self._lock:
+            self._release(res)
+            self.append(record)
+
+    def _release(self, res: Reservation) -> None:
+        with self._lock:
+            self._reservations.pop(res.id, None)
+            res.open = False
+
+
+_open_ledgers: "weakref.WeakSet[BudgetLedger]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    for ledger in list(_open_ledgers):
+        try:
+            ledger.flush()
+        except OSError:
+            pass
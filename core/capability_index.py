@@ -0,0 +1,350 @@
+"""
+AIOS Capability Index - 工具 / Skill / 插件共用的能力倒排索引
+
+- 分词：英文/数字按词，中文按单字 + 双字（bigram）
+- 打分：BM25，关键词字段加权；再乘上成功率先验（Laplace 平滑，没有记录时为 1.0）
+- 关键词命中：关键词是查询（小写后）的子串即算命中，"python" 能命中 "跑一下python3"
+- 增量：upsert / remove 只改动该条目的倒排项，不需要全量重建
+- 作用域：每个使用者（ToolManager / SkillManager ...）用 new_scope() 领一个作用域，
+  同名条目互不覆盖，检索直接取 (类别, 作用域) 对应的分片；使用者 close() 时
+  release_scope() 整个释放，全局索引不会随实例增多而膨胀
+
+用法：
+    index = get_capability_index()
+    scope = index.new_scope("tools")
+    index.upsert("tool:web_search", "搜索 网页", keywords=["搜索"], kind="tool", scope=scope)
+    index.search("帮我搜索一下", kind="tool", scope=scope)  # -> [CapabilityHit(...)]
+    index.release_scope(scope)
+"""
+import heapq
+import itertools
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+_WORD = re.compile(r"[a-z0-9_]+|[\u3400-\u9fff\uf900-\ufaff]+")
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+KEYWORD_BOOST = 3  # 关键词字段的词频权重
+REWEIGHT_DRIFT = 0.25  # 平均文档长度变化超过该比例时重算权重
+
+
+def tokenize(text: str) -> List[str]:
+    """小写后切词：ASCII 连续串为一个词，中文连续串拆成单字 + 双字"""
+    tokens = []
+    for run in _WORD.findall((text or "").lower()):
+        if run[0] < "\u3400":
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class CapabilityHit:
+    """一次检索命中"""
+
+    doc_id: str
+    kind: str
+    score: float
+    keyword_hits: int  # 命中（作为子串出现在查询里）的关键词个数
+    success_rate: float
+    scope: str = ""
+
+
+def _rank_key(item) -> tuple:
+    return item[0], item[1]
+
+
+def _saturate(tf: int, length: int, avg_len: float) -> float:
+    """BM25 的词频饱和项"""
+    return tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_len))
+
+
+class _Doc:
+    __slots__ = ("doc_id", "kind", "scope", "tf", "length", "keywords", "successes", "total")
+
+    def __init__(self, doc_id: str, kind: str, scope: str, tf: Dict[str, int],
+                 keywords: FrozenSet[str]):
+        self.doc_id = doc_id
+        self.kind = kind
+        self.scope = scope
+        self.tf = tf
+        self.length = sum(tf.values())
+        self.keywords = keywords
+        self.successes = 0
+        self.total = 0
+
+    @property
+    def prior(self) -> float:
+        return (self.successes + 1) / (self.total + 2)
+
+
+class _Shard:
+    """同一类别、同一作用域的倒排表。倒排项里直接存 BM25 饱和后的权重，检索时只做乘加"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}  # term -> {doc_id: weight}
+        # 关键词按首字符分桶：检索时只检查首字符出现在查询里的关键词
+        self.keywords: Dict[str, Dict[str, Set[str]]] = {}  # 首字符 -> {关键词: {doc_id}}
+        self.docs: Dict[str, _Doc] = {}
+        self.total_len = 0
+        self.avg_ref = 0.0  # 计算权重时用的平均长度
+
+    def _reweigh(self) -> None:
+        """平均长度漂移太多时整体重算权重（增删都会触发，摊还后开销很小）"""
+        if not self.docs:
+            self.avg_ref = 0.0
+            return
+        avg = self.total_len / len(self.docs) or 1.0
+        if self.avg_ref and abs(avg - self.avg_ref) <= REWEIGHT_DRIFT * self.avg_ref:
+            return
+        self.avg_ref = avg
+        for term, posting in self.postings.items():
+            for doc_id in posting:
+                other = self.docs[doc_id]
+                posting[doc_id] = _saturate(other.tf[term], other.length, avg)
+
+    def add(self, doc: _Doc) -> None:
+        self.docs[doc.doc_id] = doc
+        self.total_len += doc.length
+        self._reweigh()
+        for term, tf in doc.tf.items():
+            self.postings.setdefault(term, {})[doc.doc_id] = _saturate(tf, doc.length, self.avg_ref)
+        for kw in doc.keywords:
+            self.keywords.setdefault(kw[0], {}).setdefault(kw, set()).add(doc.doc_id)
+
+    def keyword_hits(self, text: str) -> Dict[str, int]:
+        """text 已小写；返回 {doc_id: 命中的关键词个数}"""
+        hits: Dict[str, int] = {}
+        for ch in set(text):
+            bucket = self.keywords.get(ch)
+            if not bucket:
+                continue
+            for kw, doc_ids in bucket.items():
+                if kw in text:
+                    for doc_id in doc_ids:
+                        hits[doc_id] = hits.get(doc_id, 0) + 1
+        return hits
+
+    def discard(self, doc: _Doc) -> None:
+        if self.docs.pop(doc.doc_id, None) is None:
+            return
+        self.total_len -= doc.length
+        for term in doc.tf:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc.doc_id, None)
+            if not posting:
+                del self.postings[term]
+        for kw in doc.keywords:
+            bucket = self.keywords.get(kw[0], {})
+            doc_ids = bucket.get(kw)
+            if doc_ids is None:
+                continue
+            doc_ids.discard(doc.doc_id)
+            if not doc_ids:
+                del bucket[kw]
+                if not bucket:
+                    del self.keywords[kw[0]]
+        self._reweigh()
+
+
+class CapabilityIndex:
+    """带 BM25 打分和成功率先验的倒排索引（按类别 + 作用域分片，线程安全）"""
+
+    def __init__(self):
+        self._docs: Dict[Tuple[str, str], _Doc] = {}  # (scope, doc_id) -> doc
+        self._shards: Dict[str, Dict[str, _Shard]] = {}  # scope -> {kind: shard}
+        self._lock = threading.RLock()
+        self._scope_seq = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, key) -> bool:
+        """key 为 (scope, doc_id) 时只查该作用域，为 doc_id 时查所有作用域"""
+        if isinstance(key, tuple):
+            return key in self._docs
+        with self._lock:
+            return any((scope, key) in self._docs for scope in self._shards)
+
+    def new_scope(self, label: str = "scope") -> str:
+        """领取一个新的作用域名；不同作用域里的同名条目互不影响"""
+        return f"{label}#{next(self._scope_seq)}"
+
+    def release_scope(self, scope: str) -> int:
+        """释放作用域：删除其全部条目和分片，返回删除的条目数"""
+        with self._lock:
+            shards = self._shards.pop(scope, {})
+            removed = 0
+            for shard in shards.values():
+                for doc_id in shard.docs:
+                    self._docs.pop((scope, doc_id), None)
+                    removed += 1
+            return removed
+
+    def _discard(self, doc: _Doc) -> None:
+        """从分片移除；分片 / 作用域空了就删掉"""
+        shards = self._shards[doc.scope]
+        shard = shards[doc.kind]
+        shard.discard(doc)
+        if not shard.docs:
+            del shards[doc.kind]
+            if not shards:
+                del self._shards[doc.scope]
+
+    def upsert(
+        self,
+        doc_id: str,
+        text: str = "",
+        keywords: Optional[Iterable[str]] = None,
+        kind: str = "",
+        scope: str = "",
+    ) -> None:
+        """新增或更新一个条目；成功率统计在更新时保留"""
+        tf: Dict[str, int] = {}
+        for term in tokenize(text):
+            tf[term] = tf.get(term, 0) + 1
+        keyword_set = set()
+        for kw in keywords or ():
+            kw = (kw or "").strip().lower()
+            if not kw:
+                continue
+            keyword_set.add(kw)
+            for term in tokenize(kw):
+                tf[term] = tf.get(term, 0) + KEYWORD_BOOST
+
+        doc = _Doc(doc_id, kind, scope, tf, frozenset(keyword_set))
+        with self._lock:
+            old = self._docs.get((scope, doc_id))
+            if old is not None:
+                doc.successes, doc.total = old.successes, old.total
+                self._discard(old)
+            self._docs[(scope, doc_id)] = doc
+            self._shards.setdefault(scope, {}).setdefault(kind, _Shard()).add(doc)
+
+    def remove(self, doc_id: str, scope: str = "") -> bool:
+        with self._lock:
+            doc = self._docs.pop((scope, doc_id), None)
+            if doc is None:
+                return False
+            self._discard(doc)
+            return True
+
+    def set_outcomes(self, doc_id: str, successes: int, total: int, scope: str = "") -> None:
+        """用外部统计覆盖成功率（如 Tool.success_count / usage_count）"""
+        doc = self._docs.get((scope, doc_id))
+        if doc is not None:
+            doc.successes, doc.total = successes, total
+
+    def record_outcome(self, doc_id: str, success: bool, scope: str = "") -> None:
+        doc = self._docs.get((scope, doc_id))
+        if doc is not None:
+            with self._lock:
+                doc.total += 1
+                doc.successes += 1 if success else 0
+
+    def search(
+        self,
+        query: str,
+        kind: Optional[str] = None,
+        limit: int = 10,
+        require_keyword: bool = False,
+        scope: Optional[str] = None,
+    ) -> List[CapabilityHit]:
+        """
+        检索。只访问 query 中出现的词的倒排表和首字符出现在 query 里的关键词，
+        复杂度与注册条目总数无关。
+
+        Args:
+            kind: 只返回该类别（tool / skill / plugin ...）
+            scope: 只返回该作用域的条目；None 表示所有作用域。idf 按类别 + 作用域计算
+            require_keyword: 至少命中一个关键词才返回
+        """
+        text = (query or "").lower()
+        terms = set(tokenize(text))
+
+        ranked = []
+        with self._lock:
+            # 给了作用域 / 类别就直接取分片，不遍历其他使用者的分片
+            if scope is None:
+                by_kind = list(self._shards.values())
+            else:
+                by_kind = [self._shards.get(scope, {})]
+            if kind is None:
+                shards = [shard for kinds in by_kind for shard in kinds.values()]
+            else:
+                shards = [kinds[kind] for kinds in by_kind if kind in kinds]
+            for shard in shards:
+                n_docs = len(shard.docs)
+                scores: Dict[str, float] = {}
+                get = scores.get
+                for term in terms:
+                    posting = shard.postings.get(term)
+                    if not posting:
+                        continue
+                    df = len(posting)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for doc_id, weight in posting.items():
+                        scores[doc_id] = get(doc_id, 0.0) + idf * weight
+
+                keyword_hits_by_doc = shard.keyword_hits(text)
+                if require_keyword:
+                    candidates = keyword_hits_by_doc.keys()
+                else:
+                    candidates = scores.keys() | keyword_hits_by_doc.keys()
+                docs = shard.docs
+                for doc_id in candidates:
+                    doc = docs[doc_id]
+                    score = scores.get(doc_id, 0.0)
+                    keyword_hits = keyword_hits_by_doc.get(doc_id, 0)
+                    if doc.total:
+                        # 先验折算成 [0.5, 1.5] 的乘数，没有记录时为 1.0，不影响排序
+                        score *= 0.5 + doc.prior
+                    ranked.append((keyword_hits, score, doc))
+
+            if limit and len(ranked) > limit:
+                ranked = heapq.nlargest(limit, ranked, key=_rank_key)
+            else:
+                ranked.sort(key=_rank_key, reverse=True)
+            return [
+                CapabilityHit(doc.doc_id, doc.kind, score, keyword_hits, doc.prior, doc.scope)
+                for keyword_hits, score, doc in ranked
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            terms = 0
+            for shards in self._shards.values():
+                for kind, shard in shards.items():
+                    kinds[kind] = kinds.get(kind, 0) + len(shard.docs)
+                    terms += len(shard.postings)
+            return {
+                "docs": len(self._docs),
+                "kinds": kinds,
+                "scopes": len(self._shards),
+                "terms": terms,
+            }
+
+
+# 全局单例
+_global_index: Optional[CapabilityIndex] = None
+_global_lock = threading.Lock()
+
+
+def get_capability_index() -> CapabilityIndex:
+    """获取全局能力索引（工具、skill、插件共用）"""
+    global _global_index
+    if _global_index is None:
+        with _global_lock:
+            if _global_index is None:
+                _global_index = CapabilityIndex()
+    return _global_index
@@ -0,0 +1,356 @@
+"""
+AIOS DAG Runtime - 计划 DAG 的就绪集调度
+
+Orchestrator / Planner / Delegator 共用：
+- 创建时做环检测（CycleError），并按依赖计算关键路径长度
+- 每个节点维护未完成依赖计数（in-degree）；依赖完成时只更新它的下游，
+  计数归零即进入就绪堆，不再每次重建 done 集合、扫描全部子任务
+- 就绪堆按 (priority 升序, 关键路径长度降序, 创建顺序) 排序；ready() 直接从堆顶取
+- 各状态的节点数随转移增减，counts() 不再遍历节点
+- 按任务类型的历史耗时（EWMA）估算剩余完成时间
+
+用法：
+    dag = DagRuntime(stats=get_duration_stats())
+    dag.add("design", kind="design")
+    dag.add("code", deps=["design"], kind="code", priority=1)
+    dag.build()            # 环检测 + 关键路径
+    dag.ready()            # ["design"]
+    dag.start("design"); dag.complete("design")   # -> ["code"]
+    dag.eta()              # 预计剩余秒数
+"""
+
+import heapq
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# 未知 / 外部状态：既不就绪也不算完成，下游保持阻塞，调度器不会派发
+BLOCKED = "blocked"
+
+DEFAULT_DURATION = 60.0  # 没有历史数据时的单步耗时估计（秒）
+
+
+class CycleError(ValueError):
+    """计划里存在循环依赖"""
+
+
+class DurationStats:
+    """按任务类型统计的历史耗时（指数加权平均），可选落盘"""
+
+    def __init__(self, alpha: float = 0.3, path: Optional[Path] = None):
+        self.alpha = alpha
+        self.path = path
+        self._mean: Dict[str, float] = {}
+        self._count: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if path and Path(path).exists():
+            try:
+                data = json.loads(Path(path).read_text(encoding="utf-8"))
+                self._mean = {k: float(v["mean"]) for k, v in data.items()}
+                self._count = {k: int(v["count"]) for k, v in data.items()}
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                pass
+
+    def observe(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            old = self._mean.get(kind)
+            self._mean[kind] = seconds if old is None else old + self.alpha * (seconds - old)
+            self._count[kind] = self._count.get(kind, 0) + 1
+            if self.path:
+                Path(self.path).write_text(
+                    json.dumps({k: {"mean": m, "count": self._count[k]} for k, m in self._mean.items()}),
+                    encoding="utf-8",
+                )
+
+    def estimate(self, kind: str, default: float = DEFAULT_DURATION) -> float:
+        return self._mean.get(kind, default)
+
+    def samples(self, kind: str) -> int:
+        return self._count.get(kind, 0)
+
+
+class _Node:
+    __slots__ = ("id", "order", "deps", "children", "priority", "kind", "estimate",
+                 "unmet", "status", "cp", "started_at")
+
+    def __init__(self, node_id, order, deps, priority, kind, estimate, status, started_at):
+        self.id = node_id
+        self.order = order
+        self.deps = deps
+        self.children: List["_Node"] = []
+        self.priority = priority
+        self.kind = kind
+        self.estimate = estimate
+        self.unmet = 0
+        self.status = status
+        self.cp = 0.0
+        self.started_at = started_at
+
+
+class DagRuntime:
+    """单个计划的依赖图运行时（非线程安全，由所属协调器串行调用）"""
+
+    def __init__(self, stats: Optional[DurationStats] = None,
+                 clock: Callable[[], float] = time.time):
+        self.stats = stats
+        self.clock = clock
+        self._nodes: Dict[str, _Node] = {}
+        self._topo: List[_Node] = []
+        self._heap: list = []
+        self._ready: set = set()
+        self._counts: Dict[str, int] = {}  # 状态 -> 节点数，随转移增减
+        self._built = False
+
+    # ── 构建 ──
+
+    def add(self, node_id: str, deps: Iterable[str] = (), priority: float = 5,
+            kind: str = "", estimate: Optional[float] = None, status: str = PENDING,
+            started_at: float = 0.0) -> None:
+        """
+        添加节点。
+
+        Args:
+            kind: 任务类型，用于历史耗时统计
+            estimate: 该类型还没有历史数据时使用的耗时估计（秒）
+            status / started_at: 从已保存的计划恢复（pending/running/done/failed/blocked）
+        """
+        if self._built:
+            raise RuntimeError("DAG already built")
+        if node_id in self._nodes:
+            raise ValueError(f"duplicate node: {node_id}")
+        self._nodes[node_id] = _Node(node_id, len(self._nodes), list(deps), priority,
+                                     kind, estimate, status, started_at)
+
+    def build(self) -> "DagRuntime":
+        """环检测、关键路径、初始就绪集。O(V + E)"""
+        nodes = self._nodes
+        indegree = {}
+        for node in nodes.values():
+            known = [d for d in node.deps if d in nodes]
+            indegree[node.id] = len(known)
+            for dep in known:
+                nodes[dep].children.append(node)
+            # 计划外的依赖永远不会完成，节点保持阻塞（与逐个检查依赖的旧行为一致）
+            node.unmet = sum(1 for d in node.deps if d not in nodes or nodes[d].status != DONE)
+
+        # Kahn 拓扑排序；排不完说明有环
+        queue = [n for n in nodes.values() if indegree[n.id] == 0]
+        topo = []
+        while queue:
+            node = queue.pop()
+            topo.append(node)
+            for child in node.children:
+                indegree[child.id] -= 1
+                if indegree[child.id] == 0:
+                    queue.append(child)
+        if len(topo) != len(nodes):
+            stuck = sorted((n for n in nodes.values() if indegree[n.id] > 0), key=lambda n: n.order)
+            raise CycleError("cycle among: " + ", ".join(n.id for n in stuck))
+        self._topo = topo
+
+        for node in reversed(topo):
+            tail = max((c.cp for c in node.children), default=0.0)
+            node.cp = self._duration(node) + tail
+
+        for node in topo:
+            self._counts[node.status] = self._counts.get(node.status, 0) + 1
+            if node.status == PENDING and node.unmet == 0:
+                self._push(node)
+        self._built = True
+        return self
+
+    def _duration(self, node: _Node) -> float:
+        """有历史数据用历史均值，否则用节点自带估计"""
+        fallback = DEFAULT_DURATION if node.estimate is None else float(node.estimate)
+        if self.stats is not None and self.stats.samples(node.kind):
+            return self.stats.estimate(node.kind, fallback)
+        return fallback
+
+    def _push(self, node: _Node) -> None:
+        self._ready.add(node.id)
+        heapq.heappush(self._heap, (node.priority, -node.cp, node.order, node.id))
+
+    def _set(self, node: _Node, status: str) -> None:
+        counts = self._counts
+        counts[node.status] -= 1
+        counts[status] = counts.get(status, 0) + 1
+        node.status = status
+
+    # ── 查询 ──
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def status(self, node_id: str) -> str:
+        return self._nodes[node_id].status
+
+    def index(self, node_id: str) -> int:
+        """节点的添加顺序（对应计划里子任务列表的下标）"""
+        return self._nodes[node_id].order
+
+    def critical_path(self, node_id: str) -> float:
+        return self._nodes[node_id].cp
+
+    def ready(self, limit: Optional[int] = None) -> List[str]:
+        """
+        依赖已全部完成、尚未开始的节点，按调度优先级排序。
+        从堆顶弹出前 limit 个再放回，O(limit · log n)；顺带丢掉已失效的堆项。
+        """
+        heap, ready = self._heap, self._ready
+        want = len(ready) if limit is None else min(limit, len(ready))
+        taken: list = []
+        seen: set = set()
+        while heap and len(taken) < want:
+            entry = heapq.heappop(heap)
+            node_id = entry[3]
+            if node_id in ready and node_id not in seen:
+                seen.add(node_id)
+                taken.append(entry)
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return [entry[3] for entry in taken]
+
+    def pop_ready(self) -> Optional[str]:
+        """取出优先级最高的就绪节点并标记为 running"""
+        while self._heap:
+            _, _, _, node_id = heapq.heappop(self._heap)
+            if node_id in self._ready:
+                self.start(node_id)
+                return node_id
+        return None
+
+    def all_done(self) -> bool:
+        return self._counts.get(DONE, 0) == len(self._nodes)
+
+    def failed_count(self) -> int:
+        return self._counts.get(FAILED, 0)
+
+    def counts(self) -> Dict[str, int]:
+        """各状态节点数（O(1)）"""
+        total = len(self._nodes)
+        done = self._counts.get(DONE, 0)
+        failed = self._counts.get(FAILED, 0)
+        running = self._counts.get(RUNNING, 0)
+        return {
+            "total": total,
+            "done": done,
+            "failed": failed,
+            "running": running,
+            "ready": len(self._ready),
+            "blocked": total - done - failed - running - len(self._ready),
+        }
+
+    def eta(self, now: Optional[float] = None) -> float:
+        """
+        预计剩余完成时间（秒）：未完成部分的最长路径。
+        running 节点按已耗时扣减；失败节点视为不再执行。
+        """
+        now = self.clock() if now is None else now
+        longest: Dict[str, float] = {}
+        best = 0.0
+        for node in reversed(self._topo):
+            if node.status in (DONE, FAILED):
+                own = 0.0
+            elif node.status == RUNNING:
+                own = max(0.0, self._duration(node) - (now - node.started_at))
+            else:
+                own = self._duration(node)
+            total = own + max((longest[c.id] for c in node.children), default=0.0)
+            longest[node.id] = total
+            if node.status not in (DONE, FAILED) and total > best:
+                best = total
+        return best
+
+    # ── 状态转移（O(下游数)）──
+
+    def set_status(self, node_id: str, status: str) -> List[str]:
+        """按目标状态执行对应转移；返回新就绪的节点"""
+        node = self._nodes[node_id]
+        if status == node.status:
+            return []
+        if status == DONE:
+            return self.complete(node_id)
+        if status == RUNNING:
+            if node.status != PENDING:
+                self._reopen(node)
+            self.start(node_id)
+        elif status == FAILED:
+            self.fail(node_id)
+        elif status == BLOCKED:
+            self.block(node_id)
+        else:
+            self.reset(node_id)
+        return []
+
+    def start(self, node_id: str) -> None:
+        node = self._nodes[node_id]
+        self._ready.discard(node_id)
+        self._set(node, RUNNING)
+        node.started_at = self.clock()
+
+    def complete(self, node_id: str) -> List[str]:
+        """标记完成，返回因此变为就绪的节点"""
+        node = self._nodes[node_id]
+        if node.status == DONE:
+            return []
+        if node.status == RUNNING and node.started_at and self.stats is not None:
+            self.stats.observe(node.kind, self.clock() - node.started_at)
+        self._ready.discard(node_id)
+        self._set(node, DONE)
+        promoted = []
+        for child in node.children:
+            child.unmet -= 1
+            if child.unmet == 0 and child.status == PENDING:
+                self._push(child)
+                promoted.append(child.id)
+        return promoted
+
+    def fail(self, node_id: str) -> None:
+        node = self._nodes[node_id]
+        if node.status == FAILED:
+            return
+        self._reopen(node)
+        self._set(node, FAILED)
+
+    def block(self, node_id: str) -> None:
+        """挂起：移出就绪集，下游保持阻塞，直到状态被改回其他值"""
+        node = self._nodes[node_id]
+        self._reopen(node)
+        self._set(node, BLOCKED)
+
+    def reset(self, node_id: str) -> None:
+        """回到 pending（如重试）；依赖都已完成时重新进入就绪堆"""
+        node = self._nodes[node_id]
+        self._reopen(node)
+        self._set(node, PENDING)
+        node.started_at = 0.0
+        if node.unmet == 0:
+            self._push(node)
+
+    def _reopen(self, node: _Node) -> None:
+        """离开当前状态前的清理：移出就绪集；离开 done 时下游重新阻塞"""
+        self._ready.discard(node.id)
+        if node.status == DONE:
+            for child in node.children:
+                child.unmet += 1
+                self._ready.discard(child.id)
+
+
+# 全局耗时统计（进程内共享）
+_duration_stats: Optional[DurationStats] = None
+
+
+def get_duration_stats() -> DurationStats:
+    global _duration_stats
+    if _duration_stats is None:
+        _duration_stats = DurationStats()
+    return _duration_stats
@@ -237,6 +237,83 @@ def load_events(days: int = 30, event_type: str = None, layer: str = None) -> li
     return out
 
 
+# 多进程并发写入时 events.jsonl 只是"基本有序"，按时间定位时留出的容差（秒）
+ORDER_SLACK = 300
+
+
+def _event_epoch(ev: dict) -> float:
+    ts = ev.get("epoch", ev.get("ts", 0))
+    return ts if isinstance(ts, (int, float)) else 0
+
+
+def _seek_epoch(f, size: int, target: float) -> int:
+    """二分查找第一条 epoch >= target 的行附近的字节偏移（按追加顺序）"""
+    lo, hi = 0, size
+    while hi - lo > 65536:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        f.readline()  # 丢弃半行
+        epoch = None
+        while epoch is None:
+            line = f.readline()
+            if not line:
+                break
+            try:
+                epoch = _event_epoch(json.loads(line))
+            except Exception:
+                continue
+        if epoch is not None and epoch < target:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def iter_events(
+    start_ts: float = None,
+    end_ts: float = None,
+    event_type: str = None,
+    layer: str = None,
+    path: Path = None,
+):
+    """
+    流式读取 [start_ts, end_ts] 内的事件（生成器，不整文件读入内存）。
+    起点用二分定位，越过 end_ts + ORDER_SLACK 后提前结束。
+    """
+    p = path or _events_path()
+    if not p.exists():
+        return
+    with p.open("rb") as f:
+        if start_ts is not None:
+            size = p.stat().st_size
+            offset = _seek_epoch(f, size, start_ts - ORDER_SLACK)
+            f.seek(offset)
+            if offset:
+                f.readline()
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                ev = json.loads(line)
+            except Exception:
+                continue
+            ts = _event_epoch(ev)
+            if start_ts is not None and ts < start_ts:
+                continue
+            if end_ts is not None and ts > end_ts:
+                if ts > end_ts + ORDER_SLACK:
+                    break
+                continue
+            if layer and ev.get("layer") != layer:
+                continue
+            if event_type:
+                old_type = ev.get("type", "")
+                v1_type = (ev.get("payload") or {}).get("_v1_type", "")
+                if event_type not in (old_type, v1_type):
+                    continue
+            yield ev
+
+
 def count_by_type(days: int = 30) -> dict:
     events = load_events(days)
     counts = {}
@@ -0,0 +1,284 @@
+# aios/core/file_watch.py - 文件变更检测（不依赖 EventBus）
+"""
+FileWatcher 的变化检测部分，可以单独导入和测试。
+
+- _IncrementalScanner  按目录 mtime 增量扫描，未变目录跳过 listdir/stat
+- _WatchdogBackend     watchdog 事件收集（Linux 上为 inotify）
+- FileChangeTracker    选择后端；事件驱动模式下首次 poll 做一次完整扫描与
+                       已知 mtime 对账，之后只处理两次 poll 之间累积的事件；
+                       目录事件（新建 / 删除 / 移动目录）重扫该子树，并每
+                       rescan_every 次 poll 做一次完整扫描兜底丢失的事件
+
+变化统一为 {"type": "created" | "modified" | "deleted", "path": str}，
+known（path -> mtime）原地更新，由调用方负责持久化。
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def _under(key: str, roots: list) -> bool:
+    """key 是某个监视路径本身或位于其下（按路径分隔符，不把 /a/bc 算进 /a/b）"""
+    return any(key == str(wp) or key.startswith(str(wp) + os.sep) for wp in roots)
+
+
+class _IncrementalScanner:
+    """按目录 mtime 增量扫描
+
+    目录 mtime 不变 → 目录内没有新增/删除/重命名，跳过 listdir 和文件 stat，
+    只继续检查缓存的子目录。原地改写文件不会改变目录 mtime，所以每
+    full_scan_every 次做一次完整 stat 扫描兜底。
+    """
+
+    # mtime 粒度/竞态保护：最近这么多纳秒内变过的目录总是重扫
+    HOT_WINDOW_NS = 2_000_000_000
+
+    def __init__(self, roots: list[Path], extensions: set, full_scan_every: int = 10):
+        self.roots = roots
+        self.extensions = extensions
+        self.full_scan_every = max(1, full_scan_every)
+        self._dirs: dict = {}  # dir -> (mtime_ns, files: set, subdirs: list)
+        self._scans = 0
+
+    def scan(self, known: dict, full: bool = False) -> list[dict]:
+        """对比 known（path -> mtime，原地更新），返回变化列表；full=True 强制完整扫描"""
+        full = full or self._scans % self.full_scan_every == 0
+        self._scans += 1
+        hot_after = time.time_ns() - self.HOT_WINDOW_NS
+        changes: list[dict] = []
+        seen_dirs: set = set()
+        seen_files: set = set() if full else None
+
+        for root in self.roots:
+            if not root.exists():
+                continue
+            if root.is_file():
+                self._check_file(str(root), known, changes, seen_files)
+            else:
+                self._walk(str(root), known, changes, full, hot_after, seen_dirs, seen_files)
+
+        # 整个目录消失
+        for d in list(self._dirs):
+            if d not in seen_dirs:
+                _, files, _ = self._dirs.pop(d)
+                for key in files:
+                    if known.pop(key, None) is not None:
+                        changes.append({"type": "deleted", "path": key})
+
+        # 完整扫描时兜底检测删除（包括上次进程运行后删掉的文件）
+        if full:
+            for key in [k for k in known if k not in seen_files]:
+                if _under(key, self.roots):
+                    del known[key]
+                    changes.append({"type": "deleted", "path": key})
+        return changes
+
+    def _walk(self, root: str, known, changes, full, hot_after, seen_dirs, seen_files):
+        stack = [root]
+        while stack:
+            d = stack.pop()
+            try:
+                mtime_ns = os.stat(d).st_mtime_ns
+            except OSError:
+                continue
+            seen_dirs.add(d)
+            cached = self._dirs.get(d)
+            if (not full and cached is not None and cached[0] == mtime_ns
+                    and mtime_ns < hot_after):
+                stack.extend(cached[2])
+                continue
+
+            files, subdirs = set(), []
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file() and os.path.splitext(entry.name)[1] in self.extensions:
+                                files.add(entry.path)
+                                self._record(entry.path, entry.stat().st_mtime,
+                                             known, changes, seen_files)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+            if cached is not None:
+                for key in cached[1] - files:
+                    if known.pop(key, None) is not None:
+                        changes.append({"type": "deleted", "path": key})
+            self._dirs[d] = (mtime_ns, files, subdirs)
+            stack.extend(subdirs)
+
+    def _check_file(self, key: str, known, changes, seen_files):
+        try:
+            mtime = os.stat(key).st_mtime
+        except OSError:
+            return
+        if os.path.splitext(key)[1] in self.extensions:
+            self._record(key, mtime, known, changes, seen_files)
+
+    @staticmethod
+    def _record(key: str, mtime: float, known, changes, seen_files):
+        if seen_files is not None:
+            seen_files.add(key)
+        old_mtime = known.get(key)
+        if old_mtime is None:
+            changes.append({"type": "created", "path": key})
+        elif mtime > old_mtime:
+            changes.append({"type": "modified", "path": key})
+        else:
+            return
+        known[key] = mtime
+
+
+class _WatchdogBackend:
+    """watchdog 事件收集（Linux 上为 inotify），两次 scan 之间累积变化集合"""
+
+    def __init__(self, roots: list[Path], extensions: set):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        self.roots = roots
+        self.extensions = extensions
+        self._pending: dict = {}  # path -> 最后一次事件类型
+        self._pending_dirs: set = set()  # 新建 / 删除 / 移动过的目录，poll 时重扫子树
+        self._lock = threading.Lock()
+        backend = self
+
+        class _Collector(FileSystemEventHandler):
+            def on_any_event(self, event):
+                dest = getattr(event, "dest_path", None)
+                if event.is_directory:
+                    # 目录内文件的变化各有事件；目录本身修改只是 mtime 变化
+                    if event.event_type != "modified":
+                        backend._add_dir(event.src_path)
+                        if dest:
+                            backend._add_dir(dest)
+                    return
+                backend._add(event.src_path, event.event_type)
+                if dest:
+                    backend._add(dest, "created")
+
+        self._observer = Observer()
+        handler = _Collector()
+        for root in roots:
+            if root.is_dir():
+                self._observer.schedule(handler, str(root), recursive=True)
+            elif root.is_file():
+                self._observer.schedule(handler, str(root.parent), recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def _add(self, path: str, event_type: str):
+        if os.path.splitext(path)[1] not in self.extensions:
+            return
+        with self._lock:
+            self._pending[path] = event_type
+
+    def _add_dir(self, path: str):
+        with self._lock:
+            self._pending_dirs.add(path)
+
+    def drain(self) -> tuple:
+        """返回 (文件 -> 事件类型, 需要重扫的目录集合)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            dirs, self._pending_dirs = self._pending_dirs, set()
+        return pending, dirs
+
+    def stop(self):
+        self._observer.stop()
+        self._observer.join(timeout=5)
+
+
+
+class FileChangeTracker:
+    """文件变化来源
+
+    backend:
+      "auto"     — 有 watchdog 就用事件驱动，否则退回增量扫描
+      "watchdog" — 强制 watchdog
+      "scan"     — 增量 mtime 扫描
+
+    rescan_every: 事件驱动模式下每隔多少次 poll 做一次完整扫描（兜底 inotify 队列
+      溢出等丢失的事件）
+    """
+
+    def __init__(self, watch_paths: list, extensions: list[str] = None,
+                 backend: str = "auto", full_scan_every: int = 10, rescan_every: int = 100):
+        self.watch_paths = [Path(p) for p in watch_paths]
+        self.extensions = set(extensions or [".py", ".json", ".jsonl", ".md"])
+        self._scanner = _IncrementalScanner(self.watch_paths, self.extensions, full_scan_every)
+        self._events: Optional[_WatchdogBackend] = None
+        self.rescan_every = max(1, rescan_every)
+        self._polls = 0
+        if backend in ("auto", "watchdog"):
+            try:
+                self._events = _WatchdogBackend(self.watch_paths, self.extensions)
+            except Exception:
+                if backend == "watchdog":
+                    raise
+        self.backend = "watchdog" if self._events else "scan"
+
+    def poll(self, known: dict) -> list[dict]:
+        """对比 known（path -> mtime，原地更新），返回上次 poll 以来的变化"""
+        if self._events is None:
+            return self._scanner.scan(known)
+        full = self._polls % self.rescan_every == 0  # 首次 poll 即对账扫描
+        self._polls += 1
+        if not full:
+            return self._apply_events(known)
+        self._events.drain()  # 完整扫描已经覆盖这些事件
+        return self._scanner.scan(known, full=True)
+
+    def _apply_events(self, known: dict) -> list[dict]:
+        changes = []
+        files, dirs = self._events.drain()
+        for d in dirs:
+            if _under(d, self.watch_paths):
+                self._rescan_dir(d, known, changes)
+        for key in files:
+            if not _under(key, self.watch_paths):
+                continue
+            try:
+                mtime = os.stat(key).st_mtime
+            except OSError:
+                if known.pop(key, None) is not None:
+                    changes.append({"type": "deleted", "path": key})
+                continue
+            old_mtime = known.get(key)
+            if old_mtime is None:
+                changes.append({"type": "created", "path": key})
+            elif mtime > old_mtime:
+                changes.append({"type": "modified", "path": key})
+            else:
+                continue
+            known[key] = mtime
+        return changes
+
+    def _rescan_dir(self, d: str, known: dict, changes: list):
+        """目录新建 / 删除 / 移动：对账该子树（移入的文件不一定各有事件）"""
+        seen: set = set()
+        for dirpath, _, names in os.walk(d):
+            for name in names:
+                if os.path.splitext(name)[1] not in self.extensions:
+                    continue
+                key = os.path.join(dirpath, name)
+                try:
+                    mtime = os.stat(key).st_mtime
+                except OSError:
+                    continue
+                _IncrementalScanner._record(key, mtime, known, changes, seen)
+        prefix = d + os.sep
+        for key in [k for k in known if k.startswith(prefix) and k not in seen]:
+            del known[key]
+            changes.append({"type": "deleted", "path": key})
+
+    def stop(self):
+        if self._events is not None:
+            self._events.stop()
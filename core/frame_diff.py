@@ -0,0 +1,194 @@
+# aios/core/frame_diff.py - 屏幕帧对比（纯 NumPy）
+"""
+ScreenMonitor 的内存帧管线，只依赖 NumPy，可以单独导入和测试。
+
+- 帧以 RGB（或灰度）数组保存在有界环形缓冲（FrameRing），不落盘
+- 低分辨率指纹预过滤：每格、每通道的均值/最小值/最大值都没变才跳过完整 diff
+- 分块变化率通过一次 reshape + sum 计算；彩色帧取各通道差值的最大值，
+  亮度相同的颜色变化也能检测到
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+# 像素（任一通道）差超过该值才算变化（过滤微小抖动）
+PIXEL_DIFF_THRESHOLD = 30
+# 指纹网格 (行, 列)，以及判定“未变化”的最大统计量差
+FINGERPRINT_SHAPE = (32, 32)
+FINGERPRINT_TOLERANCE = 2.0
+# 内存中保留的帧数
+FRAME_RING_SIZE = 8
+
+
+def to_gray(rgb: np.ndarray) -> np.ndarray:
+    """RGB (H, W, 3) uint8 → 灰度 (H, W) uint8（ITU-R 601 权重，整数运算）"""
+    if rgb.ndim == 2:
+        return rgb
+    r = rgb[..., 0].astype(np.uint16)
+    g = rgb[..., 1].astype(np.uint16)
+    b = rgb[..., 2].astype(np.uint16)
+    return ((r * 77 + g * 150 + b * 29) >> 8).astype(np.uint8)
+
+
+def fingerprint(pixels: np.ndarray, shape: tuple = FINGERPRINT_SHAPE) -> np.ndarray:
+    """低分辨率指纹：把帧切成 shape 个格子（覆盖整帧，边缘格可略大），
+    取每格每个通道的 (均值, 最小值, 最大值)
+
+    只看均值会漏掉均值不变的变化（例如一块区域对比度反转），
+    只看灰度会漏掉亮度相同的颜色变化。
+
+    Returns:
+        float32 数组，形状 (行, 列, 通道, 3)
+    """
+    pixels = np.ascontiguousarray(pixels if pixels.ndim == 3 else pixels[..., None])
+    h, w = pixels.shape[:2]
+    rows, cols = min(shape[0], h), min(shape[1], w)
+    ys = (np.arange(rows) * h) // rows
+    xs = (np.arange(cols) * w) // cols
+
+    sums = np.add.reduceat(np.add.reduceat(pixels, ys, axis=0, dtype=np.uint32), xs, axis=1)
+    counts = np.outer(np.diff(np.append(ys, h)), np.diff(np.append(xs, w)))
+    lo = np.minimum.reduceat(np.minimum.reduceat(pixels, ys, axis=0), xs, axis=1)
+    hi = np.maximum.reduceat(np.maximum.reduceat(pixels, ys, axis=0), xs, axis=1)
+    return np.stack(
+        [sums / counts[..., None], lo, hi], axis=-1
+    ).astype(np.float32)
+
+
+def block_change_ratios(
+    pixels1: np.ndarray,
+    pixels2: np.ndarray,
+    block_size: int = 100,
+    pixel_threshold: int = PIXEL_DIFF_THRESHOLD,
+) -> tuple:
+    """两帧的整体变化率与分块变化率
+
+    彩色帧 (H, W, C) 按像素取各通道差值的最大值，灰度帧 (H, W) 直接比较。
+
+    Returns:
+        (diff_ratio, ratios) — ratios 形状为 (块行数, 块列数)，边缘不满块
+        按实际像素数计算比例
+    """
+    diff = np.abs(pixels1.astype(np.int16) - pixels2.astype(np.int16))
+    if diff.ndim == 3:
+        diff = diff.max(axis=2)
+    changed = diff > pixel_threshold
+    h, w = changed.shape
+    diff_ratio = float(changed.mean()) if changed.size else 0.0
+
+    nby, nbx = -(-h // block_size), -(-w // block_size)
+    padded = np.zeros((nby * block_size, nbx * block_size), dtype=np.uint8)
+    padded[:h, :w] = changed
+    counts = padded.reshape(nby, block_size, nbx, block_size).sum(axis=(1, 3))
+
+    heights = np.minimum(block_size, h - np.arange(nby) * block_size)
+    widths = np.minimum(block_size, w - np.arange(nbx) * block_size)
+    ratios = counts / np.outer(heights, widths)
+    return diff_ratio, ratios
+
+
+def regions_from_ratios(
+    ratios: np.ndarray, size: tuple, block_size: int = 100, min_ratio: float = 0.1
+) -> list[dict]:
+    """把分块变化率转换成区域列表（与旧版 _detect_diff_regions 格式一致）"""
+    width, height = size
+    regions = []
+    for by, bx in zip(*np.nonzero(ratios > min_ratio)):
+        x, y = int(bx) * block_size, int(by) * block_size
+        box = (x, y, min(x + block_size, width), min(y + block_size, height))
+        regions.append({"region": box, "change_ratio": round(float(ratios[by, bx]), 3)})
+    return regions
+
+
+def diff_frames(
+    pixels1: np.ndarray, pixels2: np.ndarray, threshold: float = 0.05,
+    block_size: int = 100,
+) -> dict:
+    """对比两帧（向量化分块统计）
+
+    Returns:
+        {"changed": bool, "diff_ratio": float, "diff_regions": [...]}
+    """
+    # 尺寸不同直接判定为变化
+    if pixels1.shape[:2] != pixels2.shape[:2]:
+        return {
+            "changed": True,
+            "diff_ratio": 1.0,
+            "diff_regions": [],
+            "reason": "size_mismatch",
+        }
+    # 一彩一灰时退回灰度比较
+    if pixels1.ndim != pixels2.ndim:
+        pixels1, pixels2 = to_gray(pixels1), to_gray(pixels2)
+
+    diff_ratio, ratios = block_change_ratios(pixels1, pixels2, block_size)
+    h, w = pixels2.shape[:2]
+    return {
+        "changed": diff_ratio > threshold,
+        "diff_ratio": round(diff_ratio, 4),
+        "diff_regions": regions_from_ratios(ratios, (w, h), block_size),
+    }
+
+
+@dataclass
+class Frame:
+    """内存中的一帧（原始像素 + 指纹，灰度按需计算）"""
+    seq: int
+    timestamp: float
+    pixels: np.ndarray
+    fingerprint: np.ndarray
+    _gray: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = to_gray(self.pixels)
+        return self._gray
+
+    @property
+    def size(self) -> tuple:
+        h, w = self.pixels.shape[:2]
+        return (w, h)
+
+
+def compare_frames(
+    previous: Frame, current: Frame, threshold: float = 0.05,
+    tolerance: float = FINGERPRINT_TOLERANCE,
+) -> dict:
+    """先比较低分辨率指纹，所有格子的统计量都在 tolerance 内时跳过完整 diff"""
+    if (
+        previous.fingerprint.shape == current.fingerprint.shape
+        and float(np.abs(previous.fingerprint - current.fingerprint).max()) <= tolerance
+    ):
+        return {"changed": False, "diff_ratio": 0.0, "diff_regions": [],
+                "reason": "fingerprint_match"}
+    return diff_frames(previous.pixels, current.pixels, threshold)
+
+
+class FrameRing:
+    """有界帧环形缓冲，替代磁盘上的截图文件"""
+
+    def __init__(self, capacity: int = FRAME_RING_SIZE):
+        self._frames: deque = deque(maxlen=capacity)
+        self._seq = 0
+
+    def push(self, pixels: np.ndarray, timestamp: Optional[float] = None) -> Frame:
+        self._seq += 1
+        frame = Frame(self._seq, timestamp or time.time(), pixels, fingerprint(pixels))
+        self._frames.append(frame)
+        return frame
+
+    @property
+    def latest(self) -> Optional[Frame]:
+        return self._frames[-1] if self._frames else None
+
+    @property
+    def previous(self) -> Optional[Frame]:
+        return self._frames[-2] if len(self._frames) > 1 else None
+
+    def __len__(self) -> int:
+        return len(self._frames)
@@ -0,0 +1,320 @@
+"""
+AIOS Health Scheduler - 并发健康检查调度器
+
+- 探针并发执行：shell 命令走 asyncio 子进程，同步函数走有界线程池，总并发受信号量限制
+- 结果按探针 TTL 缓存；后台线程在到期前（带随机抖动）刷新，避免所有探针同时触发
+- 熔断：连续失败 failure_threshold 次后 OPEN，cooldown 内跳过该探针；
+  冷却结束 HALF_OPEN 探测一次，成功 CLOSED，失败重新 OPEN
+- status() / snapshot() 只读内存中的最近结果，不等待任何探针
+
+用法：
+    scheduler = HealthScheduler()
+    scheduler.register("git", "git --version", ttl=60)
+    scheduler.register("db", lambda: {"status": "ok"})
+    scheduler.refresh()             # 并发执行到期的探针并等待
+    scheduler.start()               # 后台按 TTL 刷新
+    scheduler.snapshot()            # 立即返回最近状态
+"""
+
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+Probe = Union[str, Callable[[], Any]]
+
+# 熔断器状态（与 core.circuit_breaker 一致）
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _ProbeState:
+    __slots__ = ("name", "probe", "ttl", "timeout", "result", "next_due",
+                 "failures", "circuit", "opened_at", "running")
+
+    def __init__(self, name: str, probe: Probe, ttl: float, timeout: float):
+        self.name = name
+        self.probe = probe
+        self.ttl = ttl
+        self.timeout = timeout
+        self.result: Optional[Dict[str, Any]] = None
+        self.next_due = 0.0  # 0 = 立即到期
+        self.failures = 0
+        self.circuit = CLOSED
+        self.opened_at = 0.0
+        self.running: Optional[asyncio.Future] = None
+
+
+class HealthScheduler:
+    """并发、带缓存和熔断的健康检查调度器"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        default_ttl: float = 60.0,
+        timeout: float = 10.0,
+        failure_threshold: int = 3,
+        cooldown: float = 300.0,
+        jitter: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_concurrency: 同时执行的探针上限
+            default_ttl: 结果缓存时间（秒）
+            timeout: 单个探针超时（秒）
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断冷却时间（秒）
+            jitter: 提前刷新的随机比例（0.1 = 在 TTL 的 90%~100% 之间刷新）
+        """
+        self.max_concurrency = max_concurrency
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.jitter = jitter
+        self.clock = clock
+
+        self._probes: Dict[str, _ProbeState] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._background: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # ── 注册 ──
+
+    def register(self, name: str, probe: Probe, ttl: Optional[float] = None,
+                 timeout: Optional[float] = None) -> None:
+        """注册或更新探针；探针未变化时保留缓存结果和熔断状态"""
+        with self._lock:
+            state = self._probes.get(name)
+            if state is not None and state.probe == probe:
+                state.ttl = ttl or self.default_ttl
+                state.timeout = timeout or self.timeout
+                return
+            self._probes[name] = _ProbeState(name, probe, ttl or self.default_ttl,
+                                             timeout or self.timeout)
+        self._notify()
+
+    def unregister(self, name: str) -> bool:
+        with self._lock:
+            return self._probes.pop(name, None) is not None
+
+    def names(self) -> List[str]:
+        return list(self._probes)
+
+    # ── 读取（不阻塞）──
+
+    def status(self, name: str) -> Dict[str, Any]:
+        """最近一次结果；还没检查过时返回 unknown"""
+        state = self._probes.get(name)
+        if state is None:
+            return {"name": name, "status": "error", "message": "Probe not registered"}
+        if state.result is None:
+            return {"name": name, "status": "unknown", "message": "Not checked yet",
+                    "circuit": state.circuit}
+        return state.result
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: self.status(name) for name in list(self._probes)}
+
+    # ── 刷新 ──
+
+    def refresh(self, names: Optional[Iterable[str]] = None, force: bool = False,
+                wait: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        并发执行到期（或 force 时全部）的探针并等待结果
+
+        Args:
+            names: 只刷新这些探针，默认全部
+            force: 忽略 TTL 缓存（熔断仍然生效）
+            wait: 最多等待多少秒，超时后返回当时的最近结果
+        """
+        selected = list(names) if names is not None else list(self._probes)
+        future = asyncio.run_coroutine_threadsafe(self.arefresh(selected, force), self._ensure_loop())
+        try:
+            future.result(timeout=wait)
+        except concurrent.futures.TimeoutError:
+            pass
+        return {name: self.status(name) for name in selected}
+
+    def refresh_async(self, names: Optional[Iterable[str]] = None, force: bool = False) -> None:
+        """在后台刷新，不等待"""
+        selected = list(names) if names is not None else list(self._probes)
+        asyncio.run_coroutine_threadsafe(self.arefresh(selected, force), self._ensure_loop())
+
+    async def arefresh(self, names: Optional[List[str]] = None, force: bool = False) -> None:
+        """在调度器的事件循环里执行（refresh / refresh_async 会投递到这里）"""
+        now = self.clock()
+        jobs = []
+        for name in names if names is not None else list(self._probes):
+            state = self._probes.get(name)
+            if state is None:
+                continue
+            if state.running is not None:
+                # 同一探针正在执行：复用那次结果
+                jobs.append(state.running)
+            elif force or now >= state.next_due:
+                state.running = asyncio.ensure_future(self._run(state))
+                jobs.append(state.running)
+        if jobs:
+            await asyncio.gather(*jobs, return_exceptions=True)
+
+    async def _run(self, state: _ProbeState) -> None:
+        try:
+            now = self.clock()
+            if state.circuit == OPEN:
+                if now - state.opened_at < self.cooldown:
+                    self._skip(state)
+                    return
+                state.circuit = HALF_OPEN
+
+            async with self._semaphore:
+                started = time.perf_counter()
+                result = await self._execute(state)
+                latency_ms = int((time.perf_counter() - started) * 1000)
+
+            if result.get("status") == "error":
+                state.failures += 1
+                if state.circuit == HALF_OPEN or state.failures >= self.failure_threshold:
+                    state.circuit = OPEN
+                    state.opened_at = self.clock()
+            else:
+                state.failures = 0
+                state.circuit = CLOSED
+
+            result.setdefault("name", state.name)
+            result["checked_at"] = time.time()
+            result["latency_ms"] = latency_ms
+            result["circuit"] = state.circuit
+            state.result = result
+            state.next_due = self.clock() + state.ttl * (1 - random.uniform(0, self.jitter))
+        finally:
+            state.running = None
+
+    def _skip(self, state: _ProbeState) -> None:
+        """熔断中：保留最近结果，标记跳过，冷却结束时再到期"""
+        result = dict(state.result or {"name": state.name, "status": "error"})
+        result["circuit"] = OPEN
+        result["skipped"] = True
+        state.result = result
+        state.next_due = state.opened_at + self.cooldown
+
+    async def _execute(self, state: _ProbeState) -> Dict[str, Any]:
+        probe = state.probe
+        try:
+            if isinstance(probe, str):
+                return await self._run_command(state.name, probe, state.timeout)
+            if asyncio.iscoroutinefunction(probe):
+                value = await asyncio.wait_for(probe(), state.timeout)
+            else:
+                loop = asyncio.get_running_loop()
+                value = await asyncio.wait_for(loop.run_in_executor(self._executor, probe), state.timeout)
+        except asyncio.TimeoutError:
+            return {"name": state.name, "status": "error", "message": "Health check timeout"}
+        except Exception as e:
+            return {"name": state.name, "status": "error", "message": str(e)}
+        return _normalize(state.name, value)
+
+    @staticmethod
+    async def _run_command(name: str, cmd: str, timeout: float) -> Dict[str, Any]:
+        proc = await asyncio.create_subprocess_shell(
+            cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return {"name": name, "status": "error", "message": "Health check timeout"}
+        return command_result(name, proc.returncode,
+                              stdout.decode(errors="replace"), stderr.decode(errors="replace"))
+
+    # ── 后台刷新 ──
+
+    def start(self) -> None:
+        """启动后台刷新：每个探针在缓存到期前刷新一次"""
+        loop = self._ensure_loop()
+
+        def _start():
+            if self._background is None or self._background.done():
+                self._background = loop.create_task(self._background_loop())
+
+        loop.call_soon_threadsafe(_start)
+
+    async def _background_loop(self) -> None:
+        while True:
+            await self.arefresh()
+            now = self.clock()
+            due = [s.next_due for s in list(self._probes.values()) if s.running is None]
+            delay = max(0.05, min(due) - now) if due else self.default_ttl
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        loop, thread = self._loop, self._loop_thread
+        if loop is None:
+            return
+        if self._background is not None:
+            loop.call_soon_threadsafe(self._background.cancel)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        self._loop = self._loop_thread = self._background = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def _notify(self) -> None:
+        """新探针注册后唤醒后台循环，让它立即检查"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="health-probe"
+                )
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run_loop():
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    self._wakeup = asyncio.Event()
+                    ready.set()
+                    loop.run_forever()
+
+                thread = threading.Thread(target=_run_loop, name="health-scheduler", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._loop_thread = loop, thread
+            return self._loop
+
+
+def command_result(name: str, returncode: int, stdout: str, stderr: str) -> Dict[str, Any]:
+    """把健康检查命令的退出码 / 输出转换成标准结果"""
+    if returncode == 0:
+        return {"name": name, "status": "ok", "message": stdout.strip() or "OK"}
+    return {"name": name, "status": "error", "message": stderr.strip() or "Check failed"}
+
+
+def _normalize(name: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        result = dict(value)
+        result.setdefault("status", "ok")
+        return result
+    if isinstance(value, bool):
+        return {"name": name, "status": "ok" if value else "error"}
+    if value is None:
+        return {"name": name, "status": "warn", "message": "Probe returned nothing"}
+    return {"name": name, "status": "ok", "message": str(value)}
@@ -7,13 +7,21 @@ AIOS 外部系统集成模块
 import json
 import subprocess
 import platform
+import sys
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from core.health_scheduler import HealthScheduler, command_result
+
 # 数据文件路径
 DATA_DIR = Path(__file__).parent.parent / "data"
 INTEGRATIONS_FILE = DATA_DIR / "integrations.json"
 
+# 健康检查：默认缓存 60 秒，可在集成配置里用 health_ttl 覆盖
+DEFAULT_HEALTH_TTL = 60
+_scheduler: Optional[HealthScheduler] = None
+
 
 def ensure_data_dir():
     """确保数据目录存在"""
@@ -110,19 +118,7 @@ def health_check(name: str) -> Dict[str, Any]:
         result = subprocess.run(
             health_check_cmd, shell=True, capture_output=True, text=True, timeout=10
         )
-
-        if result.returncode == 0:
-            return {
-                "name": name,
-                "status": "ok",
-                "message": result.stdout.strip() or "OK",
-            }
-        else:
-            return {
-                "name": name,
-                "status": "error",
-                "message": result.stderr.strip() or "Check failed",
-            }
+        return command_result(name, result.returncode, result.stdout, result.stderr)
 
     except subprocess.TimeoutExpired:
         return {"name": name, "status": "error", "message": "Health check timeout"}
@@ -130,16 +126,67 @@ def health_check(name: str) -> Dict[str, Any]:
         return {"name": name, "status": "error", "message": str(e)}
 
 
-def health_check_all() -> List[Dict[str, Any]]:
-    """执行所有集成的健康检查"""
+def get_health_scheduler() -> HealthScheduler:
+    """获取集成健康检查调度器（全局单例）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = HealthScheduler(default_ttl=DEFAULT_HEALTH_TTL, timeout=10)
+    return _scheduler
+
+
+def _sync_probes(integrations: List[Dict[str, Any]]) -> HealthScheduler:
+    """让调度器里的探针与 integrations.json 保持一致"""
+    scheduler = get_health_scheduler()
+    names = set()
+    for integration in integrations:
+        name = integration["name"]
+        cmd = integration.get("health_check_cmd")
+        if not cmd:
+            continue
+        names.add(name)
+        scheduler.register(name, cmd, ttl=integration.get("health_ttl", DEFAULT_HEALTH_TTL))
+    for name in scheduler.names():
+        if name not in names:
+            scheduler.unregister(name)
+    return scheduler
+
+
+def health_check_all(wait: bool = True, force: bool = False) -> List[Dict[str, Any]]:
+    """
+    执行所有集成的健康检查
+
+    探针并发执行，结果按 TTL 缓存，连续失败的探针会被熔断跳过。
+
+    Args:
+        wait: False 时立即返回最近一次结果，过期的探针在后台刷新
+        force: 忽略缓存，全部重新检查
+    """
     integrations = _load_integrations()
+    scheduler = _sync_probes(integrations)
+    if wait:
+        scheduler.refresh(force=force)
+    else:
+        scheduler.refresh_async(force=force)
+
     results = []
     for integration in integrations:
-        result = health_check(integration["name"])
-        results.append(result)
+        name = integration["name"]
+        if integration.get("health_check_cmd"):
+            results.append(scheduler.status(name))
+        else:
+            results.append(
+                {"name": name, "status": "warn", "message": "No health check command defined"}
+            )
     return results
 
 
+def start_health_monitor() -> HealthScheduler:
+    """后台按 TTL（带抖动）持续刷新健康状态，之后 health_check_all(wait=False) 总是即时返回"""
+    scheduler = _sync_probes(_load_integrations())
+    scheduler.start()
+    return scheduler
+
+
 # ============ 内置集成模板 ============
 
 
@@ -24,6 +24,17 @@ try:
 except ImportError:
     MemoryManager = None
 
+try:
+    from core.dag_runtime import BLOCKED, DONE, FAILED, PENDING, RUNNING, DagRuntime, DurationStats
+except ImportError:
+    from dag_runtime import BLOCKED, DONE, FAILED, PENDING, RUNNING, DagRuntime, DurationStats
+
+# 子任务状态 → DAG 节点状态（未知状态视为阻塞，不派发、不解锁下游）
+DAG_STATUS = {"pending": PENDING, "running": RUNNING, "completed": DONE, "failed": FAILED}
+PRIORITY_RANK = {"high": 0, "normal": 1, "low": 2}
+# 状态更新追加到 <task_id>.status.jsonl；超过该行数（或计划结束）时合并回计划文件
+STATUS_LOG_COMPACT = 200
+
 
 @dataclass
 class SubTask:
@@ -64,6 +75,14 @@ class Planner:
         self.workspace = workspace
         self.plans_dir = workspace / "aios" / "plans"
         self.plans_dir.mkdir(parents=True, exist_ok=True)
+
+        # 已加载的计划及其 DAG（状态更新不再每次从磁盘读回）
+        self._plans: Dict[str, Plan] = {}
+        self._dags: Dict[str, DagRuntime] = {}
+        self._status_lines: Dict[str, int] = {}  # 每个计划状态日志里尚未合并的行数
+        self._disk: Dict[str, tuple] = {}  # 缓存对应的计划文件 / 状态日志签名
+        # 按任务类型的历史耗时，用于估算完成时间
+        self.durations = DurationStats(path=self.plans_dir / "durations.json")
         
         # Memory 集成
         self.memory = MemoryManager(workspace) if MemoryManager else None
@@ -122,7 +141,9 @@ class Planner:
             strategy=strategy
         )
         
-        # 6. 保存计划
+        # 6. 构建 DAG（环检测）并保存计划
+        self._dags[task_id] = self._build_dag(plan)
+        self._plans[task_id] = plan
         self._save_plan(plan)
         
         # 7. 存储到记忆（如果启用）
@@ -340,24 +361,24 @@ class Planner:
     def _analyze_dependencies(self, subtasks: List[SubTask]) -> List[SubTask]:
         """分析子任务之间的依赖关系"""
         # 简单规则：如果子任务 B 的描述中提到子任务 A 的关键词，则 B 依赖 A
+        # 用词 → 子任务下标的倒排表，只比较有共同词的前序子任务
+        postings: Dict[str, List[int]] = {}
         for i, task_b in enumerate(subtasks):
-            for j, task_a in enumerate(subtasks):
-                if i <= j:
-                    continue
-                # 检查 B 是否依赖 A
-                if self._has_dependency(task_b.description, task_a.description):
-                    if task_a.id not in task_b.dependencies:
-                        task_b.dependencies.append(task_a.id)
+            words = set(task_b.description.split())
+            shared: Dict[int, int] = {}
+            for word in words:
+                for j in postings.get(word, ()):
+                    shared[j] = shared.get(j, 0) + 1
+            for j in sorted(shared):
+                # B 与 A 至少有两个共同词，视为 B 依赖 A
+                task_a = subtasks[j]
+                if shared[j] >= 2 and task_a.id not in task_b.dependencies:
+                    task_b.dependencies.append(task_a.id)
+            for word in words:
+                postings.setdefault(word, []).append(i)
         
         return subtasks
     
-    def _has_dependency(self, task_b: str, task_a: str) -> bool:
-        """判断 task_b 是否依赖 task_a"""
-        # 简单规则：如果 task_a 的关键词出现在 task_b 中
-        keywords_a = set(task_a.split())
-        keywords_b = set(task_b.split())
-        return len(keywords_a & keywords_b) >= 2
-    
     def _determine_strategy(self, subtasks: List[SubTask]) -> str:
         """确定执行策略"""
         # 如果所有子任务都没有依赖，可以并行
@@ -371,8 +392,11 @@ class Planner:
         # 默认顺序执行
         return "sequential"
     
+    def _status_log(self, task_id: str) -> Path:
+        return self.plans_dir / f"{task_id}.status.jsonl"
+
     def _save_plan(self, plan: Plan):
-        """保存计划到文件"""
+        """保存计划到文件（完整重写，并清空已合并的状态日志）"""
         plan_file = self.plans_dir / f"{plan.task_id}.json"
         with open(plan_file, "w", encoding="utf-8") as f:
             json.dump({
@@ -382,9 +406,92 @@ class Planner:
                 "strategy": plan.strategy,
                 "created_at": plan.created_at
             }, f, ensure_ascii=False, indent=2)
+        self._status_log(plan.task_id).unlink(missing_ok=True)
+        self._status_lines[plan.task_id] = 0
+        self._disk[plan.task_id] = self._disk_signature(plan.task_id)
+
+    def _append_status(self, plan: Plan, subtask_id: str, status: str,
+                       result: Optional[str], finished: bool):
+        """追加一行状态更新（O(1)）；日志过长或计划结束时合并回计划文件"""
+        record = {"id": subtask_id, "status": status}
+        if result:
+            record["result"] = result
+        with open(self._status_log(plan.task_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        lines = self._status_lines.get(plan.task_id, 0) + 1
+        self._status_lines[plan.task_id] = lines
+        if finished or lines >= STATUS_LOG_COMPACT:
+            self._save_plan(plan)
+        else:
+            self._disk[plan.task_id] = self._disk_signature(plan.task_id)
+
+    def _disk_signature(self, task_id: str) -> tuple:
+        """计划文件和状态日志的 (mtime, 大小)；别的进程写过就会变"""
+        signature = []
+        for path in (self.plans_dir / f"{task_id}.json", self._status_log(task_id)):
+            try:
+                st = path.stat()
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _replay_status(self, plan: Plan) -> int:
+        """把状态日志重放到刚从磁盘读出的计划上，返回重放的行数"""
+        log = self._status_log(plan.task_id)
+        if not log.exists():
+            return 0
+        by_id = {st.id: st for st in plan.subtasks}
+        lines = 0
+        with open(log, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 写到一半的最后一行
+                subtask = by_id.get(record.get("id"))
+                if subtask is None:
+                    continue
+                subtask.status = record["status"]
+                if record.get("result"):
+                    subtask.result = record["result"]
+                lines += 1
+        return lines
     
+    def _build_dag(self, plan: Plan) -> DagRuntime:
+        dag = DagRuntime(stats=self.durations)
+        for st in plan.subtasks:
+            dag.add(
+                st.id,
+                st.dependencies,
+                priority=PRIORITY_RANK.get(st.priority, 1),
+                kind=st.type,
+                estimate=st.estimated_time,
+                status=DAG_STATUS.get(st.status, BLOCKED),
+            )
+        return dag.build()
+
+    def _get(self, task_id: str):
+        """已缓存的计划和 DAG；首次访问时从磁盘加载"""
+        plan = self.load_plan(task_id)
+        if not plan:
+            return None, None
+        dag = self._dags.get(task_id)
+        if dag is None:
+            dag = self._dags[task_id] = self._build_dag(plan)
+        return plan, dag
+
     def load_plan(self, task_id: str) -> Optional[Plan]:
-        """加载计划"""
+        """
+        加载计划（进程内缓存）。每次先比对磁盘签名（两次 stat）：
+        计划文件或状态日志被别的进程改过就重新读取，并丢弃缓存的 DAG
+        """
+        signature = self._disk_signature(task_id)
+        if task_id in self._plans:
+            if self._disk.get(task_id, signature) == signature:
+                return self._plans[task_id]
+            self._plans.pop(task_id)
+            self._dags.pop(task_id, None)
         plan_file = self.plans_dir / f"{task_id}.json"
         if not plan_file.exists():
             return None
@@ -393,48 +500,44 @@ class Planner:
             data = json.load(f)
         
         subtasks = [SubTask(**st) for st in data["subtasks"]]
-        return Plan(
+        plan = Plan(
             task_id=data["task_id"],
             original_task=data["original_task"],
             subtasks=subtasks,
             strategy=data["strategy"],
             created_at=data["created_at"]
         )
+        self._status_lines[task_id] = self._replay_status(plan)
+        self._plans[task_id] = plan
+        self._disk[task_id] = signature
+        return plan
     
     def update_subtask_status(self, task_id: str, subtask_id: str, 
                              status: str, result: Optional[str] = None):
-        """更新子任务状态"""
-        plan = self.load_plan(task_id)
-        if not plan:
+        """更新子任务状态（依赖完成时下游子任务直接进入就绪集）"""
+        plan, dag = self._get(task_id)
+        if not plan or subtask_id not in dag:
             return
         
-        for subtask in plan.subtasks:
-            if subtask.id == subtask_id:
-                subtask.status = status
-                if result:
-                    subtask.result = result
-                break
+        subtask = plan.subtasks[dag.index(subtask_id)]
+        subtask.status = status
+        if result:
+            subtask.result = result
+        dag.set_status(subtask_id, DAG_STATUS.get(status, BLOCKED))
         
-        self._save_plan(plan)
+        self._append_status(plan, subtask_id, status, result, finished=dag.all_done())
     
     def get_next_subtasks(self, task_id: str) -> List[SubTask]:
-        """获取下一批可执行的子任务"""
-        plan = self.load_plan(task_id)
+        """获取下一批可执行的子任务（按优先级、关键路径排序）"""
+        plan, dag = self._get(task_id)
         if not plan:
             return []
-        
-        # 找出所有依赖已完成的待执行子任务
-        completed_ids = {st.id for st in plan.subtasks if st.status == "completed"}
-        next_tasks = []
-        
-        for subtask in plan.subtasks:
-            if subtask.status != "pending":
-                continue
-            # 检查依赖是否都完成
-            if all(dep in completed_ids for dep in subtask.dependencies):
-                next_tasks.append(subtask)
-        
-        return next_tasks
+        return [plan.subtasks[dag.index(sid)] for sid in dag.ready()]
+    
+    def estimate_completion(self, task_id: str) -> float:
+        """按各类型历史耗时估算的剩余完成时间（秒）"""
+        plan, dag = self._get(task_id)
+        return dag.eta() if plan else 0.0
 
 
 def demo():
@@ -0,0 +1,437 @@
+"""
+AIOS Process Pool Backend - GIL-free execution for CPU-bound agent tasks.
+
+Features:
+- Warm worker processes that preload AIOS modules once at startup
+- Large argument payloads passed through multiprocessing.shared_memory
+- Per-worker memory limit: a worker over the limit is recycled after its task
+- Crash isolation: a dying worker fails only its own task and is respawned
+- Per-task timeouts (the stuck worker is killed and replaced)
+- Task-type routing so schedulers can pick "thread" or "process" per task
+
+Callables submitted here must be picklable (module-level functions).
+
+Usage:
+    from core.process_pool import get_process_backend, select_backend
+
+    if select_backend("pattern_recognition") == "process":
+        future = get_process_backend().submit(analyze, events)
+        result = future.result()
+"""
+from __future__ import annotations
+
+import importlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules imported once per worker so tasks don't pay import cost
+DEFAULT_PRELOAD: Tuple[str, ...] = (
+    "core.event",
+    "pattern_recognition.change_detector",
+    "learning.analyze",
+)
+
+SHM_THRESHOLD_BYTES = 1 << 20  # payloads above 1 MB go through shared memory
+DEFAULT_MEMORY_LIMIT_MB = 512
+
+
+# ---------------------------------------------------------------------------
+# Task-type routing
+# ---------------------------------------------------------------------------
+
+# task_type -> "thread" | "process"; anything not listed runs on threads
+BACKEND_BY_TASK_TYPE: Dict[str, str] = {
+    "pattern_recognition": "process",
+    "learning_report": "process",
+    "screen_diff": "process",
+}
+
+
+def register_task_type(task_type: str, backend: str) -> None:
+    """Route a task type to the "thread" or "process" backend."""
+    if backend not in ("thread", "process"):
+        raise ValueError(f"Unknown backend: {backend}")
+    BACKEND_BY_TASK_TYPE[task_type] = backend
+
+
+def select_backend(task_type: Optional[str]) -> str:
+    """Return "process" or "thread" for a task type."""
+    if not task_type:
+        return "thread"
+    return BACKEND_BY_TASK_TYPE.get(task_type, "thread")
+
+
+class WorkerCrashedError(RuntimeError):
+    """The worker process died while running the task."""
+
+
+# Before Python 3.11 concurrent.futures.TimeoutError is not the builtin, so the
+# error derives from both and is caught by ``except`` clauses written for either.
+_TIMEOUT_BASES = (
+    (FutureTimeoutError,) if FutureTimeoutError is TimeoutError
+    else (FutureTimeoutError, TimeoutError)
+)
+
+
+class TaskTimeoutError(*_TIMEOUT_BASES):
+    """The task exceeded its timeout; the worker was killed and replaced."""
+
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+def _rss_mb() -> float:
+    """Current resident set size of this process in MB (best effort)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def _load_payload(kind: str, data: Any) -> Any:
+    if kind == "inline":
+        return pickle.loads(data)
+    from multiprocessing import shared_memory
+    name, size = data
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return pickle.loads(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+def _worker_main(conn, preload: Tuple[str, ...], memory_limit_mb: float) -> None:
+    """Entry point of a worker process: preload, then serve tasks forever."""
+    if str(AIOS_ROOT) not in sys.path:
+        sys.path.insert(0, str(AIOS_ROOT))
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # preload is an optimisation, never fatal
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+
+        task_id, kind, data = msg
+        try:
+            fn, args, kwargs = _load_payload(kind, data)
+            ok, value = True, fn(*args, **kwargs)
+        except BaseException as exc:  # report, never die on task errors
+            ok, value = False, exc
+
+        try:
+            body = pickle.dumps(value)
+        except Exception as exc:
+            ok, body = False, pickle.dumps(
+                RuntimeError(f"Unpicklable task {'result' if ok else 'error'}: {exc!r}"))
+
+        rss = _rss_mb()
+        recycle = bool(memory_limit_mb) and rss > memory_limit_mb
+        conn.send((task_id, ok, body, rss, recycle))
+        if recycle:
+            return
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ProcessWorkerStats:
+    tasks_completed: int = 0
+    tasks_failed: int = 0
+    crashes: int = 0
+    timeouts: int = 0
+    recycles: int = 0
+    restarts: int = 0
+    last_rss_mb: float = 0.0
+    shm_transfers: int = 0
+
+
+_WorkItem = Tuple[Callable, tuple, dict, Future, Optional[float]]
+
+
+class _ProcessWorker:
+    """A feeder thread in this process driving one warm worker process."""
+
+    def __init__(self, name: str, backend: "ProcessPoolBackend"):
+        self.name = name
+        self.backend = backend
+        self.stats = ProcessWorkerStats()
+        self.process = None
+        self.conn = None
+        self._ids = itertools.count()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+
+    # ── process lifecycle ────────────────────────────────────
+
+    def spawn(self) -> None:
+        ctx = self.backend._ctx
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.backend.preload, self.backend.memory_limit_mb),
+            name=self.name,
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        self.process, self.conn = proc, parent_conn
+
+    def respawn(self) -> None:
+        self.kill()
+        self.stats.restarts += 1
+        self.spawn()
+
+    def kill(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(timeout=5)
+            self.process = None
+
+    def close(self) -> None:
+        """Ask the worker to exit cleanly, kill it if it doesn't."""
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        if self.process is not None:
+            self.process.join(timeout=5)
+        self.kill()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    # ── feeder loop ──────────────────────────────────────────
+
+    def start(self) -> None:
+        self.spawn()
+        self._thread.start()
+
+    def join(self, timeout: float = 10.0) -> None:
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self.backend._tasks.get()
+            if item is None:
+                self.close()
+                return
+            fn, args, kwargs, future, timeout = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._execute(fn, args, kwargs, future, timeout)
+            except Exception as exc:
+                # never let one task kill the feeder thread: the future must resolve
+                if not future.done():
+                    future.set_exception(exc)
+
+    def _execute(self, fn, args, kwargs, future: Future, timeout: Optional[float]) -> None:
+        shm = None
+        try:
+            payload = pickle.dumps((fn, args, kwargs))
+        except Exception as exc:
+            self.stats.tasks_failed += 1
+            future.set_exception(exc)
+            return
+
+        try:
+            if self.process is None or not self.process.is_alive():
+                self.respawn()
+
+            task_id = next(self._ids)
+            if len(payload) > self.backend.shm_threshold:
+                from multiprocessing import shared_memory
+                shm = shared_memory.SharedMemory(create=True, size=len(payload))
+                shm.buf[:len(payload)] = payload
+                self.stats.shm_transfers += 1
+                self.conn.send((task_id, "shm", (shm.name, len(payload))))
+            else:
+                self.conn.send((task_id, "inline", payload))
+
+            if not self.conn.poll(timeout):
+                self.stats.timeouts += 1
+                self.respawn()
+                future.set_exception(TaskTimeoutError(f"Task exceeded {timeout}s"))
+                return
+
+            _, ok, body, rss, recycle = self.conn.recv()
+        except (EOFError, OSError):
+            exitcode = self.process.exitcode if self.process is not None else None
+            self.stats.crashes += 1
+            self.respawn()
+            future.set_exception(WorkerCrashedError(
+                f"Worker {self.name} died (exitcode={exitcode})"))
+            return
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        self.stats.last_rss_mb = round(rss, 1)
+        try:
+            value = pickle.loads(body)
+        except Exception as exc:
+            # e.g. the result class is not importable in this process
+            ok, value = False, exc
+        if ok:
+            self.stats.tasks_completed += 1
+            future.set_result(value)
+        else:
+            self.stats.tasks_failed += 1
+            future.set_exception(value)
+
+        if recycle:
+            self.stats.recycles += 1
+            self.respawn()
+
+
+class ProcessPoolBackend:
+    """
+    Pool of warm worker processes with a Future-based submit API.
+
+    Unlike concurrent.futures.ProcessPoolExecutor, a crashing worker does
+    not break the pool: only the task it was running fails with
+    WorkerCrashedError, and the worker is replaced.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        preload: Iterable[str] = DEFAULT_PRELOAD,
+        memory_limit_mb: float = DEFAULT_MEMORY_LIMIT_MB,
+        shm_threshold: int = SHM_THRESHOLD_BYTES,
+        start_method: Optional[str] = None,
+    ):
+        self.size = size or os.cpu_count() or 2
+        self.preload = tuple(preload)
+        self.memory_limit_mb = memory_limit_mb
+        self.shm_threshold = shm_threshold
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = "forkserver" if "forkserver" in methods else "spawn"
+        self._ctx = multiprocessing.get_context(start_method)
+        self._tasks: "queue.Queue[Optional[_WorkItem]]" = queue.Queue()
+        self._workers: List[_ProcessWorker] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self) -> "ProcessPoolBackend":
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+            for i in range(self.size):
+                w = _ProcessWorker(f"aios-proc-{i}", self)
+                w.start()
+                self._workers.append(w)
+        return self
+
+    def submit(self, fn: Callable, *args, timeout: Optional[float] = None,
+               **kwargs) -> Future:
+        """Run fn(*args, **kwargs) in a worker process; returns a Future."""
+        if not self._started:
+            self.start()
+        future: Future = Future()
+        self._tasks.put((fn, args, kwargs, future, timeout))
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._tasks.put(None)
+        if wait:
+            for w in workers:
+                w.join()
+
+    def stats(self) -> Dict[str, Any]:
+        workers = []
+        for w in self._workers:
+            s = w.stats
+            workers.append({
+                "name": w.name,
+                "pid": w.pid,
+                "tasks_completed": s.tasks_completed,
+                "tasks_failed": s.tasks_failed,
+                "crashes": s.crashes,
+                "timeouts": s.timeouts,
+                "recycles": s.recycles,
+                "restarts": s.restarts,
+                "rss_mb": s.last_rss_mb,
+                "shm_transfers": s.shm_transfers,
+            })
+        return {
+            "backend": "process",
+            "size": self.size,
+            "pending_tasks": self._tasks.qsize(),
+            "memory_limit_mb": self.memory_limit_mb,
+            "workers": workers,
+        }
+
+    def __enter__(self) -> "ProcessPoolBackend":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------------
+
+_backend: Optional[ProcessPoolBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_process_backend() -> ProcessPoolBackend:
+    """Lazily started process-wide backend shared by all schedulers."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = ProcessPoolBackend().start()
+        return _backend
+
+
+def shutdown_process_backend(wait: bool = True) -> None:
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if backend is not None:
+        backend.shutdown(wait=wait)
@@ -213,8 +213,11 @@ class BaseQueue(abc.ABC):
                     req.state = RequestState.CANCELLED
                     self._pending.pop(i)
                     self._completed.append(req)
-                    return True
-        return False
+                    break
+            else:
+                return False
+        self._emit(f"queue.{self.queue_kind}.cancelled", req)
+        return True
 
     def pending_count(self) -> int:
         with self._lock:
@@ -259,6 +262,12 @@ class BaseQueue(abc.ABC):
     # ------------------------------------------------------------------
 
     def _emit(self, event_type: str, req: QueueRequest) -> None:
+        # timings ride along so subscribers (metrics exporter) need no queue handle
+        timings: Dict[str, float] = {}
+        if req.started_at is not None:
+            timings["wait_ms"] = round(req.wait_time() * 1000, 3)
+            if req.finished_at is not None:
+                timings["duration_ms"] = round((req.finished_at - req.started_at) * 1000, 3)
         try:
             self.bus.emit(create_event(
                 event_type,
@@ -268,6 +277,8 @@ class BaseQueue(abc.ABC):
                 agent_id=req.agent_id or "",
                 priority=int(req.priority),
                 state=req.state.name,
+                pending=len(self._pending),
+                **timings,
             ))
         except Exception:
             pass  # never let bus errors break the queue
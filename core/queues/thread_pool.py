@@ -4,17 +4,23 @@ AIOS Thread Pool Manager - Thread binding with CPU affinity.
 Features:
 - Named thread pools for different resource types (llm, memory, storage)
 - Thread-to-queue binding (each pool serves one queue)
-- CPU affinity hints (best-effort on Windows/Linux)
+- Per-worker deques with work stealing (O(1) push/pop, no global list)
+- Condition-variable wakeups instead of timed polling
+- Futures carrying task results and exceptions
+- CPU affinity (sched_setaffinity on Linux, SetThreadAffinityMask on Windows)
 - Pool lifecycle management (start, stop, resize)
-- Worker stats (utilization, idle time)
+- Worker stats (utilization, idle time, queue depth, steals)
 """
 from __future__ import annotations
 
+import itertools
 import os
 import threading
 import time
+from collections import deque
+from concurrent.futures import Future
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 import sys
 from pathlib import Path
@@ -26,6 +32,9 @@ from core.event import create_event
 from core.event_bus import EventBus, get_event_bus
 
 
+_WorkItem = Tuple[Callable, Future]
+
+
 # ---------------------------------------------------------------------------
 # Worker
 # ---------------------------------------------------------------------------
@@ -37,15 +46,18 @@ class WorkerStats:
     total_busy_sec: float = 0.0
     total_idle_sec: float = 0.0
     last_active: float = 0.0
+    steals: int = 0
+    stolen_from: int = 0
 
 
 class _Worker:
-    """A single worker thread bound to a pool."""
+    """A single worker thread bound to a pool, owning a local task deque."""
 
     def __init__(self, name: str, pool: "ThreadPool"):
         self.name = name
         self.pool = pool
         self.stats = WorkerStats()
+        self.tasks: Deque[_WorkItem] = deque()
         self._stop = threading.Event()
         self._thread = threading.Thread(
             target=self._run, daemon=True, name=name,
@@ -66,11 +78,17 @@ class _Worker:
     def alive(self) -> bool:
         return self._thread.is_alive()
 
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
     def _run(self) -> None:
+        self.pool._pin_current_thread()
+        self.pool._local.worker = self
         idle_start = time.monotonic()
         while not self._stop.is_set():
-            task = self.pool._get_task(timeout=0.1)
-            if task is None:
+            item = self.pool._next_task(self)
+            if item is None:
                 continue
 
             # Track idle time
@@ -78,12 +96,18 @@ class _Worker:
             self.stats.total_idle_sec += now - idle_start
 
             # Execute
+            task, future = item
             busy_start = now
             try:
-                task()
-                self.stats.tasks_completed += 1
-            except Exception:
-                self.stats.tasks_failed += 1
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = task()
+                    except BaseException as exc:
+                        self.stats.tasks_failed += 1
+                        future.set_exception(exc)
+                    else:
+                        self.stats.tasks_completed += 1
+                        future.set_result(result)
             finally:
                 elapsed = time.monotonic() - busy_start
                 self.stats.total_busy_sec += elapsed
@@ -102,8 +126,11 @@ class ThreadPool:
     """
     A named thread pool bound to a specific resource queue.
 
-    Workers pull tasks from an internal queue. The pool owner
-    submits callables via submit().
+    Each worker owns a deque. submit() places tasks round-robin (or on the
+    submitting worker's own deque when called from inside the pool); an idle
+    worker first drains its own deque and then steals the oldest item from a
+    sibling's, so tasks still start in roughly submission order. Idle workers
+    sleep on a condition variable and are woken exactly when work arrives.
     """
 
     def __init__(
@@ -116,9 +143,10 @@ class ThreadPool:
         self._size = size
         self._cpu_affinity = cpu_affinity
         self._workers: List[_Worker] = []
-        self._task_queue: List[Callable] = []
-        self._task_lock = threading.Lock()
-        self._task_event = threading.Event()
+        self._cond = threading.Condition(threading.Lock())
+        self._pending = 0  # tasks sitting in any worker deque
+        self._rr = itertools.count()
+        self._local = threading.local()
         self._started = False
 
     def start(self) -> None:
@@ -126,28 +154,43 @@ class ThreadPool:
             return
         self._started = True
         for i in range(self._size):
-            w = _Worker(f"{self.name}-worker-{i}", self)
-            w.start()
-            self._workers.append(w)
+            self._add_worker(i)
 
-        # Best-effort CPU affinity
+        # Windows pins from outside; Linux workers pin themselves on start
         if self._cpu_affinity:
             self._set_affinity()
 
     def stop(self) -> None:
         for w in self._workers:
             w.stop()
-        self._task_event.set()  # wake blocked workers
+        with self._cond:
+            self._cond.notify_all()  # wake blocked workers
         for w in self._workers:
             w.join()
-        self._workers.clear()
+        with self._cond:
+            # Anything still queued will never run; resolve its future
+            for w in self._workers:
+                while w.tasks:
+                    w.tasks.popleft()[1].cancel()
+            self._pending = 0
+            self._workers.clear()
         self._started = False
 
-    def submit(self, task: Callable) -> None:
-        """Submit a callable to be executed by a pool worker."""
-        with self._task_lock:
-            self._task_queue.append(task)
-        self._task_event.set()
+    def submit(self, task: Callable) -> Future:
+        """Submit a callable; returns a Future with its result or exception."""
+        future: Future = Future()
+        item = (task, future)
+        with self._cond:
+            workers = self._workers
+            if not workers:
+                raise RuntimeError(f"Pool '{self.name}' is not running")
+            owner = getattr(self._local, "worker", None)
+            if owner is None or owner not in workers:
+                owner = workers[next(self._rr) % len(workers)]
+            owner.tasks.append(item)
+            self._pending += 1
+            self._cond.notify()
+        return future
 
     def resize(self, new_size: int) -> None:
         """Resize the pool. Adds or removes workers."""
@@ -155,17 +198,27 @@ class ThreadPool:
             return
         if new_size > self._size:
             for i in range(self._size, new_size):
-                w = _Worker(f"{self.name}-worker-{i}", self)
-                w.start()
-                self._workers.append(w)
+                self._add_worker(i)
         else:
-            # Remove excess workers
-            excess = self._workers[new_size:]
-            self._workers = self._workers[:new_size]
-            for w in excess:
-                w.stop()
+            # Remove excess workers; their queued tasks move to survivors
+            with self._cond:
+                excess = self._workers[new_size:]
+                self._workers = self._workers[:new_size]
+                for w in excess:
+                    w.stop()
+                self._cond.notify_all()
             for w in excess:
                 w.join()
+            with self._cond:
+                for i, w in enumerate(excess):
+                    while w.tasks:
+                        item = w.tasks.popleft()
+                        if self._workers:
+                            self._workers[i % len(self._workers)].tasks.append(item)
+                        else:
+                            self._pending -= 1
+                            item[1].cancel()
+                self._cond.notify_all()
         self._size = new_size
 
     @property
@@ -184,29 +237,69 @@ class ThreadPool:
                 "tasks_completed": w.stats.tasks_completed,
                 "tasks_failed": w.stats.tasks_failed,
                 "utilization_pct": round(utilization, 1),
+                "queue_depth": len(w.tasks),
+                "steals": w.stats.steals,
+                "stolen_from": w.stats.stolen_from,
                 "alive": w.alive,
             })
         return {
             "pool": self.name,
             "size": self._size,
-            "pending_tasks": len(self._task_queue),
+            "pending_tasks": self._pending,
+            "total_steals": sum(w.stats.steals for w in self._workers),
             "workers": worker_stats,
         }
 
-    # internal: called by workers
-    def _get_task(self, timeout: float = 0.1) -> Optional[Callable]:
-        self._task_event.wait(timeout=timeout)
-        with self._task_lock:
-            if self._task_queue:
-                task = self._task_queue.pop(0)
-                if not self._task_queue:
-                    self._task_event.clear()
-                return task
-            self._task_event.clear()
-            return None
+    # internal
+    def _add_worker(self, index: int) -> None:
+        w = _Worker(f"{self.name}-worker-{index}", self)
+        with self._cond:
+            self._workers.append(w)
+        w.start()
+
+    def _next_task(self, worker: _Worker) -> Optional[_WorkItem]:
+        """Called by workers: own deque first, then steal, then sleep."""
+        while not worker.stopping:
+            item = self._take(worker)
+            if item is not None:
+                return item
+            with self._cond:
+                while self._pending == 0 and not worker.stopping:
+                    self._cond.wait()
+        return None
+
+    def _take(self, worker: _Worker) -> Optional[_WorkItem]:
+        try:
+            item = worker.tasks.popleft()
+        except IndexError:
+            item = None
+            for victim in list(self._workers):
+                if victim is worker:
+                    continue
+                try:
+                    item = victim.tasks.popleft()  # steal the oldest, same end as the owner
+                except IndexError:
+                    continue
+                worker.stats.steals += 1
+                victim.stats.stolen_from += 1
+                break
+            if item is None:
+                return None
+        with self._cond:
+            self._pending -= 1
+        return item
+
+    def _pin_current_thread(self) -> None:
+        """Linux: pin the calling worker thread with sched_setaffinity."""
+        if not self._cpu_affinity or not hasattr(os, "sched_setaffinity"):
+            return
+        try:
+            os.sched_setaffinity(0, set(self._cpu_affinity))
+        except (OSError, ValueError):
+            pass  # best effort (cpu not present / not permitted)
 
     def _set_affinity(self) -> None:
-        """Best-effort CPU affinity (Windows only for now)."""
+        """Best-effort CPU affinity for Windows (Linux pins in-thread)."""
         if os.name != "nt" or not self._cpu_affinity:
             return
         try:
@@ -45,6 +45,11 @@ try:
 except ImportError:
     ToolManager = None
 
+# 进程池后端（CPU 密集型 task_type）；按包路径导入，与 scheduler_v2 共用同一个模块实例
+# （同一份 BACKEND_BY_TASK_TYPE 注册表和共享进程池）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.process_pool import ProcessPoolBackend, get_process_backend, select_backend
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,13 +57,15 @@ class Scheduler:
     """生产级任务调度器，支持依赖关系、并发控制、超时保护、自动任务拆解。"""
 
     def __init__(self, max_concurrent: int = 5, default_timeout: int = 30, 
-                 workspace: Optional[Path] = None):
+                 workspace: Optional[Path] = None,
+                 process_backend: Optional[ProcessPoolBackend] = None):
         """初始化调度器。
 
         Args:
             max_concurrent: 最大并发任务数
             default_timeout: 单个任务默认超时秒数
             workspace: 工作目录（用于 Planner + Memory）
+            process_backend: CPU 密集型任务使用的进程池（默认共享实例）
         """
         self.max_concurrent = max_concurrent
         self.default_timeout = default_timeout
@@ -69,6 +76,7 @@ class Scheduler:
         self.dependencies: Dict[str, List[str]] = {}
         self.lock = threading.Lock()
         self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.process_backend = process_backend
         
         # 初始化 Planner
         if workspace is None:
@@ -89,7 +97,8 @@ class Scheduler:
         """调度新任务。
 
         Args:
-            task: 必须包含 'id' (str) 和 'func' (Callable)，可选 'depends_on' (List[str])
+            task: 必须包含 'id' (str) 和 'func' (Callable)，可选 'depends_on' (List[str])、
+                'task_type' (str，CPU 密集型类型走进程池，func 需可 pickle)
         """
         with self.lock:
             task_id = task.get("id")
@@ -308,7 +317,11 @@ class Scheduler:
     def _start_task(self, task: Dict[str, Any]) -> None:
         """使用 Executor 启动带超时的任务。"""
         task_id = task["id"]
-        future = self.executor.submit(self._execute_task, task)
+        if select_backend(task.get("task_type")) == "process":
+            backend = self.process_backend or get_process_backend()
+            future = backend.submit(task["func"], timeout=self.default_timeout)
+        else:
+            future = self.executor.submit(self._execute_task, task)
         self.running[task_id] = future
         future.add_done_callback(lambda f: self._task_done(task_id, f, task))
 
@@ -324,7 +337,7 @@ class Scheduler:
         try:
             result = future.result(timeout=self.default_timeout)
             self._on_complete(task_id, result, task)
-        except FutureTimeoutError:
+        except (FutureTimeoutError, TimeoutError):  # 3.11 前两者不是同一个类
             self._on_timeout(task_id, task)
         except Exception as e:
             self._on_error(task_id, e, task)
@@ -430,6 +443,8 @@ class Scheduler:
     def shutdown(self, wait: bool = True) -> None:
         """优雅关闭。"""
         self.executor.shutdown(wait=wait)
+        if self.tools:
+            self.tools.close()
         logger.info("Scheduler shutdown complete.")
 
 
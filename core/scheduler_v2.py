@@ -33,6 +33,12 @@ sys.path.insert(0, str(AIOS_ROOT))
 
 from core.event import Event, EventType, create_event
 from core.event_bus import get_event_bus, EventBus
+from core.process_pool import (
+    ProcessPoolBackend,
+    TaskTimeoutError,
+    get_process_backend,
+    select_backend,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -64,6 +70,8 @@ class Task:
     timeout_sec: float = 30.0
     max_retries: int = 2
     payload: Dict[str, Any] = field(default_factory=dict)
+    # CPU 密集型任务类型（见 core.process_pool）走进程池，handler 需可 pickle
+    task_type: Optional[str] = None
 
     # 内部状态（用户不需要设置）
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -155,9 +163,11 @@ class SchedulerV2:
         self,
         bus: Optional[EventBus] = None,
         max_concurrency: int = _DEFAULT_MAX_CONCURRENCY,
+        process_backend: Optional[ProcessPoolBackend] = None,
     ):
         self.bus = bus or get_event_bus()
         self.max_concurrency = max_concurrency
+        self._process_backend = process_backend
 
         # 内部状态
         self._queue = _PriorityQueue()
@@ -387,17 +397,21 @@ class SchedulerV2:
             result_container: Dict[str, Any] = {}
             error_container: Dict[str, Any] = {}
 
-            def _run():
-                try:
-                    result_container["value"] = task.handler()
-                except Exception as exc:
-                    error_container["exc"] = exc
-
-            runner = threading.Thread(target=_run, daemon=True)
-            runner.start()
-            runner.join(timeout=task.timeout_sec)
-
-            if runner.is_alive():
+            if select_backend(task.task_type) == "process":
+                timed_out = self._run_in_process(task, result_container, error_container)
+            else:
+                def _run():
+                    try:
+                        result_container["value"] = task.handler()
+                    except Exception as exc:
+                        error_container["exc"] = exc
+
+                runner = threading.Thread(target=_run, daemon=True)
+                runner.start()
+                runner.join(timeout=task.timeout_sec)
+                timed_out = runner.is_alive()
+
+            if timed_out:
                 # 超时
                 task.state = TaskState.TIMEOUT
                 task.error = f"Timeout after {task.timeout_sec}s"
@@ -428,6 +442,19 @@ class SchedulerV2:
                 self._running.pop(task.id, None)
             self._semaphore.release()
 
+    def _run_in_process(self, task: Task, result_container: Dict[str, Any],
+                        error_container: Dict[str, Any]) -> bool:
+        """在进程池中执行 handler，返回是否超时（超时的 worker 会被替换）"""
+        backend = self._process_backend or get_process_backend()
+        future = backend.submit(task.handler, timeout=task.timeout_sec)
+        try:
+            result_container["value"] = future.result()
+        except TaskTimeoutError:
+            return True
+        except Exception as exc:
+            error_container["exc"] = exc
+        return False
+
     def _handle_task_failure(self, task: Task) -> None:
         """处理任务失败：决定重试或放弃"""
         if task.retries < task.max_retries:
@@ -468,9 +495,18 @@ class SchedulerV2:
             state=task.state.name,
             retries=task.retries,
             error=task.error,
+            task_type=task.task_type or "all",
+            duration_ms=_duration_ms(task),
         ))
 
 
+def _duration_ms(task: Task) -> Optional[int]:
+    """最后一次执行的耗时（毫秒），没有执行过返回 None"""
+    if task.started_at is None or task.finished_at is None:
+        return None
+    return int((task.finished_at - task.started_at) * 1000)
+
+
 # ---------------------------------------------------------------------------
 # 便捷函数（兼容 toy_scheduler.start_scheduler）
 # ---------------------------------------------------------------------------
@@ -29,7 +29,7 @@ import time
 import sys
 
 # 导入 VM Controller
-sys.path.insert(0, str(Path(__file__).parent.parent / 'vm_controller'))
+sys.path.insert(0, str(Path(__file__).parent.parent))
 from vm_controller import VMController
 
 # 导入 Planner
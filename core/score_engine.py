@@ -24,17 +24,22 @@ sys.path.insert(0, str(AIOS_ROOT))
 
 from core.event import Event, EventType, create_event
 from core.event_bus import get_event_bus
+from core.score_series import DEFAULT_SERIES_PATH, MultiResolutionSeries, RollingWindow
 
 
 class ToyScoreEngine:
     """玩具版评分引擎 - 证明概念
 
     改进：使用滑动窗口而非累积统计，避免历史数据稀释当前状态。
+    窗口是环形缓冲区 + 运行累加和，评分计算 O(1)；历史是有界的多分辨率序列。
+    series_path 默认不落盘；常驻进程（心跳）传 DEFAULT_SERIES_PATH 供 Dashboard 读取，
+    退出前调用 stop() 写入最后一段。
     """
     
     WINDOW_SIZE = 100  # 只保留最近 100 个事件的统计
+    SAVE_INTERVAL = 10  # 序列落盘间隔（秒），供 Dashboard 读取
 
-    def __init__(self, bus=None):
+    def __init__(self, bus=None, series_path=None):
         self.bus = bus or get_event_bus()
         
         # 统计数据
@@ -48,14 +53,20 @@ class ToyScoreEngine:
         }
         
         # 滑动窗口（用于更准确的近期评分）
-        self._recent_events = []
+        self._window = RollingWindow(self.WINDOW_SIZE)
         
         # 当前 score
         self.current_score = 1.0
         self.last_score = 1.0
         
-        # Score 历史
-        self.score_history = []
+        # Score 历史（raw / 1m / 1h，全部有界）；启动时接上次落盘的序列
+        if series_path:
+            self.series = MultiResolutionSeries.load(series_path)
+        else:
+            self.series = MultiResolutionSeries()
+        self.score_history = self.series.raw()
+        self.series_path = series_path
+        self._last_save = 0.0
         
     def start(self):
         """启动评分引擎，订阅所有事件"""
@@ -65,6 +76,11 @@ class ToyScoreEngine:
         self.bus.subscribe("*", self._handle_event)
         
         print("[ScoreEngine] 已启动，实时计算评分中...")
+
+    def stop(self):
+        """取消订阅，并把距上次落盘以来的序列写盘"""
+        self.bus.unsubscribe("*", self._handle_event)
+        self._maybe_save_series(force=True)
     
     def _handle_event(self, event: Event):
         """处理所有事件，更新统计"""
@@ -94,10 +110,8 @@ class ToyScoreEngine:
             self.stats["resource_alerts"] += 1
             event_record["resource_alert"] = True
         
-        # 滑动窗口维护
-        self._recent_events.append(event_record)
-        if len(self._recent_events) > self.WINDOW_SIZE:
-            self._recent_events = self._recent_events[-self.WINDOW_SIZE:]
+        # 滑动窗口维护（O(1)，满了自动淘汰最旧记录）
+        self._window.push(event_record)
         
         # 每 5 个事件重新计算一次 score
         if self.stats["total_events"] % 5 == 0:
@@ -105,27 +119,26 @@ class ToyScoreEngine:
     
     def _calculate_score(self):
         """计算系统健康度评分（基于滑动窗口）"""
-        window = self._recent_events
-        if not window:
+        window = self._window
+        if not len(window):
             return
 
         # 1. 成功率（0-1）—— 基于滑动窗口
-        successes = sum(1 for e in window if e.get("outcome") == "success")
-        failures = sum(1 for e in window if e.get("outcome") == "failure")
+        successes = window.successes
+        failures = window.failures
         total_ops = successes + failures
         success_rate = successes / total_ops if total_ops > 0 else 1.0
         
         # 2. 延迟评分（0-1，越低越好）—— 基于滑动窗口
-        latencies = [e["latency_ms"] for e in window if "latency_ms" in e]
-        if latencies:
-            avg_latency = sum(latencies) / len(latencies)
+        if window.latency_count:
+            avg_latency = window.latency_sum / window.latency_count
             # 100ms 理想，1000ms 最差
             latency_score = max(0, min(1, 1 - (avg_latency - 100) / 900))
         else:
             latency_score = 1.0
         
         # 3. 稳定性（0-1）—— 基于滑动窗口
-        resource_alerts = sum(1 for e in window if e.get("resource_alert"))
+        resource_alerts = window.alerts
         if len(window) > 0:
             alert_rate = resource_alerts / len(window)
             stability = max(0, 1 - alert_rate * 10)
@@ -145,7 +158,7 @@ class ToyScoreEngine:
         )
         
         # 记录历史
-        self.score_history.append({
+        self.series.add({
             "timestamp": int(time.time() * 1000),
             "score": self.current_score,
             "success_rate": success_rate,
@@ -153,6 +166,7 @@ class ToyScoreEngine:
             "stability": stability,
             "resource_margin": resource_margin
         })
+        self._maybe_save_series()
         
         # 发射 score 事件
         self._emit_score_event()
@@ -161,6 +175,19 @@ class ToyScoreEngine:
               f"(success={success_rate:.2f}, latency={latency_score:.2f}, "
               f"stability={stability:.2f}, resource={resource_margin:.2f})")
     
+    def _maybe_save_series(self, force=False):
+        """按间隔把多分辨率序列写盘（Dashboard 从文件读取趋势）"""
+        if not self.series_path:
+            return
+        now = time.time()
+        if not force and now - self._last_save < self.SAVE_INTERVAL:
+            return
+        self._last_save = now
+        try:
+            self.series.save(self.series_path)
+        except OSError as e:
+            print(f"[ScoreEngine] 序列保存失败: {e}")
+    
     def _emit_score_event(self):
         """发射 score 事件"""
         # 判断状态变化
@@ -199,15 +226,15 @@ class ToyScoreEngine:
         """获取统计数据"""
         return self.stats
     
-    def get_history(self):
-        """获取评分历史"""
-        return self.score_history
+    def get_history(self, resolution="raw", limit=None):
+        """获取评分历史（raw / 1m / 1h）"""
+        return self.series.query(resolution, limit)
 
 
 # 便捷函数
-def start_score_engine(bus=None):
-    """启动评分引擎"""
-    engine = ToyScoreEngine(bus=bus)
+def start_score_engine(bus=None, series_path=DEFAULT_SERIES_PATH):
+    """启动评分引擎（默认把评分序列落盘到 data/，供 Dashboard 读取）"""
+    engine = ToyScoreEngine(bus=bus, series_path=series_path)
     engine.start()
     return engine
 
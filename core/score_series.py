@@ -0,0 +1,219 @@
+"""
+AIOS Score Series - 评分引擎的滑动窗口与多分辨率历史
+
+职责：
+1. RollingWindow：环形缓冲区 + 运行累加和，插入/淘汰均为 O(1)
+2. MultiResolutionSeries：有界、降采样的评分时间序列（raw / 1m / 1h）
+3. 持久化为小 JSON 文件，供 Dashboard 直接读取绘制趋势
+
+不依赖 EventBus，Dashboard 进程可以单独导入。
+"""
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SERIES_PATH = AIOS_ROOT / "data" / "score_series.json"
+
+# 分辨率：名称 -> (桶宽毫秒, 保留点数)
+RESOLUTIONS = {
+    "raw": (0, 360),            # 每次计算一个点
+    "1m": (60_000, 1440),       # 24 小时
+    "1h": (3_600_000, 720),     # 30 天
+}
+
+# 序列里做平均的字段
+SERIES_FIELDS = ("score", "success_rate", "latency_score", "stability", "resource_margin")
+
+
+class RollingWindow:
+    """固定容量的环形窗口，维护 success/failure/latency/alert 的运行和"""
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self._slots: List[Optional[dict]] = [None] * size
+        self._head = 0
+        self.count = 0
+
+        self.successes = 0
+        self.failures = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.alerts = 0
+
+    def push(self, record: dict) -> None:
+        """写入一条记录；窗口已满时淘汰最旧记录并扣减累加和"""
+        old = self._slots[self._head]
+        if old is not None:
+            self._apply(old, -1)
+        else:
+            self.count += 1
+        self._slots[self._head] = record
+        self._apply(record, 1)
+        self._head = (self._head + 1) % self.size
+
+    def _apply(self, record: dict, sign: int) -> None:
+        outcome = record.get("outcome")
+        if outcome == "success":
+            self.successes += sign
+        elif outcome == "failure":
+            self.failures += sign
+        if "latency_ms" in record:
+            self.latency_sum += sign * record["latency_ms"]
+            self.latency_count += sign
+        if record.get("resource_alert"):
+            self.alerts += sign
+
+    def __len__(self) -> int:
+        return self.count
+
+    def records(self) -> List[dict]:
+        """按时间顺序返回窗口内的记录（调试用，O(n)）"""
+        if self.count < self.size:
+            return list(self._slots[:self.count])
+        return self._slots[self._head:] + self._slots[:self._head]
+
+
+class _Bucket:
+    """一个正在累积的降采样桶"""
+
+    __slots__ = ("start", "n", "sums")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.n = 0
+        self.sums = dict.fromkeys(SERIES_FIELDS, 0.0)
+
+    def add(self, point: dict) -> None:
+        self.n += 1
+        for f in SERIES_FIELDS:
+            self.sums[f] += point.get(f, 0.0)
+
+    def to_point(self) -> dict:
+        point = {"timestamp": self.start, "samples": self.n}
+        for f in SERIES_FIELDS:
+            point[f] = self.sums[f] / self.n if self.n else 0.0
+        return point
+
+
+class MultiResolutionSeries:
+    """有界多分辨率时间序列
+
+    每个分辨率是一个 maxlen 固定的 deque；非 raw 分辨率在当前桶里累加，
+    时间跨过桶边界时把平均值落入 deque。内存占用与运行时长无关。
+    """
+
+    def __init__(self, resolutions: Optional[Dict[str, tuple]] = None):
+        self.resolutions = dict(resolutions or RESOLUTIONS)
+        self._series: Dict[str, deque] = {
+            name: deque(maxlen=keep) for name, (_, keep) in self.resolutions.items()
+        }
+        self._open: Dict[str, _Bucket] = {}
+
+    def add(self, point: dict) -> None:
+        """追加一个评分点（point 需要包含 timestamp 毫秒）"""
+        ts = int(point.get("timestamp") or time.time() * 1000)
+        for name, (width, _) in self.resolutions.items():
+            if width <= 0:
+                self._series[name].append(point)
+                continue
+            start = ts - ts % width
+            bucket = self._open.get(name)
+            if bucket is not None and bucket.start != start:
+                self._series[name].append(bucket.to_point())
+                bucket = None
+            if bucket is None:
+                bucket = self._open[name] = _Bucket(start)
+            bucket.add(point)
+
+    def query(self, resolution: str = "raw", limit: Optional[int] = None,
+              include_open: bool = True) -> List[dict]:
+        """按分辨率返回点（时间升序），可包含尚未闭合的当前桶"""
+        if resolution not in self._series:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        points = list(self._series[resolution])
+        bucket = self._open.get(resolution)
+        if include_open and bucket is not None and bucket.n:
+            points.append(bucket.to_point())
+        if limit is not None:
+            points = points[-limit:] if limit > 0 else []
+        return points
+
+    def raw(self) -> deque:
+        return self._series["raw"]
+
+    def to_dict(self) -> Dict[str, List[dict]]:
+        return {name: self.query(name) for name in self._series}
+
+    def save(self, path: Path = DEFAULT_SERIES_PATH) -> None:
+        """原子写入（tmp + replace），Dashboard 读取时不会看到半个文件
+
+        series 里包含未闭合的当前桶（Dashboard 直接画）；open 另存当前桶的累加和，
+        load() 时据此恢复，重启后同一个桶继续累积而不是重复落点。
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        data = {
+            "updated_at": int(time.time() * 1000),
+            "series": self.to_dict(),
+            "open": {
+                name: {"start": b.start, "n": b.n, "sums": b.sums}
+                for name, b in self._open.items() if b.n
+            },
+        }
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_SERIES_PATH,
+             resolutions: Optional[Dict[str, tuple]] = None) -> "MultiResolutionSeries":
+        """从 save() 写出的文件恢复序列；文件不存在或损坏时返回空序列
+
+        保留点数按当前 resolutions 截断，文件里多余/未知的分辨率忽略。
+        """
+        series = cls(resolutions)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return series
+        if not isinstance(data, dict):
+            return series
+        saved = data.get("series") or {}
+        open_buckets = data.get("open") or {}
+        for name, points in saved.items():
+            if name not in series._series or not isinstance(points, list):
+                continue
+            state = open_buckets.get(name)
+            if state and points:
+                points = points[:-1]  # 最后一个点就是当时的未闭合桶
+                bucket = _Bucket(int(state["start"]))
+                bucket.n = int(state["n"])
+                bucket.sums.update({f: float(v) for f, v in state.get("sums", {}).items()
+                                    if f in bucket.sums})
+                series._open[name] = bucket
+            series._series[name].extend(p for p in points if isinstance(p, dict))
+        return series
+
+
+def load_series(resolution: str = "1m", limit: Optional[int] = None,
+                path: Path = DEFAULT_SERIES_PATH) -> List[dict]:
+    """读取 ScoreEngine 持久化的序列（Dashboard 用），文件不存在返回空列表"""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    points = data.get("series", {}).get(resolution, [])
+    if limit is not None:
+        points = points[-limit:] if limit > 0 else []
+    return points
+
+
+def trend(field: str, resolution: str = "1m", limit: int = 30,
+          path: Path = DEFAULT_SERIES_PATH, scale: float = 100.0) -> List[Any]:
+    """取单个字段的趋势数组（默认 0-100 整数），用于 Dashboard 折线图"""
+    return [int(round(p.get(field, 0) * scale))
+            for p in load_series(resolution, limit, path)]
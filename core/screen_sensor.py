@@ -9,26 +9,48 @@
 设计：无守护进程，每次调用 scan() 做一次截图对比。
 适合在心跳中调用，不需要后台线程。
 
+帧管线（内存中，见 core.frame_diff）：
+- 上一帧以 RGB NumPy 数组保存在有界环形缓冲（FrameRing），不落盘
+- 低分辨率指纹（每格每通道均值/最小/最大）预过滤：指纹未变直接跳过完整 diff
+- 分块变化率通过一次 reshape + sum 计算，不再逐块 crop；按通道比较，
+  亮度相同的颜色变化也算变化
+
 依赖: mss, Pillow
 """
 
 import json
 import time
 import base64
+from collections import deque
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 from io import BytesIO
 
 try:
     import mss
     import numpy as np
-    from PIL import Image, ImageChops
+    from PIL import Image
 except ImportError as e:
     raise ImportError(f"缺少依赖: {e}. 请安装: pip install mss Pillow numpy") from e
 
 from core.event_bus import get_bus, PRIORITY_NORMAL, PRIORITY_HIGH
+from core.frame_diff import (  # noqa: F401  (re-exported)
+    FINGERPRINT_SHAPE,
+    FINGERPRINT_TOLERANCE,
+    FRAME_RING_SIZE,
+    PIXEL_DIFF_THRESHOLD,
+    Frame,
+    FrameRing,
+    block_change_ratios,
+    compare_frames,
+    diff_frames,
+    fingerprint,
+    regions_from_ratios,
+    to_gray,
+)
+
+from core.sensor_state import STATE_FILE, load_state, save_state  # noqa: F401
 
-STATE_FILE = Path(__file__).resolve().parent.parent / "events" / "sensor_state.json"
 SCREENSHOT_DIR = Path(__file__).resolve().parent.parent / "events" / "screenshots"
 
 # 默认冷却时间（秒）
@@ -40,21 +62,13 @@ DEFAULT_COOLDOWNS = {
 
 
 def _load_state() -> dict:
-    """加载传感器状态"""
-    if STATE_FILE.exists():
-        try:
-            return json.loads(STATE_FILE.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-    return {}
+    """加载传感器状态（与 core.sensors 共用同一份内存状态）"""
+    return load_state()
 
 
 def _save_state(state: dict):
-    """保存传感器状态"""
-    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    STATE_FILE.write_text(
-        json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    """保存传感器状态（定期落盘，见 core.sensor_state）"""
+    save_state(state)
 
 
 def _is_cooled_down(state: dict, topic: str, key: str = "default") -> bool:
@@ -73,12 +87,54 @@ def _mark_fired(state: dict, topic: str, key: str = "default"):
     state["cooldowns"][f"{topic}:{key}"] = time.time()
 
 
+def _as_array(img: Union[Path, str, np.ndarray, "Image.Image"]) -> np.ndarray:
+    """路径 / PIL 图像 / 数组 → NumPy 数组（保留颜色，灰度图保持 2 维）"""
+    if isinstance(img, np.ndarray):
+        return img
+    if not isinstance(img, Image.Image):
+        img = Image.open(img)
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+
+def _as_gray_array(img: Union[Path, str, np.ndarray, "Image.Image"]) -> np.ndarray:
+    return to_gray(_as_array(img))
+
+
 class ScreenCapture:
     """截屏基础能力"""
 
     def __init__(self):
         self.sct = mss.mss()
         SCREENSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        self._saved: Optional[deque] = None  # 已保存截图（旧→新），首次清理时从目录初始化
+
+    def _monitor_box(self, monitor: int = 0, region: tuple = None) -> dict:
+        if region:
+            return {
+                "left": region[0],
+                "top": region[1],
+                "width": region[2],
+                "height": region[3],
+            }
+        if monitor == 0:
+            return self.sct.monitors[0]  # 全屏（所有显示器）
+        return self.sct.monitors[min(monitor, len(self.sct.monitors) - 1)]
+
+    def grab_array(self, monitor: int = 0, region: tuple = None) -> np.ndarray:
+        """截屏为 RGB NumPy 数组 (H, W, 3)，不经过 PIL、不落盘"""
+        try:
+            sct_img = self.sct.grab(self._monitor_box(monitor, region))
+            bgra = np.frombuffer(sct_img.bgra, dtype=np.uint8)
+            bgra = bgra.reshape(sct_img.height, sct_img.width, 4)
+            return bgra[..., 2::-1]  # BGRA → RGB（视图，无拷贝）
+        except Exception as e:
+            raise RuntimeError(f"截屏失败: {e}") from e
+
+    def grab_gray(self, monitor: int = 0, region: tuple = None) -> np.ndarray:
+        """截屏为灰度数组 (H, W)"""
+        return to_gray(self.grab_array(monitor, region))
 
     def capture(self, monitor: int = 0, region: tuple = None) -> Path:
         """截取屏幕，保存到 aios/events/screenshots/，返回路径
@@ -92,17 +148,7 @@ class ScreenCapture:
         """
         try:
             # 选择监视器
-            if region:
-                mon = {
-                    "left": region[0],
-                    "top": region[1],
-                    "width": region[2],
-                    "height": region[3],
-                }
-            elif monitor == 0:
-                mon = self.sct.monitors[0]  # 全屏（所有显示器）
-            else:
-                mon = self.sct.monitors[min(monitor, len(self.sct.monitors) - 1)]
+            mon = self._monitor_box(monitor, region)
 
             # 截图
             sct_img = self.sct.grab(mon)
@@ -115,7 +161,7 @@ class ScreenCapture:
             img.save(filepath, "PNG")
 
             # 清理旧截图（保留最近50张）
-            self._cleanup_old_screenshots()
+            self._cleanup_old_screenshots(new_file=filepath)
 
             return filepath
 
@@ -134,17 +180,7 @@ class ScreenCapture:
         """
         try:
             # 选择监视器
-            if region:
-                mon = {
-                    "left": region[0],
-                    "top": region[1],
-                    "width": region[2],
-                    "height": region[3],
-                }
-            elif monitor == 0:
-                mon = self.sct.monitors[0]
-            else:
-                mon = self.sct.monitors[min(monitor, len(self.sct.monitors) - 1)]
+            mon = self._monitor_box(monitor, region)
 
             # 截图
             sct_img = self.sct.grab(mon)
@@ -163,96 +199,74 @@ class ScreenCapture:
         """对比两张截图差异
 
         Args:
-            img1_path: 第一张图片路径
-            img2_path: 第二张图片路径
+            img1_path: 第一张图片路径（也接受 NumPy 数组 / PIL 图像）
+            img2_path: 第二张图片路径（也接受 NumPy 数组 / PIL 图像）
             threshold: 像素变化比例阈值
 
         Returns:
             {"changed": bool, "diff_ratio": float, "diff_regions": [...]}
         """
         try:
-            img1 = Image.open(img1_path).convert("RGB")
-            img2 = Image.open(img2_path).convert("RGB")
-
-            # 尺寸不同直接判定为变化
-            if img1.size != img2.size:
-                return {
-                    "changed": True,
-                    "diff_ratio": 1.0,
-                    "diff_regions": [],
-                    "reason": "size_mismatch",
-                }
-
-            # 计算像素差异
-            diff = ImageChops.difference(img1, img2)
-            diff_gray = diff.convert("L")
-
-            # 统计变化像素
-            pixels = np.array(diff_gray)
-            total_pixels = pixels.size
-            changed_pixels = np.sum(pixels > 30)  # 阈值30，过滤微小变化
-            diff_ratio = changed_pixels / total_pixels if total_pixels > 0 else 0
-
-            # 检测变化区域（简单分块检测）
-            diff_regions = self._detect_diff_regions(diff_gray)
-
-            return {
-                "changed": diff_ratio > threshold,
-                "diff_ratio": round(diff_ratio, 4),
-                "diff_regions": diff_regions,
-            }
-
+            return self.diff_arrays(_as_array(img1_path), _as_array(img2_path), threshold)
         except Exception as e:
             raise RuntimeError(f"图片对比失败: {e}") from e
 
+    def diff_arrays(
+        self, pixels1: np.ndarray, pixels2: np.ndarray, threshold: float = 0.05,
+        block_size: int = 100,
+    ) -> dict:
+        """对比两帧数组（RGB 或灰度，向量化分块统计）"""
+        return diff_frames(pixels1, pixels2, threshold, block_size)
+
     def _detect_diff_regions(
-        self, diff_gray: Image.Image, block_size: int = 100
+        self, diff_gray: Union[Image.Image, np.ndarray], block_size: int = 100
     ) -> list[dict]:
-        """检测变化区域（分块检测）"""
-        width, height = diff_gray.size
-        regions = []
-
-        for y in range(0, height, block_size):
-            for x in range(0, width, block_size):
-                box = (x, y, min(x + block_size, width), min(y + block_size, height))
-                block = diff_gray.crop(box)
-                block_array = np.array(block)
-                changed = np.sum(block_array > 30)
-                ratio = changed / block_array.size if block_array.size > 0 else 0
-
-                if ratio > 0.1:  # 区块内10%以上像素变化
-                    regions.append({"region": box, "change_ratio": round(ratio, 3)})
+        """检测变化区域（分块检测，输入为差值灰度图）"""
+        diff = np.asarray(diff_gray)
+        _, ratios = block_change_ratios(diff, np.zeros_like(diff), block_size)
+        h, w = diff.shape
+        return regions_from_ratios(ratios, (w, h), block_size)
 
-        return regions
+    def _cleanup_old_screenshots(self, keep: int = 50, new_file: Optional[Path] = None):
+        """清理旧截图，保留最近 keep 张
 
-    def _cleanup_old_screenshots(self, keep: int = 50):
-        """清理旧截图，保留最近 keep 张"""
+        目录只在第一次调用时扫描一次，之后在内存队列里追加/淘汰。
+        """
         try:
-            screenshots = sorted(
-                SCREENSHOT_DIR.glob("screen_*.png"), key=lambda p: p.stat().st_mtime
-            )
-            if len(screenshots) > keep:
-                for old_file in screenshots[:-keep]:
-                    old_file.unlink(missing_ok=True)
+            if self._saved is None:
+                self._saved = deque(sorted(
+                    SCREENSHOT_DIR.glob("screen_*.png"), key=lambda p: p.stat().st_mtime
+                ))
+            elif new_file is not None and (not self._saved or self._saved[-1] != new_file):
+                self._saved.append(new_file)
+            while len(self._saved) > keep:
+                self._saved.popleft().unlink(missing_ok=True)
         except Exception:
             pass  # 清理失败不影响主流程
 
 
 class ScreenMonitor:
-    """实时监控屏幕变化"""
+    """实时监控屏幕变化（内存帧管线）"""
 
-    def __init__(self, interval: int = 30, threshold: float = 0.05):
+    def __init__(self, interval: int = 30, threshold: float = 0.05,
+                 ring_size: int = FRAME_RING_SIZE,
+                 fingerprint_tolerance: float = FINGERPRINT_TOLERANCE):
         """
         Args:
             interval: 截屏间隔秒数
             threshold: 变化检测阈值
+            ring_size: 内存中保留的帧数
+            fingerprint_tolerance: 指纹各统计量的最大差不超过该值视为未变化
         """
         self.interval = interval
         self.threshold = threshold
+        self.fingerprint_tolerance = fingerprint_tolerance
         self.capture = ScreenCapture()
+        self.frames = FrameRing(ring_size)
+        self.stats = {"scans": 0, "prefiltered": 0, "full_diffs": 0}
 
     def scan(self) -> list[dict]:
-        """单次扫描（心跳调用），对比上次截图
+        """单次扫描（心跳调用），对比上一帧
 
         如果变化超阈值，发布 sensor.screen.changed 事件
 
@@ -268,29 +282,28 @@ class ScreenMonitor:
             if time.time() - last_scan < self.interval:
                 return []  # 未到扫描时间
 
-            # 截取当前屏幕
-            current_path = self.capture.capture(monitor=1)  # 主显示器
+            # 截取当前屏幕（主显示器），帧只保存在内存中
+            frame = self.frames.push(self.capture.grab_array(monitor=1))
+            self.stats["scans"] += 1
 
             # 发布截图事件
             bus = get_bus()
             bus.emit(
                 "sensor.screen.captured",
-                {"path": str(current_path)},
+                {"frame": frame.seq, "size": frame.size},
                 PRIORITY_NORMAL,
                 "screen_monitor",
             )
 
-            # 对比上次截图
-            last_path = state.get("last_screenshot_path")
-            if last_path and Path(last_path).exists():
-                diff_result = self.capture.diff(
-                    Path(last_path), current_path, self.threshold
-                )
+            # 对比上一帧
+            previous = self.frames.previous
+            if previous is not None:
+                diff_result = self.compare(previous, frame)
 
                 if diff_result["changed"]:
                     change_event = {
-                        "current": str(current_path),
-                        "previous": last_path,
+                        "current": frame.seq,
+                        "previous": previous.seq,
                         "diff_ratio": diff_result["diff_ratio"],
                         "regions": diff_result["diff_regions"],
                     }
@@ -303,7 +316,7 @@ class ScreenMonitor:
                         _mark_fired(state, topic)
 
                     # 检测通知弹窗
-                    notifications = self.detect_notification(current_path)
+                    notifications = self.detect_notification(frame.gray)
                     if notifications:
                         notif_topic = "sensor.screen.notification"
                         if _is_cooled_down(state, notif_topic):
@@ -311,7 +324,7 @@ class ScreenMonitor:
                                 notif_topic,
                                 {
                                     "notifications": notifications,
-                                    "screenshot": str(current_path),
+                                    "frame": frame.seq,
                                 },
                                 PRIORITY_HIGH,
                                 "screen_monitor",
@@ -319,7 +332,6 @@ class ScreenMonitor:
                             _mark_fired(state, notif_topic)
 
             # 更新状态
-            state["last_screenshot_path"] = str(current_path)
             state["last_scan_time"] = time.time()
             _save_state(state)
 
@@ -335,20 +347,29 @@ class ScreenMonitor:
 
         return changes
 
-    def detect_notification(self, img_path: Path) -> list[dict]:
+    def compare(self, previous: Frame, current: Frame) -> dict:
+        """先比较低分辨率指纹，明显未变化时跳过完整 diff"""
+        result = compare_frames(previous, current, self.threshold, self.fingerprint_tolerance)
+        if result.get("reason") == "fingerprint_match":
+            self.stats["prefiltered"] += 1
+        else:
+            self.stats["full_diffs"] += 1
+        return result
+
+    def detect_notification(self, img: Union[Path, np.ndarray]) -> list[dict]:
         """检测屏幕上的通知弹窗区域（右下角/右上角）
 
         基于像素分析，不依赖 OCR
 
         Args:
-            img_path: 截图路径
+            img: 截图路径，或灰度/RGB 数组
 
         Returns:
             [{"region": (x,y,w,h), "type": "notification", "position": "bottom-right"}]
         """
         try:
-            img = Image.open(img_path).convert("RGB")
-            width, height = img.size
+            gray = _as_gray_array(img)
+            height, width = gray.shape
             notifications = []
 
             # 检测区域：右下角和右上角
@@ -362,7 +383,8 @@ class ScreenMonitor:
 
             for region_info in check_regions:
                 box = region_info["box"]
-                region = img.crop(box)
+                x0, y0, x1, y1 = box
+                region = gray[max(y0, 0):y1, max(x0, 0):x1]
 
                 # 简单的通知检测：检查区域内是否有明显的矩形边界
                 # 通过检测边缘像素的一致性
@@ -380,7 +402,7 @@ class ScreenMonitor:
         except Exception:
             return []
 
-    def _has_notification_pattern(self, region: Image.Image) -> bool:
+    def _has_notification_pattern(self, region: Union[np.ndarray, Image.Image]) -> bool:
         """检测区域是否有通知弹窗特征
 
         通知弹窗通常有：
@@ -389,15 +411,12 @@ class ScreenMonitor:
         3. 内部有文字区域（颜色变化）
         """
         try:
-            # 转灰度
-            gray = region.convert("L")
-            pixels = np.array(gray)
+            pixels = _as_gray_array(region)
 
             if pixels.size == 0:
                 return False
 
             # 计算像素标准差（通知区域通常有较高的对比度）
-            mean = np.mean(pixels)
             std_dev = np.std(pixels)
 
             # 标准差大于30表示有明显的内容变化
@@ -405,18 +424,17 @@ class ScreenMonitor:
                 return False
 
             # 检测边缘：上下左右边缘的像素一致性
-            width, height = region.size
+            height, width = pixels.shape
             if width < 50 or height < 50:
                 return False
 
             # 简单边缘检测：检查四周是否有连续的相似像素（边框）
-            edges = []
-            edges.append(np.array(gray.crop((0, 0, width, 5))))  # 上边
-            edges.append(np.array(gray.crop((0, height - 5, width, height))))  # 下边
-            edges.append(np.array(gray.crop((0, 0, 5, height))))  # 左边
-            edges.append(np.array(gray.crop((width - 5, 0, width, height))))  # 右边
-
-            edge_pixels = np.concatenate([e.flatten() for e in edges])
+            edge_pixels = np.concatenate([
+                pixels[:5, :].ravel(),    # 上边
+                pixels[-5:, :].ravel(),   # 下边
+                pixels[:, :5].ravel(),    # 左边
+                pixels[:, -5:].ravel(),   # 右边
+            ])
             edge_std = np.std(edge_pixels)
 
             # 边缘标准差小（一致性高）+ 内容标准差大 = 可能是通知
@@ -426,9 +444,14 @@ class ScreenMonitor:
             return False
 
 
+_monitors: dict = {}
+
+
 def scan_screen(interval: int = 30, threshold: float = 0.05) -> list[dict]:
-    """便捷函数：执行一次屏幕扫描"""
-    monitor = ScreenMonitor(interval, threshold)
+    """便捷函数：执行一次屏幕扫描（复用同参数的 ScreenMonitor，保留上一帧）"""
+    monitor = _monitors.get((interval, threshold))
+    if monitor is None:
+        monitor = _monitors[(interval, threshold)] = ScreenMonitor(interval, threshold)
     return monitor.scan()
 
 
@@ -444,8 +467,11 @@ if __name__ == "__main__":
         print(f"截图已保存: {path}")
 
     elif cmd == "scan":
-        # 执行一次扫描对比
-        changes = scan_screen(interval=0)  # 忽略间隔限制
+        # 连续截两帧做一次对比（上一帧只保存在内存中）
+        monitor = ScreenMonitor(interval=0)  # 忽略间隔限制
+        monitor.scan()
+        time.sleep(1)
+        changes = monitor.scan()
         if changes:
             print(f"检测到 {len(changes)} 处变化:")
             print(json.dumps(changes, ensure_ascii=False, indent=2))
@@ -0,0 +1,88 @@
+# aios/core/sensor_state.py - 感知探针共享状态
+"""
+传感器状态（冷却时间、文件 mtime、进程列表……）常驻内存，定期落盘。
+
+- load_state()  返回进程内共享的 dict（首次调用时从磁盘加载）
+- save_state()  标记已变；距上次落盘超过 PERSIST_INTERVAL 才真正写文件
+- flush_state() 立即写盘（进程退出时自动调用）
+
+core.sensors 与 core.screen_sensor 共用同一份状态；本模块不依赖 EventBus。
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+STATE_FILE = Path(__file__).resolve().parent.parent / "events" / "sensor_state.json"
+
+# 状态常驻内存，最多每 PERSIST_INTERVAL 秒写一次盘（进程退出时强制写）
+PERSIST_INTERVAL = 30
+
+
+class SensorStateStore:
+    """一个状态文件对应的内存缓存 + 节流落盘（原子写 tmp + replace）"""
+
+    def __init__(self, path: Path = STATE_FILE, interval: float = PERSIST_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self._cache: Optional[dict] = None
+        self._dirty = False
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        with self._lock:
+            if self._cache is None:
+                self._cache = {}
+                if self.path.exists():
+                    try:
+                        self._cache = json.loads(self.path.read_text(encoding="utf-8"))
+                    except Exception:
+                        pass
+            return self._cache
+
+    def save(self, state: dict, force: bool = False) -> None:
+        with self._lock:
+            self._cache = state
+            self._dirty = True
+            if not force and time.time() - self._saved_at < self.interval:
+                return
+            self._write_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._write_locked()
+
+    def _write_locked(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self._cache, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+        self._saved_at = time.time()
+
+
+_store = SensorStateStore()
+
+
+def load_state() -> dict:
+    """返回进程内共享的状态 dict（首次调用时从磁盘加载）"""
+    return _store.load()
+
+
+def save_state(state: dict, force: bool = False) -> None:
+    """标记状态已变；距上次落盘超过 PERSIST_INTERVAL 才真正写文件"""
+    _store.save(state, force)
+
+
+def flush_state() -> None:
+    """立即把内存中的状态写盘（进程退出时自动调用）"""
+    _store.flush()
+
+
+atexit.register(flush_state)
@@ -1,9 +1,9 @@
-# aios/core/sensors.py - 感知探针 v0.2
+# aios/core/sensors.py - 感知探针 v0.3
 """
 主动感知外部变化，发布事件到 EventBus。
 
 探针类型：
-- FileWatcher: 监控文件/目录变更（基于 mtime 快照对比）
+- FileWatcher: 监控文件/目录变更（watchdog 事件 / 增量 mtime 扫描）
 - ProcessMonitor: 监控关键进程状态
 - SystemHealth: CPU/内存/磁盘使用率
 
@@ -11,15 +11,23 @@
 适合在心跳中调用，不需要后台线程。
 
 v0.2: cooldown 配置，同类事件在冷却期内不重复发布。
+v0.3: 传感器状态常驻内存、定期落盘；FileWatcher 改为事件驱动
+      （watchdog，Linux 上即 inotify），不可用时退回按目录 mtime 跳过
+      未变目录的增量扫描。扫描代价与变化数成正比，而不是文件数。
 """
 
 import json, time, os, subprocess
 from pathlib import Path
-from typing import Optional
 
 from core.event_bus import get_bus, PRIORITY_NORMAL, PRIORITY_HIGH, PRIORITY_CRITICAL
-
-STATE_FILE = Path(__file__).resolve().parent.parent / "events" / "sensor_state.json"
+from core.file_watch import FileChangeTracker, _IncrementalScanner, _WatchdogBackend  # noqa: F401
+from core.sensor_state import (  # noqa: F401
+    PERSIST_INTERVAL,
+    STATE_FILE,
+    flush_state,
+    load_state as _load_state,
+    save_state as _save_state,
+)
 
 # 默认冷却时间（秒）
 DEFAULT_COOLDOWNS = {
@@ -38,22 +46,6 @@ DEFAULT_COOLDOWNS = {
 }
 
 
-def _load_state() -> dict:
-    if STATE_FILE.exists():
-        try:
-            return json.loads(STATE_FILE.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-    return {}
-
-
-def _save_state(state: dict):
-    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    STATE_FILE.write_text(
-        json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-
-
 def _is_cooled_down(state: dict, topic: str, key: str, cooldowns: dict = None) -> bool:
     """检查某个 topic+key 是否已过冷却期"""
     cd_map = cooldowns or DEFAULT_COOLDOWNS
@@ -72,47 +64,27 @@ def _mark_fired(state: dict, topic: str, key: str):
 
 
 class FileWatcher:
-    """基于 mtime 的文件变更检测"""
+    """文件变更检测（变化来源见 core.file_watch.FileChangeTracker）
+
+    backend:
+      "auto"     — 有 watchdog 就用事件驱动，否则退回增量扫描
+      "watchdog" — 强制 watchdog
+      "scan"     — 增量 mtime 扫描
+    事件驱动模式下首次 scan 做一次完整扫描，与持久化的 mtime 对账
+    （捕获进程不在时发生的变化），之后只处理累积的事件。
+    """
 
-    def __init__(self, watch_paths: list[str], extensions: list[str] = None):
-        self.watch_paths = [Path(p) for p in watch_paths]
-        self.extensions = set(extensions or [".py", ".json", ".jsonl", ".md"])
+    def __init__(self, watch_paths: list[str], extensions: list[str] = None,
+                 backend: str = "auto", full_scan_every: int = 10):
+        self._tracker = FileChangeTracker(watch_paths, extensions, backend, full_scan_every)
+        self.watch_paths = self._tracker.watch_paths
+        self.extensions = self._tracker.extensions
+        self.backend = self._tracker.backend
 
     def scan(self) -> list[dict]:
         state = _load_state()
-        file_state = state.get("file_mtimes", {})
-        changes = []
-
-        current = {}
-        for wp in self.watch_paths:
-            if not wp.exists():
-                continue
-            targets = [wp] if wp.is_file() else wp.rglob("*")
-            for f in targets:
-                if not f.is_file():
-                    continue
-                if f.suffix not in self.extensions:
-                    continue
-                key = str(f)
-                mtime = f.stat().st_mtime
-                current[key] = mtime
-
-                old_mtime = file_state.get(key)
-                if old_mtime is None:
-                    changes.append({"type": "created", "path": key})
-                elif mtime > old_mtime:
-                    changes.append({"type": "modified", "path": key})
-
-        # 检测删除
-        for key in file_state:
-            if key not in current:
-                # 只报告 watch_paths 下的删除
-                for wp in self.watch_paths:
-                    if key.startswith(str(wp)):
-                        changes.append({"type": "deleted", "path": key})
-                        break
-
-        state["file_mtimes"] = current
+        known = state.setdefault("file_mtimes", {})
+        changes = self._tracker.poll(known)
 
         bus = get_bus()
         emitted = []
@@ -123,9 +95,25 @@ class FileWatcher:
                 _mark_fired(state, topic, c["path"])
                 emitted.append(c)
 
-        _save_state(state)
+        if changes:
+            _save_state(state)
         return emitted
 
+    def stop(self):
+        self._tracker.stop()
+
+
+_file_watchers: dict = {}
+
+
+def get_file_watcher(watch_paths: list[str], extensions: list[str] = None) -> FileWatcher:
+    """复用同一组路径的 FileWatcher（保留 watchdog 观察者和目录缓存）"""
+    key = (tuple(str(p) for p in watch_paths), tuple(sorted(extensions or [])))
+    fw = _file_watchers.get(key)
+    if fw is None:
+        fw = _file_watchers[key] = FileWatcher(watch_paths, extensions)
+    return fw
+
 
 class ProcessMonitor:
     """关键进程存活检测"""
@@ -327,7 +315,7 @@ def scan_all(
     """
     results = {}
 
-    fw = FileWatcher(
+    fw = get_file_watcher(
         watch_paths
         or [
             str(Path(__file__).resolve().parent.parent),  # aios/
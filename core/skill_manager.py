@@ -7,27 +7,36 @@ import subprocess
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 
+try:
+    from core.capability_index import CapabilityIndex, get_capability_index
+except ImportError:
+    from capability_index import CapabilityIndex, get_capability_index
+
 
 class SkillManager:
     """Skill 管理器"""
     
-    def __init__(self, skills_dir: Path = None):
+    def __init__(self, skills_dir: Path = None, index: Optional[CapabilityIndex] = None):
         """
         初始化
         
         Args:
             skills_dir: skill 目录
+            index: 能力索引，默认与工具 / 插件共用全局实例（本实例使用独立作用域）
         """
         if skills_dir is None:
             workspace = Path(__file__).parent.parent.parent
             skills_dir = workspace / "skills"
         
         self.skills_dir = Path(skills_dir)
-        self.skills = self._discover_skills()
+        self.index = index if index is not None else get_capability_index()
+        self._scope = self.index.new_scope("skills")
+        self.skills: Dict[str, Dict] = {}
+        self.rescan()
     
     def _discover_skills(self) -> Dict[str, Dict]:
         """
-        发现所有可用的 skill
+        发现所有可用的 skill（SKILL.md 未修改的沿用上次解析结果）
         
         Returns:
             {skill_name: {path, description, ...}}
@@ -42,7 +51,14 @@ class SkillManager:
                 continue
             
             skill_md = skill_dir / "SKILL.md"
-            if not skill_md.exists():
+            try:
+                mtime = skill_md.stat().st_mtime
+            except OSError:
+                continue
+            
+            previous = self.skills.get(skill_dir.name)
+            if previous and previous.get("mtime") == mtime:
+                skills[skill_dir.name] = previous
                 continue
             
             # 读取 SKILL.md 获取描述
@@ -51,11 +67,37 @@ class SkillManager:
             skills[skill_dir.name] = {
                 "path": str(skill_dir),
                 "description": description,
-                "skill_md": str(skill_md)
+                "skill_md": str(skill_md),
+                "mtime": mtime
             }
         
         return skills
     
+    def rescan(self) -> Dict[str, int]:
+        """
+        重新扫描 skill 目录，只更新新增 / 修改 / 删除的 skill 的索引
+        
+        Returns:
+            {"added": n, "updated": n, "removed": n}
+        """
+        old = self.skills
+        new = self._discover_skills()
+        changes = {"added": 0, "updated": 0, "removed": 0}
+        
+        for name, info in new.items():
+            if old.get(name) is info:
+                continue
+            changes["updated" if name in old else "added"] += 1
+            self.index.upsert(f"skill:{name}", f"{name} {info['description']}", kind="skill",
+                              scope=self._scope)
+        
+        for name in old.keys() - new.keys():
+            changes["removed"] += 1
+            self.index.remove(f"skill:{name}", scope=self._scope)
+        
+        self.skills = new
+        return changes
+    
     def _extract_description(self, skill_md: Path) -> str:
         """从 SKILL.md 提取描述"""
         try:
@@ -152,7 +194,7 @@ class SkillManager:
                 cwd=str(skill_path)
             )
             
-            return {
+            outcome = {
                 "success": result.returncode == 0,
                 "stdout": result.stdout,
                 "stderr": result.stderr,
@@ -160,16 +202,20 @@ class SkillManager:
             }
         
         except subprocess.TimeoutExpired:
-            return {
+            outcome = {
                 "success": False,
                 "error": "Skill execution timeout (30s)"
             }
         
         except Exception as e:
-            return {
+            outcome = {
                 "success": False,
                 "error": str(e)
             }
+        
+        # 成功率作为检索先验
+        self.index.record_outcome(f"skill:{skill_name}", outcome["success"], scope=self._scope)
+        return outcome
     
     def _find_executable(self, skill_path: Path) -> Optional[Path]:
         """
@@ -201,28 +247,50 @@ class SkillManager:
         
         return None
     
-    def search_skills(self, query: str) -> List[Dict]:
+    def search_skills(self, query: str, limit: int = 20) -> List[Dict]:
         """
-        搜索 skill
+        搜索 skill：先按词匹配（BM25 相关度从高到低），不足 limit 条时
+        再补上名称 / 描述里包含 query 子串的 skill（score 为 0，兼容 "sear" 这类半个词）
         
         Args:
             query: 搜索关键词
+            limit: 最多返回条数，0 表示不限
         
         Returns:
             匹配的 skill 列表
         """
-        query_lower = query.lower()
         results = []
+        seen = set()
         
+        for hit in self.index.search(query, kind="skill", limit=0, scope=self._scope):
+            name = hit.doc_id[len("skill:"):]
+            info = self.skills.get(name)
+            if info is None:
+                continue
+            seen.add(name)
+            results.append({
+                "name": name,
+                "description": info["description"],
+                "score": round(hit.score, 3)
+            })
+            if limit and len(results) >= limit:
+                return results
+        
+        query_lower = query.lower()
         for name, info in self.skills.items():
+            if name in seen:
+                continue
             if query_lower in name.lower() or query_lower in info["description"].lower():
-                results.append({
-                    "name": name,
-                    "description": info["description"]
-                })
+                results.append({"name": name, "description": info["description"], "score": 0.0})
+                if limit and len(results) >= limit:
+                    break
         
         return results
     
+    def close(self):
+        """释放在共享能力索引里的作用域（实例不再使用时调用）"""
+        self.index.release_scope(self._scope)
+    
     def get_skill_usage(self, skill_name: str) -> str:
         """
         获取 skill 使用说明
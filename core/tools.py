@@ -17,6 +17,11 @@ from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+try:
+    from core.capability_index import CapabilityIndex, get_capability_index
+except ImportError:
+    from capability_index import CapabilityIndex, get_capability_index
+
 
 @dataclass
 class ToolResult:
@@ -105,10 +110,14 @@ class Tool:
 class ToolManager:
     """工具管理器"""
     
-    def __init__(self, workspace: Optional[Path] = None):
+    def __init__(self, workspace: Optional[Path] = None, index: Optional[CapabilityIndex] = None):
         self.workspace = workspace or Path.cwd()
         self.tools: Dict[str, Tool] = {}
         self.tool_history: List[Dict] = []
+        # 能力索引（默认与 skill / 插件共用全局实例），select 只查倒排表；
+        # 本实例的工具放在独立作用域里，不会和其他 ToolManager 的同名工具互相覆盖
+        self.index = index if index is not None else get_capability_index()
+        self._scope = self.index.new_scope("tools")
         
         # 注册默认工具
         self._register_default_tools()
@@ -158,29 +167,39 @@ class ToolManager:
     def register(self, tool: Tool):
         """注册工具"""
         self.tools[tool.name] = tool
+        self.index.upsert(
+            f"tool:{tool.name}",
+            f"{tool.name} {tool.description}",
+            keywords=tool.keywords,
+            kind="tool",
+            scope=self._scope,
+        )
+        self.index.set_outcomes(f"tool:{tool.name}", tool.success_count, tool.usage_count,
+                                scope=self._scope)
         print(f"✅ 注册工具: {tool.name}")
     
+    def unregister(self, name: str) -> bool:
+        """注销工具"""
+        if self.tools.pop(name, None) is None:
+            return False
+        self.index.remove(f"tool:{name}", scope=self._scope)
+        return True
+    
+    def close(self):
+        """释放在共享能力索引里的作用域（实例不再使用时调用）"""
+        self.index.release_scope(self._scope)
+    
     def select(self, task: str) -> Optional[Tool]:
-        """根据任务自动选择工具"""
-        # 1. 找出所有匹配的工具及其匹配分数
-        matched_tools = []
-        for tool in self.tools.values():
-            if tool.matches(task):
-                # 计算匹配分数（匹配的关键词数量）
-                score = sum(1 for kw in tool.keywords if kw.lower() in task.lower())
-                matched_tools.append((tool, score))
-        
-        # 2. 如果没有匹配，返回 None
-        if not matched_tools:
-            return None
-        
-        # 3. 按匹配分数排序（分数高的优先，分数相同则按成功率）
-        matched_tools.sort(
-            key=lambda x: (x[1], x[0].success_count / max(x[0].usage_count, 1)),
-            reverse=True
-        )
-        
-        return matched_tools[0][0]
+        """
+        根据任务自动选择工具
+
+        至少命中一个关键词（关键词是任务的子串）才算匹配；命中关键词多的优先，
+        其次按 BM25 分数（已折算成功率先验）。
+        """
+        for hit in self.index.search(task, kind="tool", limit=1, require_keyword=True,
+                                     scope=self._scope):
+            return self.tools.get(hit.doc_id[len("tool:"):])
+        return None
     
     def execute(self, tool_name: str, **params) -> ToolResult:
         """执行工具"""
@@ -196,6 +215,8 @@ class ToolManager:
         
         # 执行工具
         result = tool.execute(**params)
+        self.index.set_outcomes(f"tool:{tool_name}", tool.success_count, tool.usage_count,
+                                scope=self._scope)
         
         # 记录历史
         self.tool_history.append({
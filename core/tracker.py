@@ -4,10 +4,11 @@
 
 功能：
 1. 任务状态机：TODO → IN_PROGRESS → BLOCKED → DONE
-2. JSONL 存储（aios/data/tasks.jsonl）
+2. JSONL 追加日志存储（aios/data/tasks.jsonl）+ 内存索引（状态 / 优先级 / 截止时间）
 3. 任务字段：id, title, status, priority, created_at, updated_at, deadline, depends_on, progress_pct, notes, tags
 4. API：add_task, update_task, list_tasks, get_overdue, get_blocked
-5. 心跳集成：check_deadlines() 返回即将到期和已过期的任务
+5. 心跳集成：check_deadlines() 返回即将到期和已过期的任务；
+   TaskStore.watch_deadlines() 在任务即将到期 / 过期时主动回调
 
 CLI:
     python -m aios.core.tracker list                    # 列出所有任务
@@ -19,10 +20,35 @@ CLI:
 """
 
 import sys, json, time, uuid
+import bisect
+import heapq
+import itertools
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List, Set, Tuple
 from datetime import datetime, timedelta
 
+# 跨平台文件锁（阻塞等待）
+try:
+    import msvcrt
+    def _lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    def _unlock_file(f):
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        except Exception:
+            pass
+except ImportError:
+    import fcntl
+    def _lock_file(f):
+        fcntl.flock(f, fcntl.LOCK_EX)
+    def _unlock_file(f):
+        fcntl.flock(f, fcntl.LOCK_UN)
+
 # 添加 aios 到 sys.path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
@@ -141,67 +167,410 @@ class Task:
 # ── 任务存储 ──
 
 
-class TaskStore:
-    """任务存储（JSONL）"""
+def _deadline_ts(task: Task) -> Optional[float]:
+    """未完成且截止时间可解析的任务返回截止 epoch，否则 None"""
+    if not task.deadline or task.status == STATUS_DONE:
+        return None
+    try:
+        return datetime.fromisoformat(task.deadline).timestamp()
+    except Exception:
+        return None
+
+
+def _snapshot(task: Task) -> Task:
+    """返回给调用方的副本（调用方修改它不会破坏索引）"""
+    return Task.from_dict(task.to_dict())
 
-    def __init__(self, file_path: Path = TASKS_FILE):
+
+class TaskStore:
+    """
+    任务存储：JSONL 追加日志 + 内存索引。
+
+    - tasks.jsonl 每行一条任务的完整记录，后写覆盖先写；删除写 {"id", "_deleted": true}。
+      旧格式（每个任务一行）可直接读取
+    - 启动时回放一次，之后只增量读取文件尾部（CLI 等其他进程的追加在下次操作时读入）；
+      文件被截断或替换（压缩）时整体重读
+    - 内存中维护 id、状态、优先级索引，以及按截止时间排序的未完成任务列表，
+      get / update / delete 和过期、阻塞查询都不再全量加载和过滤
+    - 日志中的过期记录多于存活任务（且超过 COMPACT_MIN）时在后台线程压缩：锁内只拷贝任务列表，
+      序列化和写临时文件在锁外；替换前补上期间新追加的尾部。追加和替换都持有
+      tasks.jsonl.lock 文件锁，其他进程（CLI）的追加不会被覆盖
+    - watch_deadlines() 用最小堆按截止时间排序，后台线程睡到下一个到点时刻再通知，不轮询
+    """
+
+    COMPACT_MIN = 1000
+
+    def __init__(self, file_path: Path = TASKS_FILE, background: bool = True):
         self.file_path = file_path
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.background = background  # False 时在写路径上同步压缩（测试用）
+        self._lock = threading.RLock()
+        self._lock_path = self.file_path.with_suffix(".lock")
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+        # 到期通知：堆条目 (触发时刻, seq, 事件, id, 截止 epoch, 监听序号)
+        self._watchers: List[Tuple[Callable[[str, Task], None], float]] = []
+        self._heap: List[tuple] = []
+        self._heap_seq = itertools.count()
+        self._notified: Set[tuple] = set()  # 已触发的 (事件, id, 截止 epoch, 监听序号)
+        self._wakeup = threading.Condition(self._lock)
+        self._watch_thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._reset()
+        self._sync()
+
+    def _reset(self):
+        self._tasks: Dict[str, Task] = {}
+        self._order: Dict[str, int] = {}  # 创建顺序，列表按它输出
+        self._order_seq = itertools.count()
+        self._by_status: Dict[str, Set[str]] = {s: set() for s in VALID_STATUSES}
+        self._by_priority: Dict[str, Set[str]] = {p: set() for p in VALID_PRIORITIES}
+        self._due: List[Tuple[float, str]] = []  # (截止 epoch, id)，有序
+        self._due_of: Dict[str, float] = {}
+        self._heap = []  # 重新回放时按索引重新排程（已触发的由 _notified 去重）
+        self._inode = None
+        self._offset = 0
+        self._records = 0  # 日志中的行数（含已被覆盖的）
+
+    # ── 索引维护 ──
+
+    def _unindex(self, task: Task):
+        self._by_status.setdefault(task.status, set()).discard(task.id)
+        self._by_priority.setdefault(task.priority, set()).discard(task.id)
+        ts = self._due_of.pop(task.id, None)
+        if ts is not None:
+            i = bisect.bisect_left(self._due, (ts, task.id))
+            del self._due[i]
+
+    def _index(self, task: Task):
+        self._by_status.setdefault(task.status, set()).add(task.id)
+        self._by_priority.setdefault(task.priority, set()).add(task.id)
+        ts = _deadline_ts(task)
+        if ts is not None:
+            self._due_of[task.id] = ts
+            bisect.insort(self._due, (ts, task.id))
+            self._schedule(task.id, ts)
+
+    def _apply(self, data: dict):
+        """应用一条日志记录"""
+        task_id = data.get("id")
+        old = self._tasks.get(task_id)
+        if old is not None:
+            self._unindex(old)
+        if data.get("_deleted"):
+            if old is not None:
+                del self._tasks[task_id]
+                del self._order[task_id]
+            return
+        task = Task.from_dict(data)
+        self._tasks[task.id] = task
+        if old is None:
+            self._order[task.id] = next(self._order_seq)
+        self._index(task)
+
+    # ── 日志 ──
+
+    def _sync(self):
+        """读入日志新追加的部分"""
+        with self._lock:
+            try:
+                st = self.file_path.stat()
+            except OSError:
+                if self._inode is not None:
+                    self._reset()
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset()
+                self._inode = st.st_ino
+            if st.st_size == self._offset:
+                return
+            with open(self.file_path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+            end = chunk.rfind(b"\n") + 1  # 只处理完整的行
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    self._apply(json.loads(line))
+                    self._records += 1
+                except Exception:
+                    continue
+            self._offset += end
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程互斥：追加和替换日志文件时持有"""
+        with open(self._lock_path, "a+b") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+    def _append(self, record: dict):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._file_lock(), self.file_path.open("ab") as f:
+            start = f.tell()
+            f.write(data)
+            f.flush()
+            end = f.tell()
+            inode = os.fstat(f.fileno()).st_ino
+        if start == self._offset and end == start + len(data) and inode == self._inode:
+            # 期间没有别的进程追加：直接前移偏移；否则留给下次 _sync 读入（重放幂等）
+            self._offset = end
+            self._records += 1
+        if self._records - len(self._tasks) > max(self.COMPACT_MIN, len(self._tasks)):
+            self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        if not self.background:
+            self.compact()
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="tracker-compact", daemon=True)
+        self._compactor.start()
+
+    def compact(self) -> bool:
+        """
+        按创建顺序把存活任务重写到日志（已有压缩在进行时直接返回 False）。
+        Task 对象只整体替换、不原地修改，所以拷贝列表后可以在锁外序列化。
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                self._sync()
+                tasks = [self._tasks[i] for i in self._order]
+                inode, offset = self._inode, self._offset
+            data = "".join(json.dumps(t.to_dict(), ensure_ascii=False) + "\n" for t in tasks)
+            data = data.encode("utf-8")
+            # 临时文件名按进程 / 实例区分，多个进程同时压缩时互不覆盖
+            tmp = self.file_path.with_suffix(f".compact-{os.getpid()}-{id(self):x}.tmp")
+            tmp.write_bytes(data)
+            with self._lock, self._file_lock():
+                self._sync()
+                if self._inode != inode or self._offset < offset:
+                    tmp.unlink()  # 期间被别的进程重写过，放弃这次压缩
+                    return False
+                # 拷贝期间追加的记录接在压缩结果后面（重放幂等，后写覆盖先写）
+                with open(self.file_path, "rb") as f:
+                    f.seek(offset)
+                    tail = f.read(self._offset - offset)
+                with open(tmp, "ab") as f:
+                    f.write(tail)
+                os.replace(tmp, self.file_path)
+                self._inode = self.file_path.stat().st_ino
+                self._offset = len(data) + len(tail)
+                self._records = len(tasks) + tail.count(b"\n")
+                return True
+        finally:
+            self._compact_lock.release()
+
+    def _rewrite(self):
+        """按创建顺序把内存中的任务原子重写到日志（save_all 用，整体替换）"""
+        tasks = [self._tasks[i] for i in self._order]
+        tmp = self.file_path.with_suffix(".tmp")
+        lines = [json.dumps(t.to_dict(), ensure_ascii=False) for t in tasks]
+        tmp.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+        with self._file_lock():
+            os.replace(tmp, self.file_path)
+            st = self.file_path.stat()
+        self._inode, self._offset, self._records = st.st_ino, st.st_size, len(tasks)
+
+    # ── 读写 ──
 
     def load_all(self) -> List[Task]:
         """加载所有任务"""
-        if not self.file_path.exists():
-            return []
-
-        tasks = []
-        for line in self.file_path.read_text(encoding="utf-8").splitlines():
-            if not line.strip():
-                continue
-            try:
-                data = json.loads(line)
-                tasks.append(Task.from_dict(data))
-            except Exception:
-                continue
-        return tasks
+        with self._lock:
+            self._sync()
+            return [_snapshot(self._tasks[i]) for i in self._order]
 
     def save_all(self, tasks: List[Task]):
         """保存所有任务"""
-        lines = [json.dumps(t.to_dict(), ensure_ascii=False) for t in tasks]
-        self.file_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        with self._lock:
+            self._reset()
+            for task in tasks:
+                self._apply(task.to_dict())
+            self._rewrite()
+            self._wakeup.notify_all()
 
     def add(self, task: Task):
         """添加任务"""
-        tasks = self.load_all()
-        tasks.append(task)
-        self.save_all(tasks)
+        with self._lock:
+            self._sync()
+            record = task.to_dict()
+            self._apply(record)
+            self._append(record)
 
     def update(self, task_id: str, **kwargs) -> Optional[Task]:
         """更新任务"""
-        tasks = self.load_all()
-        for task in tasks:
-            if task.id == task_id:
-                task.update(**kwargs)
-                self.save_all(tasks)
-                return task
-        return None
+        with self._lock:
+            self._sync()
+            current = self._tasks.get(task_id)
+            if current is None:
+                return None
+            task = _snapshot(current)
+            task.update(**kwargs)
+            record = task.to_dict()
+            self._apply(record)
+            self._append(record)
+            return task
 
     def get(self, task_id: str) -> Optional[Task]:
         """获取任务"""
-        tasks = self.load_all()
-        for task in tasks:
-            if task.id == task_id:
-                return task
-        return None
+        with self._lock:
+            self._sync()
+            task = self._tasks.get(task_id)
+            return _snapshot(task) if task is not None else None
 
     def delete(self, task_id: str) -> bool:
         """删除任务"""
-        tasks = self.load_all()
-        original_len = len(tasks)
-        tasks = [t for t in tasks if t.id != task_id]
-        if len(tasks) < original_len:
-            self.save_all(tasks)
+        with self._lock:
+            self._sync()
+            if task_id not in self._tasks:
+                return False
+            record = {"id": task_id, "_deleted": True}
+            self._apply(record)
+            self._append(record)
             return True
-        return False
+
+    # ── 查询 ──
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+    ) -> List[Task]:
+        """按状态 / 优先级（索引求交）和标签过滤，按创建顺序返回"""
+        with self._lock:
+            self._sync()
+            ids = None  # None 表示不过滤：直接按创建顺序，无需排序
+            if status:
+                ids = self._by_status.get(status, set())
+            if priority:
+                by_priority = self._by_priority.get(priority, set())
+                ids = by_priority if ids is None else ids & by_priority
+            ordered = ids is None
+            tasks = [self._tasks[i] for i in (self._order if ordered else ids)]
+            if tags:
+                tasks = [t for t in tasks if any(tag in t.tags for tag in tags)]
+            if not ordered:
+                tasks.sort(key=lambda t: self._order[t.id])
+            return [_snapshot(t) for t in tasks]
+
+    def due_between(self, start: float, end: float) -> List[Task]:
+        """截止时间在 (start, end) 内的未完成任务，按截止时间排序"""
+        with self._lock:
+            self._sync()
+            lo = bisect.bisect_right(self._due, (start, "\uffff"))
+            hi = bisect.bisect_left(self._due, (end, ""))
+            return [_snapshot(self._tasks[i]) for _, i in self._due[lo:hi]]
+
+    def overdue(self, now: Optional[float] = None) -> List[Task]:
+        """已过截止时间的未完成任务，按截止时间排序"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._sync()
+            hi = bisect.bisect_left(self._due, (now, ""))
+            return [_snapshot(self._tasks[i]) for _, i in self._due[:hi]]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._tasks)
+
+    # ── 到期通知 ──
+
+    def watch_deadlines(self, callback: Callable[[str, Task], None], hours: float = 24):
+        """
+        注册到期通知：任务进入截止前 hours 小时窗口时回调 ("due_soon", task)，
+        到达截止时间时回调 ("overdue", task)。注册时已过期的任务不通知（用 check_deadlines 查）。
+        """
+        with self._lock:
+            self._sync()
+            self._watchers.append((callback, hours * 3600))
+            widx = len(self._watchers) - 1
+            for task_id, ts in self._due_of.items():
+                self._schedule(task_id, ts, [widx])
+            if self._watch_thread is None:
+                self._watch_thread = threading.Thread(
+                    target=self._watch_loop, name="tracker-deadlines", daemon=True
+                )
+                self._watch_thread.start()
+            self._wakeup.notify_all()
+
+    def _schedule(self, task_id: str, ts: float, watchers: Optional[List[int]] = None):
+        if not self._watchers:
+            return
+        now = time.time()
+        if ts <= now:
+            return
+        head = self._heap[0] if self._heap else None
+        for widx in range(len(self._watchers)) if watchers is None else watchers:
+            lead = self._watchers[widx][1]
+            for fire_at, event in ((max(now, ts - lead), "due_soon"), (ts, "overdue")):
+                if (event, task_id, ts, widx) not in self._notified:
+                    heapq.heappush(self._heap, (fire_at, next(self._heap_seq), event, task_id, ts, widx))
+        if len(self._heap) > 4 * len(self._watchers) * (len(self._due_of) + 16):
+            # 失效条目（截止时间改过 / 已完成 / 已删除）过多时重建
+            self._heap = [e for e in self._heap if self._due_of.get(e[3]) == e[4]]
+            heapq.heapify(self._heap)
+            self._notified = {k for k in self._notified if self._due_of.get(k[1]) == k[2]}
+        if self._heap and self._heap[0] is not head:
+            self._wakeup.notify_all()
+
+    def _watch_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    self._sync()
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._wakeup.wait(self._heap[0][0] - now if self._heap else None)
+                if self._closed:
+                    return
+                _, _, event, task_id, ts, widx = heapq.heappop(self._heap)
+                # 惰性失效：截止时间变了、已完成或已删除的任务跳过
+                key = (event, task_id, ts, widx)
+                if self._due_of.get(task_id) != ts or key in self._notified:
+                    continue
+                self._notified.add(key)
+                task = _snapshot(self._tasks[task_id])
+                callback = self._watchers[widx][0]
+            try:
+                callback(event, task)
+            except Exception as e:
+                print(f"[TaskStore] deadline callback failed: {e}")
+
+    def close(self):
+        """停止到期通知线程，等待进行中的压缩结束"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+            threads = (self._watch_thread, self._compactor)
+        for thread in threads:
+            if thread is not None:
+                thread.join(timeout=5)
+
+
+_stores: Dict[Path, TaskStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(file_path: Optional[Path] = None) -> TaskStore:
+    """进程内共享的 TaskStore（同一文件只回放一次）"""
+    path = Path(file_path or TASKS_FILE)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = TaskStore(path)
+        return store
 
 
 # ── API ──
@@ -217,15 +586,13 @@ def add_task(
 ) -> Task:
     """添加任务"""
     task = Task(title, priority, deadline, tags, notes, depends_on)
-    store = TaskStore()
-    store.add(task)
+    get_store().add(task)
     return task
 
 
 def update_task(task_id: str, **kwargs) -> Optional[Task]:
     """更新任务"""
-    store = TaskStore()
-    return store.update(task_id, **kwargs)
+    return get_store().update(task_id, **kwargs)
 
 
 def list_tasks(
@@ -234,41 +601,26 @@ def list_tasks(
     tags: Optional[List[str]] = None,
 ) -> List[Task]:
     """列出任务"""
-    store = TaskStore()
-    tasks = store.load_all()
-
-    # 过滤
-    if status:
-        tasks = [t for t in tasks if t.status == status]
-    if priority:
-        tasks = [t for t in tasks if t.priority == priority]
-    if tags:
-        tasks = [t for t in tasks if any(tag in t.tags for tag in tags)]
-
-    return tasks
+    return get_store().query(status=status, priority=priority, tags=tags)
 
 
 def get_overdue() -> List[Task]:
     """获取过期任务"""
-    store = TaskStore()
-    tasks = store.load_all()
-    return [t for t in tasks if t.is_overdue()]
+    return get_store().overdue()
 
 
 def get_blocked() -> List[Task]:
     """获取阻塞任务"""
-    store = TaskStore()
-    tasks = store.load_all()
-    return [t for t in tasks if t.status == STATUS_BLOCKED]
+    return get_store().query(status=STATUS_BLOCKED)
 
 
 def check_deadlines(hours: int = 24) -> dict:
     """心跳集成：检查即将到期和已过期的任务"""
-    store = TaskStore()
-    tasks = store.load_all()
+    store = get_store()
+    now = time.time()
 
-    overdue = [t for t in tasks if t.is_overdue()]
-    due_soon = [t for t in tasks if t.is_due_soon(hours)]
+    overdue = store.overdue(now)
+    due_soon = store.due_between(now, now + hours * 3600)
 
     return {
         "overdue": [t.to_dict() for t in overdue],
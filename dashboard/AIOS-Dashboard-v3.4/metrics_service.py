@@ -0,0 +1,612 @@
+"""
+AIOS Dashboard v3.4 指标物化服务
+
+/api/metrics 不再在每个请求里重新读文件、重新统计：
+1. EventAggregates：tail events.jsonl，增量维护错误 Top、慢操作、成功率、今日改进、日志
+2. Panel：每个面板独立 TTL，过期后先返回旧值并在后台刷新（stale-while-revalidate）
+3. CpuSampler：后台线程采样 CPU/内存/磁盘，请求路径只读最新值（不再阻塞 100ms）
+4. MetricsService.render()：组合快照只在某个面板版本变化时重新序列化，附带 ETag
+
+请求路径只做字典查找 + 字节拷贝，与在线人数无关。
+"""
+import hashlib
+import heapq
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+
+DASHBOARD_ROOT = Path(__file__).parent
+AIOS_ROOT = DASHBOARD_ROOT.parent.parent
+WORKSPACE_ROOT = AIOS_ROOT.parent
+
+sys.path.insert(0, str(AIOS_ROOT))
+from dashboard.dashboard_server import TailReader
+
+# 面板 -> (TTL 秒, 最长可返回旧值的秒数)
+PANEL_TTLS = {
+    "events": (1.0, 30.0),
+    "agents": (5.0, 60.0),
+    "resources": (2.0, 30.0),
+    "trends": (30.0, 300.0),
+    "evolution": (30.0, 300.0),
+}
+
+EVENT_WINDOW = 1000     # 与原实现一致：统计最近 1000 条事件
+SLOW_THRESHOLD_MS = 500
+LOG_WINDOW = 50
+TOP_N = 5
+TREND_POINTS = 12
+
+
+# ---------------------------------------------------------------------------
+# 事件流增量聚合
+# ---------------------------------------------------------------------------
+
+class EventAggregates:
+    """events.jsonl 最近 N 条事件的滑动聚合
+
+    每条新事件 O(1) 入窗、最旧事件 O(1) 出窗；Top 错误用 Counter，
+    慢操作只保留窗口内超过阈值的那部分（通常很少），取 Top 时再排序。
+    """
+
+    def __init__(self, path, window=EVENT_WINDOW):
+        self.tail = TailReader(path)
+        self.window = window
+        self._seq = 0
+        self._entries = deque()          # (seq, error_msg, outcome)
+        self._errors = Counter()
+        self._slow = deque()             # (seq, operation, duration)
+        self._task_total = 0
+        self._task_success = 0
+        self._logs = deque(maxlen=LOG_WINDOW)
+        self._improvements_day = time.strftime('%Y-%m-%d')
+        self._improvements = 0
+
+    def update(self):
+        """读取新增事件，返回本次处理的条数"""
+        lines = self.tail.read_new_lines()
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict):
+                self._add(event)
+        return len(lines)
+
+    def _add(self, event):
+        self._seq += 1
+        seq = self._seq
+
+        error_msg = None
+        if event.get('level') == 'error':
+            error_msg = event.get('message', 'Unknown error')
+            if len(error_msg) > 50:
+                error_msg = error_msg[:50] + '...'
+            self._errors[error_msg] += 1
+
+        duration = event.get('duration_ms', 0)
+        if isinstance(duration, (int, float)) and duration > SLOW_THRESHOLD_MS:
+            self._slow.append((seq, event.get('operation', 'Unknown'), int(duration)))
+
+        outcome = None
+        if event.get('type') in ('task_complete', 'task_failed'):
+            outcome = event['type'] == 'task_complete'
+            self._task_total += 1
+            self._task_success += outcome
+
+        timestamp = event.get('timestamp', 0)
+        if event.get('type') == 'improvement_applied':
+            today = time.strftime('%Y-%m-%d')
+            self._roll_day(today)
+            if isinstance(timestamp, (int, float)) and \
+                    time.strftime('%Y-%m-%d', time.localtime(timestamp)) == today:
+                self._improvements += 1
+
+        if not isinstance(timestamp, (int, float)):
+            timestamp = time.time()
+        self._logs.append({
+            'time': time.strftime('%H:%M:%S', time.localtime(timestamp)),
+            'level': event.get('level', 'info'),
+            'message': event.get('message', '')
+        })
+
+        self._entries.append((seq, error_msg, outcome))
+        if len(self._entries) > self.window:
+            self._evict()
+
+    def _evict(self):
+        seq, error_msg, outcome = self._entries.popleft()
+        if error_msg is not None:
+            self._errors[error_msg] -= 1
+            if self._errors[error_msg] <= 0:
+                del self._errors[error_msg]
+        if outcome is not None:
+            self._task_total -= 1
+            self._task_success -= outcome
+        while self._slow and self._slow[0][0] <= seq:
+            self._slow.popleft()
+
+    def _roll_day(self, today):
+        if today != self._improvements_day:
+            self._improvements_day = today
+            self._improvements = 0
+
+    # ── 读取 ──────────────────────────────────────────────
+
+    def top_errors(self, n=TOP_N):
+        return [{'error': err, 'count': cnt} for err, cnt in self._errors.most_common(n)]
+
+    def slow_operations(self, n=TOP_N):
+        top = heapq.nlargest(n, self._slow, key=lambda s: s[2])
+        return [{'operation': op, 'duration': d} for _, op, d in top]
+
+    def success_rate(self):
+        """窗口内 task_complete / (task_complete + task_failed)，无数据返回 None"""
+        if not self._task_total:
+            return None
+        return round(self._task_success / self._task_total * 100, 1)
+
+    def improvements_today(self):
+        self._roll_day(time.strftime('%Y-%m-%d'))
+        return self._improvements
+
+    def logs(self):
+        return list(self._logs)
+
+    def snapshot(self):
+        return {
+            'top_errors': self.top_errors(),
+            'slow_ops': self.slow_operations(),
+            'event_success_rate': self.success_rate(),
+            'improvements_today': self.improvements_today(),
+            'logs': self.logs(),
+        }
+
+
+# ---------------------------------------------------------------------------
+# 非阻塞资源采样
+# ---------------------------------------------------------------------------
+
+class CpuSampler:
+    """后台线程定期采样 CPU/内存/磁盘，读取方永远不阻塞
+
+    psutil.cpu_percent(interval=None) 返回距上次调用的平均值，
+    由采样线程按固定间隔调用，等价于 interval=采样间隔 的阻塞测量。
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._value = {'cpu': 0, 'mem': 0, 'disk': 0, 'gpu': 0}
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._psutil = psutil
+            psutil.cpu_percent(interval=None)  # 建立基线，首个值才有意义
+        except ImportError:
+            self._psutil = None
+
+    def start(self):
+        if self._psutil is None or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="dashboard-cpu")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        if self._psutil is None:
+            return self._value
+        psutil = self._psutil
+        try:
+            self._value = {
+                'cpu': round(psutil.cpu_percent(interval=None), 1),
+                'mem': round(psutil.virtual_memory().percent, 1),
+                'disk': round(psutil.disk_usage('C:\\' if sys.platform == 'win32' else '/').percent, 1),
+                'gpu': 0,  # GPU 需要额外库
+            }
+        except Exception as e:
+            print(f"[WARN] 资源采样失败: {e}")
+        return self._value
+
+    def get(self):
+        return self._value  # 整体替换的 dict，读取无需加锁
+
+
+# ---------------------------------------------------------------------------
+# 面板缓存
+# ---------------------------------------------------------------------------
+
+class Panel:
+    """单个面板的物化结果：TTL + stale-while-revalidate + 单飞刷新
+
+    - 未过期：直接返回
+    - 过期但未超过 max_stale：返回旧值，后台线程刷新（同一时刻最多一个）
+    - 没有值或过旧：当前请求同步计算（其他并发请求等同一把锁）
+    """
+
+    def __init__(self, name, compute, ttl, max_stale, clock=time.monotonic):
+        self.name = name
+        self.compute = compute
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.value = None
+        self.computed_at = None
+        self.version = 0
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def get(self):
+        now = self._clock()
+        age = None if self.computed_at is None else now - self.computed_at
+        if age is not None and age <= self.ttl:
+            self.stats['hits'] += 1
+            return self.value
+        if age is not None and age <= self.max_stale:
+            self.stats['stale_hits'] += 1
+            value = self.value
+            self._refresh_async()
+            return value
+        self.stats['misses'] += 1
+        with self._lock:
+            # 等锁期间可能已被别的请求刷新
+            if self.computed_at is None or self._clock() - self.computed_at > self.ttl:
+                self._refresh()
+        return self.value
+
+    def _refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_locked, daemon=True,
+                         name=f"panel-{self.name}").start()
+
+    def _refresh_locked(self):
+        try:
+            with self._lock:
+                self._refresh()
+        finally:
+            self._refreshing = False
+
+    def _refresh(self):
+        """调用方持有 self._lock"""
+        try:
+            value = self.compute()
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[WARN] 面板 {self.name} 刷新失败: {e}")
+            if self.computed_at is not None:
+                self.computed_at = self._clock()  # 保留旧值，退避一个 TTL
+            return
+        self.stats['refreshes'] += 1
+        if value != self.value or self.computed_at is None:
+            self.value = value
+            self.version += 1
+        self.computed_at = self._clock()
+
+    def invalidate(self):
+        self.computed_at = None
+
+
+# ---------------------------------------------------------------------------
+# 面板计算（原 RealDataHandler 里的逐请求逻辑）
+# ---------------------------------------------------------------------------
+
+_FALLBACK_AGENTS = [
+    {'name': 'Coder', 'pid': 12345, 'alive': True, 'status': 'active', 'success_rate': 98,
+     'model': 'claude-opus-4-5', 'tasks': 2345},
+    {'name': 'Analyst', 'pid': 12346, 'alive': True, 'status': 'active', 'success_rate': 99,
+     'model': 'claude-sonnet-4-5', 'tasks': 1876},
+    {'name': 'Reactor', 'pid': 12347, 'alive': True, 'status': 'active', 'success_rate': 100,
+     'model': 'claude-sonnet-4-5', 'tasks': 984},
+    {'name': 'Monitor', 'pid': 12348, 'alive': True, 'status': 'active', 'success_rate': 98,
+     'model': 'claude-haiku-4-5', 'tasks': 3421},
+]
+
+# 演示 Agent 的 last_active 以进程启动时间为基准，重算不会让面板版本变化
+_FALLBACK_EPOCH = time.time()
+
+_FALLBACK_ERRORS = [
+    {'error': 'Connection timeout', 'count': 23},
+    {'error': 'File not found', 'count': 19},
+    {'error': 'API rate limit', 'count': 12},
+    {'error': 'MemoryError', 'count': 8},
+    {'error': 'Database deadlock', 'count': 5}
+]
+
+_FALLBACK_SLOW_OPS = [
+    {'operation': 'event_bus.publish', 'duration': 1247, 'count': 89},
+    {'operation': 'agent.spawn', 'duration': 987, 'count': 156},
+    {'operation': 'database.query', 'duration': 854, 'count': 67},
+    {'operation': 'reactor.fix', 'duration': 723, 'count': 34},
+    {'operation': 'api.call', 'duration': 612, 'count': 98}
+]
+
+_STATIC_SECTIONS = {
+    "event": "Reactor 自动修复磁盘告警",
+    "event_color": "emerald",
+    # SLO 体检数据
+    "slo_success_rate": 80.4,
+    "slo_confidence": 95.7,
+    "slo_false_positive": 0,
+    "slo_health_gain": 3.2,
+    # ClawdHub 社区 Agent 数据
+    "community_agents_count": 3,
+    "community_agents_active": ["smart_researcher", "self_heal_agent", "monitor_master"],
+    "community_contribution": "三诸侯协作：研究员洞察 + 自愈执行 + 监控守护",
+    # 三诸侯协作状态
+    "three_lords": {
+        "researcher": {
+            "name": "smart_researcher",
+            "status": "卦象洞察已激活",
+            "contribution": "每日简报贡献 +1"
+        },
+        "healer": {
+            "name": "self_heal_agent",
+            "status": "Self-Healing Loop v2 运行中",
+            "contribution": "失败任务重生率 100%"
+        },
+        "monitor": {
+            "name": "monitor_master",
+            "status": "全系统监控守护中",
+            "contribution": "Health 99.9+"
+        },
+        "collaboration": "✅ 三诸侯已协同工作！研究员分析 + 自愈执行 + 监控调度 = 永生进化闭环"
+    }
+}
+
+
+def _read_tail_lines(path, limit):
+    """读取文件最后 limit 行（只读尾部 64KB，够用就不读全文件）"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            size = f.tell()
+            f.seek(max(0, size - 64 * 1024))
+            data = f.read()
+    except OSError:
+        return []
+    lines = data.split(b"\n")
+    if size > 64 * 1024:
+        lines = lines[1:]  # 第一行可能不完整
+    return [l.decode('utf-8', errors='replace') for l in lines if l.strip()][-limit:]
+
+
+def load_agents(root=AIOS_ROOT):
+    """agents.json 的 active 数 + agents/ 目录下的格式化状态"""
+    active = 0
+    registry = []
+    agents_file = root / "agent_system" / "data" / "agents.json"
+    try:
+        with open(agents_file, encoding="utf-8") as f:
+            registry = json.load(f).get("agents", [])
+        active = len([a for a in registry if a.get("status") == "active"])
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    formatted = []
+    agent_dir = root / "agent_system" / "data" / "agents"
+    if agent_dir.exists():
+        for agent_file in agent_dir.glob("*.json"):
+            try:
+                with open(agent_file, 'r', encoding='utf-8') as f:
+                    agent = json.load(f)
+                formatted.append({
+                    'name': agent.get('name', agent_file.stem),
+                    'pid': agent.get('pid', 0),
+                    'alive': agent.get('status') == 'active',
+                    'status': agent.get('status', 'idle'),
+                    'success_rate': int(agent.get('success_rate', 0) * 100),
+                    'last_active': agent.get('last_active') or agent_file.stat().st_mtime
+                })
+            except (OSError, ValueError, TypeError):
+                pass
+    if not formatted:
+        formatted = [dict(a, last_active=_FALLBACK_EPOCH - 60 * (i + 1))
+                     for i, a in enumerate(_FALLBACK_AGENTS)]
+
+    if active == 0:
+        active = len([a for a in formatted if a.get('alive')])
+
+    if registry:
+        success_rate = round(sum(a.get("stats", {}).get("success_rate", 98) for a in registry)
+                             / len(registry), 1)
+    else:
+        success_rate = None
+    return {"active_agents": active, "agents": formatted, "registry_success_rate": success_rate}
+
+
+def load_trends(root=AIOS_ROOT, points=TREND_POINTS):
+    """metrics_history.jsonl 最近 points 条趋势
+
+    不足 points 条时在前面用最早一条的值补齐（无数据时用默认值），
+    补点的时间标签按 5 分钟往前推；同样的输入总是得到同样的输出，
+    面板版本（ETag）只在数据真正变化时才变。
+    """
+    labels, success, evolution, first_ts = [], [], [], None
+    for line in _read_tail_lines(root / "learning" / "metrics_history.jsonl", 20):
+        try:
+            record = json.loads(line)
+            timestamp = record.get('timestamp')
+            if not timestamp:
+                ts_str = record.get('ts', '')
+                timestamp = (datetime.fromisoformat(ts_str.replace('Z', '+00:00')).timestamp()
+                             if ts_str else None)
+            tsr = record.get('task_success_rate') or record.get('tool_success_rate', 0.985)
+            score = record.get('evolution_score', 0.965)
+        except (ValueError, TypeError, AttributeError):
+            continue
+        if first_ts is None and timestamp:
+            first_ts = timestamp
+        labels.append(time.strftime('%H:%M', time.localtime(timestamp)) if timestamp else '')
+        success.append(round(tsr * 100, 1))
+        evolution.append(round(90 + score * 10, 1))
+
+    labels, success, evolution = labels[-points:], success[-points:], evolution[-points:]
+    needed = points - len(success)
+    if needed > 0:
+        pad_success = success[0] if success else 98.5
+        pad_evo = evolution[0] if evolution else 96.5
+        if first_ts is not None:
+            pad_labels = [time.strftime('%H:%M', time.localtime(first_ts - (needed - i) * 300))
+                          for i in range(needed)]  # 每 5 分钟一个点
+        else:
+            pad_labels = [''] * needed
+        labels = pad_labels + labels
+        success = [pad_success] * needed + success
+        evolution = [pad_evo] * needed + evolution
+
+    return {
+        "trend_evolution_labels": labels,
+        "trend_evolution": evolution,
+        "trend_success_labels": labels,
+        "trend_success": success,
+    }
+
+
+def load_evolution_score(root=AIOS_ROOT):
+    """最新 Evolution Score，映射到 90-100"""
+    for line in reversed(_read_tail_lines(root / "learning" / "metrics_history.jsonl", 1)):
+        try:
+            return round(90 + json.loads(line).get('evolution_score', 0.0) * 10, 2)
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return 96.8
+
+
+# ---------------------------------------------------------------------------
+# 服务
+# ---------------------------------------------------------------------------
+
+class MetricsService:
+    """Dashboard 指标物化服务：各面板独立缓存，组合结果按版本缓存并带 ETag"""
+
+    def __init__(self, root=AIOS_ROOT, workspace=WORKSPACE_ROOT, ttls=None,
+                 sampler=None, clock=time.monotonic):
+        self.root = Path(root)
+        ttls = dict(PANEL_TTLS, **(ttls or {}))
+        self.events = EventAggregates(Path(workspace) / "events.jsonl")
+        self.sampler = sampler if sampler is not None else CpuSampler()
+        self._events_lock = threading.Lock()
+        self.panels = {
+            "events": self._panel("events", self._compute_events, ttls, clock),
+            "agents": self._panel("agents", lambda: load_agents(self.root), ttls, clock),
+            "resources": self._panel("resources", self.sampler.get, ttls, clock),
+            "trends": self._panel("trends", lambda: load_trends(self.root), ttls, clock),
+            "evolution": self._panel("evolution", lambda: load_evolution_score(self.root),
+                                     ttls, clock),
+        }
+        self._render_lock = threading.Lock()
+        self._rendered = None  # (versions, body, etag, payload)
+
+    @staticmethod
+    def _panel(name, compute, ttls, clock):
+        ttl, max_stale = ttls[name]
+        return Panel(name, compute, ttl, max_stale, clock)
+
+    def start(self):
+        self.sampler.start()
+        return self
+
+    def stop(self):
+        self.sampler.stop()
+
+    def _compute_events(self):
+        with self._events_lock:
+            self.events.update()
+            return self.events.snapshot()
+
+    # ── 组合 ──────────────────────────────────────────────
+
+    def metrics(self):
+        """/api/metrics 的完整数据（结构与原 get_real_metrics 一致）"""
+        return self.render()[2]
+
+    def render(self):
+        """返回 (body_bytes, etag, payload)；面板都未变化时复用上次序列化结果"""
+        values = {name: panel.get() for name, panel in self.panels.items()}
+        versions = tuple(panel.version for panel in self.panels.values())
+        rendered = self._rendered
+        if rendered is not None and rendered[0] == versions:
+            return rendered[1:]
+        with self._render_lock:
+            rendered = self._rendered
+            if rendered is not None and rendered[0] == versions:
+                return rendered[1:]
+            payload = self._compose(values)
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            self._rendered = (versions, body, etag, payload)
+            return body, etag, payload
+
+    def _compose(self, values):
+        events, agents = values["events"], values["agents"]
+        resources, trends = values["resources"], values["trends"]
+        success_rate = agents["registry_success_rate"]
+        if success_rate is None:
+            success_rate = events["event_success_rate"] or 98.7
+        payload = {
+            # 时间取自最近一次面板变化，保证内容不变时 ETag 稳定
+            "time": datetime.now().strftime("%H:%M:%S"),
+            "active_agents": agents["active_agents"],
+            "evolution_score": values["evolution"],
+            "improvements_today": events["improvements_today"],
+            "success_rate": success_rate,
+            "agents": agents["agents"],
+            "top_errors": events["top_errors"] or _FALLBACK_ERRORS,
+            "slow_ops": events["slow_ops"] or _FALLBACK_SLOW_OPS,
+            "cpu": resources["cpu"],
+            "mem": resources["mem"],
+            "disk": resources["disk"],
+            "gpu": resources["gpu"],
+        }
+        payload.update(trends)
+        payload.update(_STATIC_SECTIONS)
+        return payload
+
+    def logs(self):
+        """/api/logs：与 events 面板共用同一个增量窗口"""
+        logs = self.panels["events"].get()["logs"]
+        if not logs:
+            logs = [
+                {'time': '13:10:45', 'level': 'info', 'message': 'AIOS Dashboard started'},
+                {'time': '13:10:46', 'level': 'info', 'message': 'Loading agents...'},
+                {'time': '13:10:47', 'level': 'warn', 'message': 'Agent "coder" response time: 1247ms'},
+                {'time': '13:10:48', 'level': 'error', 'message': 'Connection timeout to API'},
+                {'time': '13:10:49', 'level': 'info', 'message': 'Retry successful'}
+            ]
+        return {'logs': logs}
+
+    def stats(self):
+        return {name: dict(panel.stats, version=panel.version, ttl=panel.ttl)
+                for name, panel in self.panels.items()}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_metrics_service():
+    """进程内共享的 MetricsService（首次调用时启动采样线程）"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = MetricsService().start()
+        return _service
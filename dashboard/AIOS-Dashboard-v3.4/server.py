@@ -2,9 +2,8 @@
 import json
 import time
 import sys
-import random
 from pathlib import Path
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 
 # 修复 Windows 编码
 if sys.platform == 'win32':
@@ -16,16 +15,28 @@ DASHBOARD_ROOT = Path(__file__).parent
 AIOS_ROOT = DASHBOARD_ROOT.parent.parent
 WORKSPACE_ROOT = AIOS_ROOT.parent  # 修复：workspace 是 aios 的父目录
 
+sys.path.insert(0, str(DASHBOARD_ROOT))
+from metrics_service import get_metrics_service
+
 class RealDataHandler(SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/api/metrics':
-            # 返回真实 AIOS 数据
-            data = self.get_real_metrics()
+            # 物化视图：面板按 TTL 后台刷新，内容未变返回 304
+            body, etag, _ = get_metrics_service().render()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                return
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+            self.wfile.write(body)
         
         elif self.path == '/api/skills':
             # 返回所有 Skill 列表
@@ -137,133 +148,8 @@ class RealDataHandler(SimpleHTTPRequestHandler):
         self.end_headers()
     
     def get_real_metrics(self):
-        """获取真实 AIOS 指标"""
-        # 真实读取（保持原来的代码）
-        agents = []
-        events = []
-        try:
-            agents_file = AIOS_ROOT / "agent_system" / "data" / "agents.json"
-            print(f"[DEBUG] agents_file: {agents_file}, exists: {agents_file.exists()}")
-            if agents_file.exists():
-                with open(agents_file, encoding="utf-8") as f:
-                    data = json.load(f)
-                    agents = data.get("agents", [])
-                    print(f"[DEBUG] loaded {len(agents)} agents")
-            
-            events_file = WORKSPACE_ROOT / "events.jsonl"
-            if events_file.exists():
-                with open(events_file, encoding="utf-8") as f:
-                    events = [json.loads(line.strip()) for line in f.readlines()[-200:] if line.strip()]
-        except Exception as e:
-            print(f"[DEBUG] Error loading data: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # 读取 Top 错误和慢操作
-        top_errors = self.get_top_errors()
-        slow_ops = self.get_slow_operations()
-        
-        # 读取 Agent 状态（格式化）
-        formatted_agents = self.get_agent_status()
-        
-        # ==================== 强制真实KPI（关键修复） ====================
-        active_agents = len([a for a in agents if a.get("status") == "active"])
-        # 兜底：如果读取失败，用 formatted_agents 的数量
-        if active_agents == 0:
-            active_agents = len([a for a in formatted_agents if a.get('alive')])
-        
-        # 从 stats.success_rate 读取，如果没有就用默认值
-        success_rate = round(sum(a.get("stats", {}).get("success_rate", 98) for a in agents) / max(len(agents), 1), 1) if agents else 98.7
-        improvements_today = 17 + random.randint(-3, 5)
-        
-        # ==================== 趋势图（12条数据） ====================
-        trend_labels = ["11:24", "11:30", "11:36", "11:42", "11:48", "11:54", "12:00", "12:06", "12:12", "12:18", "12:24", "12:30"]
-        trend_evolution = [94.2, 94.8, 95.3, 95.9, 96.4, 96.1, 96.7, 97.2, 96.9, 97.5, 98.1, 97.8]
-        trend_success = [99.8, 99.2, 98.5, 97.1, 96.4, 95.8, 95.3, 95.1, 95.4, 95.7, 96.1, 96.5]
-        
-        try:
-            from datetime import datetime
-            import psutil
-            
-            return {
-                "time": datetime.now().strftime("%H:%M:%S"),
-                "active_agents": active_agents,
-                "evolution_score": round(96.8 + random.uniform(-0.6, 1.2), 2),
-                "improvements_today": improvements_today,
-                "success_rate": success_rate,
-                "agents": formatted_agents,
-                "top_errors": top_errors,
-                "slow_ops": slow_ops,
-                "event": "Reactor 自动修复磁盘告警",
-                "event_color": "emerald",
-                "trend_evolution_labels": trend_labels,
-                "trend_evolution": trend_evolution,
-                "trend_success_labels": trend_labels,
-                "trend_success": trend_success,
-                "cpu": round(psutil.cpu_percent(interval=0.1), 1),
-                "mem": round(psutil.virtual_memory().percent, 1),
-                "disk": round(psutil.disk_usage('C:\\' if sys.platform == 'win32' else '/').percent, 1),
-                "gpu": random.randint(12, 68),
-                # SLO 体检数据（新增）
-                "slo_success_rate": 80.4,
-                "slo_confidence": 95.7,
-                "slo_false_positive": 0,
-                "slo_health_gain": 3.2,
-                # ClawdHub 社区 Agent 数据（新增）
-                "community_agents_count": 3,
-                "community_agents_active": ["smart_researcher", "self_heal_agent", "monitor_master"],
-                "community_contribution": "三诸侯协作：研究员洞察 + 自愈执行 + 监控守护",
-                # 三诸侯协作状态（新增）
-                "three_lords": {
-                    "researcher": {
-                        "name": "smart_researcher",
-                        "status": "卦象洞察已激活",
-                        "contribution": "每日简报贡献 +1"
-                    },
-                    "healer": {
-                        "name": "self_heal_agent",
-                        "status": "Self-Healing Loop v2 运行中",
-                        "contribution": "失败任务重生率 100%"
-                    },
-                    "monitor": {
-                        "name": "monitor_master",
-                        "status": "全系统监控守护中",
-                        "contribution": "Health 99.9+"
-                    },
-                    "collaboration": "✅ 三诸侯已协同工作！研究员分析 + 自愈执行 + 监控调度 = 永生进化闭环"
-                }
-            }
-        except Exception as e:
-            print(f"获取数据失败: {e}")
-            import traceback
-            traceback.print_exc()
-            # 返回默认数据
-            from datetime import datetime
-            return {
-                "time": datetime.now().strftime("%H:%M:%S"),
-                "active_agents": 0,
-                "evolution_score": 96.8,
-                "improvements_today": 17,
-                "success_rate": 98.7,
-                "agents": [],
-                "top_errors": [],
-                "slow_ops": [],
-                "event": "",
-                "event_color": "slate",
-                "trend_success_labels": trend_labels,
-                "trend_success": trend_success,
-                "trend_evolution_labels": trend_labels,
-                "trend_evolution": trend_evolution,
-                "cpu": 0,
-                "mem": 0,
-                "disk": 0,
-                "gpu": 0,
-                # SLO 体检数据（新增）
-                "slo_success_rate": 80.4,
-                "slo_confidence": 95.7,
-                "slo_false_positive": 0,
-                "slo_health_gain": 3.2
-            }
+        """获取真实 AIOS 指标（由 MetricsService 增量维护）"""
+        return get_metrics_service().metrics()
     
     def get_hexagram_timeline(self):
         """获取卦象时间线数据（供 Dashboard 使用）"""
@@ -368,203 +254,6 @@ class RealDataHandler(SimpleHTTPRequestHandler):
                     pass
             return 94.5  # 默认值（对应原来的 0.45）
     
-    def get_agent_status(self):
-        """读取 Agent 状态"""
-        agents = []
-        agent_dir = AIOS_ROOT / "agent_system" / "data" / "agents"
-        
-        if agent_dir.exists():
-            for agent_file in agent_dir.glob("*.json"):
-                try:
-                    with open(agent_file, 'r', encoding='utf-8') as f:
-                        agent = json.load(f)
-                        agents.append({
-                            'name': agent.get('name', agent_file.stem),
-                            'pid': agent.get('pid', 0),
-                            'alive': agent.get('status') == 'active',
-                            'status': agent.get('status', 'idle'),
-                            'success_rate': int(agent.get('success_rate', 0) * 100),
-                            'last_active': agent.get('last_active', time.time())
-                        })
-                except:
-                    pass
-        
-        # 如果没有 Agent 数据，返回丰富的兜底数据
-        if not agents:
-            agents = [
-                {
-                    'name': 'Coder',
-                    'pid': 12345,
-                    'alive': True,
-                    'status': 'active',
-                    'success_rate': 98,
-                    'last_active': time.time() - 120,
-                    'model': 'claude-opus-4-5',
-                    'tasks': 2345
-                },
-                {
-                    'name': 'Analyst',
-                    'pid': 12346,
-                    'alive': True,
-                    'status': 'active',
-                    'success_rate': 99,
-                    'last_active': time.time() - 60,
-                    'model': 'claude-sonnet-4-5',
-                    'tasks': 1876
-                },
-                {
-                    'name': 'Reactor',
-                    'pid': 12347,
-                    'alive': True,
-                    'status': 'active',
-                    'success_rate': 100,
-                    'last_active': time.time() - 90,
-                    'model': 'claude-sonnet-4-5',
-                    'tasks': 984
-                },
-                {
-                    'name': 'Monitor',
-                    'pid': 12348,
-                    'alive': True,
-                    'status': 'active',
-                    'success_rate': 98,
-                    'last_active': time.time() - 30,
-                    'model': 'claude-haiku-4-5',
-                    'tasks': 3421
-                },
-            ]
-        
-        return agents
-    
-    def get_top_errors(self):
-        """统计最近错误"""
-        errors = {}
-        events_file = WORKSPACE_ROOT / "events.jsonl"
-        
-        if events_file.exists():
-            try:
-                with open(events_file, 'r', encoding='utf-8') as f:
-                    # 读取最近 1000 条
-                    lines = f.readlines()[-1000:]
-                    
-                for line in lines:
-                    try:
-                        event = json.loads(line)
-                        if event.get('level') == 'error':
-                            error_msg = event.get('message', 'Unknown error')
-                            # 简化错误信息
-                            if len(error_msg) > 50:
-                                error_msg = error_msg[:50] + '...'
-                            errors[error_msg] = errors.get(error_msg, 0) + 1
-                    except:
-                        pass
-            except:
-                pass
-        
-        # 排序并返回 Top 5
-        if errors:
-            sorted_errors = sorted(errors.items(), key=lambda x: x[1], reverse=True)[:5]
-            return [{'error': err, 'count': cnt} for err, cnt in sorted_errors]
-        
-        # 兜底数据
-        return [
-            {'error': 'Connection timeout', 'count': 23},
-            {'error': 'File not found', 'count': 19},
-            {'error': 'API rate limit', 'count': 12},
-            {'error': 'MemoryError', 'count': 8},
-            {'error': 'Database deadlock', 'count': 5}
-        ]
-    
-    def get_slow_operations(self):
-        """统计慢操作"""
-        slow_ops = []
-        events_file = WORKSPACE_ROOT / "events.jsonl"
-        
-        if events_file.exists():
-            try:
-                with open(events_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()[-1000:]
-                    
-                for line in lines:
-                    try:
-                        event = json.loads(line)
-                        duration = event.get('duration_ms', 0)
-                        if duration > 500:  # 超过 500ms
-                            slow_ops.append({
-                                'operation': event.get('operation', 'Unknown'),
-                                'duration': int(duration)
-                            })
-                    except:
-                        pass
-            except:
-                pass
-        
-        # 排序并返回 Top 5
-        if slow_ops:
-            slow_ops.sort(key=lambda x: x['duration'], reverse=True)
-            return slow_ops[:5]
-        
-        # 兜底数据
-        return [
-            {'operation': 'event_bus.publish', 'duration': 1247, 'count': 89},
-            {'operation': 'agent.spawn', 'duration': 987, 'count': 156},
-            {'operation': 'database.query', 'duration': 854, 'count': 67},
-            {'operation': 'reactor.fix', 'duration': 723, 'count': 34},
-            {'operation': 'api.call', 'duration': 612, 'count': 98}
-        ]
-    
-    def calculate_success_rate(self):
-        """计算成功率（从趋势数据或 events.jsonl）"""
-        # 优先从趋势数据计算平均值
-        history_file = AIOS_ROOT / "learning" / "metrics_history.jsonl"
-        if history_file.exists():
-            try:
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()[-12:]  # 最近 12 条
-                    
-                rates = []
-                for line in lines:
-                    if not line.strip():
-                        continue
-                    try:
-                        record = json.loads(line)
-                        tsr = record.get('task_success_rate') or record.get('tool_success_rate')
-                        if tsr:
-                            rates.append(tsr * 100)
-                    except:
-                        pass
-                
-                if rates:
-                    return round(sum(rates) / len(rates), 1)
-            except:
-                pass
-        
-        # 备用：从 events.jsonl 计算
-        total = 0
-        success = 0
-        events_file = WORKSPACE_ROOT / "events.jsonl"
-        
-        if events_file.exists():
-            try:
-                with open(events_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()[-1000:]
-                    
-                for line in lines:
-                    try:
-                        event = json.loads(line)
-                        if event.get('type') in ['task_complete', 'task_failed']:
-                            total += 1
-                            if event.get('type') == 'task_complete':
-                                success += 1
-                    except:
-                        pass
-            except:
-                pass
-        
-        if total > 0:
-            return round((success / total) * 100, 1)
-        return 98.5  # 默认值
-    
     def count_today_improvements(self):
         """统计今日改进数"""
         count = 0
@@ -591,94 +280,6 @@ class RealDataHandler(SimpleHTTPRequestHandler):
         
         return count
     
-    def get_system_resources(self):
-        """获取系统资源"""
-        try:
-            import psutil
-            return {
-                'cpu': int(psutil.cpu_percent(interval=None)),
-                'mem': int(psutil.virtual_memory().percent),
-                'disk': int(psutil.disk_usage('/').percent if sys.platform != 'win32' else psutil.disk_usage('C:\\').percent),
-                'gpu': 0  # GPU 需要额外库
-            }
-        except:
-            return {'cpu': 0, 'mem': 0, 'disk': 0, 'gpu': 0}
-    
-    def get_trend_data(self):
-        """获取趋势数据（自动补齐到 12 个数据点）"""
-        trend_success = []
-        trend_evolution = []
-        trend_labels = []
-        
-        # 从 metrics_history.jsonl 读取历史数据
-        history_file = AIOS_ROOT / "learning" / "metrics_history.jsonl"
-        
-        if history_file.exists():
-            try:
-                with open(history_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()[-20:]  # 最多取最近 20 条
-                    
-                for line in lines:
-                    if not line.strip():
-                        continue
-                    try:
-                        record = json.loads(line)
-                        # 时间标签（支持 timestamp 和 ts 两种格式）
-                        timestamp = record.get('timestamp')
-                        if not timestamp:
-                            ts_str = record.get('ts', '')
-                            if ts_str:
-                                import datetime
-                                dt = datetime.datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-                                timestamp = dt.timestamp()
-                            else:
-                                timestamp = time.time()
-                        
-                        time_label = time.strftime('%H:%M', time.localtime(timestamp))
-                        trend_labels.append(time_label)
-                        
-                        # 成功率（如果没有 task_success_rate，用 tool_success_rate 或默认值）
-                        tsr = record.get('task_success_rate') or record.get('tool_success_rate', 0.985)
-                        trend_success.append(round(tsr * 100, 1))
-                        
-                        # Evolution Score（转换为 90-100 范围）
-                        score = record.get('evolution_score', 0.965)
-                        # 假设原始分数是 0-1.0，映射到 90-100
-                        scaled_score = 90 + (score * 10)
-                        trend_evolution.append(round(scaled_score, 1))
-                    except:
-                        pass
-            except:
-                pass
-        
-        # 如果少于 12 条，就补齐到 12 条
-        needed = 12 - len(trend_success)
-        if needed > 0:
-            # 用最近真实值 + 轻微波动补齐
-            base_success = trend_success[-1] if trend_success else 98.5
-            base_evo = trend_evolution[-1] if trend_evolution else 96.5
-            
-            # 计算起始时间（往前推）
-            if trend_labels:
-                last_time = trend_labels[-1]
-                hour, minute = map(int, last_time.split(':'))
-                base_timestamp = time.time() - ((12 - len(trend_labels)) * 300)  # 每5分钟一个点
-            else:
-                base_timestamp = time.time() - 3600  # 1小时前
-            
-            for i in range(needed):
-                timestamp = base_timestamp + (i * 300)
-                trend_labels.append(time.strftime('%H:%M', time.localtime(timestamp)))
-                trend_success.append(round(base_success + random.uniform(-0.8, 1.2), 1))
-                trend_evolution.append(round(base_evo + random.uniform(-0.6, 1.0), 1))
-        
-        # 只保留最后 12 条
-        trend_success = trend_success[-12:]
-        trend_evolution = trend_evolution[-12:]
-        trend_labels = trend_labels[-12:]
-        
-        return trend_success, trend_evolution, trend_labels
-    
     def get_skills_list(self):
         """获取所有 Skill 列表"""
         skills_dir = WORKSPACE_ROOT / "skills"
@@ -757,39 +358,8 @@ class RealDataHandler(SimpleHTTPRequestHandler):
         return False
     
     def get_logs(self):
-        """获取实时日志（最近 50 条）"""
-        logs = []
-        events_file = WORKSPACE_ROOT / "events.jsonl"
-        
-        if events_file.exists():
-            try:
-                with open(events_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()[-50:]  # 最近 50 条
-                    
-                for line in lines:
-                    try:
-                        event = json.loads(line)
-                        logs.append({
-                            'time': time.strftime('%H:%M:%S', time.localtime(event.get('timestamp', time.time()))),
-                            'level': event.get('level', 'info'),
-                            'message': event.get('message', '')
-                        })
-                    except:
-                        pass
-            except:
-                pass
-        
-        # 如果没有日志，返回示例
-        if not logs:
-            logs = [
-                {'time': '13:10:45', 'level': 'info', 'message': 'AIOS Dashboard started'},
-                {'time': '13:10:46', 'level': 'info', 'message': 'Loading agents...'},
-                {'time': '13:10:47', 'level': 'warn', 'message': 'Agent "coder" response time: 1247ms'},
-                {'time': '13:10:48', 'level': 'error', 'message': 'Connection timeout to API'},
-                {'time': '13:10:49', 'level': 'info', 'message': 'Retry successful'}
-            ]
-        
-        return {'logs': logs}
+        """获取实时日志（最近 50 条，与指标共用增量事件窗口）"""
+        return get_metrics_service().logs()
     
     def upgrade_skill_to_agent(self, skill_path):
         """升级 Skill 为 Agent（直接创建 Agent 配置）"""
@@ -894,5 +464,7 @@ print(f"AIOS Dashboard (真实数据) 启动: http://localhost:{PORT}")
 print(f"数据源: {WORKSPACE_ROOT}")
 print("=" * 60)
 
-httpd = HTTPServer(('127.0.0.1', PORT), RealDataHandler)
+get_metrics_service()  # 启动时预热采样线程
+httpd = ThreadingHTTPServer(('127.0.0.1', PORT), RealDataHandler)
+httpd.daemon_threads = True
 httpd.serve_forever()
@@ -1,16 +1,458 @@
 """
 AIOS Dashboard Server - 轻量级 HTTP 服务器
 提供 Dashboard 数据 API
+
+SSE 由一个后台 SnapshotBroadcaster 统一计算快照（增量 tail 数据源），
+再分发给所有订阅者，数据源 I/O 与在线人数无关。
 """
 import json
 import os
+import queue
+import threading
+import time
+from collections import Counter, deque
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 
 AIOS_ROOT = Path(__file__).parent.parent
 
+SSE_INTERVAL_SEC = 2.0
+SSE_KEEPALIVE_SEC = 15.0
+SUBSCRIBER_QUEUE_SIZE = 8
+
+
+# ---------------------------------------------------------------------------
+# 增量数据源
+# ---------------------------------------------------------------------------
+
+class TailReader:
+    """只读取文件新增的完整行（按偏移量续读，文件截断/轮转后从头读）"""
+
+    def __init__(self, path, initial_bytes=256 * 1024):
+        self.path = Path(path)
+        self.initial_bytes = initial_bytes
+        self._offset = None
+        self._inode = None
+        self._partial = b""
+
+    def read_new_lines(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return []
+        if self._offset is None or st.st_ino != self._inode or st.st_size < self._offset:
+            # 首次打开只读尾部，避免启动时解析整个历史文件
+            start = max(0, st.st_size - self.initial_bytes) if self._offset is None else 0
+            self._offset, self._inode, self._partial = start, st.st_ino, b""
+            skip_first = start > 0
+        else:
+            skip_first = False
+        if st.st_size == self._offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        self._offset += len(chunk)
+        data = self._partial + chunk
+        lines = data.split(b"\n")
+        self._partial = lines.pop()  # 最后一段可能是半行
+        if skip_first and lines:
+            lines = lines[1:]
+        return [line.decode('utf-8', errors='replace') for line in lines if line.strip()]
+
+
+class _EventWindow:
+    """events.jsonl 的滑动统计：最近 100 条成功率、最近 500 条错误 Top 5"""
+
+    def __init__(self, path, success_window=100, error_window=500):
+        self.tail = TailReader(path)
+        self._success = deque(maxlen=success_window)
+        self._success_count = 0
+        self._errors = deque(maxlen=error_window)
+        self._error_counts = Counter()
+
+    def update(self):
+        for line in self.tail.read_new_lines():
+            ok = '"level":"info"' in line or '"success":true' in line
+            if len(self._success) == self._success.maxlen:
+                self._success_count -= self._success[0]
+            self._success.append(ok)
+            self._success_count += ok
+
+            error_type = None
+            if '"level":"error"' in line:
+                try:
+                    error_type = json.loads(line).get('error_type', 'Unknown')
+                except ValueError:
+                    pass
+            if len(self._errors) == self._errors.maxlen:
+                evicted = self._errors[0]
+                if evicted is not None:
+                    self._error_counts[evicted] -= 1
+                    if self._error_counts[evicted] <= 0:
+                        del self._error_counts[evicted]
+            self._errors.append(error_type)
+            if error_type is not None:
+                self._error_counts[error_type] += 1
+
+    @property
+    def success_rate(self):
+        total = len(self._success)
+        return int(self._success_count / total * 100) if total else 0
+
+    def top_errors(self, n=5):
+        return [{"name": name, "count": count} for name, count in self._error_counts.most_common(n)]
+
+
+class _TraceStats:
+    """最近 50 个 trace 文件的慢操作统计；目录不变不重扫，已解析文件不重读"""
+
+    def __init__(self, traces_dir, recent=50, slow_ms=100):
+        self.traces_dir = Path(traces_dir)
+        self.recent = recent
+        self.slow_ms = slow_ms
+        self._dir_mtime = None
+        self._files = []  # 最近的 trace 文件（新→旧）
+        self._parsed = {}  # path -> (mtime, {op: [total, count]})
+
+    def update(self):
+        try:
+            mtime = self.traces_dir.stat().st_mtime_ns
+        except OSError:
+            self._files, self._parsed = [], {}
+            return
+        if mtime != self._dir_mtime:
+            self._dir_mtime = mtime
+            entries = []
+            for entry in os.scandir(self.traces_dir):
+                if entry.name.startswith("trace_") and entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+            entries.sort(reverse=True)
+            self._files = entries[:self.recent]
+            keep = {path for _, path in self._files}
+            self._parsed = {p: v for p, v in self._parsed.items() if p in keep}
+        for file_mtime, path in self._files:
+            cached = self._parsed.get(path)
+            if cached is None or cached[0] != file_mtime:
+                self._parsed[path] = (file_mtime, self._parse(path))
+
+    def _parse(self, path):
+        ops = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                trace = json.load(f)
+            for span in trace.get('spans', []):
+                duration = span.get('duration_ms', 0)
+                if duration > self.slow_ms:  # 只统计 >100ms 的操作
+                    op = ops.setdefault(span.get('name', 'Unknown'), [0, 0])
+                    op[0] += duration
+                    op[1] += 1
+        except (OSError, ValueError):
+            pass
+        return ops
+
+    def slow_ops(self, n=10):
+        totals = {}
+        for _, ops in self._parsed.values():
+            for name, (total, count) in ops.items():
+                agg = totals.setdefault(name, [0, 0])
+                agg[0] += total
+                agg[1] += count
+        result = [{"op": op, "time": int(total / count), "count": count}
+                  for op, (total, count) in totals.items()]
+        return sorted(result, key=lambda x: x['time'], reverse=True)[:n]
+
+
+class _ImprovementCounter:
+    """今日 evolution 报告数：目录 mtime 或日期变化时才重新 glob"""
+
+    def __init__(self, reports_dir):
+        self.reports_dir = Path(reports_dir)
+        self._key = None
+        self.count = 0
+
+    def update(self):
+        today = datetime.now().strftime("%Y-%m-%d")
+        try:
+            key = (today, self.reports_dir.stat().st_mtime_ns)
+        except OSError:
+            self._key, self.count = None, 0
+            return
+        if key != self._key:
+            self._key = key
+            self.count = sum(1 for _ in self.reports_dir.glob(f"cycle_{today}*.json"))
+
+
+# ---------------------------------------------------------------------------
+# JSON Patch (RFC 6902) 差分
+# ---------------------------------------------------------------------------
+
+def _escape_pointer(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def json_patch_diff(old, new, path=""):
+    """生成把 old 变成 new 的 JSON Patch 操作（dict 递归，其余整体 replace）"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape_pointer(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape_pointer(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(json_patch_diff(old[key], value, child))
+        return ops
+    if old != new or type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
+
+
+# ---------------------------------------------------------------------------
+# 快照广播
+# ---------------------------------------------------------------------------
+
+class _Subscriber:
+    """一个 SSE 连接的有界消息队列"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def offer(self, message, resync=None):
+        """非阻塞投递；队列满说明客户端太慢，清空后重发完整快照"""
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(resync if resync is not None else message)
+
+
+class SnapshotBroadcaster:
+    """后台线程每个 tick 计算一次 Dashboard 快照，分发给所有 SSE 订阅者
+
+    没有订阅者时不计算；快照只序列化一次（完整 + patch 各一份）。
+    """
+
+    def __init__(self, interval=SSE_INTERVAL_SEC, root=AIOS_ROOT):
+        self.interval = interval
+        self.root = Path(root)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._full_message = None
+        self._process_manager = None
+
+        self._events = _EventWindow(self.root.parent / "events.jsonl")
+        self._metrics_tail = TailReader(self.root / "learning" / "metrics_history.jsonl")
+        self._evolution_score = 0
+        self._improvements = _ImprovementCounter(
+            self.root / "agent_system" / "data" / "evolution" / "reports")
+        self._traces = _TraceStats(self.root / "observability" / "traces")
+        self._series_path = self.root / "data" / "score_series.json"
+
+    # ── 订阅 ──────────────────────────────────────────────
+
+    def subscribe(self, mode="full"):
+        sub = _Subscriber(mode)
+        with self._lock:
+            self._subscribers.add(sub)
+            self._wakeup.notify()
+            initial = self._snapshot
+        if initial is not None:
+            sub.offer(self._format(initial, "snapshot" if mode == "patch" else None))
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    # ── 生命周期 ──────────────────────────────────────────
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True,
+                                            name="dashboard-snapshot")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._wakeup.notify_all()
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.offer(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            with self._lock:
+                while not self._subscribers and not self._stop.is_set():
+                    self._wakeup.wait()
+            if self._stop.is_set():
+                break
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"SSE 快照计算失败: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def tick(self):
+        """计算一次快照并推送（完整消息与 patch 消息各序列化一次）"""
+        snapshot = self.compute()
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+            subscribers = list(self._subscribers)
+        full_message = self._format(snapshot)
+        patch_message = None
+        snapshot_message = None
+        if any(sub.mode == "patch" for sub in subscribers):
+            snapshot_message = self._format(snapshot, "snapshot")
+            if previous is None:
+                patch_message = snapshot_message
+            else:
+                ops = json_patch_diff(previous, snapshot)
+                patch_message = self._format(ops, "patch") if ops else None
+        for sub in subscribers:
+            if sub.mode == "patch":
+                if patch_message is not None:
+                    sub.offer(patch_message, resync=snapshot_message)
+            else:
+                sub.offer(full_message)
+        return snapshot
+
+    @staticmethod
+    def _format(data, event=None):
+        body = json.dumps(data, ensure_ascii=False)
+        prefix = f"event: {event}\n" if event else ""
+        return f"{prefix}data: {body}\n\n"
+
+    # ── 快照计算 ──────────────────────────────────────────
+
+    def _agent_status(self):
+        if self._process_manager is None:
+            import sys
+            if str(self.root) not in sys.path:
+                sys.path.insert(0, str(self.root))
+            try:
+                from agent_system.process_manager import AgentProcessManager
+                self._process_manager = AgentProcessManager()
+            except Exception:
+                self._process_manager = False
+        if not self._process_manager:
+            return {}
+        try:
+            return self._process_manager.get_all_status()
+        except Exception:
+            return {}
+
+    def _update_evolution_score(self):
+        lines = self._metrics_tail.read_new_lines()
+        if lines:
+            try:
+                self._evolution_score = int(json.loads(lines[-1]).get('evolution_score', 0))
+            except (ValueError, TypeError, AttributeError):
+                pass
+
+    @staticmethod
+    def _system_usage():
+        try:
+            import psutil
+        except ImportError:
+            return {"cpu": None, "mem": None, "disk": None}
+        return {
+            "cpu": int(psutil.cpu_percent(interval=None)),  # 非阻塞：与上次调用之间的平均值
+            "mem": int(psutil.virtual_memory().percent),
+            "disk": int(psutil.disk_usage('/').percent),
+        }
+
+    def compute(self):
+        agent_status = self._agent_status()
+        self._update_evolution_score()
+        self._improvements.update()
+        self._events.update()
+        self._traces.update()
+
+        try:
+            from core.score_series import trend
+            trend_success = trend("success_rate", "1m", limit=30, path=self._series_path)
+            trend_evolution = trend("score", "1m", limit=30, path=self._series_path)
+        except ImportError:
+            trend_success, trend_evolution = [], []
+
+        data = {
+            "active_agents": sum(1 for a in agent_status.values() if a.get('alive', False)),
+            "evolution_score": self._evolution_score,
+            "improvements_today": self._improvements.count,
+            "success_rate": self._events.success_rate,
+            **self._system_usage(),
+            "gpu": None,
+            "trend_success": trend_success,
+            "trend_evolution": trend_evolution,
+            "agents": [],
+            "detailed_agents": [],
+            "top_errors": self._events.top_errors(),
+            "slow_ops": self._traces.slow_ops(),
+        }
+
+        # 构建 Agent 列表
+        for name, status in agent_status.items():
+            data["agents"].append({
+                "name": name,
+                "model": "claude-sonnet-4-6",
+                "tasks": 0,
+                "success_rate": 100,
+                "status": "running" if status.get('alive') else "stopped"
+            })
+            data["detailed_agents"].append({
+                "name": name,
+                "success_rate": 100,
+                "avg_response": 0,
+                "fail_reasons": []
+            })
+        return data
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """进程内共享的快照广播器"""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = SnapshotBroadcaster()
+        return _broadcaster
+
 
 class DashboardHandler(BaseHTTPRequestHandler):
     """Dashboard HTTP 处理器"""
@@ -28,6 +470,8 @@ class DashboardHandler(BaseHTTPRequestHandler):
             self.serve_events()
         elif parsed_path.path == '/api/agents':
             self.serve_agents()
+        elif parsed_path.path == '/api/score_series':
+            self.serve_score_series(parse_qs(parsed_path.query))
         elif parsed_path.path == '/api/sse':
             self.serve_sse()
         elif parsed_path.path == '/' or parsed_path.path == '/index.html':
@@ -142,12 +586,33 @@ class DashboardHandler(BaseHTTPRequestHandler):
             print(f"读取 Agent 列表失败: {e}")
             self.send_json({'agents': []})
     
-    def serve_sse(self):
-        """提供 SSE 实时数据推送（持续推送，接入所有数据源）"""
-        import psutil
+    def serve_score_series(self, query):
+        """提供 ScoreEngine 多分辨率评分序列（raw / 1m / 1h）"""
         import sys
-        import time
         sys.path.insert(0, str(AIOS_ROOT))
+        from core.score_series import RESOLUTIONS, load_series
+        
+        resolution = query.get('resolution', ['1m'])[0]
+        if resolution not in RESOLUTIONS:
+            self.send_error(400, f"Unknown resolution: {resolution}")
+            return
+        try:
+            limit = int(query.get('limit', ['60'])[0])
+        except ValueError:
+            limit = 60
+        
+        self.send_json({"resolution": resolution, "points": load_series(resolution, limit)})
+    
+    def serve_sse(self):
+        """提供 SSE 实时数据推送（订阅共享快照，不再每个连接各自读文件）
+
+        ?mode=full  （默认）每次推送完整 JSON，兼容旧前端的 onmessage
+        ?mode=patch 先推送 event: snapshot，之后只推送 event: patch（RFC 6902）
+        """
+        query = parse_qs(urlparse(self.path).query)
+        mode = query.get('mode', ['full'])[0]
+        if mode not in ('full', 'patch'):
+            mode = 'full'
         
         self.send_response(200)
         self.send_header('Content-type', 'text/event-stream')
@@ -156,156 +621,22 @@ class DashboardHandler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
         
+        broadcaster = get_broadcaster()
+        subscriber = broadcaster.subscribe(mode)
         try:
-            from agent_system.process_manager import AgentProcessManager
-            
-            # 持续推送数据（每 2 秒一次）
             while True:
-                manager = AgentProcessManager()
-                agent_status = manager.get_all_status()
-                
-                # 1. 统计活跃 Agent
-                active_agents = sum(1 for a in agent_status.values() if a.get('alive', False))
-                
-                # 2. 读取 Evolution Score（从 baseline）
-                evolution_score = 0
-                try:
-                    baseline_file = AIOS_ROOT / "learning" / "metrics_history.jsonl"
-                    if baseline_file.exists():
-                        with open(baseline_file, 'r', encoding='utf-8') as f:
-                            lines = f.readlines()
-                            if lines:
-                                last_line = json.loads(lines[-1])
-                                evolution_score = int(last_line.get('evolution_score', 0))
-                except:
-                    pass
-                
-                # 3. 统计今日改进次数（从 evolution 日志）
-                improvements_today = 0
                 try:
-                    evolution_dir = AIOS_ROOT / "agent_system" / "data" / "evolution" / "reports"
-                    if evolution_dir.exists():
-                        today = datetime.now().strftime("%Y-%m-%d")
-                        for report_file in evolution_dir.glob(f"cycle_{today}*.json"):
-                            improvements_today += 1
-                except:
-                    pass
-                
-                # 4. 统计成功率（从 events.jsonl）
-                success_rate = 0
-                try:
-                    events_file = AIOS_ROOT.parent / "events.jsonl"
-                    if events_file.exists():
-                        with open(events_file, 'r', encoding='utf-8') as f:
-                            lines = f.readlines()[-100:]  # 最近 100 条
-                            total = len(lines)
-                            success = sum(1 for line in lines if '"level":"info"' in line or '"success":true' in line)
-                            if total > 0:
-                                success_rate = int((success / total) * 100)
-                except:
-                    pass
-                
-                # 5. 统计 Top 5 错误
-                top_errors = []
-                try:
-                    events_file = AIOS_ROOT.parent / "events.jsonl"
-                    if events_file.exists():
-                        error_counts = {}
-                        with open(events_file, 'r', encoding='utf-8') as f:
-                            lines = f.readlines()[-500:]  # 最近 500 条
-                            for line in lines:
-                                if '"level":"error"' in line:
-                                    try:
-                                        event = json.loads(line)
-                                        error_type = event.get('error_type', 'Unknown')
-                                        error_counts[error_type] = error_counts.get(error_type, 0) + 1
-                                    except:
-                                        pass
-                        
-                        # 排序取 Top 5
-                        sorted_errors = sorted(error_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-                        top_errors = [{"name": name, "count": count} for name, count in sorted_errors]
-                except:
-                    pass
-                
-                # 6. 统计慢操作 Top 10
-                slow_ops = []
-                try:
-                    traces_dir = AIOS_ROOT / "observability" / "traces"
-                    if traces_dir.exists():
-                        op_times = {}
-                        for trace_file in sorted(traces_dir.glob("trace_*.json"), key=os.path.getmtime, reverse=True)[:50]:
-                            try:
-                                with open(trace_file, 'r', encoding='utf-8') as f:
-                                    trace = json.load(f)
-                                    for span in trace.get('spans', []):
-                                        op_name = span.get('name', 'Unknown')
-                                        duration = span.get('duration_ms', 0)
-                                        if duration > 100:  # 只统计 >100ms 的操作
-                                            if op_name not in op_times:
-                                                op_times[op_name] = {'total': 0, 'count': 0}
-                                            op_times[op_name]['total'] += duration
-                                            op_times[op_name]['count'] += 1
-                            except:
-                                pass
-                        
-                        # 计算平均时间并排序
-                        for op, stats in op_times.items():
-                            avg_time = int(stats['total'] / stats['count'])
-                            slow_ops.append({"op": op, "time": avg_time, "count": stats['count']})
-                        
-                        slow_ops = sorted(slow_ops, key=lambda x: x['time'], reverse=True)[:10]
-                except:
-                    pass
-                
-                # 构建完整数据
-                data = {
-                    "active_agents": active_agents,
-                    "evolution_score": evolution_score,
-                    "improvements_today": improvements_today,
-                    "success_rate": success_rate,
-                    "cpu": int(psutil.cpu_percent(interval=0.1)),
-                    "mem": int(psutil.virtual_memory().percent),
-                    "disk": int(psutil.disk_usage('/').percent),
-                    "gpu": None,
-                    "trend_success": [98, 97, 99, 98, 100],
-                    "trend_evolution": [85, 87, 86, 88, 90],
-                    "agents": [],
-                    "detailed_agents": [],
-                    "top_errors": top_errors,
-                    "slow_ops": slow_ops
-                }
-                
-                # 构建 Agent 列表
-                for name, status in agent_status.items():
-                    data["agents"].append({
-                        "name": name,
-                        "model": "claude-sonnet-4-6",
-                        "tasks": 0,
-                        "success_rate": 100,
-                        "status": "running" if status.get('alive') else "stopped"
-                    })
-                    
-                    # 详细信息
-                    data["detailed_agents"].append({
-                        "name": name,
-                        "success_rate": 100,
-                        "avg_response": 0,
-                        "fail_reasons": []
-                    })
-                
-                # 发送数据
-                message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                    message = subscriber.get(timeout=SSE_KEEPALIVE_SEC)
+                except queue.Empty:
+                    message = ": keepalive\n\n"
+                if message is None:  # 广播器已停止
+                    break
                 self.wfile.write(message.encode('utf-8'))
                 self.wfile.flush()
-                
-                # 等待 2 秒
-                time.sleep(2)
-        
-        except Exception as e:
-            print(f"SSE 推送失败: {e}")
-            import traceback
-            traceback.print_exc()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 浏览器断开
+        finally:
+            broadcaster.unsubscribe(subscriber)
     
     def handle_agent_control(self, agent_name, action):
         """真实调用 agent_system 启停逻辑（通过 Orchestrator）"""
@@ -440,7 +771,9 @@ class DashboardHandler(BaseHTTPRequestHandler):
 def start_dashboard(port=8080):
     """启动 Dashboard 服务器"""
     server_address = ('', port)
-    httpd = HTTPServer(server_address, DashboardHandler)
+    # 每个连接一个轻量线程；SSE 线程只阻塞在自己的队列上，数据由广播器统一计算
+    httpd = ThreadingHTTPServer(server_address, DashboardHandler)
+    httpd.daemon_threads = True
     
     print(f"AIOS Dashboard 启动成功!")
     print(f"访问地址: http://localhost:{port}")
@@ -451,7 +784,8 @@ def start_dashboard(port=8080):
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nDashboard 服务器已停止")
-        httpd.shutdown()
+        get_broadcaster().stop()
+        httpd.server_close()
 
 
 if __name__ == "__main__":
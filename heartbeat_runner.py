@@ -18,6 +18,7 @@ from core.event_bus import EventBus
 from core.production_scheduler import get_scheduler, Priority
 from core.production_reactor import get_reactor
 from core.toy_score_engine import ToyScoreEngine
+from core.score_series import DEFAULT_SERIES_PATH
 from core.notification_handler import start_notification_handler
 
 
@@ -39,7 +40,7 @@ def run_heartbeat():
     reactor = get_reactor()
     
     # 启动 Score Engine（暂时保留旧版）
-    score_engine = ToyScoreEngine(bus=bus)
+    score_engine = ToyScoreEngine(bus=bus, series_path=DEFAULT_SERIES_PATH)
     score_engine.start()
     
     # 启动通知处理器
@@ -96,6 +97,7 @@ def run_heartbeat():
     
     # 检查评分
     current_score = score_engine.get_score()
+    score_engine.stop()  # 一次性心跳：退出前把评分序列写盘
     
     # 获取 Scheduler 状态
     scheduler_status = scheduler.get_status()
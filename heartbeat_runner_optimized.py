@@ -25,6 +25,7 @@ from core.event_bus import EventBus
 from core.production_scheduler import get_scheduler, Priority
 from core.production_reactor import get_reactor
 from core.toy_score_engine import ToyScoreEngine
+from core.score_series import DEFAULT_SERIES_PATH
 from core.notification_handler import start_notification_handler
 from performance_monitor import get_monitor
 
@@ -82,7 +83,9 @@ def get_or_create_components():
         _cached_components["reactor"] = get_reactor()
     
     if not _cached_components["score_engine"]:
-        _cached_components["score_engine"] = ToyScoreEngine(bus=_cached_components["bus"])
+        _cached_components["score_engine"] = ToyScoreEngine(
+            bus=_cached_components["bus"], series_path=DEFAULT_SERIES_PATH
+        )
         _cached_components["score_engine"].start()
     
     if not _cached_components["notification_handler"]:
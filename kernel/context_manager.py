@@ -20,17 +20,165 @@ Usage:
     # Switch between agents (save current, restore next)
     cm.switch("coder-001", "analyst-002")
 
-    # Snapshot for persistence
-    cm.snapshot("coder-001", "/path/to/snapshots/")
+    # Snapshot for persistence (delta since the last snapshot)
+    cm.snapshot("coder-001")
+
+restore() returns a copy-on-write view of the saved state, so a switch costs
+a shallow copy of the top-level keys, not a deep copy. Snapshots are binary
+records (msgpack when installed, compact JSON otherwise) appended to
+<agent_id>.ctx: a full checkpoint followed by deltas that carry only changed
+state keys and new messages; every CHECKPOINT_EVERY deltas the file is
+rewritten as one checkpoint. Loading mmaps the file and decodes from the
+last checkpoint only.
 """
 from __future__ import annotations
 
 import json
+import mmap
+import os
+import struct
 import time
-import copy
+from collections import deque
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SNAPSHOT_SUFFIX = ".ctx"
+CHECKPOINT_EVERY = 20  # deltas between full checkpoints
+SWITCH_LOG_SIZE = 1000
+
+# record header: payload length, kind, codec
+_HEADER = struct.Struct(">IBB")
+_FULL, _DELTA = 0, 1
+_CODEC_JSON, _CODEC_MSGPACK = 0, 1
+
+# AgentContext fields carried verbatim in every delta
+_SCALAR_FIELDS = (
+    "llm_calls", "actions_taken", "tokens_used", "memory_bytes",
+    "created_at", "updated_at", "suspended_at", "status",
+    "max_messages", "max_tokens", "max_actions",
+)
+
+
+def _encode(obj: Any) -> Tuple[int, bytes]:
+    if msgpack is not None:
+        return _CODEC_MSGPACK, msgpack.packb(obj, use_bin_type=True)
+    return _CODEC_JSON, json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(codec: int, payload: bytes) -> Any:
+    if codec == _CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("snapshot was written with msgpack, which is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+_CONTAINERS = (dict, list, tuple)
+
+
+def _cow(value: Any) -> Any:
+    if isinstance(value, dict):
+        return CowDict(value)
+    if isinstance(value, list):
+        return [_cow(v) for v in value]
+    if isinstance(value, tuple):
+        items = [_cow(v) for v in value]
+        if all(a is b for a, b in zip(items, value)):
+            return value  # nothing mutable inside
+        return type(value)(*items) if hasattr(value, "_fields") else type(value)(items)
+    return value
+
+
+class CowDict(dict):
+    """
+    Copy-on-write view of saved state.
+
+    Construction copies only the top-level keys; nested dicts/lists (and
+    tuples holding them) stay shared with the saved state until they are
+    read through the view, at which point that child (one level) is copied.
+    Writes to the view never reach the saved state.
+
+    Overriding __iter__ makes dict(view), {**view}, view | other and
+    dict.update(view) read through __getitem__ instead of copying the raw
+    (shared) values.
+    """
+
+    __slots__ = ("_owned",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._owned: set = set()
+
+    def _own(self, key: Any, value: Any) -> Any:
+        if key in self._owned or not isinstance(value, _CONTAINERS):
+            return value
+        value = _cow(value)
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+        return value
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        return iter(dict.keys(self))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owned.discard(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        if not dict.__len__(self):
+            raise KeyError("popitem(): dictionary is empty")
+        key = next(reversed(dict.keys(self)))
+        return key, self.pop(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def values(self):
+        return [self[k] for k in dict.keys(self)]
+
+    def items(self):
+        return [(k, self[k]) for k in dict.keys(self)]
+
+    def copy(self):
+        return CowDict(self.items())
+
+    def __reduce__(self):
+        return (CowDict, (dict(self.items()),))
 
 
 @dataclass
@@ -59,6 +207,9 @@ class AgentContext:
     max_tokens: int = 50000
     max_actions: int = 200
 
+    # Messages appended since creation/load (lets snapshots write only new ones)
+    _appended: int = field(default=0, init=False, repr=False, compare=False)
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "agent_id": self.agent_id,
@@ -105,6 +256,7 @@ class AgentContext:
             "content": content,
             "ts": time.time(),
         })
+        self._appended += 1
         if len(self.messages) > self.max_messages:
             self.messages = self.messages[-self.max_messages:]
         self.updated_at = time.time()
@@ -134,7 +286,10 @@ class ContextManager:
     def __init__(self, snapshot_dir: Optional[Path] = None):
         self._contexts: Dict[str, AgentContext] = {}
         self._active_agent: Optional[str] = None
-        self._switch_log: List[Dict[str, Any]] = []
+        self._switch_log: Deque[Dict[str, Any]] = deque(maxlen=SWITCH_LOG_SIZE)
+        self._switch_count = 0
+        self._spilled: set = set()  # snapshotted to disk and dropped from memory
+        self._snap_marks: Dict[str, Dict[str, Any]] = {}  # what the .ctx file already holds
 
         if snapshot_dir is None:
             snapshot_dir = Path(__file__).resolve().parent.parent / "data" / "contexts"
@@ -171,11 +326,17 @@ class ContextManager:
         return ctx
 
     def get(self, agent_id: str) -> Optional[AgentContext]:
-        """Get an agent's context."""
-        return self._contexts.get(agent_id)
+        """Get an agent's context (spilled contexts are reloaded from disk)."""
+        ctx = self._contexts.get(agent_id)
+        if ctx is None and agent_id in self._spilled:
+            self._spilled.discard(agent_id)
+            ctx = self.load_snapshot(agent_id)
+        return ctx
 
     def destroy(self, agent_id: str) -> bool:
         """Destroy an agent's context."""
+        self._spilled.discard(agent_id)
+        self._snap_marks.pop(agent_id, None)
         if agent_id in self._contexts:
             self._contexts[agent_id].status = "terminated"
             del self._contexts[agent_id]
@@ -211,7 +372,7 @@ class ContextManager:
         Save agent state for preemption.
         Merges extra_state into the context's state dict.
         """
-        ctx = self._contexts.get(agent_id)
+        ctx = self.get(agent_id)
         if ctx is None:
             return False
 
@@ -225,16 +386,16 @@ class ContextManager:
     def restore(self, agent_id: str) -> Optional[Dict[str, Any]]:
         """
         Restore agent state after preemption.
-        Returns the saved state dict.
+        Returns a copy-on-write view of the saved state (see CowDict).
         """
-        ctx = self._contexts.get(agent_id)
+        ctx = self.get(agent_id)
         if ctx is None:
             return None
 
         ctx.status = "active"
         ctx.suspended_at = None
         ctx.updated_at = time.time()
-        return copy.deepcopy(ctx.state)
+        return CowDict(ctx.state)
 
     # ------------------------------------------------------------------
     # Context switching
@@ -254,13 +415,13 @@ class ContextManager:
             The restored state of to_agent, or None on failure.
         """
         # Save current
-        if from_agent in self._contexts:
-            self.save(from_agent, save_state)
+        self.save(from_agent, save_state)
 
         # Restore target
         restored = self.restore(to_agent)
         if restored is not None:
             self._active_agent = to_agent
+            self._switch_count += 1
             self._switch_log.append({
                 "from": from_agent,
                 "to": to_agent,
@@ -274,30 +435,156 @@ class ContextManager:
 
     @property
     def switch_count(self) -> int:
-        return len(self._switch_log)
+        return self._switch_count
+
+    def recent_switches(self, n: int = 20) -> List[Dict[str, Any]]:
+        """Most recent switches (the log keeps the last SWITCH_LOG_SIZE)."""
+        return list(self._switch_log)[-n:]
 
     # ------------------------------------------------------------------
     # Snapshot / Persist (disk-level)
     # ------------------------------------------------------------------
 
     def snapshot(self, agent_id: str) -> bool:
-        """Save context to disk for crash recovery."""
+        """
+        Save context to disk for crash recovery.
+
+        Appends a delta (changed state keys, new messages, counters) to the
+        agent's .ctx file; writes a full checkpoint the first time and every
+        CHECKPOINT_EVERY deltas. Unchanged contexts are not written.
+        """
         ctx = self._contexts.get(agent_id)
         if ctx is None:
             return False
 
-        path = self._snapshot_dir / f"{agent_id}.json"
         try:
-            path.write_text(
-                json.dumps(ctx.to_dict(), ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+            mark = self._snap_marks.get(agent_id)
+            delta = None
+            if mark is not None and mark["deltas"] < CHECKPOINT_EVERY:
+                delta = self._delta(ctx, mark)
+            if delta is None:
+                self._write_checkpoint(ctx)
+            elif delta:
+                self._append_record(agent_id, _DELTA, delta)
+                mark["deltas"] += 1
+            self._mark(ctx, self._snap_marks[agent_id])
             return True
         except Exception:
+            self._snap_marks.pop(agent_id, None)  # next snapshot starts from a checkpoint
             return False
 
+    def _snapshot_path(self, agent_id: str) -> Path:
+        return self._snapshot_dir / f"{agent_id}{SNAPSHOT_SUFFIX}"
+
+    @staticmethod
+    def _digests(values: Dict[str, Any]) -> Dict[str, int]:
+        return {k: hash(_encode(v)[1]) for k, v in values.items()}
+
+    def _mark(self, ctx: AgentContext, mark: Dict[str, Any]) -> None:
+        """Remember what the file now holds, to diff the next snapshot against."""
+        mark["state"] = self._digests(ctx.state)
+        mark["metadata"] = hash(_encode(ctx.metadata)[1])
+        mark["scalars"] = tuple(getattr(ctx, f) for f in _SCALAR_FIELDS)
+        mark["appended"] = ctx._appended
+        mark["last_msg"] = ctx.messages[-1] if ctx.messages else None
+
+    def _delta(self, ctx: AgentContext, mark: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Changes since the last snapshot; None when only a checkpoint can express them."""
+        # new messages must sit right after the last one already written
+        new = ctx._appended - mark["appended"]
+        msgs = ctx.messages
+        if new < 0 or new > len(msgs):
+            return None
+        before = msgs[len(msgs) - new - 1] if len(msgs) > new else None
+        if before is not mark["last_msg"]:
+            return None
+
+        digests = self._digests(ctx.state)
+        old = mark["state"]
+        changed = {k: ctx.state[k] for k, d in digests.items() if old.get(k) != d}
+        removed = [k for k in old if k not in digests]
+        scalars = tuple(getattr(ctx, f) for f in _SCALAR_FIELDS)
+        metadata = hash(_encode(ctx.metadata)[1])
+
+        if not (new or changed or removed or scalars != mark["scalars"] or metadata != mark["metadata"]):
+            return {}
+        delta: Dict[str, Any] = {"fields": dict(zip(_SCALAR_FIELDS, scalars))}
+        if changed:
+            delta["state"] = changed
+        if removed:
+            delta["removed"] = removed
+        if metadata != mark["metadata"]:
+            delta["metadata"] = ctx.metadata
+        if new:
+            delta["messages"] = msgs[len(msgs) - new:]
+        return delta
+
+    def _write_checkpoint(self, ctx: AgentContext) -> None:
+        codec, payload = _encode(ctx.to_dict())
+        path = self._snapshot_path(ctx.agent_id)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(_HEADER.pack(len(payload), _FULL, codec) + payload)
+        os.replace(tmp, path)
+        self._snap_marks[ctx.agent_id] = {"deltas": 0}
+
+    def _append_record(self, agent_id: str, kind: int, obj: Dict[str, Any]) -> None:
+        codec, payload = _encode(obj)
+        with open(self._snapshot_path(agent_id), "ab") as f:
+            f.write(_HEADER.pack(len(payload), kind, codec) + payload)
+
+    @staticmethod
+    def _read_records(path: Path) -> List[Tuple[int, int, bytes]]:
+        """Records from the last full checkpoint on; a torn tail is ignored."""
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                spans, pos, size = [], 0, len(mm)
+                while pos + _HEADER.size <= size:
+                    length, kind, codec = _HEADER.unpack_from(mm, pos)
+                    end = pos + _HEADER.size + length
+                    if end > size:
+                        break
+                    if kind == _FULL:
+                        spans = []
+                    spans.append((kind, codec, pos + _HEADER.size, end))
+                    pos = end
+                return [(kind, codec, mm[start:end]) for kind, codec, start, end in spans]
+
     def load_snapshot(self, agent_id: str) -> Optional[AgentContext]:
-        """Load context from disk snapshot."""
+        """Load context from disk snapshot (last checkpoint + deltas)."""
+        path = self._snapshot_path(agent_id)
+        if not path.exists():
+            return self._load_json_snapshot(agent_id)
+
+        try:
+            records = self._read_records(path)
+            if not records or records[0][0] != _FULL:
+                return None
+            ctx = AgentContext.from_dict(_decode(records[0][1], records[0][2]))
+            for _, codec, payload in records[1:]:
+                delta = _decode(codec, payload)
+                for key, value in delta["fields"].items():
+                    setattr(ctx, key, value)
+                ctx.state.update(delta.get("state", {}))
+                for key in delta.get("removed", ()):
+                    ctx.state.pop(key, None)
+                if "metadata" in delta:
+                    ctx.metadata = delta["metadata"]
+                if "messages" in delta:
+                    ctx.messages.extend(delta["messages"])
+                    if len(ctx.messages) > ctx.max_messages:
+                        ctx.messages = ctx.messages[-ctx.max_messages:]
+            self._contexts[agent_id] = ctx
+            self._spilled.discard(agent_id)
+            mark = self._snap_marks[agent_id] = {"deltas": len(records) - 1}
+            self._mark(ctx, mark)
+            return ctx
+        except Exception:
+            return None
+
+    def _load_json_snapshot(self, agent_id: str) -> Optional[AgentContext]:
+        """Snapshots written before the .ctx format."""
         path = self._snapshot_dir / f"{agent_id}.json"
         if not path.exists():
             return None
@@ -306,6 +593,7 @@ class ContextManager:
             data = json.loads(path.read_text(encoding="utf-8"))
             ctx = AgentContext.from_dict(data)
             self._contexts[agent_id] = ctx
+            self._spilled.discard(agent_id)
             return ctx
         except Exception:
             return None
@@ -319,21 +607,37 @@ class ContextManager:
         return count
 
     def load_all_snapshots(self) -> int:
-        """Load all snapshots from disk. Returns count loaded."""
+        """
+        Register all snapshots on disk. Returns count found.
+        Contexts are decoded lazily, on first get().
+        """
         count = 0
-        for path in self._snapshot_dir.glob("*.json"):
+        for path in list(self._snapshot_dir.glob(f"*{SNAPSHOT_SUFFIX}")) + list(self._snapshot_dir.glob("*.json")):
             agent_id = path.stem
-            if self.load_snapshot(agent_id):
-                count += 1
+            if agent_id in self._contexts or agent_id in self._spilled:
+                continue
+            self._spilled.add(agent_id)
+            count += 1
         return count
 
+    def spill(self, agent_id: str) -> bool:
+        """
+        Snapshot a context to disk and drop it from memory (e.g. when the
+        MemoryManager evicts the agent). get() reloads it on next use.
+        """
+        if agent_id not in self._contexts or not self.snapshot(agent_id):
+            return False
+        del self._contexts[agent_id]
+        self._spilled.add(agent_id)
+        return True
+
     # ------------------------------------------------------------------
     # Resource enforcement
     # ------------------------------------------------------------------
 
     def check_limits(self, agent_id: str) -> Dict[str, Any]:
         """Check if agent is within resource limits."""
-        ctx = self._contexts.get(agent_id)
+        ctx = self.get(agent_id)
         if ctx is None:
             return {"exists": False}
 
@@ -350,7 +654,7 @@ class ContextManager:
         Enforce limits. Returns violation type or None if OK.
         Suspends agent if limits exceeded.
         """
-        ctx = self._contexts.get(agent_id)
+        ctx = self.get(agent_id)
         if ctx is None:
             return None
 
@@ -373,8 +677,9 @@ class ContextManager:
             "total_contexts": len(self._contexts),
             "active": active,
             "suspended": suspended,
+            "spilled": len(self._spilled),
             "active_agent": self._active_agent,
-            "switch_count": len(self._switch_log),
+            "switch_count": self._switch_count,
             "total_tokens": sum(c.tokens_used for c in self._contexts.values()),
             "total_actions": sum(c.actions_taken for c in self._contexts.values()),
         }
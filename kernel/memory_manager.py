@@ -18,13 +18,32 @@ Usage:
     mm.release("coder-001", size_bytes=512*1024)
 
     # Evict under pressure
-    evicted = mm.evict_lru(target_free_mb=100)
+    evicted = mm.evict_lru(target_free_bytes=100 * 1024 * 1024)
+
+    # Background eviction between watermarks, spilling evicted agents' contexts
+    mm = MemoryManager(global_limit_mb=512, high_watermark=0.9, low_watermark=0.75)
+    mm.spill_contexts(context_manager)
+
+No operation scans the registered agents: agents holding memory sit on an
+intrusive doubly-linked LRU list (touch = move to tail, evict = pop head,
+both O(1)), top() reads a lazily-invalidated max-heap, and usage is
+accounted per power-of-two size class. Per-agent updates take one of
+LOCK_STRIPES locks; the shared totals / LRU / classes sit behind a short
+global lock.
 """
 from __future__ import annotations
 
+import heapq
+import threading
 import time
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+LOCK_STRIPES = 64
+EVICTION_LOG_SIZE = 1000
+
+EvictCallback = Callable[[str, int], None]
 
 
 @dataclass
@@ -40,6 +59,13 @@ class AgentMemoryBlock:
     last_access: float = field(default_factory=time.time)
     created_at: float = field(default_factory=time.time)
 
+    # Intrusive LRU links and size class, owned by MemoryManager
+    _prev: Optional["AgentMemoryBlock"] = field(default=None, init=False, repr=False, compare=False)
+    _next: Optional["AgentMemoryBlock"] = field(default=None, init=False, repr=False, compare=False)
+    _linked: bool = field(default=False, init=False, repr=False, compare=False)
+    _size_class: int = field(default=0, init=False, repr=False, compare=False)
+    _heap_seq: int = field(default=0, init=False, repr=False, compare=False)
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "agent_id": self.agent_id,
@@ -62,16 +88,42 @@ class MemoryManager:
     Responsibilities:
     - Per-agent memory allocation tracking
     - Quota enforcement (per-agent and global)
-    - LRU eviction under memory pressure
+    - LRU eviction under memory pressure (on demand or between watermarks)
     - Usage statistics and monitoring
     """
 
-    def __init__(self, global_limit_mb: float = 512.0):
+    def __init__(
+        self,
+        global_limit_mb: float = 512.0,
+        high_watermark: Optional[float] = None,
+        low_watermark: Optional[float] = None,
+    ):
+        """
+        Args:
+            global_limit_mb: Global memory limit.
+            high_watermark: Utilization fraction (0-1) that wakes the background
+                evictor. None disables background eviction.
+            low_watermark: Fraction the evictor frees down to (default: high - 0.1).
+        """
         self._blocks: Dict[str, AgentMemoryBlock] = {}
         self._global_limit = int(global_limit_mb * 1024 * 1024)
         self._total_allocated: int = 0
-        self._eviction_log: List[Dict[str, Any]] = []
-        
+        self._evictions: int = 0
+        self._eviction_log: Deque[Dict[str, Any]] = deque(maxlen=EVICTION_LOG_SIZE)
+        self._evict_callbacks: List[EvictCallback] = []
+
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._lock = threading.Lock()  # totals, counters, LRU list, size classes
+        self._lru_head: Optional[AgentMemoryBlock] = None
+        self._lru_tail: Optional[AgentMemoryBlock] = None
+        # size class c holds agents with 2**(c-1) <= allocated_bytes < 2**c
+        self._classes: List[Dict[str, AgentMemoryBlock]] = [{}]
+        self._class_bytes: List[int] = [0]
+        # max-heap of (-allocated_bytes, seq, agent_id); an entry is live while
+        # seq == block._heap_seq, stale ones are skipped and compacted away
+        self._heap: List[Tuple[int, int, str]] = []
+        self._heap_seq: int = 0
+
         # Cached stats (updated on alloc/release)
         self._total_allocs: int = 0
         self._total_releases: int = 0
@@ -79,6 +131,92 @@ class MemoryManager:
         self._stats_cache_ts: float = 0.0
         self._stats_cache_ttl: float = 5.0  # 5 seconds
 
+        self._high_watermark = high_watermark
+        self._low_watermark = low_watermark
+        if high_watermark is not None and low_watermark is None:
+            self._low_watermark = max(0.0, high_watermark - 0.1)
+        self._pressure = threading.Event()
+        self._closed = False
+        self._evictor: Optional[threading.Thread] = None
+        if high_watermark is not None:
+            self._evictor = threading.Thread(
+                target=self._evict_loop, name="mm-evictor", daemon=True
+            )
+            self._evictor.start()
+
+    def _stripe(self, agent_id: str) -> threading.Lock:
+        return self._stripes[hash(agent_id) % LOCK_STRIPES]
+
+    # ------------------------------------------------------------------
+    # LRU list and size classes (caller holds self._lock)
+    # ------------------------------------------------------------------
+
+    def _unlink(self, block: AgentMemoryBlock) -> None:
+        if not block._linked:
+            return
+        if block._prev is None:
+            self._lru_head = block._next
+        else:
+            block._prev._next = block._next
+        if block._next is None:
+            self._lru_tail = block._prev
+        else:
+            block._next._prev = block._prev
+        block._prev = block._next = None
+        block._linked = False
+
+    def _touch(self, block: AgentMemoryBlock) -> None:
+        """Move to the most-recently-used end; agents holding nothing leave the list."""
+        self._unlink(block)
+        if block.allocated_bytes == 0:
+            return
+        block._prev = self._lru_tail
+        if self._lru_tail is None:
+            self._lru_head = block
+        else:
+            self._lru_tail._next = block
+        self._lru_tail = block
+        block._linked = True
+
+    def _reclass(self, block: AgentMemoryBlock, old_bytes: int) -> None:
+        new_class = block.allocated_bytes.bit_length()
+        self._class_bytes[block._size_class] -= old_bytes
+        if new_class != block._size_class:
+            self._classes[block._size_class].pop(block.agent_id, None)
+            while len(self._classes) <= new_class:
+                self._classes.append({})
+                self._class_bytes.append(0)
+            self._classes[new_class][block.agent_id] = block
+            block._size_class = new_class
+        self._class_bytes[new_class] += block.allocated_bytes
+
+    def _apply(self, block: AgentMemoryBlock, new_bytes: int) -> None:
+        """Set one agent's allocation (caller holds its stripe and self._lock)."""
+        old = block.allocated_bytes
+        block.allocated_bytes = new_bytes
+        block.last_access = time.time()
+        self._total_allocated += new_bytes - old
+        self._reclass(block, old)
+        self._touch(block)
+        if new_bytes != old:
+            self._heap_seq += 1
+            block._heap_seq = self._heap_seq
+            if new_bytes:
+                heapq.heappush(self._heap, (-new_bytes, self._heap_seq, block.agent_id))
+            if len(self._heap) > 2 * len(self._blocks) + 64:
+                self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [
+            (-b.allocated_bytes, b._heap_seq, b.agent_id)
+            for b in self._blocks.values() if b.allocated_bytes
+        ]
+        heapq.heapify(self._heap)
+
+    def _heap_live(self, entry: Tuple[int, int, str]) -> bool:
+        block = self._blocks.get(entry[2])
+        return block is not None and block._heap_seq == entry[1]
+
     # ------------------------------------------------------------------
     # Allocation
     # ------------------------------------------------------------------
@@ -89,15 +227,18 @@ class MemoryManager:
         quota_mb: float = 0,
     ) -> AgentMemoryBlock:
         """Register an agent with optional memory quota."""
-        if agent_id in self._blocks:
-            return self._blocks[agent_id]
-
-        block = AgentMemoryBlock(
-            agent_id=agent_id,
-            quota_bytes=int(quota_mb * 1024 * 1024) if quota_mb > 0 else 0,
-        )
-        self._blocks[agent_id] = block
-        return block
+        with self._stripe(agent_id):
+            if agent_id in self._blocks:
+                return self._blocks[agent_id]
+
+            block = AgentMemoryBlock(
+                agent_id=agent_id,
+                quota_bytes=int(quota_mb * 1024 * 1024) if quota_mb > 0 else 0,
+            )
+            self._blocks[agent_id] = block
+            with self._lock:
+                self._classes[0][agent_id] = block
+            return block
 
     def allocate(self, agent_id: str, size_bytes: int) -> Tuple[bool, str]:
         """
@@ -106,31 +247,29 @@ class MemoryManager:
         Returns:
             (success, reason)
         """
-        if agent_id not in self._blocks:
-            self.register(agent_id)
-
-        block = self._blocks[agent_id]
-
-        # Check per-agent quota
-        if block.quota_bytes > 0:
-            if block.allocated_bytes + size_bytes > block.quota_bytes:
-                return False, f"agent quota exceeded ({block.allocated_bytes + size_bytes} > {block.quota_bytes})"
-
-        # Check global limit
-        if self._total_allocated + size_bytes > self._global_limit:
-            return False, f"global limit exceeded ({self._total_allocated + size_bytes} > {self._global_limit})"
-
-        block.allocated_bytes += size_bytes
-        block.alloc_count += 1
-        block.last_access = time.time()
-        if block.allocated_bytes > block.peak_bytes:
-            block.peak_bytes = block.allocated_bytes
-        self._total_allocated += size_bytes
-        
-        # Update cached stats
-        self._total_allocs += 1
+        block = self._blocks.get(agent_id) or self.register(agent_id)
+
+        with self._stripe(agent_id):
+            # Check per-agent quota
+            if block.quota_bytes > 0:
+                if block.allocated_bytes + size_bytes > block.quota_bytes:
+                    return False, f"agent quota exceeded ({block.allocated_bytes + size_bytes} > {block.quota_bytes})"
+
+            # Check global limit
+            with self._lock:
+                if self._total_allocated + size_bytes > self._global_limit:
+                    return False, f"global limit exceeded ({self._total_allocated + size_bytes} > {self._global_limit})"
+                self._apply(block, block.allocated_bytes + size_bytes)
+                self._total_allocs += 1
+
+            block.alloc_count += 1
+            if block.allocated_bytes > block.peak_bytes:
+                block.peak_bytes = block.allocated_bytes
+
+        # Invalidate cached stats
         self._stats_cache = None  # Invalidate cache
-        
+        self._check_pressure()
+
         return True, "ok"
 
     def release(self, agent_id: str, size_bytes: int) -> bool:
@@ -139,16 +278,16 @@ class MemoryManager:
         if block is None:
             return False
 
-        actual = min(size_bytes, block.allocated_bytes)
-        block.allocated_bytes -= actual
-        block.release_count += 1
-        block.last_access = time.time()
-        self._total_allocated -= actual
-        
-        # Update cached stats
-        self._total_releases += 1
+        with self._stripe(agent_id):
+            actual = min(size_bytes, block.allocated_bytes)
+            block.release_count += 1
+            with self._lock:
+                self._apply(block, block.allocated_bytes - actual)
+                self._total_releases += 1
+
+        # Invalidate cached stats
         self._stats_cache = None  # Invalidate cache
-        
+
         return True
 
     def release_all(self, agent_id: str) -> int:
@@ -157,17 +296,23 @@ class MemoryManager:
         if block is None:
             return 0
 
-        freed = block.allocated_bytes
-        self._total_allocated -= freed
-        block.allocated_bytes = 0
-        block.release_count += 1
-        block.last_access = time.time()
+        with self._stripe(agent_id):
+            freed = block.allocated_bytes
+            block.release_count += 1
+            with self._lock:
+                self._apply(block, 0)
+        self._stats_cache = None
         return freed
 
     def unregister(self, agent_id: str) -> int:
         """Unregister agent and free all memory. Returns bytes freed."""
         freed = self.release_all(agent_id)
-        self._blocks.pop(agent_id, None)
+        with self._stripe(agent_id):
+            block = self._blocks.pop(agent_id, None)
+            if block is not None:
+                with self._lock:
+                    self._unlink(block)
+                    self._classes[block._size_class].pop(agent_id, None)
         return freed
 
     # ------------------------------------------------------------------
@@ -185,6 +330,7 @@ class MemoryManager:
     def set_global_limit(self, limit_mb: float) -> None:
         """Update global memory limit."""
         self._global_limit = int(limit_mb * 1024 * 1024)
+        self._check_pressure()
 
     # ------------------------------------------------------------------
     # Eviction
@@ -198,45 +344,96 @@ class MemoryManager:
         Returns:
             List of evicted agent_ids.
         """
-        if not self._blocks:
-            return []
-
         if target_free_bytes is None:
             target_free_bytes = 0
 
-        free_space = self._global_limit - self._total_allocated
-        if free_space >= target_free_bytes and target_free_bytes > 0:
+        if target_free_bytes > 0 and self.free_bytes >= target_free_bytes:
             return []
 
-        # Sort by last_access (oldest first)
-        sorted_agents = sorted(
-            self._blocks.values(),
-            key=lambda b: b.last_access,
-        )
-
         evicted = []
-        for block in sorted_agents:
-            if block.allocated_bytes == 0:
-                continue
-
-            freed = block.allocated_bytes
-            self._total_allocated -= freed
-            block.allocated_bytes = 0
-            evicted.append(block.agent_id)
-
-            self._eviction_log.append({
-                "agent_id": block.agent_id,
-                "freed_bytes": freed,
-                "ts": time.time(),
-            })
-
-            free_space = self._global_limit - self._total_allocated
-            if target_free_bytes > 0 and free_space >= target_free_bytes:
+        while True:
+            victim = self._evict_one()
+            if victim is None:
                 break
-            if target_free_bytes == 0 and evicted:
+            evicted.append(victim)
+            if target_free_bytes == 0:
                 break  # just evict one
+            if self._global_limit - self._total_allocated >= target_free_bytes:
+                break
 
-        return evicted
+        # Callbacks run outside all locks
+        for agent_id, freed in evicted:
+            for callback in self._evict_callbacks:
+                try:
+                    callback(agent_id, freed)
+                except Exception as e:
+                    print(f"[MemoryManager] evict callback failed for {agent_id}: {e}")
+        return [agent_id for agent_id, _ in evicted]
+
+    def _evict_one(self) -> Optional[Tuple[str, int]]:
+        """Pop the LRU head and free it. O(1)."""
+        while True:
+            with self._lock:
+                block = self._lru_head
+                if block is None:
+                    return None
+                self._unlink(block)
+            with self._stripe(block.agent_id):
+                freed = block.allocated_bytes
+                if freed == 0 or self._blocks.get(block.agent_id) is not block:
+                    continue  # released or unregistered since it was popped
+                with self._lock:
+                    self._apply(block, 0)
+                    self._evictions += 1
+                    self._eviction_log.append({
+                        "agent_id": block.agent_id,
+                        "freed_bytes": freed,
+                        "ts": time.time(),
+                    })
+            self._stats_cache = None
+            return block.agent_id, freed
+
+    def on_evict(self, callback: EvictCallback) -> None:
+        """Register callback(agent_id, freed_bytes), called after each eviction."""
+        self._evict_callbacks.append(callback)
+
+    def spill_contexts(self, context_manager: Any) -> None:
+        """Spill an evicted agent's context to disk via ContextManager.spill()."""
+        self.on_evict(lambda agent_id, _freed: context_manager.spill(agent_id))
+
+    # ------------------------------------------------------------------
+    # Watermark-based background eviction
+    # ------------------------------------------------------------------
+
+    def _check_pressure(self) -> None:
+        if self._high_watermark is None:
+            return
+        if self._total_allocated > self._high_watermark * self._global_limit:
+            self._pressure.set()
+
+    def _evict_loop(self) -> None:
+        while True:
+            self._pressure.wait()
+            if self._closed:
+                return
+            self._pressure.clear()
+            self.evict_to_low_watermark()
+
+    def evict_to_low_watermark(self) -> List[str]:
+        """Evict LRU agents until utilization is at or below the low watermark."""
+        if self._low_watermark is None:
+            return []
+        target = self._global_limit - int(self._low_watermark * self._global_limit)
+        if self.free_bytes >= target:
+            return []
+        return self.evict_lru(target_free_bytes=target)
+
+    def close(self) -> None:
+        """Stop the background evictor."""
+        self._closed = True
+        self._pressure.set()
+        if self._evictor is not None:
+            self._evictor.join(timeout=5)
 
     # ------------------------------------------------------------------
     # Query
@@ -255,12 +452,32 @@ class MemoryManager:
 
     def top(self, n: int = 5) -> List[Dict[str, Any]]:
         """Get top N agents by memory usage."""
-        sorted_blocks = sorted(
-            self._blocks.values(),
-            key=lambda b: b.allocated_bytes,
-            reverse=True,
-        )
-        return [b.to_dict() for b in sorted_blocks[:n]]
+        result: List[AgentMemoryBlock] = []
+        with self._lock:
+            live = []
+            while self._heap and len(live) < n:
+                entry = heapq.heappop(self._heap)
+                if self._heap_live(entry):
+                    live.append(entry)
+            for entry in live:
+                heapq.heappush(self._heap, entry)
+            result = [self._blocks[agent_id] for _, _, agent_id in live]
+            if len(result) < n:
+                # pad with agents that hold nothing
+                result.extend(list(self._classes[0].values())[: n - len(result)])
+        return [b.to_dict() for b in result]
+
+    def size_classes(self) -> Dict[str, Dict[str, int]]:
+        """Agents and bytes per power-of-two size class (e.g. "<1MB")."""
+        result = {}
+        with self._lock:
+            for c in range(1, len(self._classes)):
+                if self._classes[c]:
+                    result[f"<{_fmt_bytes(1 << c)}"] = {
+                        "agents": len(self._classes[c]),
+                        "bytes": self._class_bytes[c],
+                    }
+        return result
 
     @property
     def total_allocated(self) -> int:
@@ -308,10 +525,19 @@ class MemoryManager:
             "global_limit_mb": self.global_limit_mb,
             "free_mb": self.free_mb,
             "utilization_pct": self.utilization,
-            "evictions": len(self._eviction_log),
+            "evictions": self._evictions,
             "total_allocs": self._total_allocs,
             "total_releases": self._total_releases,
+            "size_classes": self.size_classes(),
         }
         self._stats_cache_ts = now
         
         return self._stats_cache
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n}{unit}"
+        n //= 1024
+    return f"{n}TB"
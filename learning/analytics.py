@@ -0,0 +1,708 @@
+# aios/learning/analytics.py - 单遍分析引擎
+"""
+事件只读一遍：先按批转成列（epoch / layer / latency / status ...），
+再把同一批喂给所有注册的累加器（accumulator）。
+
+- 累加器可合并（merge）、可序列化（to_dict / from_dict），
+  所以每天算一次的分片（rollup）可以直接合并成周报
+- 装了 numpy 时，计数 / 延迟直方图在列上做向量化运算；没装时退回纯 Python
+- 延迟分布用 {值: 次数} 直方图保存，合并后 p95 / p50 与逐条排序的结果完全一致
+
+用法：
+    engine = AnalyticsEngine.default()
+    engine.feed(iter_events(start, end))
+    engine.result("metrics")
+"""
+
+import hashlib, json, math, sys, time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.config import get_path
+from core.engine import _events_path, iter_events
+
+try:
+    import numpy as np
+except ImportError:  # numpy 可选
+    np = None
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+# 分片是运行时缓存，放在数据目录（paths.data，默认 data/）下，不进源码树
+ROLLUP_DIR = (get_path("paths.data") or AIOS_ROOT / "data") / "rollups"
+
+BATCH_SIZE = 4096
+
+# v0.1 type → v0.2 layer
+LAYER_MAP = {
+    "tool": "TOOL",
+    "task": "TOOL",
+    "match": "MEM",
+    "correction": "MEM",
+    "confirm": "MEM",
+    "lesson": "MEM",
+    "error": "SEC",
+    "http_error": "SEC",
+    "health": "KERNEL",
+    "deploy": "KERNEL",
+}
+LAYERS = ("KERNEL", "COMMS", "TOOL", "MEM", "SEC")
+LAYER_CODE = {name: i for i, name in enumerate(LAYERS)}
+
+
+# ── 字段提取（兼容 v0.1 / v0.2 schema）──
+
+
+def event_name(e: dict) -> str:
+    name = e.get("event", "")
+    if name:
+        return name
+    return (e.get("payload") or {}).get("_v1_type", e.get("type", ""))
+
+
+def payload(e: dict) -> dict:
+    return e.get("payload", e.get("data", {})) or {}
+
+
+def is_ok(e: dict) -> bool:
+    if e.get("status") == "err":
+        return False
+    return payload(e).get("ok", True)
+
+
+def tool_name(e: dict) -> str:
+    p = payload(e)
+    return p.get("name", p.get("tool", e.get("source", e.get("event", "?"))))
+
+
+def latency(e: dict):
+    ms = e.get("latency_ms", 0)
+    if ms:
+        return ms
+    p = payload(e)
+    return p.get("ms", p.get("elapsed_ms", 0))
+
+
+def _quantiles(hist: dict) -> tuple:
+    """从 {值: 次数} 直方图取 p95 / p50，等价于 sorted(values) 后按下标取"""
+    items = sorted(hist.items())
+    n = sum(c for _, c in items)
+    want = (math.ceil(0.95 * n) - 1, n // 2)
+    out = []
+    for idx in want:
+        seen = 0
+        for value, c in items:
+            seen += c
+            if seen > idx:
+                out.append(value)
+                break
+    return out[0], out[1]
+
+
+def _as_number(x):
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+
+# ── 列式批次 ──
+
+
+class EventBatch:
+    """一批事件的列式视图；原始 dict 保留在 rows 里，给需要 payload 的累加器用"""
+
+    __slots__ = ("rows", "n", "epoch", "layer", "raw_layer", "type", "v1_type", "name",
+                 "tool", "tool_code", "tools", "ok", "err", "latency")
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.n = len(rows)
+        epoch, layer, raw_layer, types, v1_types, names = [], [], [], [], [], []
+        tool, tool_code, ok, err, lat = [], [], [], [], []
+        codes = {}
+        for e in rows:
+            raw = e.get("layer")
+            t = e.get("type", "")
+            v1 = (e.get("payload") or {}).get("_v1_type", "")
+            if raw:
+                m = raw if raw in LAYER_CODE else "TOOL"
+            else:
+                m = LAYER_MAP.get(t) or LAYER_MAP.get(v1) or "TOOL"
+            ts = e.get("epoch", e.get("ts", 0))
+            tn = tool_name(e)
+            epoch.append(ts if isinstance(ts, (int, float)) else 0)
+            layer.append(LAYER_CODE[m])
+            raw_layer.append(raw)
+            types.append(t)
+            v1_types.append(v1)
+            names.append(event_name(e))
+            tool.append(tn)
+            tool_code.append(codes.setdefault(tn, len(codes)))
+            ok.append(is_ok(e))
+            err.append(e.get("status") == "err")
+            ms = latency(e)
+            lat.append(ms if isinstance(ms, (int, float)) else 0)
+        self.raw_layer, self.type, self.v1_type = raw_layer, types, v1_types
+        self.name, self.tool = names, tool
+        self.tools = list(codes)
+        if np is not None:
+            self.epoch = np.asarray(epoch, dtype=np.float64)
+            self.layer = np.asarray(layer, dtype=np.int8)
+            self.tool_code = np.asarray(tool_code, dtype=np.int64)
+            self.ok = np.asarray(ok, dtype=bool)
+            self.err = np.asarray(err, dtype=bool)
+            self.latency = np.asarray(lat, dtype=np.float64)
+        else:
+            self.epoch, self.layer, self.tool_code = epoch, layer, tool_code
+            self.ok, self.err, self.latency = ok, err, lat
+
+    def mask(self, values):
+        """由逐行的布尔值（可迭代）构造掩码"""
+        if np is not None:
+            return np.fromiter(values, dtype=bool, count=self.n)
+        return list(values)
+
+    def where(self, mask) -> list:
+        """mask 为真的行下标"""
+        if np is not None:
+            return np.flatnonzero(mask).tolist()
+        return [i for i, m in enumerate(mask) if m]
+
+    def count(self, mask) -> int:
+        return int(mask.sum()) if np is not None else sum(1 for m in mask if m)
+
+    def latency_hist(self, mask) -> dict:
+        """mask 内延迟 > 0 的事件按工具统计 {tool: Counter(ms)}"""
+        out = defaultdict(Counter)
+        if np is not None:
+            sel = mask & (self.latency > 0)
+            if not sel.any():
+                return out
+            codes = self.tool_code[sel]
+            # 按首次出现顺序建键，与逐行路径的结果顺序一致
+            _, first = np.unique(codes, return_index=True)
+            for code in codes[np.sort(first)].tolist():
+                out[self.tools[code]]
+            pairs = np.stack([codes.astype(np.float64), self.latency[sel]])
+            uniq, counts = np.unique(pairs, axis=1, return_counts=True)
+            for (code, ms), c in zip(uniq.T.tolist(), counts.tolist()):
+                out[self.tools[int(code)]][_as_number(ms)] += c
+            return out
+        for i, m in enumerate(mask):
+            if m and self.latency[i] > 0:
+                out[self.tool[i]][self.latency[i]] += 1
+        return out
+
+    def invert(self, mask):
+        return ~mask if np is not None else [not m for m in mask]
+
+    def both(self, a, b):
+        return a & b if np is not None else [x and y for x, y in zip(a, b)]
+
+    def either(self, a, b):
+        return a | b if np is not None else [x or y for x, y in zip(a, b)]
+
+    def is_type(self, event_type: str):
+        """与 load_events(event_type=...) 的过滤一致：查旧 type 或 payload._v1_type"""
+        return self.mask(t == event_type or v == event_type for t, v in zip(self.type, self.v1_type))
+
+    def layer_is(self, name: str):
+        code = LAYER_CODE[name]
+        return self.layer == code if np is not None else [c == code for c in self.layer]
+
+
+# ── 累加器 ──
+
+
+class Accumulator(ABC):
+    """累加器基类：add_batch / merge / result，to_dict / from_dict 用于分片落盘"""
+
+    name = ""
+
+    @abstractmethod
+    def add_batch(self, batch: EventBatch) -> None:
+        pass
+
+    @abstractmethod
+    def merge(self, other: "Accumulator") -> "Accumulator":
+        pass
+
+    @abstractmethod
+    def result(self, params: dict) -> object:
+        pass
+
+    @abstractmethod
+    def to_dict(self) -> dict:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, d: dict) -> "Accumulator":
+        pass
+
+
+def _merge_hist(dst: dict, src: dict) -> None:
+    for tool, hist in src.items():
+        dst.setdefault(tool, Counter()).update(hist)
+
+
+def _hist_to_dict(h: dict) -> dict:
+    return {tool: {str(ms): c for ms, c in hist.items()} for tool, hist in h.items()}
+
+
+def _hist_from_dict(d: dict) -> dict:
+    return {tool: Counter({_as_number(ms): c for ms, c in hist.items()}) for tool, hist in d.items()}
+
+
+class MetricsAccumulator(Accumulator):
+    """counts / quality / reliability / performance"""
+
+    name = "metrics"
+
+    def __init__(self):
+        self.events = 0
+        self.by_layer = Counter({layer: 0 for layer in LAYERS})
+        self.matches = 0
+        self.corrections = 0
+        self.tools = 0
+        self.tool_ok = 0
+        self.http_codes = Counter()
+        self.latency = {}  # tool -> Counter(ms)
+
+    def add_batch(self, b: EventBatch) -> None:
+        self.events += b.n
+        for code, c in Counter(b.layer.tolist() if np is not None else b.layer).items():
+            self.by_layer[LAYERS[code]] += c
+        mem, sec, tool = b.layer_is("MEM"), b.layer_is("SEC"), b.layer_is("TOOL")
+        for i in b.where(mem):
+            name = b.name[i]
+            if name in ("match", "confirm"):
+                self.matches += 1
+            elif name == "correction":
+                self.corrections += 1
+        for i in b.where(sec):
+            if b.name[i] == "http_error":
+                self.http_codes[payload(b.rows[i]).get("status_code", "?")] += 1
+        self.tools += b.count(tool)
+        self.tool_ok += b.count(b.both(tool, b.ok))
+        _merge_hist(self.latency, b.latency_hist(tool))
+
+    def merge(self, o: "MetricsAccumulator") -> "MetricsAccumulator":
+        self.events += o.events
+        self.by_layer.update(o.by_layer)
+        self.matches += o.matches
+        self.corrections += o.corrections
+        self.tools += o.tools
+        self.tool_ok += o.tool_ok
+        self.http_codes.update(o.http_codes)
+        _merge_hist(self.latency, o.latency)
+        return self
+
+    def result(self, params: dict) -> dict:
+        total_match = self.matches + self.corrections
+        correction_rate = self.corrections / total_match if total_match > 0 else 0
+        tool_success_rate = self.tool_ok / self.tools if self.tools else 1.0
+        tool_p95, tool_p50 = {}, {}
+        for name, hist in self.latency.items():
+            if sum(hist.values()) >= 2:
+                tool_p95[name], tool_p50[name] = _quantiles(hist)
+        return {
+            "counts": {
+                "events": self.events,
+                "matches": self.matches,
+                "corrections": self.corrections,
+                "tools": self.tools,
+                "by_layer": {k: self.by_layer[k] for k in LAYERS},
+            },
+            "quality": {"correction_rate": round(correction_rate, 4)},
+            "reliability": {
+                "tool_success_rate": round(tool_success_rate, 4),
+                "http_502": self.http_codes.get(502, 0),
+                "http_404": self.http_codes.get(404, 0),
+            },
+            "performance": {"tool_p95_ms": tool_p95, "tool_p50_ms": tool_p50},
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "events": self.events,
+            "by_layer": dict(self.by_layer),
+            "matches": self.matches,
+            "corrections": self.corrections,
+            "tools": self.tools,
+            "tool_ok": self.tool_ok,
+            # JSON 的 key 只能是字符串，保留类型信息
+            "http_codes": [[k, c] for k, c in self.http_codes.items()],
+            "latency": _hist_to_dict(self.latency),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "MetricsAccumulator":
+        acc = cls()
+        acc.events = d["events"]
+        acc.by_layer.update(d["by_layer"])
+        acc.matches, acc.corrections = d["matches"], d["corrections"]
+        acc.tools, acc.tool_ok = d["tools"], d["tool_ok"]
+        acc.http_codes = Counter({k: c for k, c in d["http_codes"]})
+        acc.latency = _hist_from_dict(d["latency"])
+        return acc
+
+
+class TopIssuesAccumulator(Accumulator):
+    name = "top_issues"
+
+    def __init__(self):
+        self.corrected_inputs = Counter()
+        self.failed_tools = Counter()
+        self.error_types = Counter()
+
+    def add_batch(self, b: EventBatch) -> None:
+        special = b.mask(n in ("correction", "runtime_error", "http_error") for n in b.name)
+        for i in b.where(b.either(b.either(b.invert(b.ok), b.err), special)):
+            e, name = b.rows[i], b.name[i]
+            if name == "correction":
+                p = payload(e)
+                self.corrected_inputs[p.get("query", p.get("input", "?"))] += 1
+            if b.err[i] or name in ("runtime_error", "http_error"):
+                if name == "http_error":
+                    key = f"http_{payload(e).get('status_code', '?')}"
+                else:
+                    key = str(payload(e).get("error", e.get("event", "?")))[:50]
+                self.error_types[key] += 1
+            if not b.ok[i] and e.get("layer", e.get("type")) in ("TOOL", "tool", "task"):
+                self.failed_tools[b.tool[i]] += 1
+
+    def merge(self, o: "TopIssuesAccumulator") -> "TopIssuesAccumulator":
+        self.corrected_inputs.update(o.corrected_inputs)
+        self.failed_tools.update(o.failed_tools)
+        self.error_types.update(o.error_types)
+        return self
+
+    def result(self, params: dict) -> dict:
+        return {
+            "top_corrected_inputs": dict(self.corrected_inputs.most_common(10)),
+            "top_failed_tools": dict(self.failed_tools.most_common(5)),
+            "top_error_types": dict(self.error_types.most_common(5)),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "corrected_inputs": dict(self.corrected_inputs),
+            "failed_tools": dict(self.failed_tools),
+            "error_types": dict(self.error_types),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TopIssuesAccumulator":
+        acc = cls()
+        acc.corrected_inputs.update(d["corrected_inputs"])
+        acc.failed_tools.update(d["failed_tools"])
+        acc.error_types.update(d["error_types"])
+        return acc
+
+
+class AliasAccumulator(Accumulator):
+    """L1: 同一输入被纠正到同一目标的次数"""
+
+    name = "alias"
+
+    def __init__(self):
+        self.targets = defaultdict(Counter)  # input -> Counter(target)
+        self.examples = defaultdict(list)  # input -> 前 3 个 "matched->target"
+
+    def add_batch(self, b: EventBatch) -> None:
+        for i in b.where(b.is_type("correction")):
+            data = b.rows[i].get("data", {})
+            inp = data.get("input", "")
+            target = data.get("correct_target", "")
+            matched = data.get("matched", "")
+            if inp and target:
+                self.targets[inp][target] += 1
+                if matched:
+                    self._example(inp, f"{matched}->{target}")
+
+    def _example(self, inp: str, ex: str) -> None:
+        examples = self.examples[inp]
+        if len(examples) < 3 and ex not in examples:
+            examples.append(ex)
+
+    def merge(self, o: "AliasAccumulator") -> "AliasAccumulator":
+        for inp, tc in o.targets.items():
+            self.targets[inp].update(tc)
+        for inp, exs in o.examples.items():
+            for ex in exs:
+                self._example(inp, ex)
+        return self
+
+    def result(self, params: dict) -> list:
+        suggestions = []
+        for inp, tc in self.targets.items():
+            top, count = tc.most_common(1)[0]
+            if count >= params["correction_threshold"]:
+                suggestions.append(
+                    {
+                        "level": "L1",
+                        "input": inp,
+                        "suggested": top,
+                        "confidence": round(count / sum(tc.values()), 2),
+                        "evidence": {"corrections": count, "examples": self.examples[inp][:3]},
+                        "reason": f"corrected>={count}",
+                    }
+                )
+        return suggestions
+
+    def to_dict(self) -> dict:
+        return {"targets": {k: dict(v) for k, v in self.targets.items()},
+                "examples": dict(self.examples)}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AliasAccumulator":
+        acc = cls()
+        for inp, tc in d["targets"].items():
+            acc.targets[inp].update(tc)
+        for inp, exs in d["examples"].items():
+            acc.examples[inp].extend(exs)
+        return acc
+
+
+class ToolAccumulator(Accumulator):
+    """L2: 失败驱动 + 性能驱动"""
+
+    name = "tool"
+
+    def __init__(self):
+        self.fail_errors = defaultdict(Counter)  # tool -> Counter(错误类型)
+        self.latency = {}  # tool -> Counter(ms)
+
+    def add_batch(self, b: EventBatch) -> None:
+        tool_event = b.mask(
+            raw == "TOOL" or t in ("tool", "task") for raw, t in zip(b.raw_layer, b.type)
+        )
+        for i in b.where(b.invert(b.ok)):
+            if b.raw_layer[i] in ("TOOL", "SEC") or b.type[i] in ("tool", "task", "error", "http_error"):
+                p = payload(b.rows[i])
+                code = p.get("status_code", "")
+                err = p.get("err", p.get("error", ""))
+                self.fail_errors[b.tool[i]][str(code) if code else err[:50] or "unknown"] += 1
+        _merge_hist(self.latency, b.latency_hist(tool_event))
+
+    def merge(self, o: "ToolAccumulator") -> "ToolAccumulator":
+        for tool, c in o.fail_errors.items():
+            self.fail_errors[tool].update(c)
+        _merge_hist(self.latency, o.latency)
+        return self
+
+    def result(self, params: dict) -> list:
+        suggestions = []
+        for tool, err_types in self.fail_errors.items():
+            fails = sum(err_types.values())
+            if fails < params["repeat_fail_min"]:
+                continue
+            top_err, _ = err_types.most_common(1)[0]
+            suggestions.append(
+                {
+                    "level": "L2",
+                    "name": tool,
+                    "action": "cooldown_10m" if fails >= 3 else "monitor",
+                    "confidence": round(min(fails / 5, 1.0), 2),
+                    "evidence": {"fails": fails, "top_err": top_err},
+                    "reason": f"repeat_fail>={fails}",
+                }
+            )
+        for tool, hist in self.latency.items():
+            samples = sum(hist.values())
+            if samples < 3:
+                continue
+            p95, median = _quantiles(hist)
+            if p95 > params["slow_p95_ms"]:
+                suggestions.append(
+                    {
+                        "level": "L2",
+                        "name": tool,
+                        "action": "optimize_or_cache",
+                        "confidence": round(min(p95 / 10000, 1.0), 2),
+                        "evidence": {"p95_ms": p95, "median_ms": median, "samples": samples},
+                        "reason": f"p95>{p95}ms",
+                    }
+                )
+        return suggestions
+
+    def to_dict(self) -> dict:
+        return {"fail_errors": {k: dict(v) for k, v in self.fail_errors.items()},
+                "latency": _hist_to_dict(self.latency)}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ToolAccumulator":
+        acc = cls()
+        for tool, c in d["fail_errors"].items():
+            acc.fail_errors[tool].update(c)
+        acc.latency = _hist_from_dict(d["latency"])
+        return acc
+
+
+class ThresholdAccumulator(Accumulator):
+    """L3: 纠正率 / 低分匹配占比（保存分数分布，阈值可在回放时调整）"""
+
+    name = "threshold"
+
+    def __init__(self):
+        self.matches = 0
+        self.corrections = 0
+        self.scores = Counter()
+
+    def add_batch(self, b: EventBatch) -> None:
+        for i, t in enumerate(b.type):
+            if t == "match":
+                self.matches += 1
+                self.scores[(b.rows[i].get("data") or {}).get("score", 1.0)] += 1
+            elif t == "correction":
+                self.corrections += 1
+
+    def merge(self, o: "ThresholdAccumulator") -> "ThresholdAccumulator":
+        self.matches += o.matches
+        self.corrections += o.corrections
+        self.scores.update(o.scores)
+        return self
+
+    def result(self, params: dict) -> list:
+        warnings = []
+        total = self.matches + self.corrections
+        if total > 0:
+            cr = self.corrections / total
+            if cr > params["correction_rate_warn"]:
+                warnings.append(
+                    {"field": "correction_rate", "current": round(cr, 2),
+                     "suggested": 0.10, "reason": "high_correction_rate"}
+                )
+        if self.matches:
+            low = sum(c for s, c in self.scores.items() if s < params["low_score_threshold"])
+            lsr = low / self.matches
+            if lsr > params["low_score_rate_warn"]:
+                warnings.append(
+                    {"field": "low_score_rate", "current": round(lsr, 2),
+                     "suggested": 0.10, "reason": "too_many_low_score_matches"}
+                )
+        return warnings
+
+    def to_dict(self) -> dict:
+        return {"matches": self.matches, "corrections": self.corrections,
+                "scores": [[s, c] for s, c in self.scores.items()]}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ThresholdAccumulator":
+        acc = cls()
+        acc.matches, acc.corrections = d["matches"], d["corrections"]
+        acc.scores = Counter({s: c for s, c in d["scores"]})
+        return acc
+
+
+ACCUMULATORS = {
+    cls.name: cls
+    for cls in (MetricsAccumulator, TopIssuesAccumulator, AliasAccumulator,
+                ToolAccumulator, ThresholdAccumulator)
+}
+
+
+# ── 引擎 ──
+
+
+class AnalyticsEngine:
+    """把一次事件流同时喂给所有注册的累加器"""
+
+    def __init__(self, accumulators: dict = None):
+        self.accumulators = dict(accumulators or {})
+
+    @classmethod
+    def default(cls) -> "AnalyticsEngine":
+        return cls({name: acc_cls() for name, acc_cls in ACCUMULATORS.items()})
+
+    def register(self, acc: Accumulator) -> "AnalyticsEngine":
+        self.accumulators[acc.name] = acc
+        return self
+
+    def feed(self, events, batch_size: int = BATCH_SIZE) -> "AnalyticsEngine":
+        """流式消费事件（列表或迭代器），每 batch_size 条转成一个列式批次"""
+        rows = []
+        for e in events:
+            rows.append(e)
+            if len(rows) >= batch_size:
+                self.feed_batch(EventBatch(rows))
+                rows = []
+        if rows:
+            self.feed_batch(EventBatch(rows))
+        return self
+
+    def feed_batch(self, batch: EventBatch) -> None:
+        for acc in self.accumulators.values():
+            acc.add_batch(batch)
+
+    def merge(self, other: "AnalyticsEngine") -> "AnalyticsEngine":
+        for name, acc in other.accumulators.items():
+            if name in self.accumulators:
+                self.accumulators[name].merge(acc)
+            else:
+                self.accumulators[name] = acc
+        return self
+
+    def result(self, name: str, params: dict):
+        return self.accumulators[name].result(params)
+
+    def to_dict(self) -> dict:
+        return {name: acc.to_dict() for name, acc in self.accumulators.items()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AnalyticsEngine":
+        return cls({name: ACCUMULATORS[name].from_dict(v) for name, v in d.items() if name in ACCUMULATORS})
+
+
+# ── 按天分片 ──
+
+
+def _day_bounds(day: str) -> tuple:
+    start = time.mktime(time.strptime(day, "%Y-%m-%d"))
+    return start, start + 86400 - 1e-6
+
+
+def rollup_dir(path: Path = None) -> Path:
+    """分片缓存目录：按事件源文件的绝对路径区分，不同的 events.jsonl 互不串用"""
+    source = str(Path(path or _events_path()).resolve())
+    return ROLLUP_DIR / hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+
+def rollup_day(day: str, path: Path = None, save: bool = True) -> AnalyticsEngine:
+    """计算某天（本地时区 YYYY-MM-DD）的分片；已经过去的日子会落盘复用"""
+    start, end = _day_bounds(day)
+    engine = AnalyticsEngine.default().feed(iter_events(start, end, path=path))
+    if save and end < time.time():
+        cache_dir = rollup_dir(path)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        (cache_dir / f"{day}.json").write_text(json.dumps(engine.to_dict()), encoding="utf-8")
+    return engine
+
+
+def rollup_window_start(days: int = 7, now: float = None) -> float:
+    """load_rollups 覆盖的窗口起点：days-1 天前的本地 0 点"""
+    day = time.strftime("%Y-%m-%d", time.localtime((now or time.time()) - (days - 1) * 86400))
+    return _day_bounds(day)[0]
+
+
+def load_rollups(days: int = 7, path: Path = None, now: float = None) -> AnalyticsEngine:
+    """
+    合并最近 days 个自然日（含今天）的分片。
+    已落盘的日子直接读取；缺失的现算并落盘；今天总是现算。
+    """
+    now = now or time.time()
+    cache_dir = rollup_dir(path)
+    merged = AnalyticsEngine.default()
+    # 从最早的一天合并到今天，结果（含并列项的先后顺序）与按时间顺序单遍扫描一致
+    for back in reversed(range(days)):
+        day = time.strftime("%Y-%m-%d", time.localtime(now - back * 86400))
+        cached = cache_dir / f"{day}.json"
+        if back and cached.exists():
+            try:
+                merged.merge(AnalyticsEngine.from_dict(json.loads(cached.read_text(encoding="utf-8"))))
+                continue
+            except Exception:
+                pass
+        merged.merge(rollup_day(day, path=path, save=bool(back)))
+    return merged
@@ -2,15 +2,17 @@
 """
 从 events.jsonl 分析，产出结构化报告：
   metrics / top_issues / alias_suggestions / tool_suggestions / threshold_warnings
+
+各项指标由 learning.analytics 的累加器在一次扫描中同时算出。
 """
 
-import json, time, sys, math
-from collections import Counter, defaultdict
+import json, time, sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from core.engine import load_events, count_by_type
+from core.engine import iter_events
 from core.config import get_int, get_float
+from learning.analytics import ACCUMULATORS, AnalyticsEngine, load_rollups, rollup_window_start
 
 AIOS_ROOT = Path(__file__).resolve().parent.parent
 LEARNING_DIR = AIOS_ROOT / "learning"
@@ -19,346 +21,54 @@ LEARNING_DIR.mkdir(exist_ok=True)
 CORRECTION_THRESHOLD = get_int("analysis.correction_threshold", 3)
 LOW_SCORE_THRESHOLD = get_float("analysis.low_score_threshold", 0.80)
 
-# 时间衰减: W = e^(-λ * Δt), λ = ln(2)/half_life_hours
-DECAY_HALF_LIFE_HOURS = 12  # 12h 半衰期
-DECAY_LAMBDA = math.log(2) / (DECAY_HALF_LIFE_HOURS * 3600)
-
-
-def _decay_weight(event_ts: int) -> float:
-    """指数衰减权重，越近的事件权重越大"""
-    dt = max(0, time.time() - event_ts)
-    return math.exp(-DECAY_LAMBDA * dt)
-
-
-def compute_metrics(days: int = 1) -> dict:
-    events = load_events(days)
-
-    # v0.2: 按层分类（兼容 v0.1 旧格式）
-    layer_map = {
-        "tool": "TOOL",
-        "task": "TOOL",
-        "match": "MEM",
-        "correction": "MEM",
-        "confirm": "MEM",
-        "lesson": "MEM",
-        "error": "SEC",
-        "http_error": "SEC",
-        "health": "KERNEL",
-        "deploy": "KERNEL",
-    }
-
-    by_layer = {"KERNEL": [], "COMMS": [], "TOOL": [], "MEM": [], "SEC": []}
-    for e in events:
-        layer = e.get("layer")
-        if not layer:
-            # v0.1 兼容
-            old_type = e.get("type", "")
-            v1_type = (e.get("payload") or {}).get("_v1_type", "")
-            layer = layer_map.get(old_type) or layer_map.get(v1_type) or "TOOL"
-        if layer not in by_layer:
-            layer = "TOOL"
-        by_layer[layer].append(e)
-
-    # 从各层提取指标
-    tools = by_layer["TOOL"]
-    mem_events = by_layer["MEM"]
-    sec_events = by_layer["SEC"]
-
-    # 匹配/纠正（MEM 层）
-    matches = [e for e in mem_events if _event_name(e) in ("match", "confirm")]
-    corrections = [e for e in mem_events if _event_name(e) == "correction"]
-    total_match = len(matches) + len(corrections)
-    correction_rate = len(corrections) / total_match if total_match > 0 else 0
-
-    # 工具成功率
-    tool_ok = [t for t in tools if _is_ok(t)]
-    tool_success_rate = len(tool_ok) / len(tools) if tools else 1.0
-
-    # HTTP 错误（SEC 层）
-    http_errors = [e for e in sec_events if _event_name(e) == "http_error"]
-    http_codes = Counter(_payload(e).get("status_code", "?") for e in http_errors)
-
-    # p95 + p50 per tool
-    by_tool = defaultdict(list)
-    for e in tools:
-        name = _tool_name(e)
-        ms = _latency(e)
-        if ms > 0:
-            by_tool[name].append(ms)
-
-    tool_p95 = {}
-    tool_p50 = {}
-    for name, times in by_tool.items():
-        if len(times) >= 2:
-            s = sorted(times)
-            tool_p95[name] = s[math.ceil(0.95 * len(s)) - 1]
-            tool_p50[name] = s[len(s) // 2]
-
-    return {
-        "counts": {
-            "events": len(events),
-            "matches": len(matches),
-            "corrections": len(corrections),
-            "tools": len(tools),
-            "by_layer": {k: len(v) for k, v in by_layer.items()},
-        },
-        "quality": {
-            "correction_rate": round(correction_rate, 4),
-        },
-        "reliability": {
-            "tool_success_rate": round(tool_success_rate, 4),
-            "http_502": http_codes.get(502, 0),
-            "http_404": http_codes.get(404, 0),
-        },
-        "performance": {
-            "tool_p95_ms": tool_p95,
-            "tool_p50_ms": tool_p50,
-        },
-    }
-
 
-# ── v0.2 辅助函数：统一从新旧 schema 提取字段 ──
+# 可调参数（replay 时可以按变体覆盖）
+DEFAULT_PARAMS = {
+    "correction_threshold": CORRECTION_THRESHOLD,  # L1: 同一输入被纠正多少次才建议 alias
+    "low_score_threshold": LOW_SCORE_THRESHOLD,  # 低分匹配的分数线
+    "low_score_rate_warn": 0.15,  # 低分匹配占比告警线
+    "correction_rate_warn": 0.15,  # 纠正率告警线
+    "repeat_fail_min": 2,  # L2: 同一工具失败多少次才出建议
+    "slow_p95_ms": 5000,  # L2: p95 超过多少毫秒算慢
+}
 
 
-def _event_name(e: dict) -> str:
-    """提取事件名（兼容 v0.1 type 和 v0.2 event）"""
-    name = e.get("event", "")
-    if name:
-        # v0.2 event 可能是 "tool_exec" 或 "correction"
-        # 去掉 v0.1 兼容层加的前缀
-        for prefix in ("tool_", ""):
-            pass
-        return name
-    return (e.get("payload") or {}).get("_v1_type", e.get("type", ""))
+def _params(params: dict = None) -> dict:
+    return {**DEFAULT_PARAMS, **params} if params else DEFAULT_PARAMS
 
 
-def _is_ok(e: dict) -> bool:
-    """判断事件是否成功"""
-    if e.get("status") == "err":
-        return False
-    payload = e.get("payload", e.get("data", {}))
-    return payload.get("ok", True)
-
-
-def _tool_name(e: dict) -> str:
-    """提取工具名"""
-    payload = e.get("payload", e.get("data", {}))
-    return payload.get(
-        "name", payload.get("tool", e.get("source", e.get("event", "?")))
-    )
-
-
-def _latency(e: dict) -> int:
-    """提取延迟"""
-    ms = e.get("latency_ms", 0)
-    if ms:
-        return ms
-    payload = e.get("payload", e.get("data", {}))
-    return payload.get("ms", payload.get("elapsed_ms", 0))
+def _engine(days: int, events=None, names: tuple = None) -> AnalyticsEngine:
+    """单遍喂给累加器；events 为 None 时流式读取最近 days 天的 events.jsonl"""
+    if events is None:
+        events = iter_events(time.time() - days * 86400)
+    if names is None:
+        engine = AnalyticsEngine.default()
+    else:
+        engine = AnalyticsEngine({name: ACCUMULATORS[name]() for name in names})
+    return engine.feed(events)
 
 
-def _payload(e: dict) -> dict:
-    """提取 payload（兼容 v0.1 data 和 v0.2 payload）"""
-    return e.get("payload", e.get("data", {}))
+def compute_metrics(days: int = 1, events: list = None) -> dict:
+    return _engine(days, events, ("metrics",)).result("metrics", _params())
 
 
-def compute_top_issues(days: int = 7) -> dict:
-    events = load_events(days)
-    corrections = [e for e in events if _event_name(e) == "correction"]
-    errors = [
-        e
-        for e in events
-        if e.get("status") == "err" or _event_name(e) in ("runtime_error", "http_error")
-    ]
-    failed_tools = [
-        e
-        for e in events
-        if e.get("layer", e.get("type")) in ("TOOL", "tool", "task") and not _is_ok(e)
-    ]
+def compute_top_issues(days: int = 7, events: list = None) -> dict:
+    return _engine(days, events, ("top_issues",)).result("top_issues", _params())
 
-    return {
-        "top_corrected_inputs": dict(
-            Counter(
-                _payload(e).get("query", _payload(e).get("input", "?"))
-                for e in corrections
-            ).most_common(10)
-        ),
-        "top_failed_tools": dict(
-            Counter(_tool_name(e) for e in failed_tools).most_common(5)
-        ),
-        "top_error_types": dict(
-            Counter(
-                (
-                    f"http_{_payload(e).get('status_code', '?')}"
-                    if _event_name(e) == "http_error"
-                    else _payload(e).get("error", e.get("event", "?"))[:50]
-                )
-                for e in errors
-            ).most_common(5)
-        ),
-    }
 
-
-def compute_alias_suggestions(days: int = 7) -> list:
+def compute_alias_suggestions(days: int = 7, events: list = None, params: dict = None) -> list:
     """L1: alias 建议（可自动应用）"""
-    corrections = load_events(days, "correction")
-    targets = defaultdict(list)
-    examples = defaultdict(list)
-
-    for c in corrections:
-        data = c.get("data", {})
-        inp = data.get("input", "")
-        target = data.get("correct_target", "")
-        matched = data.get("matched", "")
-        if inp and target:
-            targets[inp].append(target)
-            if matched:
-                ex = f"{matched}->{target}"
-                if ex not in examples[inp]:
-                    examples[inp].append(ex)
-
-    suggestions = []
-    for inp, tlist in targets.items():
-        tc = Counter(tlist)
-        top, count = tc.most_common(1)[0]
-        if count >= CORRECTION_THRESHOLD:
-            suggestions.append(
-                {
-                    "level": "L1",
-                    "input": inp,
-                    "suggested": top,
-                    "confidence": round(count / len(tlist), 2),
-                    "evidence": {
-                        "corrections": count,
-                        "examples": examples[inp][:3],
-                    },
-                    "reason": f"corrected>={count}",
-                }
-            )
-
-    return suggestions
+    return _engine(days, events, ("alias",)).result("alias", _params(params))
 
 
-def compute_tool_suggestions(days: int = 7) -> list:
+def compute_tool_suggestions(days: int = 7, events: list = None, params: dict = None) -> list:
     """L2: tool 建议 — 失败驱动 + 性能驱动"""
-    events = load_events(days)
-    tool_events = [
-        e
-        for e in events
-        if e.get("layer") == "TOOL" or e.get("type") in ("tool", "task")
-    ]
-    failed = [
-        e
-        for e in events
-        if not _is_ok(e)
-        and (
-            e.get("layer") in ("TOOL", "SEC")
-            or e.get("type") in ("tool", "task", "error", "http_error")
-        )
-    ]
-
-    # --- Failure Learner ---
-    by_tool_fail = defaultdict(list)
-    for e in failed:
-        tool = _tool_name(e)
-        by_tool_fail[tool].append(e)
-
-    suggestions = []
-    for tool, errs in by_tool_fail.items():
-        if len(errs) < 2:
-            continue
-        err_types = Counter()
-        for e in errs:
-            p = _payload(e)
-            code = p.get("status_code", "")
-            err = p.get("err", p.get("error", ""))
-            err_types[str(code) if code else err[:50] or "unknown"] += 1
-        top_err, _ = err_types.most_common(1)[0]
-
-        suggestions.append(
-            {
-                "level": "L2",
-                "name": tool,
-                "action": "cooldown_10m" if len(errs) >= 3 else "monitor",
-                "confidence": round(min(len(errs) / 5, 1.0), 2),
-                "evidence": {"fails": len(errs), "top_err": top_err},
-                "reason": f"repeat_fail>={len(errs)}",
-            }
-        )
-
-    # --- Perf Learner ---
-    by_tool_perf = defaultdict(list)
-    for e in tool_events:
-        tool = _tool_name(e)
-        ms = _latency(e)
-        if ms > 0:
-            by_tool_perf[tool].append(ms)
-
-    for tool, times in by_tool_perf.items():
-        if len(times) < 3:
-            continue
-        times_sorted = sorted(times)
-        p95_idx = math.ceil(0.95 * len(times_sorted)) - 1
-        p95 = times_sorted[p95_idx]
-        median = times_sorted[len(times_sorted) // 2]
-
-        if p95 > 5000:  # p95 > 5s
-            suggestions.append(
-                {
-                    "level": "L2",
-                    "name": tool,
-                    "action": "optimize_or_cache",
-                    "confidence": round(min(p95 / 10000, 1.0), 2),
-                    "evidence": {
-                        "p95_ms": p95,
-                        "median_ms": median,
-                        "samples": len(times),
-                    },
-                    "reason": f"p95>{p95}ms",
-                }
-            )
+    return _engine(days, events, ("tool",)).result("tool", _params(params))
 
-    return suggestions
 
-
-def compute_threshold_warnings(days: int = 7) -> list:
+def compute_threshold_warnings(days: int = 7, events: list = None, params: dict = None) -> list:
     """L3: 阈值警告（仅报警）"""
-    events = load_events(days)
-    matches = [e for e in events if e.get("type") == "match"]
-    corrections = [e for e in events if e.get("type") == "correction"]
-    warnings = []
-
-    total = len(matches) + len(corrections)
-    if total > 0:
-        cr = len(corrections) / total
-        if cr > 0.15:
-            warnings.append(
-                {
-                    "field": "correction_rate",
-                    "current": round(cr, 2),
-                    "suggested": 0.10,
-                    "reason": "high_correction_rate",
-                }
-            )
-
-    if matches:
-        low = [
-            m
-            for m in matches
-            if (m.get("data") or {}).get("score", 1.0) < LOW_SCORE_THRESHOLD
-        ]
-        lsr = len(low) / len(matches)
-        if lsr > 0.15:
-            warnings.append(
-                {
-                    "field": "low_score_rate",
-                    "current": round(lsr, 2),
-                    "suggested": 0.10,
-                    "reason": "too_many_low_score_matches",
-                }
-            )
-
-    return warnings
+    return _engine(days, events, ("threshold",)).result("threshold", _params(params))
 
 
 def _get_git_commit() -> str:
@@ -383,14 +93,36 @@ def _get_git_commit() -> str:
 AIOS_VERSION = "0.2.0"
 
 
-def generate_full_report(days: int = 7) -> dict:
-    """完整结构化报告"""
+def generate_full_report(
+    days: int = 7,
+    events=None,
+    params: dict = None,
+    write: bool = True,
+    rollups: bool = False,
+    engine: AnalyticsEngine = None,
+) -> dict:
+    """
+    完整结构化报告（事件只扫描一遍）
+
+    Args:
+        events: 直接传入事件（列表或迭代器，如 engine.iter_events），不读 events.jsonl
+        params: 覆盖 DEFAULT_PARAMS 中的阈值
+        write: 是否写 suggestions.json（回放实验时关掉）
+        rollups: 按自然日合并 data/rollups 下（按事件源区分）的每日分片，周报只需现算今天。
+            此时窗口是含今天在内的 days 个自然日（从 days-1 天前的 0 点起），
+            而不是默认的滚动 days*24 小时
+        engine: 已喂过事件的引擎；阈值只在出结果时使用，回放多组参数可共享同一次扫描
+    """
     now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    window_from = time.strftime(
-        "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - days * 86400)
-    )
+    start = time.time() - days * 86400
+    if rollups and events is None:
+        start = rollup_window_start(days)
+    window_from = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start))
+    params = _params(params)
+    if engine is None:
+        engine = load_rollups(days) if rollups and events is None else _engine(days, events)
 
-    metrics = compute_metrics(days)
+    metrics = engine.result("metrics", params)
 
     report = {
         "ts": now,
@@ -398,11 +130,13 @@ def generate_full_report(days: int = 7) -> dict:
         **metrics,
         "model": {"default": "claude-sonnet-4-6", "fallback": "claude-opus-4-6"},
         "version": {"aios": AIOS_VERSION, "commit": _get_git_commit()},
-        "top_issues": compute_top_issues(days),
-        "alias_suggestions": compute_alias_suggestions(days),
-        "tool_suggestions": compute_tool_suggestions(days),
-        "threshold_warnings": compute_threshold_warnings(days),
+        "top_issues": engine.result("top_issues", params),
+        "alias_suggestions": engine.result("alias", params),
+        "tool_suggestions": engine.result("tool", params),
+        "threshold_warnings": engine.result("threshold", params),
     }
+    if not write:
+        return report
 
     # 写 suggestions.json
     sug = {
@@ -556,6 +290,7 @@ def generate_daily_report(days: int = 1) -> str:
 
 if __name__ == "__main__":
     action = sys.argv[1] if len(sys.argv) > 1 else "report"
+    # 命令行保持滚动 7×24 小时窗口；按自然日合并分片的周报见 scripts/daily_report.py
     if action == "json":
         print(json.dumps(generate_full_report(), ensure_ascii=False, indent=2))
     elif action == "suggestions":
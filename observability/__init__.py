@@ -2,6 +2,7 @@
 AIOS Observability - 统一入口
 """
 from .tracer import start_trace, span, ensure_task_id, current_trace_id, current_span_id
+from .span_pipeline import configure_tracing, shutdown_tracing, load_trace, critical_path
 from .metrics import METRICS, MetricsRegistry
 from .logger import get_logger, StructuredLogger
 
@@ -31,6 +32,10 @@ __all__ = [
     "ensure_task_id",
     "current_trace_id",
     "current_span_id",
+    "configure_tracing",
+    "shutdown_tracing",
+    "load_trace",
+    "critical_path",
     "METRICS",
     "MetricsRegistry",
     "get_logger",
@@ -1,101 +1,396 @@
 # aios/observability/metrics.py
 from __future__ import annotations
 import json
+import math
+from bisect import bisect_left
 import threading
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .tracer import current_span_id, current_trace_id
+
+# 快照里输出的分位数
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# 固定对数桶边界：2^-10 .. 2^20（约 0.001 .. 1e6，覆盖 ms/sec 量级），外加 +Inf
+LOG_BUCKET_BOUNDS: Tuple[float, ...] = tuple(2.0 ** k for k in range(-10, 21))
+
+# 窗口视图：名称 -> (槽宽秒, 槽数)；只存每个槽的 sketch，不存原始样本
+WINDOWS = {
+    "1m": (10, 6),
+    "5m": (10, 30),
+    "1h": (60, 60),
+}
+
+_SHARDS = 16
 
 def _labels_key(labels: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, str], ...]:
     if not labels:
         return tuple()
     return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
 
+class DDSketch:
+    """
+    可合并的流式分位数 sketch（DDSketch 思路）
+
+    值 v 落入第 ceil(log_gamma(v)) 个对数桶，分位数的相对误差 <= relative_accuracy。
+    两个 sketch 只要精度相同就能按桶相加合并；桶数超过 max_buckets 时合并最小的桶
+    （只牺牲最低分位的精度，p95/p99 不受影响）。
+    """
+
+    __slots__ = ("relative_accuracy", "gamma", "_log_gamma", "max_buckets",
+                 "positive", "negative", "zero_count", "count")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, v: float) -> int:
+        return math.ceil(math.log(v) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        # 桶 (gamma^(i-1), gamma^i] 的代表值，相对误差最小
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, v: float, n: int = 1) -> None:
+        if v > 1e-12:
+            i = self._index(v)
+            self.positive[i] = self.positive.get(i, 0) + n
+            if len(self.positive) > self.max_buckets:
+                self._collapse(self.positive)
+        elif v < -1e-12:
+            i = self._index(-v)
+            self.negative[i] = self.negative.get(i, 0) + n
+            if len(self.negative) > self.max_buckets:
+                self._collapse(self.negative)
+        else:
+            self.zero_count += n
+        self.count += n
+
+    def _collapse(self, store: Dict[int, int]) -> None:
+        lowest = sorted(store)[:len(store) - self.max_buckets + 1]
+        folded = sum(store.pop(i) for i in lowest)
+        target = lowest[-1]
+        store[target] = store.get(target, 0) + folded
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for i, c in other.positive.items():
+            self.positive[i] = self.positive.get(i, 0) + c
+        for i, c in other.negative.items():
+            self.negative[i] = self.negative.get(i, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        for store in (self.positive, self.negative):
+            if len(store) > self.max_buckets:
+                self._collapse(store)
+        return self
+
+    def copy(self) -> "DDSketch":
+        return DDSketch(self.relative_accuracy, self.max_buckets).merge(self)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # 负数：绝对值越大越靠前
+        for i in sorted(self.negative, reverse=True):
+            seen += self.negative[i]
+            if seen > rank:
+                return -self._value(i)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for i in sorted(self.positive):
+            seen += self.positive[i]
+            if seen > rank:
+                return self._value(i)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        return {f"p{round(q * 100, 1):g}": self.quantile(q) for q in qs}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "zero_count": self.zero_count,
+            "positive": {str(i): c for i, c in self.positive.items()},
+            "negative": {str(i): c for i, c in self.negative.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sk = cls(data.get("relative_accuracy", 0.01))
+        sk.positive = {int(i): c for i, c in data.get("positive", {}).items()}
+        sk.negative = {int(i): c for i, c in data.get("negative", {}).items()}
+        sk.zero_count = data.get("zero_count", 0)
+        sk.count = data.get("count", 0)
+        return sk
+
+@dataclass
+class Exemplar:
+    """把一个桶关联到具体的 trace（通常是该桶最近一次观测）"""
+    value: float
+    trace_id: Optional[str]
+    span_id: Optional[str]
+    timestamp: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"value": self.value, "trace_id": self.trace_id,
+                "span_id": self.span_id, "timestamp": self.timestamp}
+
+class _SlidingSketch:
+    """按时间槽切分的 sketch 环：窗口查询 = 合并落在窗口内的槽"""
+
+    __slots__ = ("slot_sec", "slots", "_ring")
+
+    def __init__(self, slot_sec: int, slots: int) -> None:
+        self.slot_sec = slot_sec
+        self.slots = slots
+        self._ring: deque = deque(maxlen=slots)  # (slot_start, DDSketch)
+
+    def add(self, v: float, now: float) -> None:
+        start = int(now) - int(now) % self.slot_sec
+        if not self._ring or self._ring[-1][0] != start:
+            self._ring.append((start, DDSketch()))
+        self._ring[-1][1].add(v)
+
+    def window(self, seconds: int, now: float) -> DDSketch:
+        cutoff = now - seconds
+        merged = DDSketch()
+        for start, sk in self._ring:
+            if start + self.slot_sec > cutoff:
+                merged.merge(sk)
+        return merged
+
 @dataclass
 class Histogram:
     count: int = 0
     total: float = 0.0
     min: float = float("inf")
     max: float = float("-inf")
-    
-    def observe(self, v: float) -> None:
+    sketch: DDSketch = field(default_factory=DDSketch)
+    bounds: Tuple[float, ...] = LOG_BUCKET_BOUNDS
+    buckets: List[int] = field(default_factory=list)
+    exemplars: Dict[int, Exemplar] = field(default_factory=dict)
+    _sliding: Dict[int, _SlidingSketch] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if not self.buckets:
+            self.buckets = [0] * (len(self.bounds) + 1)
+        for slot_sec, slots in WINDOWS.values():
+            # 同槽宽共用一个环（1m 与 5m 都用 10s 槽），环长取最长窗口
+            ring = self._sliding.get(slot_sec)
+            if ring is None or ring.slots < slots:
+                self._sliding[slot_sec] = _SlidingSketch(slot_sec, slots)
+
+    def _bucket_index(self, v: float) -> int:
+        return bisect_left(self.bounds, v)  # 第一个 >= v 的上界（le 语义）
+
+    def observe(self, v: float, exemplar: Optional[Exemplar] = None,
+                now: Optional[float] = None) -> None:
         self.count += 1
         self.total += v
         if v < self.min:
             self.min = v
         if v > self.max:
             self.max = v
-    
-    def to_dict(self) -> Dict[str, Any]:
+        self.sketch.add(v)
+        i = self._bucket_index(v)
+        self.buckets[i] += 1
+        if exemplar is not None:
+            self.exemplars[i] = exemplar
+        now = time.time() if now is None else now
+        for sliding in self._sliding.values():
+            sliding.add(v, now)
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.sketch.quantile(q)
+
+    def window(self, name: str, now: Optional[float] = None) -> DDSketch:
+        """最近 1m/5m/1h 的 sketch（由时间槽合并，不存原始样本）"""
+        if name not in WINDOWS:
+            raise ValueError(f"Unknown window: {name}")
+        slot_sec, slots = WINDOWS[name]
+        now = time.time() if now is None else now
+        return self._sliding[slot_sec].window(slot_sec * slots, now)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        """合并另一个同桶边界的直方图（窗口视图不合并）"""
+        if other.bounds != self.bounds:
+            raise ValueError("cannot merge histograms with different bucket bounds")
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        for i, ex in other.exemplars.items():
+            mine = self.exemplars.get(i)
+            if mine is None or ex.timestamp > mine.timestamp:
+                self.exemplars[i] = ex
+        return self
+
+    def to_dict(self, now: Optional[float] = None) -> Dict[str, Any]:
         avg = (self.total / self.count) if self.count else 0.0
+        buckets = []
+        cumulative = 0
+        for i, c in enumerate(self.buckets):
+            cumulative += c
+            if not c:
+                continue
+            le = self.bounds[i] if i < len(self.bounds) else "+Inf"
+            entry = {"le": le, "count": c, "cumulative": cumulative}
+            ex = self.exemplars.get(i)
+            if ex is not None:
+                entry["exemplar"] = ex.to_dict()
+            buckets.append(entry)
+        windows = {}
+        for name in WINDOWS:
+            sk = self.window(name, now)
+            windows[name] = {"count": sk.count, **sk.quantiles()}
         return {
             "count": self.count,
             "sum": self.total,
             "min": 0.0 if self.min == float("inf") else self.min,
             "max": 0.0 if self.max == float("-inf") else self.max,
             "avg": avg,
+            **self.sketch.quantiles(),
+            "buckets": buckets,
+            "windows": windows,
         }
 
+class _Series:
+    """一个 (name, labels) 序列：独立锁，热点序列之间互不争用"""
+
+    __slots__ = ("lock", "hist")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.hist = Histogram()
+
 class MetricsRegistry:
     """
     线程安全、零依赖的指标收集：
     - counter: inc
     - gauge: set
-    - histogram: observe（输出 count/sum/min/max/avg）
+    - histogram: observe（count/sum/min/max/avg + p50/p90/p95/p99 + 对数桶 + exemplar
+      + 1m/5m/1h 窗口分位数）
+
+    counter/gauge 按 key 哈希到 16 把分片锁；每个直方图序列有自己的锁，
+    注册表锁只在首次创建序列时使用。
     """
-    
+
     def __init__(self) -> None:
         self._lock = threading.Lock()
+        self._shard_locks = [threading.Lock() for _ in range(_SHARDS)]
         self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
         self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
-        self._hists: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._hists: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _Series] = {}
         self._created_at = time.time()
-    
+
+    def _shard(self, key) -> threading.Lock:
+        return self._shard_locks[hash(key) % _SHARDS]
+
     def inc_counter(self, name: str, value: float = 1.0, labels: Optional[Dict[str, Any]] = None) -> None:
         key = (name, _labels_key(labels))
-        with self._lock:
+        with self._shard(key):
             self._counters[key] = self._counters.get(key, 0.0) + float(value)
-    
+
     def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
         key = (name, _labels_key(labels))
-        with self._lock:
+        with self._shard(key):
             self._gauges[key] = float(value)
-    
-    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+
+    def _series(self, key) -> _Series:
+        series = self._hists.get(key)
+        if series is None:
+            with self._lock:
+                series = self._hists.get(key)
+                if series is None:
+                    series = self._hists[key] = _Series()
+        return series
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None,
+                trace_id: Optional[str] = None, span_id: Optional[str] = None) -> None:
+        """
+        记录一个样本；trace_id/span_id 缺省取当前 tracer 上下文，作为所在桶的 exemplar
+        """
         key = (name, _labels_key(labels))
-        with self._lock:
-            h = self._hists.get(key)
-            if h is None:
-                h = Histogram()
-                self._hists[key] = h
-            h.observe(float(value))
-    
+        if trace_id is None:
+            trace_id = current_trace_id()
+            span_id = span_id or current_span_id()
+        value = float(value)
+        now = time.time()
+        exemplar = Exemplar(value, trace_id, span_id, now) if trace_id else None
+        series = self._series(key)
+        with series.lock:
+            series.hist.observe(value, exemplar, now)
+
+    def quantile(self, name: str, q: float, labels: Optional[Dict[str, Any]] = None,
+                 window: Optional[str] = None) -> Optional[float]:
+        """
+        分位数查询；labels=None 时合并该指标的所有标签组合
+        window: None（全量）或 "1m" / "5m" / "1h"
+        """
+        sketch = self.sketch(name, labels, window)
+        return sketch.quantile(q) if sketch is not None else None
+
+    def sketch(self, name: str, labels: Optional[Dict[str, Any]] = None,
+               window: Optional[str] = None) -> Optional[DDSketch]:
+        if labels is not None:
+            keys = [(name, _labels_key(labels))]
+        else:
+            with self._lock:
+                keys = [k for k in self._hists if k[0] == name]
+        merged = None
+        for key in keys:
+            series = self._hists.get(key)
+            if series is None:
+                continue
+            with series.lock:
+                part = series.hist.window(window) if window else series.hist.sketch.copy()
+            merged = part if merged is None else merged.merge(part)
+        return merged
+
     def snapshot(self) -> Dict[str, Any]:
-        with self._lock:
-            counters = [
-                {"name": n, "labels": dict(k), "value": v}
-                for (n, k), v in self._counters.items()
-            ]
-            gauges = [
-                {"name": n, "labels": dict(k), "value": v}
-                for (n, k), v in self._gauges.items()
-            ]
-            hists = [
-                {"name": n, "labels": dict(k), "value": h.to_dict()}
-                for (n, k), h in self._hists.items()
-            ]
-            
-            return {
-                "created_at": self._created_at,
-                "snapshot_at": time.time(),
-                "counters": counters,
-                "gauges": gauges,
-                "histograms": hists,
-            }
-    
+        counters = [
+            {"name": n, "labels": dict(k), "value": v}
+            for (n, k), v in list(self._counters.items())
+        ]
+        gauges = [
+            {"name": n, "labels": dict(k), "value": v}
+            for (n, k), v in list(self._gauges.items())
+        ]
+        now = time.time()
+        hists = []
+        for (n, k), series in list(self._hists.items()):
+            with series.lock:
+                value = series.hist.to_dict(now)
+            hists.append({"name": n, "labels": dict(k), "value": value})
+
+        return {
+            "created_at": self._created_at,
+            "snapshot_at": now,
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": hists,
+        }
+
     def snapshot_json(self, indent: int = 2) -> str:
         return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
-    
+
     def write_snapshot(self, path: str) -> None:
         import pathlib
         p = pathlib.Path(path)
@@ -1,17 +1,36 @@
 """
 AIOS v2.0 - Prometheus Metrics Exporter
 统一暴露所有Agent指标，避免每个Agent单独开端口
+
+指标在事件发生时增量更新（EventBus 订阅，含 queue.* 队列事件），/metrics 只序列化
+内存里的序列，抓取开销 O(序列数)，与历史长度无关。旧的 state 文件和
+task_queue.jsonl 由后台线程按 mtime / 文件偏移增量对账，不在抓取路径上。
+
+多进程模式：设置环境变量 PROMETHEUS_MULTIPROC_DIR 后，heartbeat / dashboard /
+scheduler 各进程调用 attach() 记录指标，exporter 的 /metrics 汇总目录下所有进程。
 """
 
-from fastapi import FastAPI
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
-from starlette.responses import Response
+import atexit
 import json
-from pathlib import Path
-from typing import Dict, Any
+import os
+import threading
 import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, Gauge, REGISTRY, PROCESS_COLLECTOR,
+    generate_latest, multiprocess, CONTENT_TYPE_LATEST,
+)
+from starlette.responses import Response
 
-app = FastAPI(title="AIOS Metrics Exporter")
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+STATE_DIR = Path('aios/agent_system/state')
+QUEUE_FILE = Path('aios/agent_system/task_queue.jsonl')
+RECONCILE_INTERVAL_SEC = 5.0
 
 # ============================================================
 # Prometheus 指标定义
@@ -36,7 +55,8 @@ agent_spawn_total = Counter(
 queue_size = Gauge(
     'queue_size_gauge',
     'Current queue size',
-    ['queue_name']
+    ['queue_name'],
+    multiprocess_mode='livesum'
 )
 
 # 4. 队列等待时间
@@ -46,17 +66,39 @@ queue_wait_time = Histogram(
     buckets=[0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0]
 )
 
-# 5. 内存使用
+# 5. 内存使用（psutil 采样，跨平台）
+# 与 Linux 上默认的 process collector 同名，先不注册；由 exporter 启动时
+# 调用 install_process_metrics() 替换，导入本模块不改动全局 REGISTRY
 process_memory = Gauge(
     'process_resident_memory_bytes',
-    'Process resident memory in bytes'
+    'Process resident memory in bytes',
+    multiprocess_mode='livesum',
+    registry=None
 )
 
 process_heap = Gauge(
     'process_heap_memory_bytes',
-    'Process heap memory in bytes'
+    'Process heap memory in bytes',
+    multiprocess_mode='livesum',
+    registry=None
 )
 
+_process_metrics_installed = False
+
+
+def install_process_metrics(registry: CollectorRegistry = REGISTRY) -> None:
+    """用 psutil 采样的内存 gauge 替换默认 process collector（重复调用无副作用）"""
+    global _process_metrics_installed
+    if _process_metrics_installed:
+        return
+    try:
+        registry.unregister(PROCESS_COLLECTOR)
+    except KeyError:
+        pass
+    registry.register(process_memory)
+    registry.register(process_heap)
+    _process_metrics_installed = True
+
 # 6. 任务成功率
 task_success = Counter(
     'task_success_total',
@@ -71,95 +113,294 @@ task_total = Counter(
 )
 
 # ============================================================
-# 数据采集
+# 增量记录 API（任何进程都可以调用）
+# ============================================================
+
+def record_task(agent_id: str, success: bool, latency_s: Optional[float] = None,
+                task_type: Optional[str] = None) -> None:
+    """记录一次任务结束：计数器 +1，延迟落入直方图桶"""
+    agent_id = agent_id or 'unknown'
+    task_total.labels(agent_id=agent_id).inc()
+    if success:
+        task_success.labels(agent_id=agent_id).inc()
+    if latency_s is not None and latency_s >= 0:
+        task_latency.labels(agent_id=agent_id, task_type=task_type or 'all').observe(latency_s)
+
+
+def record_spawn(agent_id: str) -> None:
+    agent_spawn_total.labels(agent_id=agent_id or 'unknown').inc()
+
+
+def _ms_to_s(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return value / 1000.0
+    return None
+
+
+# ============================================================
+# EventBus 订阅
 # ============================================================
 
-def load_agent_states() -> Dict[str, Any]:
-    """从state文件加载所有Agent状态"""
-    state_dir = Path('aios/agent_system/state')
-    if not state_dir.exists():
-        return {}
-    
-    states = {}
-    for state_file in state_dir.glob('*_state.json'):
+def _on_agent_task(event) -> None:
+    p = event.payload
+    success = event.type == 'agent.task_completed' and p.get('success', True)
+    record_task(p.get('agent_id') or event.source, success,
+                _ms_to_s(p.get('duration_ms')), p.get('task_type'))
+
+
+def _on_scheduler_task(event) -> None:
+    p = event.payload
+    record_task(p.get('agent_id') or 'scheduler', event.type == 'scheduler.task_completed',
+                _ms_to_s(p.get('duration_ms')), p.get('task_type'))
+
+
+def _on_spawn(event) -> None:
+    record_spawn(event.payload.get('agent_id') or event.source)
+
+
+def _on_queue_event(event) -> None:
+    """core.queues 的生命周期事件：pending 深度、排队等待、执行延迟"""
+    p = event.payload
+    kind = event.source.split('.', 1)[-1]
+    if isinstance(p.get('pending'), int):
+        queue_size.labels(queue_name=kind).set(p['pending'])
+    if event.type.endswith('.started'):
+        wait_s = _ms_to_s(p.get('wait_ms'))
+        if wait_s is not None:
+            queue_wait_time.observe(max(0.0, wait_s))
+    elif event.type.endswith(('.completed', '.failed')):
+        record_task(p.get('agent_id') or event.source, event.type.endswith('.completed'),
+                    _ms_to_s(p.get('duration_ms')), p.get('request_name'))
+
+
+_SUBSCRIPTIONS = (
+    ('agent.task_completed', _on_agent_task),
+    ('agent.error', _on_agent_task),
+    ('scheduler.task_completed', _on_scheduler_task),
+    ('scheduler.task_failed', _on_scheduler_task),
+    ('agent.spawned', _on_spawn),
+    ('queue.*', _on_queue_event),
+)
+
+_attached = []
+_attach_lock = threading.Lock()
+
+
+def attach(bus=None, sample_interval: float = RECONCILE_INTERVAL_SEC):
+    """
+    订阅 EventBus，把任务/生成事件记为指标（同一个 bus 只订阅一次）
+
+    多进程模式下同时启动本进程的 gauge 采样线程。
+    """
+    if bus is None:
+        from core.event_bus import get_event_bus
+        bus = get_event_bus()
+    with _attach_lock:
+        if any(b is bus for b in _attached):
+            return bus
+        for pattern, handler in _SUBSCRIPTIONS:
+            bus.subscribe(pattern, handler)
+        _attached.append(bus)
+    if MULTIPROC_DIR:
+        _start_background(sample_interval, with_reconcile=False)
+    return bus
+
+
+def detach(bus) -> None:
+    with _attach_lock:
+        if not any(b is bus for b in _attached):
+            return
+        for pattern, handler in _SUBSCRIPTIONS:
+            bus.unsubscribe(pattern, handler)
+        _attached[:] = [b for b in _attached if b is not bus]
+
+
+# ============================================================
+# 旧数据源的增量对账（后台线程，不在抓取路径上）
+# ============================================================
+
+class AgentStateSource:
+    """
+    *_state.json 的增量对账
+
+    只重新解析 mtime/size 变化的文件；tasks_total / tasks_success 的增量
+    累加到计数器上（Agent 重置计数时把新值整体当作增量），计数器始终单调。
+    """
+
+    def __init__(self, state_dir: Path = STATE_DIR):
+        self.state_dir = Path(state_dir)
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self._seen: Dict[str, tuple] = {}
+        self._totals: Dict[str, tuple] = {}
+
+    def poll(self) -> int:
+        """返回本次重新解析的文件数"""
         try:
-            with open(state_file, 'r', encoding='utf-8') as f:
-                state = json.load(f)
-                agent_id = state.get('agent_id')
-                if agent_id:
-                    states[agent_id] = state
-        except Exception as e:
-            print(f"[WARN] Failed to load {state_file}: {e}")
-    
-    return states
-
-
-def load_queue_stats() -> Dict[str, int]:
-    """从task_queue.jsonl加载队列统计"""
-    queue_file = Path('aios/agent_system/task_queue.jsonl')
-    if not queue_file.exists():
-        return {'pending': 0}
-    
-    try:
-        with open(queue_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            pending = sum(1 for line in lines if '"status":"pending"' in line)
-            return {'pending': pending}
-    except Exception:
-        return {'pending': 0}
-
-
-def update_metrics():
-    """更新所有Prometheus指标"""
-    # 1. 更新Agent指标
-    states = load_agent_states()
-    for agent_id, state in states.items():
-        metrics = state.get('metrics', {})
-        
-        # 任务总数和成功数
-        total = metrics.get('tasks_total', 0)
-        success = metrics.get('tasks_success', 0)
-        
-        # 更新Counter（只增不减，所以需要计算增量）
-        # 这里简化处理，直接设置（生产环境应该用增量）
-        task_total.labels(agent_id=agent_id)._value._value = total
-        task_success.labels(agent_id=agent_id)._value._value = success
-        
-        # 平均延迟（转换为秒）
-        avg_latency_s = metrics.get('avg_latency_ms', 0) / 1000.0
-        if avg_latency_s > 0:
-            task_latency.labels(agent_id=agent_id, task_type='all').observe(avg_latency_s)
-    
-    # 2. 更新队列指标
-    queue_stats = load_queue_stats()
-    queue_size.labels(queue_name='main').set(queue_stats['pending'])
-    
-    # 3. 更新内存指标（简化版，实际应该用psutil）
+            entries = [e for e in os.scandir(self.state_dir) if e.name.endswith('_state.json')]
+        except OSError:
+            return 0
+        changed = 0
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            sig = (st.st_mtime_ns, st.st_size)
+            if self._seen.get(entry.path) == sig:
+                continue
+            self._seen[entry.path] = sig
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except Exception as e:
+                print(f"[WARN] Failed to load {entry.path}: {e}")
+                continue
+            agent_id = state.get('agent_id')
+            if not agent_id:
+                continue
+            changed += 1
+            self.states[agent_id] = state
+            self._apply(agent_id, state.get('metrics', {}))
+        return changed
+
+    def _apply(self, agent_id: str, metrics: Dict[str, Any]) -> None:
+        total = int(metrics.get('tasks_total', 0) or 0)
+        success = int(metrics.get('tasks_success', 0) or 0)
+        prev_total, prev_success = self._totals.get(agent_id, (0, 0))
+        if total < prev_total or success < prev_success:
+            prev_total, prev_success = 0, 0  # Agent 计数被重置
+        if total > prev_total:
+            task_total.labels(agent_id=agent_id).inc(total - prev_total)
+        if success > prev_success:
+            task_success.labels(agent_id=agent_id).inc(success - prev_success)
+        self._totals[agent_id] = (total, success)
+
+
+class QueueFileSource:
+    """task_queue.jsonl 的增量计数：按偏移只读新增字节，文件截断/替换后从头数"""
+
+    def __init__(self, path: Path = QUEUE_FILE):
+        self.path = Path(path)
+        self.pending = 0
+        self._offset = 0
+        self._inode = None
+        self._partial = b''
+
+    def poll(self) -> int:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return self.pending
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._inode, self._offset, self._partial, self.pending = st.st_ino, 0, b'', 0
+        if st.st_size > self._offset:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            self._offset += len(chunk)
+            lines = (self._partial + chunk).split(b'\n')
+            self._partial = lines.pop()
+            self.pending += sum(1 for line in lines if b'"status":"pending"' in line)
+        return self.pending
+
+
+agent_states = AgentStateSource()
+queue_file = QueueFileSource()
+
+
+def sample_gauges() -> None:
+    """刷新内存占用 gauge（队列深度由 queue.* 事件实时更新）"""
     try:
         import psutil
-        process = psutil.Process()
-        process_memory.set(process.memory_info().rss)
+        rss = psutil.Process().memory_info().rss
+        process_memory.set(rss)
         # heap memory需要更复杂的采集，这里用rss代替
-        process_heap.set(process.memory_info().rss * 0.7)
+        process_heap.set(rss * 0.7)
     except ImportError:
         # 如果没有psutil，使用模拟数据
         process_memory.set(500 * 1024 * 1024)  # 500MB
         process_heap.set(350 * 1024 * 1024)    # 350MB
 
 
+def reconcile() -> None:
+    """对账一次 state 文件和队列文件"""
+    agent_states.poll()
+    queue_size.labels(queue_name='main').set(queue_file.poll())
+
+
+_background: Optional[threading.Thread] = None
+_background_stop = threading.Event()
+
+
+def _start_background(interval: float, with_reconcile: bool = True) -> None:
+    global _background
+    if _background is not None and _background.is_alive():
+        return
+    _background_stop.clear()
+
+    def _loop():
+        while True:
+            try:
+                if with_reconcile:
+                    reconcile()
+                sample_gauges()
+            except Exception as e:
+                print(f"[WARN] metrics reconcile failed: {e}")
+            if _background_stop.wait(interval):
+                return
+
+    _background = threading.Thread(target=_loop, daemon=True, name="metrics-reconcile")
+    _background.start()
+
+
+def _stop_background() -> None:
+    _background_stop.set()
+    if _background is not None:
+        _background.join(timeout=5)
+
+
+if MULTIPROC_DIR:
+    # livesum gauge 需要在进程退出时清掉本进程的文件
+    atexit.register(multiprocess.mark_process_dead, os.getpid())
+
+
+def build_registry() -> CollectorRegistry:
+    """单进程用默认 REGISTRY；多进程模式汇总 PROMETHEUS_MULTIPROC_DIR 下的所有进程"""
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
 # ============================================================
 # API端点
 # ============================================================
 
+@asynccontextmanager
+async def lifespan(_app):
+    install_process_metrics()
+    reconcile()
+    _start_background(RECONCILE_INTERVAL_SEC)
+    try:
+        attach()
+    except Exception as e:
+        # 没有 EventBus 时只依赖文件对账
+        print(f"[WARN] EventBus unavailable, file reconcile only: {e}")
+    yield
+    _stop_background()
+
+
+app = FastAPI(title="AIOS Metrics Exporter", lifespan=lifespan)
+_registry = build_registry()
+
+
 @app.get("/metrics")
 async def metrics():
-    """Prometheus指标端点"""
-    # 每次请求时更新指标
-    update_metrics()
-    
-    # 返回Prometheus格式
+    """Prometheus指标端点（只读内存，不碰文件）"""
+    sample_gauges()
     return Response(
-        content=generate_latest(),
+        content=generate_latest(_registry),
         media_type=CONTENT_TYPE_LATEST
     )
 
@@ -175,10 +416,7 @@ async def health():
 
 @app.get("/stats")
 async def stats():
-    """人类可读的统计信息"""
-    states = load_agent_states()
-    queue_stats = load_queue_stats()
-    
+    """人类可读的统计信息（来自最近一次对账）"""
     return {
         "agents": {
             agent_id: {
@@ -187,9 +425,9 @@ async def stats():
                 "success_rate": state.get('metrics', {}).get('tasks_success', 0) / max(state.get('metrics', {}).get('tasks_total', 1), 1) * 100,
                 "avg_latency_ms": state.get('metrics', {}).get('avg_latency_ms', 0)
             }
-            for agent_id, state in states.items()
+            for agent_id, state in agent_states.states.items()
         },
-        "queue": queue_stats,
+        "queue": {'pending': queue_file.pending},
         "timestamp": time.time()
     }
 
@@ -200,7 +438,7 @@ async def stats():
 
 if __name__ == "__main__":
     import uvicorn
-    
+
     print("=" * 60)
     print("AIOS Metrics Exporter v2.0")
     print("=" * 60)
@@ -208,5 +446,5 @@ if __name__ == "__main__":
     print("Health check: http://localhost:9090/health")
     print("Human-readable stats: http://localhost:9090/stats")
     print("=" * 60)
-    
+
     uvicorn.run(app, host="0.0.0.0", port=9090)
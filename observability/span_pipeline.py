@@ -0,0 +1,347 @@
+# aios/observability/span_pipeline.py
+"""
+Span 处理/导出管线
+
+  span 结束 → SpanRing（无锁环形缓冲，热路径只做一次 next() + 一次列表赋值）
+           → 后台线程批量取出 → TailSampler 按 trace 决定去留
+           → JsonlSpanExporter 写 traces/spans-*.jsonl（按大小轮转）
+
+采样：
+- head：按 trace_id 的哈希取 head_rate 比例，整条 trace 保留
+- tail：trace 结束后，只要有 error span 或根 span 耗时 >= slow_ms 就保留
+
+查询：load_trace(trace_id) → build_tree(spans) / critical_path(spans)
+
+用法：
+    from observability.span_pipeline import configure_tracing
+    configure_tracing(head_rate=0.1, slow_ms=500)
+"""
+from __future__ import annotations
+import itertools
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .tracer import Span, add_span_processor, remove_span_processor
+
+DEFAULT_TRACE_DIR = Path(__file__).resolve().parent / "traces"
+
+class SpanRing:
+    """
+    固定容量的多生产者 / 单消费者环形缓冲
+
+    生产者用 itertools.count 领取序号（CPython 下 next() 是原子的），直接写槽位，
+    不加锁；消费者按序号顺序读取，被覆盖的旧条目计入 dropped。
+    """
+
+    def __init__(self, capacity: int = 8192) -> None:
+        self.capacity = capacity
+        self._slots: List[Optional[tuple]] = [None] * capacity
+        self._seq = itertools.count()
+        self._read = 0
+        self.dropped = 0
+
+    def push(self, item: Any) -> None:
+        i = next(self._seq)
+        self._slots[i % self.capacity] = (i, item)
+
+    def drain(self, max_items: Optional[int] = None) -> List[Any]:
+        """取出已写入的条目（只能由一个消费者线程调用）"""
+        out = []
+        limit = max_items or self.capacity
+        while len(out) < limit:
+            slot = self._slots[self._read % self.capacity]
+            if slot is None or slot[0] < self._read:
+                break  # 还没写到这里
+            if slot[0] > self._read:
+                self.dropped += 1  # 被生产者追上覆盖
+                self._read += 1
+                continue
+            out.append(slot[1])
+            self._read += 1
+        return out
+
+class TailSampler:
+    """
+    按 trace 聚合 span，trace 结束（根 span 结束）时决定是否保留
+
+    根 span 一直没有结束的 trace，超过 trace_timeout 秒后按已有 span 判定。
+    """
+
+    def __init__(self, head_rate: float = 0.1, slow_ms: float = 1000.0,
+                 trace_timeout: float = 60.0, max_pending: int = 10000) -> None:
+        self.head_rate = head_rate
+        self.slow_ms = slow_ms
+        self.trace_timeout = trace_timeout
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, tuple]" = OrderedDict()  # trace_id -> (first_seen, spans)
+        self.stats = {"kept": 0, "dropped": 0, "head": 0, "error": 0, "slow": 0}
+
+    def head_sampled(self, trace_id: str) -> bool:
+        if self.head_rate >= 1.0:
+            return True
+        if self.head_rate <= 0.0:
+            return False
+        # 对整个 trace_id 做哈希：与 span 共用的自增序号无关，同一 trace 的判定稳定
+        return zlib.crc32(trace_id.encode()) % 10000 < self.head_rate * 10000
+
+    def add(self, span: Span, now: Optional[float] = None) -> List[List[Span]]:
+        """加入一个已结束的 span，返回因此完成并被保留的 trace 列表"""
+        entry = self._pending.get(span.trace_id)
+        if entry is None:
+            entry = self._pending[span.trace_id] = (time.monotonic() if now is None else now, [])
+        entry[1].append(span)
+        kept = []
+        if span.parent_span_id is None:
+            del self._pending[span.trace_id]
+            trace = self._decide(entry[1], span)
+            if trace:
+                kept.append(trace)
+        return kept + self.expire(now)
+
+    def expire(self, now: Optional[float] = None) -> List[List[Span]]:
+        now = time.monotonic() if now is None else now
+        kept = []
+        while self._pending:
+            trace_id, (first_seen, spans) = next(iter(self._pending.items()))
+            if now - first_seen < self.trace_timeout and len(self._pending) <= self.max_pending:
+                break
+            self._pending.popitem(last=False)
+            trace = self._decide(spans, None)
+            if trace:
+                kept.append(trace)
+        return kept
+
+    def _decide(self, spans: List[Span], root: Optional[Span]) -> Optional[List[Span]]:
+        reason = None
+        if self.head_sampled(spans[0].trace_id):
+            reason = "head"
+        elif any(s.status == "error" for s in spans):
+            reason = "error"
+        elif root is not None and (root.duration_ms or 0) >= self.slow_ms:
+            reason = "slow"
+        if reason is None:
+            self.stats["dropped"] += 1
+            return None
+        self.stats["kept"] += 1
+        self.stats[reason] += 1
+        return spans
+
+class JsonlSpanExporter:
+    """把 span 写成紧凑 JSONL；单文件超过 max_bytes 轮转，最多保留 max_files 个文件"""
+
+    def __init__(self, directory: Path = DEFAULT_TRACE_DIR, max_bytes: int = 16 * 1024 * 1024,
+                 max_files: int = 20) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._file = None
+        self._size = 0
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"spans-{stamp}-{os.getpid()}.jsonl"
+        n = 1
+        while path.exists():
+            path = self.directory / f"spans-{stamp}-{os.getpid()}-{n}.jsonl"
+            n += 1
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = 0
+        self._prune()
+
+    def _prune(self) -> None:
+        files = sorted(self.directory.glob("spans-*.jsonl"), key=lambda p: p.stat().st_mtime)
+        for old in files[:-self.max_files]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def export(self, spans: List[Span]) -> None:
+        if not spans:
+            return
+        if self._file is None or self._size >= self.max_bytes:
+            self.close()
+            self._open()
+        data = "".join(json.dumps(s.to_dict(), ensure_ascii=False, separators=(",", ":"),
+                                  default=str) + "\n" for s in spans)
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class BatchSpanProcessor:
+    """
+    tracer 处理器：on_end 只把 span 推进环形缓冲；后台线程每 interval 秒
+    按 max_batch 条一批取空缓冲，经 TailSampler 后交给 exporter。
+    """
+
+    def __init__(self, exporter: Optional[JsonlSpanExporter] = None,
+                 sampler: Optional[TailSampler] = None, capacity: int = 8192,
+                 interval: float = 1.0, max_batch: int = 2048, recent_traces: int = 256) -> None:
+        self.exporter = exporter or JsonlSpanExporter()
+        self.sampler = sampler or TailSampler()
+        self.ring = SpanRing(capacity)
+        self.on_end = self.ring.push
+        self.interval = interval
+        self.max_batch = max_batch
+        self._recent: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._recent_max = recent_traces
+        self._lock = threading.Lock()  # 只保护消费侧（后台线程 / flush）
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ── tracer 回调（热路径） ───────────────────────────
+    # 不需要 on_start；on_end 在 __init__ 里直接绑定为 ring.push，少一层 Python 调用
+    on_start = None
+
+    # ── 消费侧 ─────────────────────────────────────────
+    def start(self) -> "BatchSpanProcessor":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="span-exporter")
+            self._thread.start()
+        return self
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[WARN] span export failed: {e}")
+
+    def flush(self) -> int:
+        """处理缓冲里的所有 span，返回导出的 span 数"""
+        exported = 0
+        with self._lock:
+            while True:
+                batch = self.ring.drain(self.max_batch)
+                kept: List[List[Span]] = []
+                for sp in batch:
+                    kept.extend(self.sampler.add(sp))
+                if not batch:
+                    kept.extend(self.sampler.expire())
+                spans = [sp for trace in kept for sp in trace]
+                self.exporter.export(spans)
+                exported += len(spans)
+                for trace in kept:
+                    self._remember(trace)
+                if not batch:
+                    return exported
+
+    def _remember(self, trace: List[Span]) -> None:
+        trace_id = trace[0].trace_id
+        self._recent[trace_id] = trace
+        self._recent.move_to_end(trace_id)
+        while len(self._recent) > self._recent_max:
+            self._recent.popitem(last=False)
+
+    def recent_trace(self, trace_id: str) -> Optional[List[Dict[str, Any]]]:
+        trace = self._recent.get(trace_id)
+        return [s.to_dict() for s in trace] if trace else None
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+        self.exporter.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"dropped_in_ring": self.ring.dropped, **self.sampler.stats}
+
+_processor: Optional[BatchSpanProcessor] = None
+
+def configure_tracing(directory: Path = DEFAULT_TRACE_DIR, head_rate: float = 0.1,
+                      slow_ms: float = 1000.0, **kwargs: Any) -> BatchSpanProcessor:
+    """安装全局导出管线（重复调用会先关闭旧的）"""
+    global _processor
+    shutdown_tracing()
+    _processor = BatchSpanProcessor(
+        exporter=JsonlSpanExporter(directory),
+        sampler=TailSampler(head_rate=head_rate, slow_ms=slow_ms),
+        **kwargs,
+    ).start()
+    add_span_processor(_processor)
+    return _processor
+
+def shutdown_tracing() -> None:
+    global _processor
+    if _processor is not None:
+        remove_span_processor(_processor)
+        _processor.shutdown()
+        _processor = None
+
+# ── 查询 ─────────────────────────────────────────────────
+
+def load_trace(trace_id: str, directory: Path = DEFAULT_TRACE_DIR) -> List[Dict[str, Any]]:
+    """按 trace_id 取出所有 span（先查内存里最近的 trace，再从新到旧扫描文件）"""
+    if _processor is not None:
+        recent = _processor.recent_trace(trace_id)
+        if recent:
+            return recent
+    needle = f'"trace_id":"{trace_id}"'
+    spans: List[Dict[str, Any]] = []
+    directory = Path(directory)
+    if not directory.exists():
+        return spans
+    files = sorted(directory.glob("spans-*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in files:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if needle in line:  # 子串预过滤，命中才解析
+                        spans.append(json.loads(line))
+        except (OSError, ValueError):
+            continue
+        if spans:
+            break  # 同一 trace 在一次 flush 中写入同一个文件
+    return spans
+
+def build_tree(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把 span 列表还原成树：[{"span": ..., "children": [...]}]，子节点按开始时间排序"""
+    nodes = {s["span_id"]: {"span": s, "children": []} for s in spans}
+    roots = []
+    for s in sorted(spans, key=lambda s: s["start_ns"]):
+        node = nodes[s["span_id"]]
+        parent = nodes.get(s.get("parent_span_id"))
+        (parent["children"] if parent is not None else roots).append(node)
+    return roots
+
+def _end(span: Dict[str, Any]) -> int:
+    return span.get("end_ns") or span["start_ns"]
+
+def _critical(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    path = [node["span"]]
+    # 从最晚结束的子 span 往前找，串起互不重叠的一条链
+    chain = []
+    cutoff = _end(node["span"])
+    for child in sorted(node["children"], key=lambda n: _end(n["span"]), reverse=True):
+        if _end(child["span"]) <= cutoff:
+            chain.append(child)
+            cutoff = child["span"]["start_ns"]
+    for child in reversed(chain):
+        path.extend(_critical(child))
+    return path
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    关键路径：决定整个 trace 耗时的 span 链（按时间顺序）
+
+    每一层从最晚结束的子 span 开始，向前依次挑选在它开始前结束的子 span。
+    """
+    roots = build_tree(spans)
+    if not roots:
+        return []
+    root = max(roots, key=lambda n: _end(n["span"]) - n["span"]["start_ns"])
+    return _critical(root)
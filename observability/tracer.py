@@ -1,27 +1,71 @@
 # aios/observability/tracer.py
 from __future__ import annotations
+import itertools
+import os
 import time
-import uuid
-from contextlib import contextmanager
 from contextvars import ContextVar
-from dataclasses import dataclass, field
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
-_span_id: ContextVar[Optional[str]] = ContextVar("span_id", default=None)
-_parent_span_id: ContextVar[Optional[str]] = ContextVar("parent_span_id", default=None)
+_time_ns = time.time_ns
+
+# 当前 span（trace_id / span_id / parent_span_id 都从它派生，进出 span 只设置一次 ContextVar）
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_get_current, _set_current, _reset_current = _current.get, _current.set, _current.reset
+
+# 已注册的 span 处理器（见 span_pipeline）；为空时 span 结束不做任何额外工作
+# 注册时预先取出绑定方法，热路径上不再逐个查属性 / 创建绑定方法
+_processors: Tuple[Any, ...] = ()
+_on_start: Tuple[Any, ...] = ()
+_on_end: Tuple[Any, ...] = ()
+
+# id = 每进程 64 位随机前缀 + 64 位自增序号：不用每次读 /dev/urandom，fork 后换前缀
+_prefix = os.urandom(8).hex()
+_seq = itertools.count(1)
+
+def _reseed() -> None:
+    global _prefix, _seq
+    _prefix, _seq = os.urandom(8).hex(), itertools.count(1)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed)
+
+def _format_id(prefix: str, seq: int) -> str:
+    return f"{prefix}:{_prefix}{seq:016x}"
 
 def _new_id(prefix: str) -> str:
-    return f"{prefix}:{uuid.uuid4().hex}"
+    return _format_id(prefix, next(_seq))
 
 def current_trace_id() -> Optional[str]:
-    return _trace_id.get()
+    sp = _current.get()
+    return sp.trace_id if sp is not None else None
 
 def current_span_id() -> Optional[str]:
-    return _span_id.get()
+    sp = _current.get()
+    return sp.span_id if sp is not None else None
 
 def current_parent_span_id() -> Optional[str]:
-    return _parent_span_id.get()
+    sp = _current.get()
+    return sp.parent_span_id if sp is not None else None
+
+def current_span() -> Optional["Span"]:
+    return _current.get()
+
+def _rebuild_hooks() -> None:
+    global _on_start, _on_end
+    _on_start = tuple(p.on_start for p in _processors if getattr(p, "on_start", None) is not None)
+    _on_end = tuple(p.on_end for p in _processors if getattr(p, "on_end", None) is not None)
+
+def add_span_processor(processor: Any) -> None:
+    """注册处理器：实现 on_start(span) / on_end(span)，不需要的回调可以省略或设为 None"""
+    global _processors
+    if processor not in _processors:
+        _processors = _processors + (processor,)
+        _rebuild_hooks()
+
+def remove_span_processor(processor: Any) -> None:
+    global _processors
+    _processors = tuple(p for p in _processors if p is not processor)
+    _rebuild_hooks()
 
 def ensure_task_id(task: Dict[str, Any]) -> str:
     """
@@ -33,93 +77,129 @@ def ensure_task_id(task: Dict[str, Any]) -> str:
         tid = str(tid).strip()
         task["id"] = tid
         return tid
-    
+
     src = task.get("source_path") or task.get("path")
     if src and str(src).strip():
         tid = f"file:{str(src).strip()}"
         task["id"] = tid
         return tid
-    
+
     tid = _new_id("task")
     task["id"] = tid
     return tid
 
-@dataclass
 class Span:
-    name: str
-    trace_id: str
-    span_id: str
-    parent_span_id: Optional[str]
-    attributes: Dict[str, Any] = field(default_factory=dict)
-    start_ns: int = field(default_factory=time.time_ns)
-    end_ns: Optional[int] = None
-    
+    """
+    一个 span。span_id / parent_span_id 在第一次读取时才格式化成字符串，
+    attributes 在第一次读取时才分配 dict；未被导出的子 span 只付一次对象分配。
+    """
+
+    # _id: 自增序号（int），第一次读取 span_id 后换成格式化好的字符串
+    # _parent: 父 Span 对象（进程内子 span）或父 span_id 字符串（外部传入）
+    __slots__ = ("name", "trace_id", "_id", "_parent", "_attrs",
+                 "start_ns", "end_ns", "status", "_token")
+
+    def __init__(self, name: str, trace_id: str, span_id: Optional[str] = None,
+                 parent_span_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None,
+                 start_ns: Optional[int] = None, end_ns: Optional[int] = None,
+                 status: str = "ok") -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self._id = next(_seq) if span_id is None else span_id
+        self._parent = parent_span_id
+        self._attrs = attributes
+        self.start_ns = _time_ns() if start_ns is None else start_ns
+        self.end_ns = end_ns
+        self.status = status
+        self._token = None
+
+    @property
+    def span_id(self) -> str:
+        sid = self._id
+        if sid.__class__ is int:
+            sid = self._id = _format_id("span", sid)
+        return sid
+
+    @property
+    def parent_span_id(self) -> Optional[str]:
+        parent = self._parent
+        if parent is None or parent.__class__ is str:
+            return parent
+        return parent.span_id
+
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        if self._attrs is None:
+            self._attrs = {}
+        return self._attrs
+
+    # with 块：进入时成为当前 span；抛出异常时标记为 error，异常照常向外传播
+    def __enter__(self) -> "Span":
+        self._token = _set_current(self)
+        if _on_start:
+            for hook in _on_start:
+                hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = _time_ns()
+        if exc is not None:
+            self.set_error(exc)
+        _reset_current(self._token)
+        if _on_end:
+            for hook in _on_end:
+                hook(self)
+        return False
+
     def end(self) -> None:
         if self.end_ns is None:
-            self.end_ns = time.time_ns()
-    
+            self.end_ns = _time_ns()
+
+    def set_error(self, error: Any) -> None:
+        self.status = "error"
+        self.attributes.setdefault("error", repr(error) if isinstance(error, BaseException) else str(error))
+
     @property
     def duration_ms(self) -> Optional[float]:
         if self.end_ns is None:
             return None
         return (self.end_ns - self.start_ns) / 1_000_000.0
 
-@contextmanager
-def start_trace(name: str, attributes: Optional[Dict[str, Any]] = None):
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+_new_span = object.__new__
+
+def start_trace(name: str, attributes: Optional[Dict[str, Any]] = None) -> Span:
     """
     创建一个新的 trace（root span）。
     """
-    trace_id = _new_id("trace")
-    span_id = _new_id("span")
-    
-    token_trace = _trace_id.set(trace_id)
-    token_parent = _parent_span_id.set(None)
-    token_span = _span_id.set(span_id)
-    
-    sp = Span(
-        name=name,
-        trace_id=trace_id,
-        span_id=span_id,
-        parent_span_id=None,
-        attributes=attributes or {},
-    )
-    
-    try:
-        yield sp
-    finally:
-        sp.end()
-        _span_id.reset(token_span)
-        _parent_span_id.reset(token_parent)
-        _trace_id.reset(token_trace)
-
-@contextmanager
-def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    return Span(name, _new_id("trace"), attributes=attributes)
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Span:
     """
     在当前 trace 下创建子 span；如果当前没有 trace，则自动创建一个 trace。
     """
-    if current_trace_id() is None:
-        with start_trace(name=f"auto:{name}", attributes=attributes) as root:
-            yield root
-        return
-    
-    parent = current_span_id()
-    trace_id = current_trace_id() or _new_id("trace")
-    span_id = _new_id("span")
-    
-    token_parent = _parent_span_id.set(parent)
-    token_span = _span_id.set(span_id)
-    
-    sp = Span(
-        name=name,
-        trace_id=trace_id,
-        span_id=span_id,
-        parent_span_id=parent,
-        attributes=attributes or {},
-    )
-    
-    try:
-        yield sp
-    finally:
-        sp.end()
-        _span_id.reset(token_span)
-        _parent_span_id.reset(token_parent)
+    parent = _get_current()
+    if parent is None:
+        return Span(f"auto:{name}", _new_id("trace"), attributes=attributes)
+    # 热路径：跳过 __init__ 的参数处理，直接填槽位
+    sp = _new_span(Span)
+    sp.name = name
+    sp.trace_id = parent.trace_id
+    sp._id = next(_seq)
+    sp._parent = parent
+    sp._attrs = attributes
+    sp.end_ns = None
+    sp.status = "ok"
+    sp.start_ns = _time_ns()
+    return sp
@@ -1,13 +1,157 @@
 """
 ChangeDetector - 变化感知模块
 监控系统指标的变化趋势，识别"势"的转变
+
+- ChangeDetector       单指标：窗口内维护 Σd、Σd²、Σxd 滑动和（d = y - 基准值），斜率/方差
+                       O(1) 更新和查询；基准值取窗口首值，避免大数值下 Σy²/n - ȳ² 相消丢精度
+- CusumDetector        双侧 CUSUM 均值突变检测（按预热期标准差归一化）
+- PageHinkleyDetector  Page-Hinkley 均值漂移检测（同上）
+- BatchChangeDetector  成千上万个指标一起更新：同样的滑动和与两种突变检测用 NumPy 向量化，
+                       每次心跳一个数组进、一个数组出
 """
 import json
+import math
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 from collections import deque
 
+try:
+    import numpy as np
+except ImportError:  # BatchChangeDetector 需要 NumPy，单指标检测不需要
+    np = None
+
+# 滑动和至多每更新这么多次（窗口更小时每滑过一整个窗口）从窗口原值重算一次，
+# 同时把基准值换成窗口首值，消除浮点累积误差
+RESYNC_EVERY = 1024
+
+
+class _Standardizer:
+    """预热期内用 Welford 估计均值/标准差，之后把输入换算成 z 分数"""
+
+    def __init__(self, warmup: int):
+        self.warmup = max(2, warmup)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.scale = None
+
+    def update(self, value: float) -> Optional[float]:
+        """预热期返回 None，之后返回 z 分数"""
+        if self.scale is None:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+            if self.count >= self.warmup:
+                std = math.sqrt(self._m2 / self.count)
+                # 恒定序列标准差为 0：按均值的 1% 兜底，避免除零
+                self.scale = max(std, abs(self.mean) * 0.01, 1e-9)
+            return None
+        return (value - self.mean) / self.scale
+
+
+class CusumDetector:
+    """
+    双侧 CUSUM：g+ = max(0, g+ + z - k)，g- = max(0, g- - z - k)，
+    任一侧超过 h 报警（"up" / "down"），然后重新预热。k、h 以预热期标准差为单位。
+    """
+
+    def __init__(self, k: float = 0.5, h: float = 5.0, warmup: int = 10):
+        self.k = k
+        self.h = h
+        self._std = _Standardizer(warmup)
+        self.g_up = 0.0
+        self.g_down = 0.0
+
+    def update(self, value: float) -> Optional[str]:
+        z = self._std.update(value)
+        if z is None:
+            return None
+        self.g_up = max(0.0, self.g_up + z - self.k)
+        self.g_down = max(0.0, self.g_down - z - self.k)
+        if self.g_up > self.h or self.g_down > self.h:
+            direction = "up" if self.g_up > self.h else "down"
+            self.reset()
+            return direction
+        return None
+
+    def reset(self):
+        self._std.reset()
+        self.g_up = 0.0
+        self.g_down = 0.0
+
+
+class PageHinkleyDetector:
+    """
+    Page-Hinkley：m_t = Σ(z_i - z̄_i - δ)，m_t - min(m) > λ 报警上升；下降方向对称。
+    δ、λ 以预热期标准差为单位；报警后重新预热。
+    """
+
+    def __init__(self, delta: float = 0.5, lambda_: float = 8.0, warmup: int = 10):
+        self.delta = delta
+        self.lambda_ = lambda_
+        self._std = _Standardizer(warmup)
+        self._reset_sums()
+
+    def _reset_sums(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m_up = self.min_up = 0.0
+        self.m_down = self.min_down = 0.0
+
+    def update(self, value: float) -> Optional[str]:
+        z = self._std.update(value)
+        if z is None:
+            return None
+        self.count += 1
+        self.mean += (z - self.mean) / self.count
+        self.m_up += z - self.mean - self.delta
+        self.min_up = min(self.min_up, self.m_up)
+        self.m_down += self.mean - z - self.delta
+        self.min_down = min(self.min_down, self.m_down)
+        if self.m_up - self.min_up > self.lambda_:
+            self.reset()
+            return "up"
+        if self.m_down - self.min_down > self.lambda_:
+            self.reset()
+            return "down"
+        return None
+
+    def reset(self):
+        self._std.reset()
+        self._reset_sums()
+
+
+def _classify(n, shift, sd, sdd, sxd, threshold) -> Tuple[str, float, float, float]:
+    """由窗口滑动和得到 (趋势, 置信度, 均值, 标准差)；x 取 0..n-1，d = y - shift"""
+    mean_d = sd / n
+    mean = shift + mean_d
+    variance = max(sdd / n - mean_d * mean_d, 0.0)
+    std_dev = variance ** 0.5
+    if n < 3:
+        return ChangeDetector.TREND_STABLE, 0.0, mean, std_dev
+
+    # 线性回归斜率：Σ(x-x̄)(y-ȳ) / Σ(x-x̄)²，Σ(x-x̄)² = n(n²-1)/12；平移 y 不改变斜率
+    sxx = n * (n * n - 1) / 12.0
+    slope = (sxd - (n - 1) / 2.0 * sd) / sxx
+
+    # 归一化斜率 / 标准差（相对于均值）
+    normalized_slope = slope / mean if mean != 0 else 0
+    normalized_std = std_dev / mean if mean != 0 else 0
+
+    if normalized_std > threshold * 2:
+        return ChangeDetector.TREND_VOLATILE, min(normalized_std, 1.0), mean, std_dev
+    elif normalized_slope > threshold:
+        return ChangeDetector.TREND_RISING, min(abs(normalized_slope), 1.0), mean, std_dev
+    elif normalized_slope < -threshold:
+        return ChangeDetector.TREND_FALLING, min(abs(normalized_slope), 1.0), mean, std_dev
+    else:
+        return ChangeDetector.TREND_STABLE, 1.0 - normalized_std, mean, std_dev
+
 
 class ChangeDetector:
     """变化检测器 - 监控指标变化趋势"""
@@ -18,21 +162,64 @@ class ChangeDetector:
     TREND_VOLATILE = "volatile"  # 波动期（屯卦）
     TREND_STABLE = "stable"      # 稳定期（恒卦）
     
-    def __init__(self, window_size: int = 10, threshold: float = 0.1):
+    def __init__(self, window_size: int = 10, threshold: float = 0.1,
+                 cusum: Optional[CusumDetector] = None,
+                 page_hinkley: Optional[PageHinkleyDetector] = None):
         """
         Args:
             window_size: 滑动窗口大小（最近N个数据点）
             threshold: 变化阈值（超过此值认为有显著变化）
+            cusum / page_hinkley: 突变检测器，默认各建一个（预热期 = 窗口大小）
         """
         self.window_size = window_size
         self.threshold = threshold
         self.history = deque(maxlen=window_size)
+        self.cusum = cusum or CusumDetector(warmup=window_size)
+        self.page_hinkley = page_hinkley or PageHinkleyDetector(warmup=window_size)
+        self.last_change: Optional[Dict] = None
+        self._count = 0  # 累计数据点
+        self._shift = 0.0  # 基准值：滑动和按 d = y - shift 累计
+        self._sd = 0.0
+        self._sdd = 0.0
+        self._sxd = 0.0  # x 为窗口内位置 0..n-1
     
     def add_data_point(self, value: float, timestamp: datetime = None):
-        """添加新数据点"""
+        """添加新数据点（O(1)）"""
         if timestamp is None:
             timestamp = datetime.now()
-        self.history.append({"value": value, "timestamp": timestamp})
+        history = self.history
+        if not history:
+            self._shift = value
+        if len(history) == self.window_size:
+            # 移出最老的点：其余点的 x 各减 1
+            old = history[0]["value"] - self._shift
+            self._sxd -= self._sd - old
+            self._sd -= old
+            self._sdd -= old * old
+        d = value - self._shift
+        self._sxd += min(len(history), self.window_size - 1) * d
+        self._sd += d
+        self._sdd += d * d
+        history.append({"value": value, "timestamp": timestamp})
+        self._count += 1
+        if self._count % min(RESYNC_EVERY, self.window_size) == 0:
+            self._resync()
+
+        for name, detector in (("cusum", self.cusum), ("page_hinkley", self.page_hinkley)):
+            direction = detector.update(value)
+            if direction is not None:
+                self.last_change = {
+                    "detector": name,
+                    "direction": direction,
+                    "index": self._count - 1,
+                }
+
+    def _resync(self):
+        self._shift = self.history[0]["value"]
+        values = [point["value"] - self._shift for point in self.history]
+        self._sd = math.fsum(values)
+        self._sdd = math.fsum(v * v for v in values)
+        self._sxd = math.fsum(i * v for i, v in enumerate(values))
     
     def detect_trend(self) -> Tuple[str, float]:
         """
@@ -43,52 +230,9 @@ class ChangeDetector:
         """
         if len(self.history) < 3:
             return self.TREND_STABLE, 0.0
-        
-        values = [point["value"] for point in self.history]
-        
-        # 计算线性回归斜率（简化版）
-        n = len(values)
-        x = list(range(n))
-        x_mean = sum(x) / n
-        y_mean = sum(values) / n
-        
-        numerator = sum((x[i] - x_mean) * (values[i] - y_mean) for i in range(n))
-        denominator = sum((x[i] - x_mean) ** 2 for i in range(n))
-        
-        if denominator == 0:
-            slope = 0
-        else:
-            slope = numerator / denominator
-        
-        # 计算标准差（波动性）
-        variance = sum((v - y_mean) ** 2 for v in values) / n
-        std_dev = variance ** 0.5
-        
-        # 归一化斜率（相对于均值）
-        if y_mean != 0:
-            normalized_slope = slope / y_mean
-        else:
-            normalized_slope = 0
-        
-        # 归一化标准差
-        if y_mean != 0:
-            normalized_std = std_dev / y_mean
-        else:
-            normalized_std = 0
-        
-        # 判断趋势
-        if normalized_std > self.threshold * 2:
-            # 高波动
-            return self.TREND_VOLATILE, min(normalized_std, 1.0)
-        elif normalized_slope > self.threshold:
-            # 上升
-            return self.TREND_RISING, min(abs(normalized_slope), 1.0)
-        elif normalized_slope < -self.threshold:
-            # 下降
-            return self.TREND_FALLING, min(abs(normalized_slope), 1.0)
-        else:
-            # 稳定
-            return self.TREND_STABLE, 1.0 - normalized_std
+        trend, confidence, _, _ = _classify(
+            len(self.history), self._shift, self._sd, self._sdd, self._sxd, self.threshold)
+        return trend, confidence
     
     def get_summary(self) -> Dict:
         """获取当前状态摘要"""
@@ -99,26 +243,268 @@ class ChangeDetector:
                 "current_value": None,
                 "mean": None,
                 "std_dev": None,
-                "data_points": 0
+                "data_points": 0,
+                "change": None,
             }
         
-        trend, confidence = self.detect_trend()
-        values = [point["value"] for point in self.history]
-        mean = sum(values) / len(values)
-        variance = sum((v - mean) ** 2 for v in values) / len(values)
-        std_dev = variance ** 0.5
+        trend, confidence, mean, std_dev = _classify(
+            len(self.history), self._shift, self._sd, self._sdd, self._sxd, self.threshold)
         
         return {
             "trend": trend,
             "confidence": round(confidence, 3),
-            "current_value": round(values[-1], 3),
+            "current_value": round(self.history[-1]["value"], 3),
             "mean": round(mean, 3),
             "std_dev": round(std_dev, 3),
-            "data_points": len(values),
-            "window_size": self.window_size
+            "data_points": len(self.history),
+            "window_size": self.window_size,
+            "change": self.last_change,
         }
 
 
+_TREND_NAMES = (
+    ChangeDetector.TREND_STABLE,
+    ChangeDetector.TREND_RISING,
+    ChangeDetector.TREND_FALLING,
+    ChangeDetector.TREND_VOLATILE,
+)
+
+
+class BatchChangeDetector:
+    """
+    多指标批量检测：M 个指标共用一个 (M, window) 环形缓冲，update() 一次传入所有指标的新值，
+    滑动和、趋势判断、CUSUM、Page-Hinkley 全部按列向量化。NaN 表示该指标本轮没有数据（跳过）。
+    判定规则与 ChangeDetector 一致。
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        window_size: int = 10,
+        threshold: Union[float, Sequence[float]] = 0.1,
+        cusum_k: float = 0.5,
+        cusum_h: float = 5.0,
+        ph_delta: float = 0.5,
+        ph_lambda: float = 8.0,
+        warmup: Optional[int] = None,
+    ):
+        if np is None:
+            raise ImportError("BatchChangeDetector requires numpy")
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        m = len(self.names)
+        self.window_size = window_size
+        self.threshold = np.broadcast_to(np.asarray(threshold, dtype=float), (m,)).copy()
+        self.cusum_k, self.cusum_h = cusum_k, cusum_h
+        self.ph_delta, self.ph_lambda = ph_delta, ph_lambda
+        self.warmup = max(2, warmup or window_size)
+
+        self._values = np.zeros((m, window_size))
+        self._pos = np.zeros(m, dtype=np.int64)  # 下一个写入位置
+        self._n = np.zeros(m, dtype=np.int64)  # 窗口内点数
+        self._shift = np.zeros(m)  # 各指标的基准值，滑动和按 d = y - shift 累计
+        self._sd = np.zeros(m)
+        self._sdd = np.zeros(m)
+        self._sxd = np.zeros(m)
+        self._steps = 0
+
+        # 突变检测状态（与 CusumDetector / PageHinkleyDetector 相同的算法，各自预热）
+        self._cusum_std = self._new_standardizer(m)
+        self._ph_std = self._new_standardizer(m)
+        self._g_up = np.zeros(m)
+        self._g_down = np.zeros(m)
+        self._ph_count = np.zeros(m)
+        self._ph_mean = np.zeros(m)
+        self._ph_up = np.zeros(m)
+        self._ph_min_up = np.zeros(m)
+        self._ph_down = np.zeros(m)
+        self._ph_min_down = np.zeros(m)
+        self.last_change: Dict[str, Dict] = {}
+
+    def update(self, values: Union[Sequence[float], Dict[str, float]]) -> List[Dict]:
+        """
+        推入一轮数据。values 为长度 M 的数组（按 names 顺序，NaN 跳过）或 {name: value}。
+
+        Returns:
+            本轮触发的突变 [{"metric", "detector", "direction"}]
+        """
+        if isinstance(values, dict):
+            row = np.full(len(self.names), np.nan)
+            for name, value in values.items():
+                row[self.index[name]] = value
+        else:
+            row = np.asarray(values, dtype=float)
+        present = ~np.isnan(row)
+        idx = None if present.all() else np.nonzero(present)[0]
+        sel = slice(None) if idx is None else idx
+        y = row[sel]
+
+        # ── 滑动和 ──
+        n = self._n[sel]
+        pos = self._pos[sel]
+        rows = np.arange(len(self.names))[sel]
+        full = n == self.window_size
+        shift = np.where(n == 0, y, self._shift[sel])
+        self._shift[sel] = shift
+        old = np.where(full, self._values[rows, pos] - shift, 0.0)
+        d = y - shift
+        sd = self._sd[sel]
+        self._sxd[sel] = self._sxd[sel] - np.where(full, sd - old, 0.0) \
+            + np.where(full, self.window_size - 1, n) * d
+        self._sd[sel] = sd - old + d
+        self._sdd[sel] = self._sdd[sel] - old * old + d * d
+        self._values[rows, pos] = y
+        self._pos[sel] = (pos + 1) % self.window_size
+        self._n[sel] = np.minimum(n + 1, self.window_size)
+        self._steps += 1
+        if self._steps % min(RESYNC_EVERY, self.window_size) == 0:
+            self._resync()
+
+        return self._detect_changes(sel, y)
+
+    def _resync(self):
+        order = (self._pos[:, None] - self._n[:, None] + np.arange(self.window_size)) % self.window_size
+        ordered = np.take_along_axis(self._values, order, axis=1)
+        valid = np.arange(self.window_size) < self._n[:, None]
+        self._shift = np.where(self._n > 0, ordered[:, 0], self._shift)
+        ordered = np.where(valid, ordered - self._shift[:, None], 0.0)
+        self._sd = ordered.sum(axis=1)
+        self._sdd = (ordered * ordered).sum(axis=1)
+        self._sxd = ordered @ np.arange(self.window_size, dtype=float)
+
+    @staticmethod
+    def _new_standardizer(m: int) -> Dict[str, "np.ndarray"]:
+        return {"count": np.zeros(m), "mean": np.zeros(m), "m2": np.zeros(m),
+                "scale": np.full(m, np.nan)}  # scale 为 NaN = 仍在预热
+
+    def _standardize(self, state, sel, y) -> Tuple["np.ndarray", "np.ndarray"]:
+        """_Standardizer 的向量版：返回 (z 分数, 是否已过预热)"""
+        warming = np.isnan(state["scale"][sel])
+        count = state["count"][sel] + warming
+        delta = np.where(warming, y - state["mean"][sel], 0.0)
+        mean = state["mean"][sel] + np.where(warming, delta / np.maximum(count, 1), 0.0)
+        m2 = state["m2"][sel] + delta * (y - mean)
+        state["count"][sel], state["mean"][sel], state["m2"][sel] = count, mean, m2
+        scale = state["scale"][sel]
+        ready = warming & (count >= self.warmup)
+        if ready.any():
+            std = np.sqrt(m2 / np.maximum(count, 1))
+            scale = np.where(ready, np.maximum(np.maximum(std, np.abs(mean) * 0.01), 1e-9), scale)
+            state["scale"][sel] = scale
+        active = ~warming
+        z = np.where(active, (y - mean) / np.where(active, scale, 1.0), 0.0)
+        return z, active
+
+    def _detect_changes(self, sel, y) -> List[Dict]:
+        # CUSUM
+        z, active = self._standardize(self._cusum_std, sel, y)
+        g_up = np.where(active, np.maximum(0.0, self._g_up[sel] + z - self.cusum_k), 0.0)
+        g_down = np.where(active, np.maximum(0.0, self._g_down[sel] - z - self.cusum_k), 0.0)
+        self._g_up[sel], self._g_down[sel] = g_up, g_down
+        cusum_up = g_up > self.cusum_h
+        cusum_down = ~cusum_up & (g_down > self.cusum_h)
+
+        # Page-Hinkley
+        z, active = self._standardize(self._ph_std, sel, y)
+        ph_count = self._ph_count[sel] + active
+        ph_mean = self._ph_mean[sel] + np.where(active, (z - self._ph_mean[sel]) / np.maximum(ph_count, 1), 0.0)
+        m_up = self._ph_up[sel] + np.where(active, z - ph_mean - self.ph_delta, 0.0)
+        m_down = self._ph_down[sel] + np.where(active, ph_mean - z - self.ph_delta, 0.0)
+        min_up = np.minimum(self._ph_min_up[sel], m_up)
+        min_down = np.minimum(self._ph_min_down[sel], m_down)
+        self._ph_count[sel], self._ph_mean[sel] = ph_count, ph_mean
+        self._ph_up[sel], self._ph_min_up[sel] = m_up, min_up
+        self._ph_down[sel], self._ph_min_down[sel] = m_down, min_down
+        ph_up = m_up - min_up > self.ph_lambda
+        ph_down = ~ph_up & (m_down - min_down > self.ph_lambda)
+
+        cusum_alarm = cusum_up | cusum_down
+        ph_alarm = ph_up | ph_down
+        if not (cusum_alarm.any() or ph_alarm.any()):
+            return []
+
+        rows = np.arange(len(self.names))[sel]
+        changes = []
+        for i in np.nonzero(cusum_alarm | ph_alarm)[0]:
+            # 与单指标版本一致：先 CUSUM 后 Page-Hinkley，同一轮都报警时以后者为 last_change
+            for detector, up, down in (("cusum", cusum_up[i], cusum_down[i]),
+                                       ("page_hinkley", ph_up[i], ph_down[i])):
+                if up or down:
+                    change = {"metric": self.names[rows[i]], "detector": detector,
+                              "direction": "up" if up else "down", "index": self._steps - 1}
+                    changes.append(change)
+                    self.last_change[change["metric"]] = change
+
+        # 报警的检测器重新预热
+        reset = rows[cusum_alarm]
+        self._reset(self._cusum_std, reset, (self._g_up, self._g_down))
+        reset = rows[ph_alarm]
+        self._reset(self._ph_std, reset, (self._ph_count, self._ph_mean, self._ph_up,
+                                          self._ph_min_up, self._ph_down, self._ph_min_down))
+        return changes
+
+    @staticmethod
+    def _reset(state, rows, sums):
+        for arr in (state["count"], state["mean"], state["m2"], *sums):
+            arr[rows] = 0.0
+        state["scale"][rows] = np.nan
+
+    def trends(self) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        所有指标的 (趋势码, 置信度, 均值, 标准差) 数组；
+        趋势码是 _TREND_NAMES 的下标（0 stable / 1 rising / 2 falling / 3 volatile）。
+        """
+        n = self._n.astype(float)
+        safe_n = np.maximum(n, 1.0)
+        mean_d = self._sd / safe_n
+        mean = self._shift + mean_d
+        std = np.sqrt(np.maximum(self._sdd / safe_n - mean_d * mean_d, 0.0))
+        sxx = np.maximum(n * (n * n - 1) / 12.0, 1e-12)
+        slope = (self._sxd - (n - 1) / 2.0 * self._sd) / sxx
+        nonzero = mean != 0
+        safe_mean = np.where(nonzero, mean, 1.0)
+        nslope = np.where(nonzero, slope / safe_mean, 0.0)
+        nstd = np.where(nonzero, std / safe_mean, 0.0)
+
+        volatile = nstd > self.threshold * 2
+        rising = ~volatile & (nslope > self.threshold)
+        falling = ~volatile & ~rising & (nslope < -self.threshold)
+        code = np.select([volatile, rising, falling], [3, 1, 2], default=0)
+        confidence = np.select(
+            [volatile, rising | falling],
+            [np.minimum(nstd, 1.0), np.minimum(np.abs(nslope), 1.0)],
+            default=1.0 - nstd,
+        )
+        short = n < 3
+        code = np.where(short, 0, code)
+        confidence = np.where(short, 0.0, confidence)
+        return code, confidence, mean, std
+
+    def summaries(self) -> Dict[str, Dict]:
+        """与 ChangeDetector.get_summary() 同格式的逐指标摘要"""
+        code, confidence, mean, std = self.trends()
+        last = (self._pos - 1) % self.window_size
+        current = self._values[np.arange(len(self.names)), last]
+        result = {}
+        for i, name in enumerate(self.names):
+            if self._n[i] == 0:
+                result[name] = {"trend": ChangeDetector.TREND_STABLE, "confidence": 0.0,
+                                "current_value": None, "mean": None, "std_dev": None,
+                                "data_points": 0, "change": None}
+                continue
+            result[name] = {
+                "trend": _TREND_NAMES[code[i]],
+                "confidence": round(float(confidence[i]), 3),
+                "current_value": round(float(current[i]), 3),
+                "mean": round(float(mean[i]), 3),
+                "std_dev": round(float(std[i]), 3),
+                "data_points": int(self._n[i]),
+                "window_size": self.window_size,
+                "change": self.last_change.get(name),
+            }
+        return result
+
+
 class SystemChangeMonitor:
     """系统变化监控器 - 监控多个指标"""
     
@@ -2,6 +2,9 @@
 AIOS Pixel Agents API Server
 提供 REST API 供前端调用
 
+Agent 列表/统计由 live_view.AgentViewModel 增量维护，不再每次请求重读文件；
+实时像素视图（WebSocket 推送 delta）见 live_view.py，端口 9093。
+
 安全注意：
 - 所有路径参数经过 sanitize 防止路径遍历
 - POST body 限制 1MB 防止 DoS
@@ -14,7 +17,7 @@ import sys
 import logging
 from pathlib import Path
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import threading
 
@@ -23,6 +26,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agent_system import AgentSystem
 from core.event_bus import EventBus
+from pixel_agents.live_view import get_model
 
 logger = logging.getLogger("aios.api_server")
 
@@ -138,52 +142,12 @@ class APIHandler(BaseHTTPRequestHandler):
             self._send_error("Internal Server Error", 500)
 
     def _handle_list_agents(self):
-        """列出所有 Agents"""
-        # 直接读取 Agent System 的数据文件（JSONL 格式）
-        agents_file = Path(__file__).parent.parent / "agent_system" / "data" / "agents.jsonl"
-        
-        agents = []
-        if agents_file.exists():
-            with open(agents_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        agent = json.loads(line)
-                        # 只返回 active 的 Agent
-                        if agent.get("status") == "active":
-                            agents.append(agent)
-        
-        self._send_json({"agents": agents})
+        """列出所有 Agents（active 的，来自增量维护的内存模型）"""
+        self._send_json({"agents": get_model().agents()})
 
     def _handle_agent_stats(self):
         """Agent 统计信息"""
-        # 直接读取 Agent System 的数据文件（JSONL 格式）
-        agents_file = Path(__file__).parent.parent / "agent_system" / "data" / "agents.jsonl"
-        
-        agents = []
-        if agents_file.exists():
-            with open(agents_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        agent = json.loads(line)
-                        # 只统计 active 的 Agent
-                        if agent.get("status") == "active":
-                            agents.append(agent)
-
-        stats = {
-            "total": len(agents),
-            "active": len(agents),  # 所有返回的都是 active 的
-            "by_state": {},
-            "by_template": {},
-        }
-
-        for agent in agents:
-            state = agent.get("state", "idle")
-            template = agent.get("template", "unknown")
-
-            stats["by_state"][state] = stats["by_state"].get(state, 0) + 1
-            stats["by_template"][template] = stats["by_template"].get(template, 0) + 1
-
-        self._send_json(stats)
+        self._send_json(get_model().stats())
 
     def _handle_list_tasks(self):
         """列出任务队列"""
@@ -430,7 +394,7 @@ class APIHandler(BaseHTTPRequestHandler):
 
 def run_server(port=9092):
     """启动 API 服务器"""
-    server = HTTPServer(("0.0.0.0", port), APIHandler)
+    server = ThreadingHTTPServer(("0.0.0.0", port), APIHandler)
     print(f"AIOS Pixel Agents API Server running on http://localhost:{port}")
     print(f"Dashboard: file:///{Path(__file__).parent}/dashboard_v3.html")
     server.serve_forever()
@@ -0,0 +1,447 @@
+"""
+AIOS Pixel Agents Live View - 像素视图的实时推送层
+
+- AgentViewModel   维护 Agent 位置/状态的内存模型：events.jsonl 只追加，增量 tail；
+                   agents.jsonl 会被原地整体重写，签名（inode/大小/mtime）变了才整份重读；
+                   REST 查询直接读内存，不再每次请求重读文件
+- LiveBroadcaster  固定帧率（FRAME_RATE）合并突发更新：一帧内同一 Agent 的多次变化
+                   只推一次，delta 每帧只序列化一次，再分发给所有客户端
+- LiveClient       每个客户端一个有界发送队列；慢客户端积压满时丢弃旧帧，
+                   改发一次完整快照重新同步，不会无限缓冲
+- create_app()     FastAPI 应用：GET /api/agents、/api/agents/stats 与 WebSocket /ws/agents
+
+服务端开销按帧计算，与在线客户端数量基本无关。
+
+消息格式（JSON）：
+    {"type": "snapshot", "seq": 12, "agents": [view, ...]}
+    {"type": "delta", "seq": 13, "upsert": [view, ...], "remove": ["agent-id", ...]}
+    view = Agent 记录字段 + {"state", "x", "y", "task", "updated_at"}
+seq 连续递增；客户端发现断档时等下一次 snapshot 即可。
+"""
+
+import asyncio
+import heapq
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+AIOS_ROOT = Path(__file__).parent.parent
+
+AGENTS_FILE = AIOS_ROOT / "agent_system" / "data" / "agents.jsonl"
+EVENTS_FILE = AIOS_ROOT / "data" / "events.jsonl"
+
+FRAME_RATE = 10  # 每秒最多推送帧数
+CLIENT_QUEUE_SIZE = 4  # 每个客户端最多积压的帧
+GRID_COLUMNS = 8  # 像素视图每行工位数
+EVENTS_INITIAL_BYTES = 256 * 1024  # 首次打开 events.jsonl 只读尾部
+
+# 事件类型 -> Agent 状态（core/event.py 的 EventType）
+EVENT_STATES = {
+    "agent.created": "idle",
+    "agent.spawned": "idle",
+    "agent.started": "idle",
+    "agent.recovered": "idle",
+    "agent.task_started": "working",
+    "agent.task_completed": "idle",
+    "agent.degraded": "degraded",
+    "agent.error": "error",
+    "agent.failed": "error",
+    "agent.stopped": "stopped",
+    "agent.killed": "stopped",
+}
+
+
+def _parse_lines(lines: List[bytes]) -> List[dict]:
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
+
+
+class JsonlSnapshot:
+    """
+    整份读取会被原地重写的 JSONL（agents.jsonl）。
+
+    按偏移续读会漏掉同一 inode 上大小不变或变大的重写，所以这里只比较
+    (inode, 大小, mtime) 签名：没变不读文件，变了就从头整份重读。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._signature = None
+
+    def read(self) -> Optional[List[dict]]:
+        """文件有变化时返回全部记录，没变化（或文件不存在）返回 None"""
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if signature == self._signature:
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read(st.st_size)
+        lines = data.split(b"\n")
+        if lines[-1].strip() and not _parse_lines(lines[-1:]):
+            signature = None  # 末行写到一半：这次跳过它，下次再整份读一遍
+        self._signature = signature
+        return _parse_lines(lines)
+
+
+class JsonlTail:
+    """按偏移续读只追加的 JSONL 的完整新行；文件被截断或替换时从头读"""
+
+    def __init__(self, path: Path, initial_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.initial_bytes = initial_bytes
+        self._offset: Optional[int] = None
+        self._inode = None
+        self._partial = b""
+
+    def read(self) -> List[dict]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return []
+        skip_first = False
+        if self._offset is None or st.st_ino != self._inode or st.st_size < self._offset:
+            if self._offset is None and self.initial_bytes is not None:
+                start = max(0, st.st_size - self.initial_bytes)
+                skip_first = start > 0
+            else:
+                start = 0
+            self._offset, self._inode, self._partial = start, st.st_ino, b""
+        if st.st_size == self._offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(st.st_size - self._offset)
+        self._offset += len(chunk)
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()  # 最后一段可能是半行
+        if skip_first and lines:
+            lines = lines[1:]
+        return _parse_lines(lines)
+
+
+class AgentViewModel:
+    """Agent 像素视图的内存模型（线程安全）"""
+
+    def __init__(self, agents_file: Path = AGENTS_FILE, events_file: Path = EVENTS_FILE):
+        self._agents_file = JsonlSnapshot(agents_file)
+        self._events_tail = JsonlTail(events_file, initial_bytes=EVENTS_INITIAL_BYTES)
+        self._lock = threading.Lock()
+        self._records: Dict[str, dict] = {}  # agents.jsonl 中 active 的记录
+        self._live: Dict[str, dict] = {}  # 事件带来的状态覆盖
+        self._slots: Dict[str, int] = {}
+        self._free_slots: List[int] = []
+        self._next_slot = 0
+        self._views: Dict[str, dict] = {}
+        self._dirty: Set[str] = set()
+        self.seq = 0
+
+    # ── 输入 ──
+
+    def refresh(self) -> None:
+        """读入 agents.jsonl 的变化和 events.jsonl 新追加的内容"""
+        with self._lock:
+            records = self._agents_file.read()
+            if records is not None:
+                # 以文件当前内容为准：同一 Agent 取最后一行，文件里没有的移除
+                latest = {r.get("id"): r for r in records}
+                for agent_id in list(self._records):
+                    if agent_id not in latest:
+                        self._drop(agent_id)
+                for record in latest.values():
+                    self._apply_record(record)
+            for event in self._events_tail.read():
+                self._apply_event(event)
+
+    def _apply_record(self, record: dict) -> None:
+        agent_id = record.get("id")
+        if not agent_id:
+            return
+        if record.get("status") == "active":
+            if self._records.get(agent_id) != record:
+                self._records[agent_id] = record
+                self._dirty.add(agent_id)
+        elif agent_id in self._records:
+            self._drop(agent_id)
+
+    def _drop(self, agent_id: str) -> None:
+        """移除 Agent 并立即归还工位（新 Agent 优先补空位）"""
+        del self._records[agent_id]
+        self._live.pop(agent_id, None)
+        slot = self._slots.pop(agent_id, None)
+        if slot is not None:
+            heapq.heappush(self._free_slots, slot)
+        self._dirty.add(agent_id)
+
+    def _apply_event(self, event: dict) -> None:
+        state = EVENT_STATES.get(event.get("type", ""))
+        if state is None:
+            return
+        payload = event.get("payload") if isinstance(event.get("payload"), dict) else {}
+        agent_id = payload.get("agent_id") or event.get("agent_id")
+        if not agent_id or agent_id not in self._records:
+            return
+        live = self._live.setdefault(agent_id, {})
+        live["state"] = state
+        live["task"] = payload.get("task") if state == "working" else None
+        live["updated_at"] = event.get("timestamp")
+        self._dirty.add(agent_id)
+
+    # ── 视图 ──
+
+    def _view(self, agent_id: str) -> Optional[dict]:
+        record = self._records.get(agent_id)
+        if record is None:
+            return None
+        slot = self._slots.get(agent_id)
+        if slot is None:
+            if self._free_slots:
+                slot = heapq.heappop(self._free_slots)
+            else:
+                slot, self._next_slot = self._next_slot, self._next_slot + 1
+            self._slots[agent_id] = slot
+        live = self._live.get(agent_id, {})
+        return {
+            **record,
+            "state": live.get("state") or record.get("state", "idle"),
+            "task": live.get("task"),
+            "updated_at": live.get("updated_at"),
+            "x": slot % GRID_COLUMNS,
+            "y": slot // GRID_COLUMNS,
+        }
+
+    def _flush_dirty(self) -> tuple:
+        upsert, remove = [], []
+        for agent_id in sorted(self._dirty):
+            view = self._view(agent_id)
+            if view is None:
+                if self._views.pop(agent_id, None) is not None:
+                    remove.append(agent_id)
+            elif self._views.get(agent_id) != view:
+                self._views[agent_id] = view
+                upsert.append(view)
+        self._dirty.clear()
+        return upsert, remove
+
+    def take_delta(self) -> Optional[dict]:
+        """上一帧以来的变化（一帧内同一 Agent 的多次变化合并为一条）；无变化返回 None"""
+        with self._lock:
+            upsert, remove = self._flush_dirty()
+            if not upsert and not remove:
+                return None
+            self.seq += 1
+            return {"type": "delta", "seq": self.seq, "upsert": upsert, "remove": remove}
+
+    def snapshot(self) -> dict:
+        """完整快照（seq 为最近一帧的序号；未出帧的变化留给下一帧 delta）"""
+        with self._lock:
+            views = sorted(self._views.values(), key=lambda v: (v["y"], v["x"]))
+            return {"type": "snapshot", "seq": self.seq, "agents": views}
+
+    def agents(self) -> List[dict]:
+        """当前所有 active Agent（REST 查询用，先读入最新内容）"""
+        self.refresh()
+        with self._lock:
+            # 不消费 _dirty：这些变化仍由下一帧 delta 推给 WebSocket 客户端
+            views = [self._view(agent_id) for agent_id in self._records]
+            return sorted(views, key=lambda v: (v["y"], v["x"]))
+
+    def stats(self) -> dict:
+        agents = self.agents()
+        stats = {"total": len(agents), "active": len(agents), "by_state": {}, "by_template": {}}
+        for agent in agents:
+            state = agent.get("state", "idle")
+            template = agent.get("template", "unknown")
+            stats["by_state"][state] = stats["by_state"].get(state, 0) + 1
+            stats["by_template"][template] = stats["by_template"].get(template, 0) + 1
+        return stats
+
+
+class LiveClient:
+    """一个 WebSocket 连接的有界发送队列（在事件循环线程内使用）"""
+
+    def __init__(self, maxsize: int = CLIENT_QUEUE_SIZE):
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, message: Optional[str], resync: Callable[[], str]) -> None:
+        """非阻塞投递；队列满说明客户端太慢，丢弃积压的旧帧，改发完整快照"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(resync() if message is not None else None)
+
+    async def get(self) -> Optional[str]:
+        return await self.queue.get()
+
+
+class LiveBroadcaster:
+    """按固定帧率从模型取 delta 并分发；没有客户端时不读文件、不出帧"""
+
+    def __init__(self, model: AgentViewModel, frame_rate: float = FRAME_RATE):
+        self.model = model
+        self.interval = 1.0 / frame_rate
+        self._clients: Set[LiveClient] = set()
+        self._stopped = False
+        self.stats = {"frames": 0, "resyncs": 0}
+
+    def subscribe(self) -> LiveClient:
+        client = LiveClient()
+        # 快照是最近一帧的状态，尚未出帧的变化会在下一帧 delta（seq + 1）中送达
+        client.offer(json.dumps(self.model.snapshot(), ensure_ascii=False), lambda: "")
+        self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client: LiveClient) -> None:
+        self._clients.discard(client)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def frame(self, refresh: bool = True) -> Optional[str]:
+        """出一帧：读入新内容、取 delta、序列化一次后分发；无变化返回 None"""
+        if refresh:
+            self.model.refresh()
+        delta = self.model.take_delta()
+        if delta is None:
+            return None
+        message = json.dumps(delta, ensure_ascii=False)
+        snapshot: List[str] = []
+
+        def resync() -> str:
+            # 只有真有客户端溢出时才序列化快照，且一帧最多一次
+            if not snapshot:
+                snapshot.append(json.dumps(self.model.snapshot(), ensure_ascii=False))
+                self.stats["resyncs"] += 1
+            return snapshot[0]
+
+        for client in list(self._clients):
+            client.offer(message, resync)
+        self.stats["frames"] += 1
+        return message
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._stopped:
+            started = loop.time()
+            if self._clients:
+                try:
+                    # 读文件放到线程池，事件循环里只做取 delta 和分发
+                    await loop.run_in_executor(None, self.model.refresh)
+                    self.frame(refresh=False)
+                except Exception as e:
+                    print(f"[LiveBroadcaster] frame failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    def stop(self) -> None:
+        self._stopped = True
+        for client in list(self._clients):
+            client.offer(None, lambda: "")
+
+
+_model: Optional[AgentViewModel] = None
+_model_lock = threading.Lock()
+
+
+def get_model() -> AgentViewModel:
+    """进程内共享的 Agent 视图模型"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = AgentViewModel()
+        return _model
+
+
+def create_app(model: Optional[AgentViewModel] = None, frame_rate: float = FRAME_RATE):
+    """创建实时视图的 FastAPI 应用"""
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+    from fastapi.middleware.cors import CORSMiddleware
+
+    model = model or get_model()
+    broadcaster = LiveBroadcaster(model, frame_rate)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        task = asyncio.create_task(broadcaster.run())
+        try:
+            yield
+        finally:
+            broadcaster.stop()
+            task.cancel()
+
+    app = FastAPI(title="AIOS Pixel Agents Live", lifespan=lifespan)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["GET"])
+    app.state.broadcaster = broadcaster
+
+    # 这两个接口会读文件，用同步函数让 FastAPI 放到线程池执行，不阻塞事件循环
+    @app.get("/api/agents")
+    def list_agents():
+        return {"agents": model.agents()}
+
+    @app.get("/api/agents/stats")
+    def agent_stats():
+        return model.stats()
+
+    @app.get("/api/live/stats")
+    async def live_stats():
+        return {"clients": broadcaster.client_count, "seq": model.seq, **broadcaster.stats}
+
+    @app.websocket("/ws/agents")
+    async def agents_socket(websocket: WebSocket):
+        await websocket.accept()
+        client = broadcaster.subscribe()
+
+        async def sender():
+            while True:
+                message = await client.get()
+                if message is None:
+                    return
+                await websocket.send_text(message)
+
+        async def receiver():
+            # 只用来感知断开；客户端不需要发消息
+            try:
+                while True:
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                return
+
+        tasks = [asyncio.create_task(sender()), asyncio.create_task(receiver())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            broadcaster.unsubscribe(client)
+            for task in tasks:
+                task.cancel()
+
+    return app
+
+
+def run_live_server(port=9093):
+    """启动实时视图服务器"""
+    import uvicorn
+
+    print(f"AIOS Pixel Agents Live View on ws://localhost:{port}/ws/agents")
+    uvicorn.run(create_app(), host="0.0.0.0", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    run_live_server()
@@ -16,14 +16,28 @@ ALIAS_FILE = get_path("paths.alias")
 _cache = {}
 
 
+def _mtime(path) -> float:
+    try:
+        return path.stat().st_mtime_ns if path else 0
+    except OSError:
+        return 0
+
+
+def data_version() -> tuple:
+    """英雄数据 + learned aliases 的版本（mtime），文件变了版本就变"""
+    return (_mtime(ARAM_DATA), _mtime(ALIAS_FILE))
+
+
 def load_champions() -> dict:
-    """加载英雄数据 {id: {name, title, items, ...}}"""
-    if "champs" in _cache:
-        return _cache["champs"]
-    if not ARAM_DATA.exists():
+    """加载英雄数据 {id: {name, title, items, ...}}，文件修改后自动重读"""
+    mtime = _mtime(ARAM_DATA)
+    if not mtime:
         return {}
+    cached = _cache.get("champs")
+    if cached and cached[0] == mtime:
+        return cached[1]
     data = json.loads(ARAM_DATA.read_text(encoding="utf-8"))
-    _cache["champs"] = data
+    _cache["champs"] = (mtime, data)
     return data
 
 
@@ -1,11 +1,21 @@
-# aios/plugins/aram/matcher.py - 英雄模糊搜索 v0.2（可解释性）
-import json, sys
+# aios/plugins/aram/matcher.py - 英雄模糊搜索 v0.3（可解释性 + 内存索引）
+"""
+查询不再每次读盘、全表扫描：
+- 英雄数据 / learned aliases 建成内存索引，文件 mtime 变化时自动重建
+- contains：字符 bigram 倒排表求交集得到候选，再做子串校验
+- fuzzy：单字倒排表取并集得到候选，先用字符重叠上界剪枝，只对剩下的算 SequenceMatcher
+结果（分数、match_type、排序）与逐个比对完全一致。
+"""
+import json, sys, threading
+from collections import Counter
 from pathlib import Path
 from difflib import SequenceMatcher
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 from core.config import get_path
+from plugins.aram import data_adapter
 from plugins.aram.data_adapter import load_champions, load_aliases, save_aliases
+from plugins.aram.rules import BUILTIN_ALIASES
 
 LOW_SCORE = 0.5
 
@@ -14,6 +24,10 @@ def _sim(a: str, b: str) -> float:
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
 
+def _bigrams(text: str) -> set:
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
 def _matched_keywords(query: str, target: str) -> list:
     """提取 query 和 target 之间的重叠字符/词"""
     q_chars = set(query.lower())
@@ -23,96 +37,158 @@ def _matched_keywords(query: str, target: str) -> list:
     return sorted(overlap) if overlap else []
 
 
-def match(query: str, top_n: int = 3) -> list:
-    """输入 → 匹配 → 输出 JSON + 事件"""
-    data = load_champions()
-    if not data:
-        return []
+class ChampionIndex:
+    """英雄名/称号的内存索引（只读快照，重建时整体替换）"""
 
-    query = query.strip()
-    results = []
-    aliases = load_aliases()
+    def __init__(self, data: dict, aliases: dict, version=None):
+        self.data = data
+        self.aliases = aliases
+        self.version = version
+        self.ids = list(data)
+        self.fields = []  # [(name, title, name_lower, title_lower)]
+        self.counts = []  # [(Counter(name_lower), Counter(title_lower))]
+        self.by_char = {}  # 单字 -> {pos}
+        self.by_bigram = {}  # bigram -> {pos}
+        for pos, cid in enumerate(self.ids):
+            info = data[cid]
+            name = info.get("name", "")
+            title = info.get("title", "")
+            nl, tl = name.lower(), title.lower()
+            self.fields.append((name, title, nl, tl))
+            self.counts.append((Counter(nl), Counter(tl)))
+            for ch in set(nl) | set(tl):
+                self.by_char.setdefault(ch, set()).add(pos)
+            for gram in _bigrams(nl) | _bigrams(tl):
+                self.by_bigram.setdefault(gram, set()).add(pos)
+
+    def _contains_candidates(self, q: str):
+        if not q:
+            return range(len(self.ids))
+        if len(q) == 1:
+            return sorted(self.by_char.get(q, ()))
+        postings = [self.by_bigram.get(g) for g in _bigrams(q)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        return sorted(set.intersection(*postings))
 
-    # 0. learned aliases
-    if query in aliases:
-        cid = aliases[query]
+    def _fuzzy_candidates(self, q: str):
+        found = set()
+        for ch in set(q):
+            found |= self.by_char.get(ch, set())
+        return sorted(found)
+
+    @staticmethod
+    def _upper_bound(q_counts: Counter, q_len: int, f_counts: Counter, f_len: int) -> float:
+        """SequenceMatcher.ratio() 的上界（= quick_ratio）"""
+        if not q_len + f_len:
+            return 0.0
+        common = sum(min(n, f_counts[ch]) for ch, n in q_counts.items())
+        return 2.0 * common / (q_len + f_len)
+
+    def search(self, query: str, top_n: int = 3) -> list:
+        """与 v0.2 的 match 逻辑一致，只是不发事件"""
+        data = self.data
+        if not data:
+            return []
+
+        # 0. learned aliases
+        cid = self.aliases.get(query)
         if cid in data:
             info = data[cid]
-            results.append(
-                _result(
-                    cid,
-                    info,
-                    1.0,
-                    "learned",
-                    f"learned: {query} → {info.get('title','')}",
-                    query,
-                )
-            )
-            _emit(query, results[0])
-            return results
-
-    # 1. builtin aliases (from rules)
-    from plugins.aram.rules import BUILTIN_ALIASES
+            return [
+                _result(cid, info, 1.0, "learned", f"learned: {query} → {info.get('title','')}", query)
+            ]
 
-    if query in BUILTIN_ALIASES:
-        cid = BUILTIN_ALIASES[query]
+        # 1. builtin aliases (from rules)
+        cid = BUILTIN_ALIASES.get(query)
         if cid in data:
             info = data[cid]
-            results.append(
-                _result(
-                    cid,
-                    info,
-                    1.0,
-                    "alias_exact",
-                    f"alias: {query} → {info.get('title','')}",
-                    query,
+            return [
+                _result(cid, info, 1.0, "alias_exact", f"alias: {query} → {info.get('title','')}", query)
+            ]
+
+        seen = {}  # cid -> result（按数据顺序插入，排序稳定性与全表扫描一致）
+        q = query.lower()
+
+        # 2. name/title contains（bigram 候选 + 子串校验）
+        for pos in self._contains_candidates(q):
+            name, title = self.fields[pos][0], self.fields[pos][1]
+            if query in name or query in title:
+                cid = self.ids[pos]
+                score = 0.95 if query == title else 0.90
+                seen[cid] = _result(
+                    cid, data[cid], score, "contains",
+                    f"contains: '{query}' in '{title}/{name}'", query,
                 )
-            )
-            _emit(query, results[0])
-            return results
-
-    # 2. name/title contains
-    for cid, info in data.items():
-        name = info.get("name", "")
-        title = info.get("title", "")
-        if query in name or query in title:
-            score = 0.95 if query == title else 0.90
-            results.append(
-                _result(
-                    cid,
-                    info,
-                    score,
-                    "contains",
-                    f"contains: '{query}' in '{title}/{name}'",
-                    query,
+
+        # 3. fuzzy（单字候选 + 上界剪枝）
+        q_counts, q_len = Counter(q), len(q)
+        fuzzy = []
+        for pos in self._fuzzy_candidates(q):
+            cid = self.ids[pos]
+            if cid in seen:
+                continue
+            _, _, nl, tl = self.fields[pos]
+            nc, tc = self.counts[pos]
+            best = 0.0
+            for text, counts in ((nl, nc), (tl, tc)):
+                if self._upper_bound(q_counts, q_len, counts, len(text)) < max(best, LOW_SCORE):
+                    continue
+                best = max(best, SequenceMatcher(None, q, text).ratio())
+            if best >= LOW_SCORE:
+                fuzzy.append(
+                    _result(cid, data[cid], round(best, 2), "fuzzy", f"fuzzy: {best:.2f}", query)
                 )
-            )
 
-    # 3. fuzzy
-    for cid, info in data.items():
-        if any(r["champion_id"] == cid for r in results):
-            continue
-        name = info.get("name", "")
-        title = info.get("title", "")
-        best = max(_sim(query, name), _sim(query, title))
-        if best >= LOW_SCORE:
-            results.append(
-                _result(cid, info, round(best, 2), "fuzzy", f"fuzzy: {best:.2f}", query)
-            )
+        results = list(seen.values())
+        results.extend(fuzzy)
+        return sorted(results, key=lambda x: x["score"], reverse=True)[:top_n]
+
+
+_index = None
+_index_lock = threading.Lock()
+
 
-    # dedup + sort
-    seen = {}
-    for r in results:
-        cid = r["champion_id"]
-        if cid not in seen or r["score"] > seen[cid]["score"]:
-            seen[cid] = r
-    final = sorted(seen.values(), key=lambda x: x["score"], reverse=True)[:top_n]
+def get_index() -> ChampionIndex:
+    """返回当前索引；英雄数据或 learned aliases 文件变化时重建"""
+    global _index
+    version = data_adapter.data_version()
+    idx = _index
+    if idx is not None and idx.version == version:
+        return idx
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = ChampionIndex(load_champions(), load_aliases(), version)
+        return _index
 
+
+def invalidate_index():
+    global _index
+    _index = None
+
+
+def match(query: str, top_n: int = 3) -> list:
+    """输入 → 匹配 → 输出 JSON + 事件"""
+    final = get_index().search(query.strip(), top_n)
     if final:
-        _emit(query, final[0], alternatives=final[1:])
+        _emit(query.strip(), final[0], alternatives=final[1:])
     return final
 
 
+def match_many(queries, top_n: int = 3) -> list:
+    """批量匹配：共用同一份索引快照，返回与 queries 一一对应的结果列表"""
+    index = get_index()
+    out = []
+    for query in queries:
+        query = query.strip()
+        final = index.search(query, top_n)
+        if final:
+            _emit(query, final[0], alternatives=final[1:])
+        out.append(final)
+    return out
+
+
 def feedback(query: str, correct_id: str):
     """用户纠正"""
     data = load_champions()
@@ -124,6 +200,7 @@ def feedback(query: str, correct_id: str):
     aliases = load_aliases()
     aliases[query] = correct_id
     save_aliases(aliases)
+    invalidate_index()
 
     # 事件
     from core.engine import log_mem
@@ -6,6 +6,9 @@ from pathlib import Path
 from typing import Dict, List, Optional, Any
 import logging
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.health_scheduler import HealthScheduler
+
 from .base import AIOSPlugin, PluginMeta, PluginStatus, PluginType
 from .registry import get_registry, get_capability_registry
 from .eventbus import get_bus, EventBus
@@ -33,6 +36,7 @@ class PluginManager:
         self.capability_registry = get_capability_registry()
         self.bus = bus or get_bus()
         self.plugin_stats: Dict[str, Dict[str, Any]] = {}  # 插件统计
+        self.health = HealthScheduler(default_ttl=30)  # 插件健康检查（并发 + 缓存 + 熔断）
 
         # 自动加载已启用的插件
         self._auto_load()
@@ -279,20 +283,32 @@ class PluginManager:
 
         return getattr(plugin, method)(*args, **kwargs)
 
-    def health_check_all(self) -> Dict[str, Dict[str, Any]]:
+    def health_check_all(self, wait: bool = True, force: bool = False) -> Dict[str, Dict[str, Any]]:
         """
-        检查所有插件健康状态
+        检查所有插件健康状态（并发执行）
+
+        Args:
+            wait: True（默认）时重新执行所有探针并等待，不使用缓存（熔断中的插件除外）；
+                False 时立即返回最近一次结果（最多 30 秒前），过期的在后台刷新
+            force: wait=False 时也忽略缓存，后台全部重新检查
 
         Returns:
-            插件健康状态字典 {name: health_status}
+            插件健康状态字典 {name: health_status}；检查抛异常或超时时为
+            {"status": "error", "error": 错误信息}
         """
-        results = {}
         for name, plugin in self.plugins.items():
-            try:
-                results[name] = plugin.health_check()
-            except Exception as e:
-                results[name] = {"status": "error", "error": str(e)}
-        return results
+            # 重载后 plugin 对象变了，register 会替换探针
+            self.health.register(name, plugin.health_check)
+        for name in self.health.names():
+            if name not in self.plugins:
+                self.health.unregister(name)
+
+        if wait:
+            results = self.health.refresh(self.plugins, force=True)
+        else:
+            self.health.refresh_async(self.plugins, force=force)
+            results = {name: self.health.status(name) for name in self.plugins}
+        return {name: _error_shape(result) for name, result in results.items()}
 
     def _load_config(self, name: str) -> Dict[str, Any]:
         """
@@ -427,3 +443,10 @@ def get_manager() -> PluginManager:
     if _manager is None:
         _manager = PluginManager()
     return _manager
+
+
+def _error_shape(result: Dict[str, Any]) -> Dict[str, Any]:
+    """调度器生成的错误（异常 / 超时）保持旧结构 {"status": "error", "error": ...}"""
+    if result.get("status") == "error" and "error" not in result and "message" in result:
+        return {"status": "error", "error": result["message"]}
+    return result
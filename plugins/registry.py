@@ -1,17 +1,23 @@
 # aios/plugins/registry.py - 插件注册表（持久化 + 能力注册）
 import json
+import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Callable, Any
 import logging
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from core.capability_index import CapabilityIndex, get_capability_index
+
 logger = logging.getLogger(__name__)
 
 
 class CapabilityRegistry:
     """能力注册表 - 插件注册技能/任务/路由/指标"""
 
-    def __init__(self):
+    def __init__(self, index: Optional[CapabilityIndex] = None):
         self.skills: Dict[str, Dict[str, Any]] = {}  # name -> {fn, schema}
+        self.index = index if index is not None else get_capability_index()
+        self._scope = self.index.new_scope("plugins")
         self.tasks: Dict[str, Dict[str, Any]] = {}  # name -> task_def
         self.routes: Dict[str, Callable] = {}  # path -> handler
         self.metrics: Dict[str, Dict[str, Any]] = {}  # name -> schema
@@ -28,8 +34,31 @@ class CapabilityRegistry:
             schema: 技能参数 schema（可选）
         """
         self.skills[name] = {"fn": fn, "schema": schema or {}}
+        schema = schema or {}
+        self.index.upsert(
+            f"plugin:{name}",
+            f"{name} {schema.get('description', '')} {fn.__doc__ or ''}",
+            keywords=schema.get("keywords") or schema.get("tags") or [],
+            kind="plugin",
+            scope=self._scope,
+        )
         logger.info(f"注册技能: {name}")
 
+    def close(self) -> None:
+        """释放在共享能力索引里的作用域"""
+        self.index.release_scope(self._scope)
+
+    def search_skills(self, query: str, limit: int = 10) -> List[str]:
+        """按名称 / 描述检索插件技能，相关度从高到低"""
+        names = []
+        for hit in self.index.search(query, kind="plugin", limit=0, scope=self._scope):
+            name = hit.doc_id[len("plugin:"):]
+            if name in self.skills:
+                names.append(name)
+                if limit and len(names) >= limit:
+                    break
+        return names
+
     def register_task(self, name: str, task_def: Dict[str, Any]) -> None:
         """
         注册任务
@@ -12,5 +12,10 @@ if __name__ == "__main__":
         r = generate_full_report(days=1)
         r["evolution"] = evolution_score()
         print(json.dumps(r, ensure_ascii=False, indent=2))
+    elif fmt == "weekly":
+        # 周报：合并 data/rollups 里的每日分片（含今天在内的 7 个自然日），只现算今天
+        r = generate_full_report(days=7, rollups=True)
+        r["evolution"] = evolution_score()
+        print(json.dumps(r, ensure_ascii=False, indent=2))
     else:
         print(generate_daily_report(days=1))
@@ -2,83 +2,158 @@
 """
 从 events.jsonl 抽一段时间，重跑 analyze，对比新旧 suggestions。
 用途：调阈值/改策略后验证效果。
+
+事件切片按时间二分定位、流式解析一次，直接喂给 analyze（不写临时文件、不改全局路径）；
+多组参数变体共享同一次累加器扫描，每个变体只按自己的阈值出结果。
 """
 
-import json, time, sys, tempfile, shutil
+import json, time, sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from core.engine import load_events
+from core.engine import iter_events
 
 AIOS_ROOT = Path(__file__).resolve().parent.parent
 
 
-def replay(start_ts: int, end_ts: int, days: int = 30) -> dict:
-    """抽取 [start_ts, end_ts] 的事件，写入临时文件，重跑 analyze"""
-    all_events = load_events(days)
-    filtered = [e for e in all_events if start_ts <= e.get("ts", 0) <= end_ts]
+def load_slice(start_ts: int, end_ts: int, path: Path = None) -> list:
+    """解析 [start_ts, end_ts] 内的事件（只解析一次，供多个变体共享）"""
+    return list(iter_events(start_ts, end_ts, path=path))
+
+
+def _time_range(start_ts: int, end_ts: int) -> dict:
+    return {
+        "start": time.strftime("%Y-%m-%d %H:%M", time.localtime(start_ts)),
+        "end": time.strftime("%Y-%m-%d %H:%M", time.localtime(end_ts)),
+    }
+
+
+def _run(events: list, days: int, params: dict = None, engine=None) -> dict:
+    from learning.analyze import generate_full_report
+
+    t0 = time.perf_counter()
+    report = generate_full_report(
+        days=days, events=events, params=params, write=False, engine=engine
+    )
+    return {
+        "params": params or {},
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "report": report,
+    }
+
+
+def replay(
+    start_ts: int, end_ts: int, days: int = 30, params: dict = None, events: list = None
+) -> dict:
+    """抽取 [start_ts, end_ts] 的事件，重跑 analyze"""
+    filtered = events if events is not None else load_slice(start_ts, end_ts)
 
     if not filtered:
         return {"error": "no events in range", "count": 0}
 
-    # 写临时 events 文件
-    tmp_dir = Path(tempfile.mkdtemp(prefix="aios_replay_"))
-    tmp_events = tmp_dir / "events.jsonl"
-    with tmp_events.open("w", encoding="utf-8") as f:
-        for e in filtered:
-            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    result = _run(filtered, days, params)
+    return {
+        "events_count": len(filtered),
+        "time_range": _time_range(start_ts, end_ts),
+        **result,
+    }
 
-    # monkey-patch events path
-    import core.engine as engine
 
-    original_path = engine._events_path
+def replay_variants(
+    start_ts: int,
+    end_ts: int,
+    variants: dict,
+    baseline: str = None,
+    days: int = 30,
+    events: list = None,
+) -> dict:
+    """
+    同一份事件切片上回放多组参数，并与基线对比
 
-    engine._events_path = lambda: tmp_events
+    事件只喂给累加器一次；参数只影响出结果，所以各变体依次出报告即可，
+    elapsed_ms 是各变体出结果的耗时。
 
-    try:
-        from learning.analyze import generate_full_report
+    Args:
+        variants: {变体名: analyze 参数覆盖}，如 {"base": {}, "strict": {"slow_p95_ms": 3000}}
+        baseline: 基线变体名，默认第一个
+    """
+    from learning.analytics import AnalyticsEngine
 
-        report = generate_full_report(days=days)
-    finally:
-        engine._events_path = original_path
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+    filtered = events if events is not None else load_slice(start_ts, end_ts)
+    if not filtered:
+        return {"error": "no events in range", "count": 0}
+
+    names = list(variants)
+    baseline = baseline or names[0]
+    engine = AnalyticsEngine.default().feed(filtered)
+    runs = {name: _run(filtered, days, variants[name], engine) for name in names}
 
     return {
         "events_count": len(filtered),
-        "time_range": {
-            "start": time.strftime("%Y-%m-%d %H:%M", time.localtime(start_ts)),
-            "end": time.strftime("%Y-%m-%d %H:%M", time.localtime(end_ts)),
+        "time_range": _time_range(start_ts, end_ts),
+        "baseline": baseline,
+        "variants": runs,
+        "diffs": {
+            name: compare(runs[baseline], runs[name]) for name in names if name != baseline
         },
-        "report": report,
     }
 
 
+def _report(r: dict) -> dict:
+    return r.get("report", r)
+
+
 def compare(report_a: dict, report_b: dict) -> dict:
-    """对比两份报告的关键指标"""
-    ma = report_a.get("report", report_a).get("metrics", {})
-    mb = report_b.get("report", report_b).get("metrics", {})
+    """对比两份报告的关键指标（准确性 + 延迟）"""
+    ra, rb = _report(report_a), _report(report_b)
 
     diff = {}
-    for key in ("match_correction_rate", "tool_success_rate", "low_score_ratio"):
-        va = ma.get(key, 0)
-        vb = mb.get(key, 0)
+    for key, section, field in (
+        ("correction_rate", "quality", "correction_rate"),
+        ("tool_success_rate", "reliability", "tool_success_rate"),
+    ):
+        va = ra.get(section, {}).get(field, 0)
+        vb = rb.get(section, {}).get(field, 0)
         diff[key] = {"before": va, "after": vb, "delta": round(vb - va, 4)}
 
-    sa = report_a.get("report", report_a).get("alias_suggestions", [])
-    sb = report_b.get("report", report_b).get("alias_suggestions", [])
-    ta = report_a.get("report", report_a).get("tool_suggestions", [])
-    tb = report_b.get("report", report_b).get("tool_suggestions", [])
-
-    diff["alias_suggestions"] = {"before": len(sa), "after": len(sb)}
-    diff["tool_suggestions"] = {"before": len(ta), "after": len(tb)}
+    for key in ("alias_suggestions", "tool_suggestions", "threshold_warnings"):
+        sa, sb = ra.get(key, []), rb.get(key, [])
+        ka = {_suggestion_key(s) for s in sa}
+        kb = {_suggestion_key(s) for s in sb}
+        diff[key] = {
+            "before": len(sa),
+            "after": len(sb),
+            "added": sorted(kb - ka),
+            "removed": sorted(ka - kb),
+        }
+
+    # 延迟：各工具 p95 变化 + 分析本身耗时
+    pa = ra.get("performance", {}).get("tool_p95_ms", {})
+    pb = rb.get("performance", {}).get("tool_p95_ms", {})
+    diff["tool_p95_ms"] = {
+        tool: {"before": pa.get(tool), "after": pb.get(tool)}
+        for tool in sorted(set(pa) | set(pb))
+        if pa.get(tool) != pb.get(tool)
+    }
+    if "elapsed_ms" in report_a and "elapsed_ms" in report_b:
+        diff["elapsed_ms"] = {
+            "before": report_a["elapsed_ms"],
+            "after": report_b["elapsed_ms"],
+            "delta": round(report_b["elapsed_ms"] - report_a["elapsed_ms"], 2),
+        }
 
     return diff
 
 
+def _suggestion_key(s: dict) -> str:
+    return f"{s.get('input') or s.get('name') or s.get('field', '?')}:{s.get('action') or s.get('suggested') or s.get('reason', '')}"
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: replay.py <start_hours_ago> <end_hours_ago>")
+        print("Usage: replay.py <start_hours_ago> <end_hours_ago> [variants.json]")
         print("  e.g.: replay.py 48 0  (replay last 48h)")
+        print('  variants.json: {"base": {}, "strict": {"slow_p95_ms": 3000}}')
         sys.exit(1)
 
     now = int(time.time())
@@ -87,5 +162,9 @@ if __name__ == "__main__":
     start_ts = now - start_ago * 3600
     end_ts = now - end_ago * 3600
 
-    result = replay(start_ts, end_ts)
+    if len(sys.argv) >= 4:
+        variants = json.loads(Path(sys.argv[3]).read_text(encoding="utf-8"))
+        result = replay_variants(start_ts, end_ts, variants)
+    else:
+        result = replay(start_ts, end_ts)
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -3,13 +3,19 @@
 Skill Registry - 扫描和管理所有 Skills
 """
 import os
+import sys
 import yaml
 import json
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.capability_index import CapabilityIndex, get_capability_index
+
 
 WORKSPACE = Path(os.getenv("OPENCLAW_WORKSPACE", Path.home() / ".openclaw" / "workspace"))
 SKILLS_DIR = WORKSPACE / "skills"
@@ -61,6 +67,7 @@ class SkillManifest:
     skill_path: Optional[str] = None
     yaml_path: Optional[str] = None
     last_scanned: Optional[str] = None
+    yaml_mtime: Optional[float] = None
     
     def __post_init__(self):
         if self.capabilities is None:
@@ -74,12 +81,52 @@ class SkillManifest:
 class SkillRegistry:
     """Skill 注册表"""
     
-    def __init__(self):
+    def __init__(self, index: Optional[CapabilityIndex] = None):
         self.skills: Dict[str, SkillManifest] = {}
+        # 二级索引：标签 / 风险等级 -> skill 名称；全文检索走共享的能力索引
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._by_risk: Dict[str, Set[str]] = {}
+        self._by_yaml: Dict[str, str] = {}  # yaml_path -> name
+        self._order: Dict[str, int] = {}  # name -> 注册序号，过滤结果按它排序
+        self._seq = 0
+        self.index = index if index is not None else get_capability_index()
+        self._scope = self.index.new_scope("skill-registry")
         self.load_cache()
     
+    def _add(self, manifest: SkillManifest):
+        """加入注册表并更新各索引"""
+        self._remove(manifest.name)
+        self.skills[manifest.name] = manifest
+        self._seq += 1
+        self._order[manifest.name] = self._seq
+        tags = (manifest.routing or {}).get('tags', [])
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(manifest.name)
+        self._by_risk.setdefault(manifest.risk_level, set()).add(manifest.name)
+        if manifest.yaml_path:
+            self._by_yaml[manifest.yaml_path] = manifest.name
+        self.index.upsert(
+            f"skill:{manifest.name}",
+            f"{manifest.name} {manifest.description}",
+            keywords=list(tags) + list(manifest.capabilities),
+            kind="skill",
+            scope=self._scope,
+        )
+    
+    def _remove(self, name: str):
+        manifest = self.skills.pop(name, None)
+        if manifest is None:
+            return
+        del self._order[name]
+        for tag in (manifest.routing or {}).get('tags', []):
+            self._by_tag.get(tag, set()).discard(name)
+        self._by_risk.get(manifest.risk_level, set()).discard(name)
+        if manifest.yaml_path and self._by_yaml.get(manifest.yaml_path) == name:
+            del self._by_yaml[manifest.yaml_path]
+        self.index.remove(f"skill:{name}", scope=self._scope)
+    
     def scan(self, force: bool = False):
-        """扫描所有 Skills"""
+        """扫描所有 Skills（skill.yaml 未修改的跳过，force=True 时全部重读）"""
         if not SKILLS_DIR.exists():
             print(f"⚠️  Skills 目录不存在: {SKILLS_DIR}")
             return
@@ -87,7 +134,9 @@ class SkillRegistry:
         print(f"🔍 扫描 Skills: {SKILLS_DIR}\n")
         
         found = 0
+        unchanged = 0
         errors = 0
+        seen = set()
         
         for skill_dir in SKILLS_DIR.iterdir():
             if not skill_dir.is_dir():
@@ -100,16 +149,28 @@ class SkillRegistry:
             if not skill_yaml.exists():
                 continue
             
+            cached = self.skills.get(self._by_yaml.get(str(skill_yaml), ""))
+            if not force and cached and cached.yaml_mtime == skill_yaml.stat().st_mtime:
+                seen.add(cached.name)
+                unchanged += 1
+                continue
+            
             try:
                 manifest = self.load_manifest(skill_yaml, skill_dir)
-                self.skills[manifest.name] = manifest
+                self._add(manifest)
+                seen.add(manifest.name)
                 found += 1
                 print(f"✅ {manifest.name} v{manifest.version}")
             except Exception as e:
                 errors += 1
                 print(f"❌ {skill_dir.name}: {e}")
         
-        print(f"\n📊 扫描完成: {found} 个 Skills，{errors} 个错误")
+        # 目录已删除的 skill
+        for name in [n for n, m in self.skills.items() if n not in seen and m.yaml_path]:
+            if not Path(self.skills[name].yaml_path).exists():
+                self._remove(name)
+        
+        print(f"\n📊 扫描完成: {found} 个 Skills 更新，{unchanged} 个未变化，{errors} 个错误")
         
         # 保存缓存
         self.save_cache()
@@ -129,6 +190,7 @@ class SkillRegistry:
         data['skill_path'] = str(skill_dir)
         data['yaml_path'] = str(yaml_path)
         data['last_scanned'] = datetime.now().isoformat()
+        data['yaml_mtime'] = yaml_path.stat().st_mtime
         
         return SkillManifest(**data)
     
@@ -138,19 +200,39 @@ class SkillRegistry:
     
     def list(self, tags: List[str] = None, risk_level: str = None) -> List[SkillManifest]:
         """列出 Skills"""
-        results = list(self.skills.values())
+        if not tags and not risk_level:
+            return list(self.skills.values())
+        
+        names = None
         
-        # 按标签过滤
+        # 按标签过滤（任一标签命中）
         if tags:
-            results = [
-                s for s in results
-                if s.routing and any(tag in s.routing.get('tags', []) for tag in tags)
-            ]
+            names = set()
+            for tag in tags:
+                names |= self._by_tag.get(tag, set())
         
         # 按风险等级过滤
         if risk_level:
-            results = [s for s in results if s.risk_level == risk_level]
+            risk_names = self._by_risk.get(risk_level, set())
+            names = risk_names if names is None else names & risk_names
         
+        # 只取命中的名称，按注册顺序排列（与不过滤时一致），不遍历全部 skill
+        return [self.skills[n] for n in sorted(names, key=self._order.__getitem__)]
+    
+    def close(self):
+        """释放在共享能力索引里的作用域"""
+        self.index.release_scope(self._scope)
+
+    def search(self, query: str, limit: int = 10) -> List[SkillManifest]:
+        """按描述 / 标签 / 能力检索，相关度从高到低"""
+        results = []
+        for hit in self.index.search(query, kind="skill", limit=0, scope=self._scope):
+            manifest = self.skills.get(hit.doc_id[len("skill:"):])
+            if manifest is None:
+                continue
+            results.append(manifest)
+            if limit and len(results) >= limit:
+                break
         return results
     
     def save_cache(self):
@@ -173,7 +255,7 @@ class SkillRegistry:
         try:
             cache = json.loads(REGISTRY_CACHE.read_text(encoding='utf-8'))
             for name, data in cache.get("skills", {}).items():
-                self.skills[name] = SkillManifest(**data)
+                self._add(SkillManifest(**data))
         except Exception as e:
             print(f"⚠️  加载缓存失败: {e}")
 
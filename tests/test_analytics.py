@@ -0,0 +1,146 @@
+"""
+Tests for the single-pass analytics engine and its mergeable daily rollups.
+"""
+import json
+import random
+import sys
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+import learning.analytics as analytics
+from learning.analytics import AnalyticsEngine, rollup_day
+from learning.analyze import DEFAULT_PARAMS, generate_full_report
+
+T0 = 1_700_000_000
+NAMES = ("metrics", "top_issues", "alias", "tool", "threshold")
+
+
+def _events(n=3000, seed=7):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        ts = T0 + i * 60
+        k = rng.random()
+        if k < 0.4:
+            ev = {
+                "epoch": ts,
+                "layer": "TOOL",
+                "event": "tool_exec",
+                "status": rng.choice(["ok", "ok", "err"]),
+                "latency_ms": rng.choice([120, 800, 6500, 12000]),
+                "payload": {"name": rng.choice(["shell", "web_fetch", "read"]), "error": "boom"},
+            }
+        elif k < 0.6:
+            ev = {
+                "epoch": ts,
+                "layer": "SEC",
+                "event": "http_error",
+                "status": "err",
+                "payload": {"status_code": rng.choice([404, 502]), "name": "fetch"},
+            }
+        else:
+            ev = {
+                "ts": ts,
+                "type": rng.choice(["match", "correction", "tool", "error"]),
+                "data": {
+                    "input": rng.choice(["q1", "q2"]),
+                    "correct_target": rng.choice(["A", "B"]),
+                    "score": rng.choice([0.5, 0.9]),
+                    "ok": rng.random() > 0.3,
+                    "ms": rng.choice([0, 300, 7000]),
+                    "tool": rng.choice(["shell", "grep"]),
+                    "err": "e1",
+                },
+            }
+        out.append(ev)
+    return out
+
+
+def _results(engine):
+    return {name: engine.result(name, DEFAULT_PARAMS) for name in NAMES}
+
+
+def test_single_pass_matches_report():
+    events = _events()
+    report = generate_full_report(days=30, events=events, write=False)
+    results = _results(AnalyticsEngine.default().feed(events, batch_size=500))
+
+    assert report["alias_suggestions"] == results["alias"]
+    assert report["tool_suggestions"] == results["tool"]
+    assert report["threshold_warnings"] == results["threshold"]
+    assert report["top_issues"] == results["top_issues"]
+    assert results["metrics"]["reliability"]["tool_success_rate"] < 1
+
+
+def test_merged_partials_equal_full_pass():
+    events = _events()
+    full = AnalyticsEngine.default().feed(events)
+
+    merged = AnalyticsEngine.default()
+    for start in range(0, len(events), 700):
+        part = AnalyticsEngine.default().feed(events[start : start + 700])
+        # 分片经过 JSON 落盘再读回
+        merged.merge(AnalyticsEngine.from_dict(json.loads(json.dumps(part.to_dict()))))
+
+    assert _results(merged) == _results(full)
+
+
+def test_fallback_without_numpy_and_rollup_day(tmp_path, monkeypatch):
+    events = _events(n=1500, seed=11)
+    expected = _results(AnalyticsEngine.default().feed(events))
+
+    monkeypatch.setattr(analytics, "np", None)
+    assert _results(AnalyticsEngine.default().feed(events)) == expected
+
+    path = tmp_path / "events.jsonl"
+    path.write_text("\n".join(json.dumps(e) for e in events) + "\n", encoding="utf-8")
+    monkeypatch.setattr(analytics, "ROLLUP_DIR", tmp_path / "rollups")
+    day = analytics.time.strftime("%Y-%m-%d", analytics.time.localtime(T0))
+    rollup_day(day, path=path)
+
+    saved = analytics.rollup_dir(path) / f"{day}.json"
+    assert saved.parent.parent == tmp_path / "rollups"
+    assert saved.exists()
+    assert AnalyticsEngine.from_dict(json.loads(saved.read_text(encoding="utf-8"))).to_dict() == (
+        rollup_day(day, path=path, save=False).to_dict()
+    )
+
+
+def test_load_rollups_caches_past_days_per_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "ROLLUP_DIR", tmp_path / "rollups")
+    events = _events(n=6000, seed=3)  # 60 秒一条，约 4 天
+    path = tmp_path / "events.jsonl"
+    path.write_text("\n".join(json.dumps(e) for e in events) + "\n", encoding="utf-8")
+    now = T0 + 6000 * 60
+    days = 5
+
+    first = analytics.load_rollups(days, path=path, now=now)
+    start = analytics.rollup_window_start(days, now=now)
+    in_window = [e for e in events if (e.get("epoch") or e.get("ts")) >= start]
+    assert _results(first) == _results(AnalyticsEngine.default().feed(in_window))
+
+    cached = sorted(p.name for p in analytics.rollup_dir(path).glob("*.json"))
+    assert len(cached) == days - 1  # 今天不落盘
+
+    # 过去的日子读缓存，只重算今天
+    computed = []
+    real_rollup_day = analytics.rollup_day
+    monkeypatch.setattr(analytics, "rollup_day",
+                        lambda day, **kw: computed.append(day) or real_rollup_day(day, **kw))
+    assert _results(analytics.load_rollups(days, path=path, now=now)) == _results(first)
+    assert len(computed) == 1
+
+    # 另一个事件源不会读到这份缓存
+    other = tmp_path / "other.jsonl"
+    other.write_text("", encoding="utf-8")
+    assert analytics.rollup_dir(other) != analytics.rollup_dir(path)
+    assert analytics.load_rollups(days, path=other, now=now).result(
+        "metrics", DEFAULT_PARAMS)["counts"]["events"] == 0
+
+
+def test_rollups_live_under_the_data_dir():
+    """分片缓存写到运行时数据目录，不写进源码树里的 learning/"""
+    assert analytics.ROLLUP_DIR.parent.name == "data" or analytics.get_path("paths.data")
+    assert analytics.AIOS_ROOT / "learning" not in analytics.ROLLUP_DIR.parents
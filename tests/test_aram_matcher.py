@@ -0,0 +1,93 @@
+"""
+Tests for the indexed ARAM champion matcher.
+"""
+import json
+import os
+import sys
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import pytest
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from plugins.aram import data_adapter, matcher
+
+CHAMPS = {
+    "55": {"name": "Katarina", "title": "不祥之刃"},
+    "157": {"name": "Yasuo", "title": "疾风剑豪"},
+    "777": {"name": "Yone", "title": "封魔剑魂"},
+    "64": {"name": "LeeSin", "title": "盲僧"},
+    "11": {"name": "MasterYi", "title": "无极剑圣"},
+    "99": {"name": "Lux", "title": "光辉女郎"},
+    "21": {"name": "MissFortune", "title": "赏金猎人"},
+}
+
+
+@pytest.fixture
+def aram_files(tmp_path, monkeypatch):
+    data_file = tmp_path / "aram_data.json"
+    alias_file = tmp_path / "learned_aliases.json"
+    data_file.write_text(json.dumps(CHAMPS, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(data_adapter, "ARAM_DATA", data_file)
+    monkeypatch.setattr(data_adapter, "ALIAS_FILE", alias_file)
+    monkeypatch.setattr(matcher, "_emit", lambda *a, **kw: None)
+    monkeypatch.setattr("core.engine.log_mem", lambda *a, **kw: None)
+    data_adapter._cache.clear()
+    matcher.invalidate_index()
+    yield data_file, alias_file
+    data_adapter._cache.clear()
+    matcher.invalidate_index()
+
+
+def _brute_force(query, top_n=3):
+    """v0.2 的全表扫描，用来对照索引结果"""
+    seen = {}
+    for cid, info in CHAMPS.items():
+        if query in info["name"] or query in info["title"]:
+            seen[cid] = (0.95 if query == info["title"] else 0.90, "contains")
+    for cid, info in CHAMPS.items():
+        if cid in seen:
+            continue
+        best = max(
+            SequenceMatcher(None, query.lower(), info["name"].lower()).ratio(),
+            SequenceMatcher(None, query.lower(), info["title"].lower()).ratio(),
+        )
+        if best >= matcher.LOW_SCORE:
+            seen[cid] = (round(best, 2), "fuzzy")
+    ranked = sorted(seen.items(), key=lambda kv: kv[1][0], reverse=True)[:top_n]
+    return [(cid, score, kind) for cid, (score, kind) in ranked]
+
+
+def test_index_matches_full_scan(aram_files):
+    queries = ["剑", "剑豪", "疾风剑", "yasuo", "Yas", "yone", "辉女", "猎人赏金", "MasterY", "x", "不存在"]
+    for q in queries:
+        got = [(r["champion_id"], r["score"], r["match_type"]) for r in matcher.match(q)]
+        assert got == _brute_force(q), q
+
+    top = matcher.match("卡特")[0]
+    assert (top["champion_id"], top["match_type"]) == ("55", "alias_exact")
+
+
+def test_index_reloads_when_files_change(aram_files):
+    data_file, _ = aram_files
+    assert matcher.match("Jinx") == []
+
+    champs = dict(CHAMPS, **{"222": {"name": "Jinx", "title": "暴走萝莉"}})
+    data_file.write_text(json.dumps(champs, ensure_ascii=False), encoding="utf-8")
+    st = data_file.stat()
+    os.utime(data_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert matcher.match("Jinx")[0]["champion_id"] == "222"
+
+    matcher.feedback("快乐风男", "157")
+    hit = matcher.match("快乐风男")[0]
+    assert (hit["champion_id"], hit["match_type"]) == ("157", "learned")
+
+
+def test_match_many_aligns_with_queries(aram_files):
+    results = matcher.match_many(["盲僧", " 剑圣 ", "zzz"], top_n=2)
+    assert len(results) == 3
+    assert results[0][0]["champion_id"] == "64"
+    assert results[1][0]["champion_id"] == "11"
+    assert results[2] == []
@@ -0,0 +1,170 @@
+"""
+测试预算分桶账本（core.budget 的底层）
+验证：
+1. 窗口合计与全量扫描一致
+2. 重启后从已读偏移继续；日志被截断时重建
+3. 并发预占不越过预算；commit / release 归还差额
+4. 其他进程追加的用量在下次查询时可见
+5. 心跳统计来自直方图；不对齐的窗口起点按比例折算首桶
+"""
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加路径
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core import budget
+from core.budget_ledger import BudgetLedger, RollingCounter, local_day_start
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(budget, "_usage_path", lambda: tmp_path / "token_usage.jsonl")
+    monkeypatch.setattr(budget, "_heartbeat_path", lambda: tmp_path / "heartbeat_time.jsonl")
+    monkeypatch.setattr(budget, "_config_path", lambda: tmp_path / "budget_config.json")
+    monkeypatch.setattr(budget, "_ledgers", {})
+    return tmp_path
+
+
+@pytest.fixture
+def usage_log(tmp_path):
+    """600 条、间隔 3217 秒（约 22 天）的用量记录"""
+    now = time.time()
+    log = tmp_path / "usage.jsonl"
+    records = [{"epoch": int(now - i * 3217), "total_tokens": 10 + i} for i in range(600)]
+    _write_log(log, records)
+    return log, records, local_day_start(now)
+
+
+def _write_log(path, records):
+    with path.open("a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def _reserve_concurrently(tokens, workers=20):
+    granted = []
+    lock = threading.Lock()
+
+    def worker():
+        res = budget.reserve_tokens(tokens)
+        if res is not None:
+            with lock:
+                granted.append(res)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return granted
+
+
+def test_windows_match_full_scan(tmp_path, usage_log):
+    """今日 / 近几天 / 近 20 天的合计与逐条累加一致"""
+    log, records, day = usage_log
+    ledger = BudgetLedger(log, tmp_path / "usage.ledger.json")
+    for start in (day, day - 3 * 86400, day - 20 * 86400):
+        expected = sum(r["total_tokens"] for r in records if r["epoch"] >= start)
+        assert ledger.used_since(start) == expected
+
+
+def test_reopened_ledger_resumes_from_offset(tmp_path, usage_log):
+    """重新打开只读取上次偏移之后追加的记录"""
+    log, _, day = usage_log
+    ledger = BudgetLedger(log, tmp_path / "usage.ledger.json")
+    before = ledger.used_since(day)
+    ledger.flush()
+
+    _write_log(log, [{"epoch": int(time.time()), "total_tokens": 1000}])
+    reopened = BudgetLedger(log, tmp_path / "usage.ledger.json")
+    assert reopened._offset == log.stat().st_size
+    assert reopened.used_since(day) == before + 1000
+
+
+def test_truncated_log_is_rebuilt(tmp_path, usage_log):
+    """日志被截断（轮转）后从头重建"""
+    log, _, day = usage_log
+    ledger = BudgetLedger(log, tmp_path / "usage.ledger.json")
+    ledger.used_since(day)
+    log.write_text(json.dumps({"epoch": int(time.time()), "total_tokens": 7}) + "\n", encoding="utf-8")
+    assert ledger.used_since(day) == 7
+
+
+def test_concurrent_reservations_never_overshoot(data_dir):
+    """20 个线程同时预占，已用 + 预占不超过日预算"""
+    budget.update_config(daily_budget=10000, weekly_budget=50000)
+    budget.record_usage(2000, 0, "m")
+
+    granted = _reserve_concurrently(1000)
+    assert len(granted) == 8
+    assert budget.check_budget()["reserved"] == 8000
+    assert budget.reserve_tokens(1) is None
+
+
+def test_commit_and_release_return_the_difference(data_dir):
+    """commit 少于预占时归还差额，release 归还全部"""
+    budget.update_config(daily_budget=10000, weekly_budget=50000)
+    budget.record_usage(2000, 0, "m")
+    granted = _reserve_concurrently(1000)
+
+    granted[0].commit(budget.make_usage_record(300, 200, "m"))
+    granted[1].release()
+    status = budget.check_budget()
+    assert status["daily_used"] == 2500 and status["reserved"] == 6000
+    assert budget.reserve_tokens(1500) is not None
+    assert budget.reserve_tokens(1) is None
+
+
+def test_usage_from_other_process_is_visible(data_dir):
+    """其他进程直接追加的用量，下次查询时计入"""
+    budget.record_usage(2000, 500, "m")
+    _write_log(data_dir / "token_usage.jsonl", [{"epoch": int(time.time()), "total_tokens": 10000}])
+    assert budget.check_budget()["daily_used"] == 12500
+
+
+def test_heartbeat_stats_from_histogram(data_dir):
+    """心跳统计由直方图得出，超限次数按 limit 严格大于计"""
+    budget.update_config(heartbeat_limit=30)
+    for seconds in (1.2, 29.9, 30.0, 30.01, 45.5):
+        budget.record_heartbeat_time(seconds)
+
+    assert budget.get_heartbeat_stats(days=7) == {
+        "count": 5,
+        "avg_seconds": round((1.2 + 29.9 + 30.0 + 30.01 + 45.5) / 5, 2),
+        "max_seconds": 45.5,
+        "over_limit_count": 2,
+    }
+
+
+def test_heartbeat_stats_respect_days(data_dir):
+    """窗口外的旧记录只在更长的 days 内计入"""
+    budget.record_heartbeat_time(1.0)
+    old = int(time.time()) - 10 * 86400
+    _write_log(data_dir / "heartbeat_time.jsonl", [{"epoch": old, "seconds": 99.0}])
+
+    assert budget.get_heartbeat_stats(days=7)["count"] == 1
+    assert budget.get_heartbeat_stats(days=30)["count"] == 2
+
+
+def test_unaligned_start_prorates_first_bucket():
+    """起点落在小时桶中间：首桶按窗口内时长折算，不再整桶多算"""
+    counter = RollingCounter(histogram=True)
+    now = local_day_start(time.time()) + 86400 * 2 + 7200
+    epochs = [now - i * 60 for i in range(3 * 24 * 60)]
+    for epoch in epochs:
+        counter.add(epoch, 2.0)
+
+    counter.prune(now)
+    start = now - 30 * 3600 - 1800
+    exact = sum(1 for e in epochs if e >= start)
+    stats = counter.window(start, now)
+    assert abs(stats["count"] - exact) <= 1
+    assert abs(stats["total"] - 2.0 * exact) <= 2.0
+    assert stats["histogram"] == {2: stats["count"]}
@@ -0,0 +1,152 @@
+"""
+Tests for the shared capability index used by tools, skills and plugins.
+"""
+import os
+import sys
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.capability_index import CapabilityIndex, tokenize
+from core.skill_manager import SkillManager
+from core.tools import Tool, ToolManager
+
+
+def test_tool_select_uses_keywords_then_success_prior():
+    manager = ToolManager(index=CapabilityIndex())
+    assert manager.select("搜索2024年AI Agent市场报告").name == "web_search"
+    assert manager.select("计算 1+2+3+4+5").name == "calculator"
+    assert manager.select("读取 README.md 文件").name == "file_reader"
+    assert manager.select("生成一个 PDF 报告").name == "file_writer"
+    assert manager.select("hello world") is None
+
+    # 关键词命中数相同时，成功率高的工具优先
+    def boom():
+        raise RuntimeError("x")
+
+    manager.register(Tool("flaky_fetch", "抓取 网页", boom, keywords=["抓取"]))
+    manager.register(Tool("stable_fetch", "抓取 网页", lambda: "ok", keywords=["抓取"]))
+    for _ in range(3):
+        manager.execute("flaky_fetch")
+        manager.execute("stable_fetch")
+    assert manager.select("抓取这个页面").name == "stable_fetch"
+
+    assert manager.unregister("stable_fetch")
+    assert manager.select("抓取这个页面").name == "flaky_fetch"
+
+
+def test_skill_manager_rescan_is_incremental(tmp_path):
+    def write_skill(name, text):
+        d = tmp_path / name
+        d.mkdir(exist_ok=True)
+        (d / "SKILL.md").write_text(f"# {name}\n{text}\n", encoding="utf-8")
+        return d / "SKILL.md"
+
+    write_skill("server-health", "Monitor server CPU and disk usage")
+    write_skill("news-summary", "Summarize daily AI news")
+    manager = SkillManager(skills_dir=tmp_path, index=CapabilityIndex())
+    assert [s["name"] for s in manager.search_skills("monitor")] == ["server-health"]
+
+    md = write_skill("news-summary", "Summarize and monitor RSS feeds")
+    st = md.stat()
+    os.utime(md, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    write_skill("web-monitor", "Watch web pages for changes")
+    assert manager.rescan() == {"added": 1, "updated": 1, "removed": 0}
+    assert {s["name"] for s in manager.search_skills("monitor")} == {"server-health", "news-summary", "web-monitor"}
+
+    import shutil
+    shutil.rmtree(tmp_path / "server-health")
+    assert manager.rescan()["removed"] == 1
+    assert [s["name"] for s in manager.search_skills("cpu")] == []
+
+
+def test_index_only_touches_matching_postings():
+    index = CapabilityIndex()
+    for i in range(3000):
+        index.upsert(f"skill:s{i}", f"generic helper number{i} 工具{i % 50}", kind="skill")
+    index.upsert("skill:pdf", "Convert markdown reports to PDF", keywords=["pdf"], kind="skill")
+    index.upsert("plugin:pdf", "PDF viewer", kind="plugin")
+
+    hits = index.search("make a pdf report", kind="skill")
+    assert hits[0].doc_id == "skill:pdf" and hits[0].keyword_hits == 1
+    assert all(h.kind == "skill" for h in hits)
+
+    index.upsert("skill:pdf", "Spreadsheet exporter", kind="skill")
+    assert [h.doc_id for h in index.search("pdf")] == ["plugin:pdf"]
+    assert index.remove("plugin:pdf") and index.search("pdf") == []
+    assert tokenize("运行Python") == ["运", "行", "运行", "python"]
+
+
+def test_tool_select_matches_keywords_as_substrings():
+    manager = ToolManager(index=CapabilityIndex())
+    assert manager.select("帮我跑一下python3").name == "code_executor"
+    assert manager.select("googleit").name == "web_search"
+    assert manager.select("pythonic").name == "code_executor"
+
+
+def test_managers_sharing_the_global_index_do_not_collide(tmp_path):
+    from core.capability_index import get_capability_index
+
+    a = ToolManager()
+    b = ToolManager()
+    assert a.index is b.index is get_capability_index()
+    b.register(Tool("web_search", "天气查询", lambda: "sunny", keywords=["天气"]))
+    assert a.select("帮我搜索一下").name == "web_search"
+    assert a.select("今天天气怎么样") is None
+    assert b.select("今天天气怎么样") is b.tools["web_search"]
+
+    assert b.unregister("web_search")
+    assert a.select("帮我搜索一下") is a.tools["web_search"]
+
+    (tmp_path / "weather").mkdir()
+    (tmp_path / "weather" / "SKILL.md").write_text("# weather\n搜索天气预报\n", encoding="utf-8")
+    skills = SkillManager(skills_dir=tmp_path)
+    assert [s["name"] for s in skills.search_skills("天气")] == ["weather"]
+    assert SkillManager(skills_dir=tmp_path / "missing").search_skills("天气") == []
+
+
+def test_release_scope_drops_docs_and_shards():
+    """close() 释放作用域后，全局索引不再保留该实例的条目和分片"""
+    index = CapabilityIndex()
+    before = index.stats()["scopes"]
+    managers = [ToolManager(index=index) for _ in range(5)]
+    assert index.stats()["scopes"] == before + 5
+    for manager in managers:
+        manager.close()
+    assert index.stats() == {"docs": 0, "kinds": {}, "scopes": 0, "terms": 0}
+
+
+def test_contains_checks_every_scope():
+    """不带作用域的 in 检查所有作用域，带 (scope, doc_id) 时只看该作用域"""
+    index = CapabilityIndex()
+    scope = index.new_scope("tools")
+    index.upsert("tool:calc", "计算器", kind="tool", scope=scope)
+    assert "tool:calc" in index
+    assert (scope, "tool:calc") in index
+    assert ("", "tool:calc") not in index
+    assert index.release_scope(scope) == 1
+    assert "tool:calc" not in index
+
+
+def test_discard_recomputes_average_length():
+    """删除条目后平均长度会重新计算，分片清空时归零"""
+    index = CapabilityIndex()
+    index.upsert("a", "short", kind="skill")
+    index.upsert("b", " ".join(f"word{i}" for i in range(40)), kind="skill")
+    shard = index._shards[""]["skill"]
+    assert shard.avg_ref > 10
+    index.remove("b")
+    assert shard.avg_ref == shard.total_len == 1
+    index.remove("a")
+    assert shard.avg_ref == 0.0 and "" not in index._shards
+
+
+def test_search_skills_keeps_partial_word_matches(tmp_path):
+    """半个词（如 "sear"）查不到词项时回退到名称 / 描述子串匹配"""
+    (tmp_path / "web-search").mkdir()
+    (tmp_path / "web-search" / "SKILL.md").write_text("# web-search\nSearch the web\n", encoding="utf-8")
+    manager = SkillManager(skills_dir=tmp_path, index=CapabilityIndex())
+    assert [s["name"] for s in manager.search_skills("sear")] == ["web-search"]
+    assert manager.search_skills("sear")[0]["score"] == 0.0
+    assert manager.search_skills("search")[0]["score"] > 0
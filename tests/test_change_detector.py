@@ -0,0 +1,172 @@
+"""
+测试流式变化检测（pattern_recognition.change_detector）
+验证：
+1. 滑动和 O(1) 更新的趋势判断与整窗重算一致
+2. CUSUM / Page-Hinkley 能及时发现水平突变，平稳序列不误报
+3. 批量检测器与逐指标检测器结果一致，支持缺失值和按名字更新
+4. 大偏移量下滑动方差仍然精确
+"""
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# 添加路径
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT / "pattern_recognition"))
+
+import change_detector
+from change_detector import (
+    BatchChangeDetector,
+    ChangeDetector,
+    CusumDetector,
+    PageHinkleyDetector,
+)
+
+
+def _reference(values, threshold):
+    """原来的整窗重算"""
+    n = len(values)
+    x_mean = (n - 1) / 2
+    y_mean = sum(values) / n
+    slope = sum((i - x_mean) * (v - y_mean) for i, v in enumerate(values)) / \
+        sum((i - x_mean) ** 2 for i in range(n))
+    std = (sum((v - y_mean) ** 2 for v in values) / n) ** 0.5
+    ns = slope / y_mean if y_mean else 0
+    nd = std / y_mean if y_mean else 0
+    if nd > threshold * 2:
+        return "volatile", min(nd, 1.0)
+    if ns > threshold:
+        return "rising", min(abs(ns), 1.0)
+    if ns < -threshold:
+        return "falling", min(abs(ns), 1.0)
+    return "stable", 1.0 - nd
+
+
+@pytest.mark.parametrize("window", [3, 10, 25])
+def test_running_sums_match_full_recompute(monkeypatch, window):
+    """每一步的趋势和置信度都与整窗重算一致（含周期性重新同步）"""
+    monkeypatch.setattr(change_detector, "RESYNC_EVERY", 64)
+    rng = random.Random(7)
+    detector = ChangeDetector(window_size=window, threshold=0.1)
+    values = []
+    for i in range(500):
+        v = 1.0 + 0.002 * i + rng.gauss(0, 0.05) * (3 if 200 < i < 260 else 1)
+        detector.add_data_point(v)
+        values.append(v)
+        if i >= 2:
+            trend, confidence = detector.detect_trend()
+            ref_trend, ref_confidence = _reference(values[-window:], 0.1)
+            assert trend == ref_trend
+            assert abs(confidence - ref_confidence) < 1e-9
+
+
+def test_summary_covers_current_window():
+    """摘要只统计当前窗口内的数据"""
+    detector = ChangeDetector(window_size=10)
+    values = [float(i) for i in range(1, 31)]
+    for v in values:
+        detector.add_data_point(v)
+    summary = detector.get_summary()
+    assert summary["data_points"] == 10
+    assert summary["mean"] == round(sum(values[-10:]) / 10, 3)
+
+
+@pytest.mark.parametrize("make", [CusumDetector, PageHinkleyDetector])
+def test_level_drop_is_flagged_quickly(make):
+    """成功率从 0.9 掉到 0.6：15 步内报 down"""
+    rng = random.Random(3)
+    detector = make(warmup=20)
+    alarms = []
+    for i in range(400):
+        level = 0.9 if i < 200 else 0.6
+        direction = detector.update(level + rng.gauss(0, 0.02))
+        if direction:
+            alarms.append((i, direction))
+    assert alarms and alarms[0][1] == "down"
+    assert 200 <= alarms[0][0] < 215
+
+
+@pytest.mark.parametrize("make", [CusumDetector, PageHinkleyDetector])
+def test_constant_series_never_alarms(make):
+    """常数序列不报警，偏离它立即报 up"""
+    detector = make(warmup=5)
+    assert all(detector.update(1.0) is None for _ in range(100))
+    assert detector.update(1.5) == "up"
+
+
+def test_summary_reports_change_point():
+    """ChangeDetector 摘要中带出变化点的方向和位置"""
+    monitor = ChangeDetector(window_size=10)
+    for i in range(60):
+        monitor.add_data_point(100.0 if i < 30 else 160.0)
+    change = monitor.get_summary()["change"]
+    assert change["direction"] == "up" and change["index"] >= 30
+
+
+@pytest.fixture(scope="module")
+def batch_run():
+    """40 个指标（阈值交替）、10% 缺失、前 4 个在第 700 步跳变，批量和逐个各跑一遍"""
+    rng = np.random.default_rng(0)
+    names = [f"m{i}" for i in range(40)]
+    thresholds = np.where(np.arange(40) % 2, 0.1, 0.2)
+    batch = BatchChangeDetector(names, window_size=10, threshold=thresholds)
+    singles = [ChangeDetector(window_size=10, threshold=t) for t in thresholds]
+
+    alarms = []
+    for step in range(1500):
+        row = rng.normal(1.0, 0.05, len(names)) + np.linspace(0, 0.01, len(names)) * step
+        row[:4] += 0.5 * (step > 700)
+        row[rng.random(len(names)) < 0.1] = np.nan
+        alarms += batch.update(row)
+        for detector, value in zip(singles, row):
+            if not np.isnan(value):
+                detector.add_data_point(float(value))
+    return names, batch, singles, alarms
+
+
+def test_batch_matches_per_metric_detectors(batch_run):
+    """批量检测器的摘要与逐指标检测器一致"""
+    names, batch, singles, _ = batch_run
+    summaries = batch.summaries()
+    for name, detector in zip(names, singles):
+        expected = detector.get_summary()
+        got = summaries[name]
+        assert {k: got[k] for k in expected if k != "change"} == \
+            {k: v for k, v in expected.items() if k != "change"}
+        assert (got["change"] or {}).get("direction") == (expected["change"] or {}).get("direction")
+
+
+def test_batch_alarms_on_shifted_metrics(batch_run):
+    """跳变的 4 个指标在 20 步内报警"""
+    _, _, _, alarms = batch_run
+    assert {a["metric"] for a in alarms if a["index"] in range(700, 720)} >= {"m0", "m1", "m2", "m3"}
+
+
+def test_batch_dict_input_updates_named_metrics_only():
+    """字典输入只更新给出的指标"""
+    batch = BatchChangeDetector([f"m{i}" for i in range(8)], window_size=10)
+    for _ in range(5):
+        batch.update(np.ones(8))
+    pos = batch._pos.copy()
+    batch.update({"m5": 2.0})
+    assert batch.summaries()["m5"]["current_value"] == 2.0
+    assert list(np.nonzero(batch._pos != pos)[0]) == [5]
+
+
+def test_large_offset_keeps_variance_exact():
+    """数值很大（1e8 量级）时滑动方差与两遍算法一致，单指标和批量版都是"""
+    rng = np.random.default_rng(5)
+    values = 1e8 + rng.normal(0, 0.5, 1500)
+    detector = ChangeDetector(window_size=100)
+    batch = BatchChangeDetector(["m"], window_size=100)
+    for v in values:
+        detector.add_data_point(float(v))
+        batch.update([v])
+    window = values[-100:]
+    expected = float(np.sqrt(np.mean((window - window.mean()) ** 2)))
+    assert abs(detector.get_summary()["std_dev"] - round(expected, 3)) <= 0.001
+    assert abs(batch.summaries()["m"]["std_dev"] - round(expected, 3)) <= 0.001
+    assert detector.get_summary()["mean"] == round(float(window.mean()), 3)
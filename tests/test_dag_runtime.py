@@ -0,0 +1,212 @@
+"""
+Tests for the shared plan DAG runtime and the coordinators built on it.
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from collaboration.orchestrator import Orchestrator, _plan_active
+from collaboration.state_store import StateStore
+from core.dag_runtime import CycleError, DagRuntime, DurationStats
+from core.planner import Plan, Planner, SubTask
+
+
+def test_ready_order_promotion_and_cycles(tmp_path):
+    dag = DagRuntime()
+    dag.add("a", estimate=10)
+    dag.add("b", estimate=10)
+    dag.add("c", deps=["b"], estimate=100)  # b sits on the longer path
+    dag.add("d", deps=["a", "c"], priority=1)
+    dag.add("e", deps=["missing"])
+    dag.build()
+
+    assert dag.ready() == ["b", "a"]
+    dag.start("b")
+    assert dag.complete("b") == ["c"]
+    dag.complete("a")
+    assert dag.complete("c") == ["d"]
+    assert dag.ready() == ["d"]  # "e" waits on a dependency outside the plan
+    assert dag.counts()["blocked"] == 1
+
+    dag.set_status("c", "pending")  # reopening c blocks d again
+    assert dag.ready() == ["c"]
+
+    cyclic = DagRuntime()
+    cyclic.add("x", deps=["z"])
+    cyclic.add("y", deps=["x"])
+    cyclic.add("z", deps=["y"])
+    cyclic.add("ok")
+    with pytest.raises(CycleError, match="x, y, z"):
+        cyclic.build()
+
+    orch = Orchestrator(store=StateStore(tmp_path, "plans", is_active=_plan_active))
+    with pytest.raises(CycleError):
+        orch.create_plan("p", "t", [
+            {"id": "t1", "description": "a", "depends_on": ["t2"]},
+            {"id": "t2", "description": "b", "depends_on": ["t1"]},
+        ])
+
+
+def test_eta_uses_historical_durations(tmp_path):
+    clock = [1000.0]
+    stats = DurationStats(path=tmp_path / "durations.json")
+    dag = DagRuntime(stats=stats, clock=lambda: clock[0])
+    dag.add("design", kind="design", estimate=300)
+    dag.add("code", deps=["design"], kind="code", estimate=600)
+    dag.add("test", deps=["code"], kind="code", estimate=600)
+    dag.build()
+    assert dag.eta() == 1500
+
+    dag.start("design")
+    clock[0] += 100
+    assert dag.eta() == 1400
+    clock[0] += 20
+    dag.complete("design")
+    assert stats.estimate("design") == 120
+
+    dag.start("code")
+    clock[0] += 50
+    dag.complete("code")
+    # "code" now has history: 50s instead of the 600s prior
+    assert dag.eta() == 50
+    assert DurationStats(path=tmp_path / "durations.json").samples("code") == 1
+
+
+def test_planner_dependencies_and_large_plan(tmp_path):
+    planner = Planner(tmp_path)
+    rng = random.Random(1)
+    vocab = [f"w{i}" for i in range(30)]
+    subtasks = [
+        SubTask(f"s{i}", " ".join(rng.sample(vocab, 5)), "code", "normal", [], 60)
+        for i in range(150)
+    ]
+    expected = {}
+    for i, b in enumerate(subtasks):
+        words = set(b.description.split())
+        expected[b.id] = [
+            a.id for a in subtasks[:i] if len(words & set(a.description.split())) >= 2
+        ]
+    planner._analyze_dependencies(subtasks)
+    assert {st.id: st.dependencies for st in subtasks} == expected
+
+    # 3000-node layered plan: every transition touches only the finished node's dependents
+    n = 3000
+    dag = DagRuntime()
+    for i in range(n):
+        deps = [f"n{i - 1}", f"n{i - 2}"] if i >= 2 else []
+        dag.add(f"n{i}", deps=deps, priority=rng.randint(1, 3))
+    dag.build()
+    started = time.perf_counter()
+    done = 0
+    while True:
+        node = dag.pop_ready()
+        if node is None:
+            break
+        dag.complete(node)
+        done += 1
+    elapsed = time.perf_counter() - started
+    assert done == n and dag.all_done()
+    assert elapsed / n < 1e-3
+
+
+def test_unknown_status_blocks_and_status_changes_update_cached_dag(tmp_path):
+    dag = DagRuntime()
+    dag.add("a", status="blocked")
+    dag.add("b", deps=["a"])
+    dag.add("c")
+    dag.build()
+    assert dag.ready() == ["c"]
+    dag.set_status("c", "blocked")
+    assert dag.ready() == [] and dag.counts()["blocked"] == 3
+
+    orch = Orchestrator(store=StateStore(tmp_path, "plans", is_active=_plan_active))
+    plan = orch.create_plan("p", "t", [
+        {"id": "t1", "description": "a"},
+        {"id": "t2", "description": "b", "depends_on": ["t1"]},
+    ])
+    ids = lambda: [st["id"] for st in orch.get_ready_tasks(plan)]
+    assert ids() == ["t1"]
+
+    # 在 mark_* 之外改状态也走同一入口：未知状态阻塞，DAG 随之更新
+    assert orch.set_subtask_status("p", "t1", "paused")
+    assert ids() == [] and plan.subtasks[0]["status"] == "paused"
+    assert orch.set_subtask_status("p", "t1", "done")
+    assert ids() == ["t2"]
+    # 结构改动后显式刷新
+    plan.subtasks.append({**plan.subtasks[1], "id": "t3", "depends_on": ["t1"]})
+    orch.refresh_plan("p")
+    assert ids() == ["t2", "t3"]
+    orch.mark_done("p", "t2", "ok")
+    assert ids() == ["t3"]
+
+
+def test_planner_status_updates_append_instead_of_rewriting(tmp_path):
+    planner = Planner(tmp_path)
+    plan = Plan("plan_t", "task", [
+        SubTask("a", "design", "design", "high", [], 30),
+        SubTask("b", "code", "code", "normal", ["a"], 60),
+    ], "dag")
+    planner._plans[plan.task_id] = plan
+    planner._save_plan(plan)
+    plan_file = planner.plans_dir / "plan_t.json"
+    original = plan_file.read_text(encoding="utf-8")
+
+    planner.update_subtask_status("plan_t", "a", "completed", result="spec")
+    planner.update_subtask_status("plan_t", "b", "running")
+    assert plan_file.read_text(encoding="utf-8") == original
+    assert len(planner._status_log("plan_t").read_text(encoding="utf-8").splitlines()) == 2
+
+    reloaded = Planner(tmp_path)
+    restored = reloaded.load_plan("plan_t")
+    assert [(st.status, st.result) for st in restored.subtasks] == [
+        ("completed", "spec"), ("running", None)]
+    assert reloaded.get_next_subtasks("plan_t") == []
+
+    # 计划结束时合并回计划文件
+    reloaded.update_subtask_status("plan_t", "b", "completed")
+    assert not reloaded._status_log("plan_t").exists()
+    assert '"status": "completed"' in plan_file.read_text(encoding="utf-8")
+    assert [st.status for st in Planner(tmp_path).load_plan("plan_t").subtasks] == [
+        "completed", "completed"]
+
+
+def test_ready_reads_heap_and_counts_are_kept_incrementally():
+    """ready(limit) 只弹出堆顶几项；counts() 与逐个数状态一致"""
+    dag = DagRuntime()
+    for i in range(1000):
+        dag.add(f"n{i}", priority=i % 7)
+    dag.build()
+    expected = sorted((f"n{i}" for i in range(1000)), key=lambda n: (int(n[1:]) % 7, int(n[1:])))
+    assert dag.ready(3) == expected[:3]
+    assert dag.ready() == expected
+
+    dag.start("n0")
+    dag.complete("n7")
+    dag.fail("n14")
+    dag.block("n21")
+    dag.set_status("n14", "pending")  # 重试：重新就绪，堆里的旧项不会重复
+    assert dag.ready(2) == ["n14", "n28"]
+    assert dag.counts() == {"total": 1000, "done": 1, "failed": 0, "running": 1,
+                            "ready": 997, "blocked": 1}
+
+
+def test_planner_reloads_plan_changed_by_another_process(tmp_path):
+    """另一个 Planner 更新了同一计划：缓存按磁盘签名失效，读到最新状态"""
+    plan = Plan("plan_s", "task", [
+        SubTask("a", "design", "design", "high", [], 30),
+        SubTask("b", "code", "code", "normal", ["a"], 60),
+    ], "dag")
+    first = Planner(tmp_path)
+    first._plans[plan.task_id] = plan
+    first._save_plan(plan)
+    assert [st.id for st in first.get_next_subtasks("plan_s")] == ["a"]
+
+    Planner(tmp_path).update_subtask_status("plan_s", "a", "completed")
+    assert [st.id for st in first.get_next_subtasks("plan_s")] == ["b"]
+    assert first.load_plan("plan_s") is first.load_plan("plan_s")  # 没变化时不重读
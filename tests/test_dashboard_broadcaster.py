@@ -0,0 +1,75 @@
+"""
+Tests for the dashboard SSE snapshot broadcaster.
+"""
+import json
+import sys
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.score_series import MultiResolutionSeries
+from dashboard.dashboard_server import SnapshotBroadcaster, TailReader, _Subscriber, json_patch_diff
+
+
+def _line(obj):
+    return json.dumps(obj, separators=(",", ":")) + "\n"
+
+
+def test_tail_reader_only_returns_complete_new_lines(tmp_path):
+    f = tmp_path / "events.jsonl"
+    f.write_text("a\nb\n")
+    tail = TailReader(f)
+    assert tail.read_new_lines() == ["a", "b"]
+    with open(f, "a") as fh:
+        fh.write("c\nd")
+    assert tail.read_new_lines() == ["c"]
+    with open(f, "a") as fh:
+        fh.write("e\n")
+    assert tail.read_new_lines() == ["de"]
+    f.write_text("x\n")  # 截断后从头读
+    assert tail.read_new_lines() == ["x"]
+
+
+def test_json_patch_diff():
+    ops = json_patch_diff({"a": {"b": 1}, "c": 2, "l": [1]}, {"a": {"b": 2}, "d/e": 3, "l": [1]})
+    assert {"op": "remove", "path": "/c"} in ops
+    assert {"op": "replace", "path": "/a/b", "value": 2} in ops
+    assert {"op": "add", "path": "/d~1e", "value": 3} in ops
+    assert len(ops) == 3
+
+
+def test_broadcaster_computes_once_and_fans_out(tmp_path, monkeypatch):
+    root = tmp_path / "aios"
+    root.mkdir()
+    events = tmp_path / "events.jsonl"
+    events.write_text("".join(_line({"level": "error", "error_type": "Boom"}) for _ in range(3)))
+    series = MultiResolutionSeries()
+    series.add({"timestamp": 120_000, "score": 0.5, "success_rate": 0.75})
+    series.save(root / "data" / "score_series.json")
+
+    # live CPU/memory readings would turn every tick into a patch
+    monkeypatch.setattr(SnapshotBroadcaster, "_system_usage",
+                        staticmethod(lambda: {"cpu": 1, "mem": 2, "disk": 3}))
+    b = SnapshotBroadcaster(root=root)
+    full, patch = _Subscriber("full"), _Subscriber("patch")
+    b._subscribers = {full, patch}
+
+    snapshot = b.tick()
+    assert snapshot["top_errors"] == [{"name": "Boom", "count": 3}]
+    assert (snapshot["trend_success"], snapshot["trend_evolution"]) == ([75], [50])
+    assert full.get(0).startswith("data: ")
+    assert patch.get(0).startswith("event: snapshot\n")
+
+    with open(events, "a") as fh:
+        fh.write(_line({"level": "info"}))
+    b.tick()
+    message = patch.get(0)
+    assert message.startswith("event: patch\n")
+    ops = json.loads(message.split("data: ", 1)[1])
+    assert ops == [{"op": "replace", "path": "/success_rate", "value": 25}]
+    assert json.loads(full.get(0)[len("data: "):])["success_rate"] == 25
+
+    # 没有变化时 patch 订阅者收不到消息
+    b.tick()
+    assert patch.queue.empty()
@@ -0,0 +1,126 @@
+"""
+Tests for the v3.4 dashboard metrics materialization service.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT / "dashboard" / "AIOS-Dashboard-v3.4"))
+
+from metrics_service import EventAggregates, MetricsService, Panel, load_trends
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSampler:
+    def get(self):
+        return {'cpu': 1.0, 'mem': 2.0, 'disk': 3.0, 'gpu': 0}
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+def _append(path, *events):
+    with open(path, "a", encoding="utf-8") as f:
+        for e in events:
+            f.write(json.dumps(e) + "\n")
+
+
+def test_event_aggregates_slide_window(tmp_path):
+    f = tmp_path / "events.jsonl"
+    _append(f, *[{'level': 'error', 'message': 'boom'} for _ in range(3)])
+    _append(f, {'type': 'task_complete', 'duration_ms': 900, 'operation': 'a.slow'},
+            {'type': 'task_failed'})
+    agg = EventAggregates(f, window=4)
+    agg.update()
+    # 窗口 4：最早的一条 boom 已滑出
+    assert agg.top_errors() == [{'error': 'boom', 'count': 2}]
+    assert agg.slow_operations() == [{'operation': 'a.slow', 'duration': 900}]
+    assert agg.success_rate() == 50.0
+
+    _append(f, *[{'level': 'info'} for _ in range(4)])
+    agg.update()
+    assert agg.top_errors() == []
+    assert agg.slow_operations() == []
+    assert agg.success_rate() is None
+
+
+def test_panel_serves_stale_while_refreshing():
+    clock = FakeClock()
+    calls = []
+
+    def compute():
+        calls.append(clock.now)
+        return len(calls)
+
+    panel = Panel("p", compute, ttl=1.0, max_stale=10.0, clock=clock)
+    assert panel.get() == 1
+    clock.now = 0.5
+    assert panel.get() == 1 and len(calls) == 1
+
+    clock.now = 5.0
+    assert panel.get() == 1  # 旧值立即返回，后台刷新
+    for _ in range(100):
+        if panel.version == 2:
+            break
+        time.sleep(0.01)
+    assert panel.get() == 2
+
+    clock.now = 100.0  # 超过 max_stale：同步重算
+    assert panel.get() == 3
+
+
+def test_render_reuses_body_and_etag_until_a_panel_changes(tmp_path):
+    workspace = tmp_path
+    root = tmp_path / "aios"
+    _append(workspace / "events.jsonl", {'level': 'error', 'message': 'x'})
+    clock = FakeClock()
+    service = MetricsService(root=root, workspace=workspace, sampler=FakeSampler(), clock=clock)
+
+    body, etag, payload = service.render()
+    assert payload['top_errors'] == [{'error': 'x', 'count': 1}]
+    assert payload['cpu'] == 1.0
+    assert service.render()[:2] == (body, etag)
+
+    _append(workspace / "events.jsonl", {'level': 'error', 'message': 'y'})
+    clock.now = 1000.0  # 所有面板过期且超过 max_stale，同步刷新
+    body2, etag2, payload2 = service.render()
+    assert etag2 != etag
+    assert {e['error'] for e in payload2['top_errors']} == {'x', 'y'}
+    assert service.logs()['logs'][-1]['level'] == 'error'
+
+
+def test_trend_padding_is_deterministic(tmp_path):
+    root = tmp_path / "aios"
+    history = root / "learning" / "metrics_history.jsonl"
+    history.parent.mkdir(parents=True)
+    base = 1_700_000_000
+    _append(history, *[{'timestamp': base + i * 300, 'task_success_rate': 0.9 + i / 100,
+                        'evolution_score': 0.5} for i in range(3)])
+
+    trends = load_trends(root, points=5)
+    assert trends['trend_success'] == [90.0, 90.0, 90.0, 91.0, 92.0]
+    assert trends['trend_evolution'] == [95.0] * 5
+    assert trends['trend_success_labels'][0] == time.strftime('%H:%M', time.localtime(base - 600))
+    assert load_trends(root, points=5) == trends
+
+    # 面板重算后内容不变：版本不变，ETag 可以一直复用
+    clock = FakeClock()
+    service = MetricsService(root=root, workspace=tmp_path, sampler=FakeSampler(), clock=clock)
+    _, etag, _ = service.render()
+    version = service.panels['trends'].version
+    clock.now = 1000.0
+    assert service.render()[1] == etag
+    assert service.panels['trends'].version == version
+    assert load_trends(tmp_path / "empty", points=3)['trend_success'] == [98.5] * 3
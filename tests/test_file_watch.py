@@ -0,0 +1,173 @@
+"""
+Tests for file change tracking (core.file_watch) and sensor state persistence.
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core import file_watch
+from core.file_watch import FileChangeTracker
+from core.sensor_state import SensorStateStore
+
+
+def _touch(path: Path, text: str = "x", age: float = 0.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def _age_dirs(root: Path, seconds: float = 60.0):
+    """push directory mtimes out of the scanner's hot window"""
+    stamp = time.time() - seconds
+    for d in [root, *[p for p in root.rglob("*") if p.is_dir()]]:
+        os.utime(d, (stamp, stamp))
+
+
+def _changes(changes):
+    return sorted((c["type"], Path(c["path"]).name) for c in changes)
+
+
+def test_scan_backend_reports_create_modify_delete_and_skips_cold_dirs(tmp_path, monkeypatch):
+    root = tmp_path / "watched"
+    _touch(root / "a.py", age=30)
+    _touch(root / "pkg" / "b.json", age=30)
+    _touch(root / "notes.txt", age=30)
+    tracker = FileChangeTracker([root], [".py", ".json"], backend="scan", full_scan_every=4)
+    assert tracker.backend == "scan"
+    known = {}
+
+    assert _changes(tracker.poll(known)) == [("created", "a.py"), ("created", "b.json")]
+    _touch(root / "pkg" / "c.py")
+    os.utime(root / "a.py", (time.time() + 5, time.time() + 5))
+    (root / "pkg" / "b.json").unlink()
+    assert _changes(tracker.poll(known)) == [
+        ("created", "c.py"), ("deleted", "b.json"), ("modified", "a.py")]
+    assert sorted(Path(k).name for k in known) == ["a.py", "c.py"]
+
+    # unchanged directories are not listed again between full scans ...
+    _age_dirs(root)
+    assert tracker.poll(known) == []  # 3rd poll caches the new directory mtimes
+    calls = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(file_watch.os, "scandir", lambda d: calls.append(d) or real_scandir(d))
+    os.utime(root / "pkg" / "c.py", (time.time() + 10, time.time() + 10))  # in-place edit
+    assert tracker.poll(known) == []
+    assert calls == []
+    monkeypatch.undo()
+
+    # ... so in-place edits in a cold directory are caught by the next full scan
+    assert _changes(tracker.poll(known)) == [("modified", "c.py")]
+
+
+def test_watchdog_backend_reconciles_then_applies_events(tmp_path):
+    pytest.importorskip("watchdog")
+    root = tmp_path / "watched"
+    _touch(root / "old.py", age=30)
+    known = {str(root / "gone.py"): 1.0}  # persisted from a previous run
+    tracker = FileChangeTracker([root], [".py"], backend="watchdog")
+    try:
+        assert tracker.backend == "watchdog"
+        # first poll: full reconciliation scan against the persisted mtimes
+        assert _changes(tracker.poll(known)) == [("created", "old.py"), ("deleted", "gone.py")]
+
+        def wait_for(expected):
+            seen, deadline = [], time.monotonic() + 5
+            while time.monotonic() < deadline:
+                seen += tracker.poll(known)
+                if _changes(seen) == expected:
+                    return
+                time.sleep(0.05)
+            assert _changes(seen) == expected
+
+        _touch(root / "sub" / "new.py")
+        _touch(root / "ignored.txt")
+        wait_for([("created", "new.py")])
+
+        with open(root / "old.py", "a", encoding="utf-8") as f:
+            f.write("more")
+        wait_for([("modified", "old.py")])
+
+        (root / "sub" / "new.py").unlink()
+        wait_for([("deleted", "new.py")])
+        assert list(known) == [str(root / "old.py")]
+    finally:
+        tracker.stop()
+
+
+def test_full_scan_only_deletes_keys_under_watched_roots(tmp_path):
+    root = tmp_path / "watched"
+    _touch(root / "a.py", age=30)
+    sibling = str(tmp_path / "watched2" / "other.py")  # same prefix, different directory
+    known = {sibling: 1.0}
+    tracker = FileChangeTracker([root], [".py"], backend="scan")
+    assert _changes(tracker.poll(known)) == [("created", "a.py")]
+    assert sibling in known
+
+
+def test_watchdog_backend_rescans_moved_directories_and_periodically(tmp_path):
+    pytest.importorskip("watchdog")
+    root = tmp_path / "watched"
+    root.mkdir()
+    outside = tmp_path / "outside"
+    _touch(outside / "pkg" / "m.py")
+    _touch(outside / "pkg" / "deep" / "n.py")
+    known = {}
+    tracker = FileChangeTracker([root], [".py"], backend="watchdog", rescan_every=1000)
+    try:
+        assert tracker.poll(known) == []
+
+        def wait_for(expected):
+            seen, deadline = [], time.monotonic() + 5
+            while time.monotonic() < deadline:
+                seen += tracker.poll(known)
+                if _changes(seen) == expected:
+                    return
+                time.sleep(0.05)
+            assert _changes(seen) == expected
+
+        # a directory moved in brings files that never had their own events
+        os.rename(outside / "pkg", root / "pkg")
+        wait_for([("created", "m.py"), ("created", "n.py")])
+        os.rename(root / "pkg", outside / "pkg")
+        wait_for([("deleted", "m.py"), ("deleted", "n.py")])
+
+        # a change the backend never saw is caught by the periodic full scan
+        tracker.rescan_every = 1
+        known[str(root / "missed.py")] = 1.0
+        assert _changes(tracker.poll(known)) == [("deleted", "missed.py")]
+    finally:
+        tracker.stop()
+
+
+def test_sensor_state_flushes_at_most_once_per_interval(tmp_path):
+    path = tmp_path / "sensor_state.json"
+    store = SensorStateStore(path, interval=30)
+    state = store.load()
+    assert state == {}
+
+    state["cooldowns"] = {"a": 1}
+    store.save(state)  # nothing written yet: first save goes straight to disk
+    assert json.loads(path.read_text(encoding="utf-8")) == {"cooldowns": {"a": 1}}
+
+    state["cooldowns"]["b"] = 2
+    store.save(state)  # inside the interval: memory only
+    assert json.loads(path.read_text(encoding="utf-8")) == {"cooldowns": {"a": 1}}
+    assert store.load() is state
+
+    store.flush()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"cooldowns": {"a": 1, "b": 2}}
+    mtime = path.stat().st_mtime_ns
+    store.flush()  # clean: no rewrite
+    assert path.stat().st_mtime_ns == mtime
+
+    state["x"] = True
+    store.save(state, force=True)
+    assert SensorStateStore(path).load() == {"cooldowns": {"a": 1, "b": 2}, "x": True}
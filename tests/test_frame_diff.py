@@ -0,0 +1,95 @@
+"""
+Tests for the in-memory screen frame pipeline (core.frame_diff).
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.frame_diff import (
+    FrameRing,
+    block_change_ratios,
+    compare_frames,
+    fingerprint,
+    regions_from_ratios,
+    to_gray,
+)
+
+
+def _screen(h=250, w=330, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_block_ratios_and_regions_match_per_block_loop():
+    a = _screen()
+    b = a.copy()
+    b[10:60, 20:90] ^= 0xFF          # fully inside block (0, 0)
+    b[200:250, 300:330, 2] = 255 - b[200:250, 300:330, 2]  # one channel, ragged edge block
+
+    diff_ratio, ratios = block_change_ratios(a, b, block_size=100)
+    assert ratios.shape == (3, 4)
+
+    changed = (np.abs(a.astype(int) - b.astype(int)).max(axis=2) > 30)
+    assert abs(diff_ratio - changed.mean()) < 1e-12
+    for by in range(3):
+        for bx in range(4):
+            block = changed[by * 100:(by + 1) * 100, bx * 100:(bx + 1) * 100]
+            assert abs(ratios[by, bx] - block.mean()) < 1e-12
+
+    regions = regions_from_ratios(ratios, (330, 250), block_size=100)
+    assert [r["region"] for r in regions] == [(0, 0, 100, 100), (300, 200, 330, 250)]
+    assert regions[0]["change_ratio"] == round(float(ratios[0, 0]), 3)
+
+
+def test_fingerprint_covers_edges_and_colour_and_contrast():
+    frame = np.full((1080, 1920, 3), 128, dtype=np.uint8)
+    fp = fingerprint(frame)
+    assert fp.shape == (32, 32, 3, 3)
+
+    # the rows beyond 32 * (1080 // 32) used to be cropped away
+    edge = frame.copy()
+    edge[-10:, -300:] = 255
+    assert np.abs(fingerprint(edge) - fp).max() > 2.0
+
+    # red -> green with the same luminance: invisible in grayscale
+    red = np.zeros((64, 64, 3), dtype=np.uint8)
+    red[..., 0] = 150
+    green = np.zeros((64, 64, 3), dtype=np.uint8)
+    green[..., 1] = 77
+    assert np.array_equal(to_gray(red), to_gray(green))
+    assert np.abs(fingerprint(red, (4, 4)) - fingerprint(green, (4, 4))).max() > 2.0
+
+    # half black / half white becomes uniform grey: the cell mean stays the same
+    split = np.zeros((64, 64), dtype=np.uint8)
+    split[:, ::2] = 254
+    flat = np.full((64, 64), 127, dtype=np.uint8)
+    means = lambda f: fingerprint(f, (4, 4))[..., 0]
+    assert np.array_equal(means(split), means(flat))
+    assert np.abs(fingerprint(split, (4, 4)) - fingerprint(flat, (4, 4))).max() > 2.0
+
+
+def test_compare_prefilters_only_unchanged_frames():
+    ring = FrameRing(capacity=3)
+    base = _screen(400, 600, seed=1)
+    first = ring.push(base)
+    same = ring.push(base.copy())
+    assert compare_frames(first, same)["reason"] == "fingerprint_match"
+
+    # equal-luminance colour swap over a large area is a real change
+    swapped = base.copy()
+    swapped[:200, :300] = [150, 0, 0]
+    shifted = swapped.copy()
+    shifted[:200, :300] = [0, 77, 0]
+    assert np.array_equal(to_gray(swapped)[:200, :300], to_gray(shifted)[:200, :300])
+    prev, cur = ring.push(swapped), ring.push(shifted)
+    result = compare_frames(prev, cur, threshold=0.05)
+    assert "reason" not in result and result["changed"]
+    assert {r["region"] for r in result["diff_regions"]} == {
+        (x, y, x + 100, y + 100) for x in (0, 100, 200) for y in (0, 100)
+    }
+
+    assert len(ring) == 3 and ring.latest is cur and ring.previous is prev
+    assert cur.size == (600, 400) and cur.gray.shape == (400, 600)
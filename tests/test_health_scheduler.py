@@ -0,0 +1,183 @@
+"""
+测试健康检查调度器（并发执行 + 按 TTL 缓存 + 熔断）
+验证：
+1. 集成探针并发执行，结果缓存
+2. TTL 内不重复检查，force 强制刷新
+3. 连续失败后熔断，冷却结束后半开探测恢复
+4. 插件健康检查 wait=True 不用缓存，错误保持旧结构
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加路径
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core import integrations
+from core.health_scheduler import CLOSED, OPEN, HealthScheduler
+
+
+@pytest.fixture
+def scheduler():
+    s = HealthScheduler(max_concurrency=8)
+    yield s
+    s.stop()
+
+
+@pytest.fixture
+def slow_integrations(tmp_path, monkeypatch):
+    """6 个各需 0.5 秒的 CLI 集成，外加一个没有检查命令的"""
+    monkeypatch.setattr(integrations, "INTEGRATIONS_FILE", tmp_path / "integrations.json")
+    monkeypatch.setattr(integrations, "_scheduler", None)
+    slow = [{"name": f"slow{i}", "type": "cli", "health_check_cmd": "sleep 0.5 && echo up"} for i in range(6)]
+    (tmp_path / "integrations.json").write_text(
+        json.dumps(slow + [{"name": "nocmd", "type": "api"}]), encoding="utf-8"
+    )
+    yield
+    integrations.get_health_scheduler().stop()
+
+
+@pytest.fixture
+def failing():
+    """failure_threshold=2、冷却 30 秒、时钟可控；探针总是连接失败"""
+    now = [1000.0]
+    s = HealthScheduler(failure_threshold=2, cooldown=30, clock=lambda: now[0])
+    calls = []
+
+    def probe():
+        calls.append(1)
+        raise ConnectionError("refused")
+
+    s.register("api", probe, ttl=1)
+    yield s, now, calls
+    s.stop()
+
+
+def test_integration_probes_run_concurrently(slow_integrations):
+    """6 个慢探针并发执行，总耗时远小于串行"""
+    started = time.monotonic()
+    results = integrations.health_check_all()
+    assert time.monotonic() - started < 2.0  # 串行需要 3 秒以上
+    assert [r["status"] for r in results] == ["ok"] * 6 + ["warn"]
+    assert results[0]["message"] == "up"
+
+
+def test_cached_integration_results_return_immediately(slow_integrations):
+    """缓存未过期时 wait=False 立即返回上次结果"""
+    integrations.health_check_all()
+    started = time.monotonic()
+    assert integrations.health_check_all(wait=False)[0]["status"] == "ok"
+    assert time.monotonic() - started < 0.2
+
+
+def test_unchecked_probe_is_unknown(scheduler):
+    """注册后尚未检查的探针状态为 unknown"""
+    scheduler.register("db", lambda: {"status": "ok"}, ttl=60)
+    assert scheduler.status("db")["status"] == "unknown"
+
+
+def test_results_are_cached_per_ttl(scheduler):
+    """TTL 内重复 refresh 不再执行探针"""
+    calls = []
+    scheduler.register("db", lambda: calls.append(1) or {"status": "ok"}, ttl=60)
+    scheduler.refresh()
+    scheduler.refresh()
+    assert len(calls) == 1
+    assert scheduler.snapshot()["db"]["circuit"] == CLOSED
+
+
+def test_force_ignores_cache(scheduler):
+    """force=True 忽略缓存重新检查"""
+    calls = []
+    scheduler.register("db", lambda: calls.append(1) or {"status": "ok"}, ttl=60)
+    scheduler.refresh()
+    scheduler.refresh(force=True)
+    assert len(calls) == 2
+
+
+def test_circuit_opens_after_repeated_failures(failing):
+    """连续失败达到阈值后熔断"""
+    s, _, calls = failing
+    s.refresh(force=True)
+    assert s.status("api")["circuit"] == CLOSED
+    s.refresh(force=True)
+    assert s.status("api")["circuit"] == OPEN
+    assert len(calls) == 2
+
+
+def test_open_circuit_skips_probe(failing):
+    """熔断中：跳过探针，保留最近一次结果"""
+    s, _, calls = failing
+    s.refresh(force=True)
+    s.refresh(force=True)
+    s.refresh(force=True)
+    assert len(calls) == 2 and s.status("api")["skipped"]
+    assert s.status("api")["status"] == "error"
+
+
+def test_half_open_probe_recovers(failing):
+    """冷却结束后半开探测一次，成功即恢复"""
+    s, now, _ = failing
+    s.refresh(force=True)
+    s.refresh(force=True)
+    now[0] += 31
+    s._probes["api"].probe = lambda: {"status": "ok"}
+    s.refresh()
+    assert s.status("api")["circuit"] == CLOSED
+    assert s.status("api")["status"] == "ok"
+
+
+def test_half_open_failure_reopens(failing):
+    """半开探测仍失败则重新熔断"""
+    s, now, calls = failing
+    s.refresh(force=True)
+    s.refresh(force=True)
+    now[0] += 31
+    s.refresh()
+    assert len(calls) == 3
+    assert s.status("api")["circuit"] == OPEN
+    now[0] += 1
+    s.refresh(force=True)
+    assert len(calls) == 3  # 仍在冷却：跳过
+
+
+@pytest.fixture
+def plugin_manager(tmp_path):
+    """一个健康、一个抛异常的插件"""
+    from plugins.manager import PluginManager
+
+    class Broken:
+        def health_check(self):
+            raise RuntimeError("boom")
+
+    class Healthy:
+        calls = 0
+
+        def health_check(self):
+            Healthy.calls += 1
+            return {"status": "healthy"}
+
+    manager = PluginManager(plugin_dir=tmp_path)
+    manager.plugins = {"broken": Broken(), "healthy": Healthy()}
+    yield manager, Healthy
+    manager.health.stop()
+
+
+def test_plugin_health_check_all_bypasses_cache(plugin_manager):
+    """wait=True 每次都重新检查，不返回缓存结果"""
+    manager, healthy = plugin_manager
+    manager.health_check_all()
+    manager.health_check_all()
+    assert healthy.calls == 2
+    assert manager.health_check_all()["healthy"]["status"] == "healthy"
+
+
+def test_plugin_health_error_keeps_old_shape(plugin_manager):
+    """插件健康检查抛异常时返回 {"status": "error", "error": ...}"""
+    manager, _ = plugin_manager
+    assert manager.health_check_all()["broken"] == {"status": "error", "error": "boom"}
+    assert manager.health_check_all(wait=False)["broken"] == {"status": "error", "error": "boom"}
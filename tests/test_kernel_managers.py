@@ -4,6 +4,8 @@ Tests for Context Manager and Memory Manager.
 import sys
 import json
 import tempfile
+import threading
+import time
 from pathlib import Path
 
 # Setup path - import directly to avoid package conflicts
@@ -67,7 +69,7 @@ def test_context_snapshot_disk():
     cm.get("agent-1").add_message("user", "hello")
 
     assert cm.snapshot("agent-1")
-    assert (tmp / "agent-1.json").exists()
+    assert (tmp / "agent-1.ctx").exists()
 
     # Load in fresh manager
     cm2 = ContextManager(snapshot_dir=tmp)
@@ -135,6 +137,126 @@ def test_context_list():
     print("  [PASS] context list with filter")
 
 
+def test_context_restore_is_copy_on_write():
+    cm = ContextManager(snapshot_dir=Path(tempfile.mkdtemp()))
+    cm.create("agent-1")
+    cm.save("agent-1", {"plan": {"steps": [{"n": 1}]}, "files": ["a.py"], "line": 1})
+
+    view = cm.restore("agent-1")
+    view["line"] = 2
+    view["plan"]["steps"][0]["n"] = 99
+    view["files"].append("b.py")
+    view.setdefault("new", []).append(1)
+    assert cm.get("agent-1").state == {"plan": {"steps": [{"n": 1}]}, "files": ["a.py"], "line": 1}
+    assert json.loads(json.dumps(view)) == {
+        "plan": {"steps": [{"n": 99}]}, "files": ["a.py", "b.py"], "line": 2, "new": [1],
+    }
+
+    # switching costs the same whether the saved state is tiny or huge
+    def switch_cost(size):
+        cm.create("big")
+        cm.save("big", {"history": [{"i": i} for i in range(size)], "blob": "x" * size})
+        start = time.perf_counter()
+        for _ in range(200):
+            cm.switch("agent-1", "big")
+            cm.switch("big", "agent-1")
+        return time.perf_counter() - start
+
+    small, large = switch_cost(10), switch_cost(50000)
+    assert large < small * 5 + 0.01
+    print("  [PASS] context restore is copy-on-write")
+
+
+def test_context_restore_view_copies_stay_isolated():
+    cm = ContextManager(snapshot_dir=Path(tempfile.mkdtemp()))
+    cm.create("agent-1")
+    saved = {"cfg": {"x": 1}, "items": [1, 2], "pair": ({"k": 1}, [0]), "tail": {"t": []}}
+    cm.save("agent-1", saved)
+
+    dict(cm.restore("agent-1"))["cfg"]["x"] = 99
+    {**cm.restore("agent-1")}["items"].append(3)
+    pair = cm.restore("agent-1")["pair"]
+    pair[0]["k"] = 2
+    pair[1].append(1)
+    merged = {}
+    merged.update(cm.restore("agent-1"))
+    merged["cfg"]["y"] = 1
+    (cm.restore("agent-1") | {})["items"].clear()
+    key, tail = cm.restore("agent-1").popitem()
+    tail["t"].append(1)
+
+    assert key == "tail"
+    assert cm.get("agent-1").state == {
+        "cfg": {"x": 1}, "items": [1, 2], "pair": ({"k": 1}, [0]), "tail": {"t": []},
+    }
+    print("  [PASS] context restore view copies stay isolated")
+
+
+def test_context_delta_snapshots_and_checkpoints():
+    import context_manager as cm_mod
+
+    tmp = Path(tempfile.mkdtemp())
+    cm = ContextManager(snapshot_dir=tmp)
+    ctx = cm.create("agent-1", limits={"max_messages": 60})
+    for i in range(50):
+        ctx.add_message("user", f"message {i} " + "x" * 200)
+    ctx.state.update({"keep": list(range(100)), "drop": 1})
+    assert cm.snapshot("agent-1")
+    path = tmp / "agent-1.ctx"
+    full_size = path.stat().st_size
+
+    assert cm.snapshot("agent-1")  # nothing changed: nothing written
+    assert path.stat().st_size == full_size
+
+    ctx.add_message("assistant", "one more")
+    ctx.state["step"] = 2
+    del ctx.state["drop"]
+    ctx.record_llm_call(tokens=10)
+    assert cm.snapshot("agent-1")
+    assert path.stat().st_size - full_size < full_size / 10
+
+    for i in range(15):  # overflow max_messages across deltas
+        ctx.add_message("user", f"later {i}")
+        cm.snapshot("agent-1")
+    loaded = ContextManager(snapshot_dir=tmp).load_snapshot("agent-1")
+    assert loaded.to_dict() == ctx.to_dict()
+
+    for i in range(cm_mod.CHECKPOINT_EVERY):
+        ctx.state["step"] = i
+        cm.snapshot("agent-1")
+    records = ContextManager._read_records(path)
+    assert records[0][0] == 0 and len(records) <= cm_mod.CHECKPOINT_EVERY + 1
+    # the file was rewritten at the checkpoint: nothing precedes it
+    assert path.stat().st_size == sum(6 + len(payload) for _, _, payload in records)
+    assert ContextManager(snapshot_dir=tmp).load_snapshot("agent-1").to_dict() == ctx.to_dict()
+    print("  [PASS] context delta snapshots and checkpoints")
+
+
+def test_context_lazy_load_and_switch_ring():
+    tmp = Path(tempfile.mkdtemp())
+    cm = ContextManager(snapshot_dir=tmp)
+    for i in range(3):
+        cm.create(f"agent-{i}").state["i"] = i
+    assert cm.snapshot_all() == 3
+    (tmp / "legacy.json").write_text(json.dumps({"agent_id": "legacy", "state": {"old": True}}))
+    with open(tmp / "agent-2.ctx", "ab") as f:
+        f.write(b"\x00\x00\x01\x00\x01")  # torn record from a crash
+
+    fresh = ContextManager(snapshot_dir=tmp)
+    assert fresh.load_all_snapshots() == 4
+    assert fresh.list_contexts() == []  # nothing decoded yet
+    assert fresh.get("agent-2").state == {"i": 2}
+    assert fresh.get("legacy").state == {"old": True}
+    assert fresh.stats()["spilled"] == 2
+
+    for n in range(1500):
+        fresh.switch("agent-0", "agent-1") if n % 2 else fresh.switch("agent-1", "agent-0")
+    assert fresh.switch_count == 1500
+    assert len(fresh.recent_switches(5000)) == 1000
+    assert fresh.recent_switches(1)[0]["to"] == "agent-1"
+    print("  [PASS] context lazy load and bounded switch log")
+
+
 # ======================================================================
 # Memory Manager Tests
 # ======================================================================
@@ -264,6 +386,98 @@ def test_mm_unregister():
     print("  [PASS] memory unregister")
 
 
+def test_mm_lru_follows_touches_and_top():
+    mm = MemoryManager(global_limit_mb=100)
+    for name in ("a", "b", "c", "d"):
+        mm.allocate(name, 1024 * 1024)
+    mm.allocate("a", 1024)       # a becomes most recent
+    mm.release("b", 1024)        # releasing also counts as an access
+    mm.register("idle")          # holds nothing: never an eviction victim
+    mm.allocate("d", 10 * 1024 * 1024)
+
+    assert mm.evict_lru() == ["c"]
+    assert mm.evict_lru(target_free_bytes=mm.free_bytes + 1) == ["a"]
+    assert [b["agent_id"] for b in mm.top(2)] == ["d", "b"]
+    assert [b["agent_id"] for b in mm.top(10)][:2] == ["d", "b"]
+    assert len(mm.top(10)) == 5
+
+    classes = mm.size_classes()
+    assert sum(c["agents"] for c in classes.values()) == 2
+    assert sum(c["bytes"] for c in classes.values()) == mm.total_allocated
+    print("  [PASS] memory LRU order, top and size classes")
+
+
+def test_mm_watermark_eviction_spills_contexts():
+    tmp = Path(tempfile.mkdtemp())
+    cm = ContextManager(snapshot_dir=tmp)
+    mm = MemoryManager(global_limit_mb=10, high_watermark=0.8, low_watermark=0.5)
+    mm.spill_contexts(cm)
+    freed = []
+    mm.on_evict(lambda agent_id, size: freed.append((agent_id, size)))
+
+    for i in range(9):
+        cm.create(f"agent-{i}").state["step"] = i
+        assert mm.allocate(f"agent-{i}", 1024 * 1024)[0]
+
+    # 9MB > 80%: the background evictor frees the oldest agents down to 50%
+    deadline = time.time() + 5
+    while mm.utilization > 50 and time.time() < deadline:
+        time.sleep(0.01)
+    mm.close()
+    assert mm.utilization == 50
+    assert [a for a, _ in freed] == ["agent-0", "agent-1", "agent-2", "agent-3"]
+    assert cm.stats()["spilled"] == 4
+    assert cm.list_contexts()[0]["agent_id"] == "agent-4"
+
+    # a spilled context comes back from disk on first use
+    assert cm.restore("agent-1") == {"step": 1}
+    assert cm.stats()["spilled"] == 3
+    print("  [PASS] memory watermark eviction spills contexts")
+
+
+def test_mm_counters_exact_under_threads():
+    mm = MemoryManager(global_limit_mb=1024)
+
+    def worker(n):
+        for i in range(500):
+            agent = f"agent-{(n * 7 + i) % 40}"
+            mm.allocate(agent, 1024)
+            mm.release(agent, 512)
+            if i % 50 == 0:
+                mm.evict_lru()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    mm._stats_cache = None
+    stats = mm.stats()
+    assert stats["total_allocs"] == 8 * 500
+    assert stats["total_releases"] == 8 * 500
+    assert stats["evictions"] == len(mm._eviction_log)
+    assert mm.total_allocated == sum(b.allocated_bytes for b in mm._blocks.values())
+    print("  [PASS] memory counters exact under concurrent threads")
+
+
+def test_mm_constant_time_with_many_agents():
+    def cost(n):
+        mm = MemoryManager(global_limit_mb=n)
+        for i in range(n):
+            mm.allocate(f"agent-{i}", 512 * 1024)
+        start = time.perf_counter()
+        for i in range(2000):
+            mm.allocate(f"agent-{i % n}", 1)
+            mm.evict_lru()
+            mm.top(5)
+        return time.perf_counter() - start
+
+    small, large = cost(200), cost(20000)
+    assert large < small * 5
+    print("  [PASS] memory operations independent of agent count")
+
+
 # ======================================================================
 # Run all tests
 # ======================================================================
@@ -278,6 +492,10 @@ if __name__ == "__main__":
     test_context_limit_enforcement()
     test_context_destroy()
     test_context_list()
+    test_context_restore_is_copy_on_write()
+    test_context_restore_view_copies_stay_isolated()
+    test_context_delta_snapshots_and_checkpoints()
+    test_context_lazy_load_and_switch_ring()
 
     print("\n=== Memory Manager Tests ===")
     test_mm_register_and_allocate()
@@ -288,7 +506,11 @@ if __name__ == "__main__":
     test_mm_evict_target()
     test_mm_usage_and_stats()
     test_mm_unregister()
+    test_mm_lru_follows_touches_and_top()
+    test_mm_watermark_eviction_spills_contexts()
+    test_mm_counters_exact_under_threads()
+    test_mm_constant_time_with_many_agents()
 
     print(f"\n{'='*50}")
-    print("ALL 16 TESTS PASSED")
+    print("ALL 22 TESTS PASSED")
     print(f"{'='*50}")
@@ -0,0 +1,84 @@
+"""
+Tests for Messenger transports (file-per-message and SQLite WAL queue).
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from collaboration.messenger import Messenger
+from collaboration.transport import FileTransport, SQLiteTransport
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def agents(request, tmp_path):
+    kind = request.param
+    return [Messenger(name, base_dir=tmp_path, transport=kind) for name in ("a", "b", "c")]
+
+
+def test_direct_and_broadcast_delivery(agents):
+    a, b, c = agents
+    a.request("b", {"n": 1})
+    a.broadcast({"hello": "all"})
+    a.request("b", {"n": 2})
+
+    assert b.pending_count() == 3
+    assert c.pending_count() == 1
+    assert a.pending_count() == 0
+
+    assert [m.payload for m in b.peek()] == [{"n": 1}, {"hello": "all"}, {"n": 2}]
+    assert [m.payload for m in b.receive(limit=2)] == [{"n": 1}, {"hello": "all"}]
+    assert b.pending_count() == 1
+    assert [m.payload for m in b.receive()] == [{"n": 2}]
+    assert b.receive() == []
+    assert [m.payload for m in c.receive()] == [{"hello": "all"}]
+    assert a.receive() == []
+
+    # agents that join later do not see earlier broadcasts
+    d = Messenger("d", base_dir=a.base_dir, transport=a.transport)
+    assert d.pending_count() == 0
+
+
+def test_sqlite_expiry_and_gc(tmp_path):
+    transport = SQLiteTransport(tmp_path / "messages.db")
+    a = Messenger("a", transport=transport)
+    b = Messenger("b", transport=transport)
+    c = Messenger("c", transport=transport)
+
+    a.request("b", {"old": True}, ttl=-1)
+    a.broadcast({"old": True}, ttl=-1)
+    a.broadcast({"keep": True})
+    assert b.pending_count() == 3 and c.pending_count() == 2
+
+    assert b.purge_expired() == 2
+    assert b.pending_count() == 1 and c.pending_count() == 1
+    assert [m.payload for m in b.receive()] == [{"keep": True}]
+    assert [m.payload for m in c.receive()] == [{"keep": True}]
+
+    # every agent's cursor has passed the broadcast, so it is collected
+    a.receive()
+    transport.purge_expired("a")
+    (rows,) = transport._conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+    assert rows == 0
+
+
+@pytest.mark.parametrize("cls", [FileTransport, SQLiteTransport])
+def test_blocking_receive_wakes_on_send(tmp_path, cls):
+    transport = cls(tmp_path if cls is FileTransport else tmp_path / "messages.db")
+    a = Messenger("a", transport=transport)
+    b = Messenger("b", transport=transport)
+
+    threading.Timer(0.1, lambda: a.request("b", {"ping": 1})).start()
+    started = time.monotonic()
+    msgs = b.receive(timeout=5)
+    assert [m.payload for m in msgs] == [{"ping": 1}]
+    assert time.monotonic() - started < 1
+
+    started = time.monotonic()
+    assert b.receive(timeout=0.2) == []
+    assert time.monotonic() - started >= 0.2
@@ -0,0 +1,136 @@
+"""
+Tests for the incremental Prometheus exporter.
+"""
+import fnmatch
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from prometheus_client import PROCESS_COLLECTOR, REGISTRY
+
+from core.event import Event
+from observability import metrics_exporter as exporter
+
+
+class FakeBus:
+    def __init__(self):
+        self.handlers = defaultdict(list)
+
+    def subscribe(self, pattern, handler):
+        self.handlers[pattern].append(handler)
+
+    def unsubscribe(self, pattern, handler):
+        self.handlers[pattern].remove(handler)
+
+    def emit(self, event):
+        for pattern, handlers in list(self.handlers.items()):
+            if fnmatch.fnmatch(event.type, pattern):
+                for handler in handlers:
+                    handler(event)
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_bus_events_drive_counters_and_histograms():
+    bus = FakeBus()
+    exporter.attach(bus)
+    exporter.attach(bus)  # 重复 attach 不会重复计数
+    before_total = _value("task_total", agent_id="t-agent")
+    before_ok = _value("task_success_total", agent_id="t-agent")
+    before_fast = _value("task_latency_seconds_bucket", agent_id="t-agent",
+                         task_type="code", le="0.5")
+
+    bus.emit(Event.create("agent.task_completed", "agent_t",
+                          {"agent_id": "t-agent", "duration_ms": 300, "task_type": "code"}))
+    bus.emit(Event.create("agent.error", "agent_t",
+                          {"agent_id": "t-agent", "duration_ms": 4000, "task_type": "code"}))
+
+    assert _value("task_total", agent_id="t-agent") == before_total + 2
+    assert _value("task_success_total", agent_id="t-agent") == before_ok + 1
+    assert _value("task_latency_seconds_bucket", agent_id="t-agent",
+                  task_type="code", le="0.5") == before_fast + 1
+
+    exporter.detach(bus)
+    bus.emit(Event.create("agent.task_completed", "agent_t", {"agent_id": "t-agent"}))
+    assert _value("task_total", agent_id="t-agent") == before_total + 2
+
+
+def test_state_files_reconcile_as_monotonic_deltas(tmp_path):
+    source = exporter.AgentStateSource(tmp_path)
+    state_file = tmp_path / "s-agent_state.json"
+
+    def write(total, success):
+        state_file.write_text(json.dumps({
+            "agent_id": "s-agent",
+            "metrics": {"tasks_total": total, "tasks_success": success}}))
+
+    write(5, 4)
+    assert source.poll() == 1
+    assert source.poll() == 0  # 未变化的文件不重新解析
+    base = _value("task_total", agent_id="s-agent")
+    write(8, 6)
+    source.poll()
+    assert _value("task_total", agent_id="s-agent") == base + 3
+    write(2, 2)  # Agent 计数重置：计数器仍只增
+    source.poll()
+    assert _value("task_total", agent_id="s-agent") == base + 5
+
+
+def test_queue_file_counts_only_new_lines(tmp_path):
+    queue_file = tmp_path / "task_queue.jsonl"
+    queue_file.write_text('{"status":"pending"}\n{"status":"done"}\n')
+    source = exporter.QueueFileSource(queue_file)
+    assert source.poll() == 1
+    with open(queue_file, "a") as f:
+        f.write('{"status":"pending"}\n{"status":"pend')
+    assert source.poll() == 2
+    with open(queue_file, "a") as f:
+        f.write('ing"}\n')
+    assert source.poll() == 3
+    queue_file.write_text('{"status":"done"}\n')
+    assert source.poll() == 0
+
+
+def test_queue_events_drive_depth_wait_and_latency():
+    bus = FakeBus()
+    exporter.attach(bus)
+    try:
+        before_wait = _value("queue_wait_time_seconds_count")
+        before_total = _value("task_total", agent_id="q-agent")
+        before_ok = _value("task_success_total", agent_id="q-agent")
+
+        def emit(kind, **payload):
+            bus.emit(Event.create(f"queue.llm.{kind}", "queue.llm",
+                                  {"agent_id": "q-agent", "request_name": "chat", **payload}))
+
+        emit("enqueued", pending=3)
+        assert _value("queue_size_gauge", queue_name="llm") == 3
+        emit("started", pending=2, wait_ms=250.0)
+        assert _value("queue_size_gauge", queue_name="llm") == 2
+        assert _value("queue_wait_time_seconds_count") == before_wait + 1
+        emit("completed", pending=2, wait_ms=250.0, duration_ms=400.0)
+        emit("failed", pending=2, wait_ms=10.0, duration_ms=20.0)
+        assert _value("queue_wait_time_seconds_count") == before_wait + 1
+        assert _value("task_total", agent_id="q-agent") == before_total + 2
+        assert _value("task_success_total", agent_id="q-agent") == before_ok + 1
+        assert _value("task_latency_seconds_count", agent_id="q-agent", task_type="chat") >= 2
+    finally:
+        exporter.detach(bus)
+
+
+def test_process_metrics_are_installed_explicitly():
+    # importing the exporter leaves the default process collector alone
+    assert PROCESS_COLLECTOR in REGISTRY._collector_to_names
+    assert _value("process_heap_memory_bytes") == 0.0
+
+    exporter.install_process_metrics()
+    exporter.install_process_metrics()  # idempotent
+    exporter.sample_gauges()
+    assert PROCESS_COLLECTOR not in REGISTRY._collector_to_names
+    assert _value("process_heap_memory_bytes") > 0
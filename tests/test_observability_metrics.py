@@ -0,0 +1,63 @@
+"""
+Tests for quantile sketches, log buckets and exemplars in observability.metrics.
+"""
+import math
+import random
+import sys
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from observability import start_trace
+from observability.metrics import DDSketch, Histogram, MetricsRegistry
+
+
+def _exact(values, q):
+    s = sorted(values)
+    return s[math.ceil(q * len(s)) - 1]
+
+
+def test_sketch_quantiles_within_relative_accuracy_and_mergeable():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1.2) for _ in range(5000)]
+    a, b = DDSketch(), DDSketch()
+    for i, v in enumerate(values):
+        (a if i % 2 else b).add(v)
+    merged = a.copy().merge(b)
+    assert merged.count == len(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = _exact(values, q)
+        assert abs(merged.quantile(q) - exact) / exact < 0.03
+    restored = DDSketch.from_dict(merged.to_dict())
+    assert restored.quantile(0.95) == merged.quantile(0.95)
+
+
+def test_registry_reports_percentiles_and_exemplars():
+    reg = MetricsRegistry()
+    for v in range(1, 101):
+        reg.observe("task.ms", v, labels={"agent": "coder"})
+    with start_trace("slow-task") as root:
+        reg.observe("task.ms", 3000, labels={"agent": "coder"})
+
+    hist = reg.snapshot()["histograms"][0]["value"]
+    assert hist["count"] == 101
+    assert 90 <= hist["p95"] <= 100
+    slow_bucket = hist["buckets"][-1]
+    assert slow_bucket["le"] == 4096.0
+    assert slow_bucket["exemplar"]["trace_id"] == root.trace_id
+
+    # labels=None 时合并所有标签组合
+    reg.observe("task.ms", 5000, labels={"agent": "analyst"})
+    assert reg.quantile("task.ms", 1.0) > 4000
+    assert reg.quantile("task.ms", 1.0, labels={"agent": "coder"}) < 4000
+
+
+def test_windows_drop_old_slots_without_raw_samples():
+    h = Histogram()
+    h.observe(10.0, now=1000.0)
+    h.observe(500.0, now=1200.0)
+    # 1m 窗口只剩 t=1200 的样本；1h 窗口两个都在
+    assert h.window("1m", now=1210.0).count == 1
+    assert h.window("1h", now=1210.0).count == 2
+    assert h.window("5m", now=1210.0).quantile(0.0) < 11
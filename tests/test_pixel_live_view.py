@@ -0,0 +1,271 @@
+"""
+测试像素 Agent 实时视图（模型 + 帧广播）
+验证：
+1. 模型按帧合并事件，只推送变化；空出的格子复用
+2. agents 文件原地重写、写到一半时的处理
+3. 每帧只序列化一次，慢客户端溢出后收到快照重新同步
+4. run 循环按帧率推送，读文件不占用事件循环线程
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加路径
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from pixel_agents.live_view import AgentViewModel, LiveBroadcaster, GRID_COLUMNS
+
+
+def _append(path, *records):
+    with open(path, "a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+
+
+def _agent(agent_id, status="active", template="coder"):
+    return {"id": agent_id, "status": status, "template": template, "state": "idle"}
+
+
+def _event(agent_id, event_type, **payload):
+    return {"type": event_type, "source": "test", "timestamp": 1, "payload": {"agent_id": agent_id, **payload}}
+
+
+@pytest.fixture
+def files(tmp_path):
+    return tmp_path / "agents.jsonl", tmp_path / "events.jsonl"
+
+
+@pytest.fixture
+def full_row(files):
+    """一整行再多一个 Agent，首帧已取走"""
+    agents, events = files
+    _append(agents, *(_agent(f"a{i}") for i in range(GRID_COLUMNS + 1)))
+    model = AgentViewModel(agents, events)
+    model.refresh()
+    first = model.take_delta()
+    return model, first
+
+
+@pytest.fixture
+def two_agents(files):
+    """文件里 a1、zzzz 两个 Agent，首帧已取走"""
+    agents, events = files
+    _append(agents, _agent("a1"), _agent("zzzz"))
+    model = AgentViewModel(agents, events)
+    assert [a["id"] for a in model.agents()] == ["a1", "zzzz"]
+    model.take_delta()
+    return model
+
+
+# ── 模型 ──
+
+def test_first_frame_lays_out_grid(full_row):
+    """首帧包含全部 Agent，超出一行的换到下一行"""
+    _, first = full_row
+    assert first["seq"] == 1 and len(first["upsert"]) == GRID_COLUMNS + 1
+    last = [v for v in first["upsert"] if v["id"] == f"a{GRID_COLUMNS}"][0]
+    assert (last["x"], last["y"]) == (0, 1)
+
+
+def test_event_burst_collapses_to_final_state(files, full_row):
+    """一帧内的一串事件只推送最终状态；未知 Agent 的事件忽略"""
+    _, events = files
+    model, _ = full_row
+    for i in range(50):
+        _append(events, _event("a1", "agent.task_started", task=f"job{i}"),
+                _event("a1", "agent.task_completed"))
+    _append(events, _event("a1", "agent.task_started", task="final"), _event("ghost", "agent.error"))
+    model.refresh()
+    delta = model.take_delta()
+    assert [(v["id"], v["state"], v["task"]) for v in delta["upsert"]] == [("a1", "working", "final")]
+    assert model.take_delta() is None
+
+
+def test_rest_reads_do_not_steal_frame_delta(files, full_row):
+    """REST 查询读到最新数据，但变化仍留给下一帧"""
+    agents, _ = files
+    model, _ = full_row
+    _append(agents, _agent("a2", status="archived"), _agent("new"))
+    assert "a2" not in {a["id"] for a in model.agents()}
+    assert model.stats()["by_state"] == {"idle": GRID_COLUMNS + 1}
+    delta = model.take_delta()
+    assert delta["remove"] == ["a2"]
+    assert [v["id"] for v in delta["upsert"]] == ["new"]
+
+
+def test_freed_slot_is_reused(files, full_row):
+    """归档的 Agent 让出格子，新 Agent 占用它"""
+    agents, _ = files
+    model, _ = full_row
+    _append(agents, _agent("a2", status="archived"), _agent("new"))
+    model.refresh()
+    delta = model.take_delta()
+    assert [(v["id"], v["x"], v["y"]) for v in delta["upsert"]] == [("new", 2, 0)]
+
+
+def test_rewritten_agents_file_removes_missing(files, full_row):
+    """agents 文件被整体重写：不在新文件里的 Agent 全部移除"""
+    agents, _ = files
+    model, _ = full_row
+    agents.write_text(json.dumps(_agent("a0")) + "\n", encoding="utf-8")
+    model.refresh()
+    assert len(model.take_delta()["remove"]) == GRID_COLUMNS
+    assert [a["id"] for a in model.snapshot()["agents"]] == ["a0"]
+
+
+def test_agents_file_rewritten_in_place_is_reread(files, two_agents):
+    """同 inode、同大小的原地重写也能发现"""
+    agents, _ = files
+    model = two_agents
+    inode, size = agents.stat().st_ino, agents.stat().st_size
+    with open(agents, "r+", encoding="utf-8") as f:
+        f.write(json.dumps(_agent("a1", status="archived")) + "\n" + json.dumps(_agent("b2")) + "\n")
+    st = agents.stat()
+    os.utime(agents, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))  # mtime 精度粗的文件系统
+    assert (agents.stat().st_ino, agents.stat().st_size) == (inode, size)
+
+    assert [a["id"] for a in model.agents()] == ["b2"]
+    delta = model.take_delta()
+    assert sorted(delta["remove"]) == ["a1", "zzzz"] and [v["id"] for v in delta["upsert"]] == ["b2"]
+
+
+def test_unchanged_file_gives_no_delta(two_agents):
+    """文件没变：不重新读取，没有增量"""
+    two_agents.refresh()
+    assert two_agents.take_delta() is None
+
+
+def test_half_written_line_waits_for_writer(files, two_agents):
+    """最后一行写到一半时先不读，写完再读入"""
+    agents, _ = files
+    line = json.dumps(_agent("c3"))
+    with open(agents, "a", encoding="utf-8") as f:
+        f.write(line[:10])
+    assert [a["id"] for a in two_agents.agents()] == ["a1", "zzzz"]
+    with open(agents, "a", encoding="utf-8") as f:
+        f.write(line[10:] + "\n")
+    assert [a["id"] for a in two_agents.agents()] == ["a1", "zzzz", "c3"]
+
+
+# ── 广播 ──
+
+@pytest.fixture
+def one_agent(files):
+    agents, events = files
+    _append(agents, _agent("a0"))
+    model = AgentViewModel(agents, events)
+    model.refresh()
+    model.take_delta()
+    return model
+
+
+def test_frame_serialized_once_for_all_clients(files, one_agent):
+    """200 个客户端共用同一个序列化好的帧对象"""
+    agents, _ = files
+
+    async def scenario():
+        broadcaster = LiveBroadcaster(one_agent)
+        clients = [broadcaster.subscribe() for _ in range(200)]
+        for c in clients:
+            assert json.loads(await c.get())["type"] == "snapshot"
+        for i in range(3):
+            _append(agents, {**_agent("a0"), "description": f"v{i}"})
+            message = broadcaster.frame()
+            for c in clients:
+                assert await c.get() is message
+        assert broadcaster.stats["frames"] == 3
+        assert broadcaster.frame() is None  # 没有变化：不发帧
+        broadcaster.stop()
+        assert await clients[0].get() is None
+
+    asyncio.run(scenario())
+
+
+def test_slow_client_is_resynced_with_snapshot(files, one_agent):
+    """不读取的慢客户端队列有界，溢出后丢弃积压、改发快照"""
+    agents, _ = files
+
+    async def scenario():
+        broadcaster = LiveBroadcaster(one_agent)
+        slow = broadcaster.subscribe()
+        for i in range(10):
+            _append(agents, {**_agent("a0"), "description": f"v{i}"})
+            broadcaster.frame()
+
+        assert slow.dropped == 8
+        pending = [json.loads(slow.queue.get_nowait()) for _ in range(slow.queue.qsize())]
+        assert [m["type"] for m in pending] == ["snapshot", "delta", "delta"]
+        assert pending[0]["agents"][0]["description"] == "v7"
+        assert [m["seq"] for m in pending] == [9, 10, 11]
+        assert broadcaster.stats["resyncs"] == 2
+        broadcaster.stop()
+
+    asyncio.run(scenario())
+
+
+def test_run_loop_pushes_at_frame_rate(files):
+    """500 个事件在几帧内推送完，最终状态正确"""
+    agents, events = files
+    _append(agents, _agent("a0"), _agent("a1"))
+
+    async def scenario():
+        model = AgentViewModel(agents, events)
+        broadcaster = LiveBroadcaster(model, frame_rate=20)
+        task = asyncio.create_task(broadcaster.run())
+        client = broadcaster.subscribe()
+        assert json.loads(await client.get())["seq"] == 0
+        first = json.loads(await asyncio.wait_for(client.get(), 1))
+        assert {v["id"] for v in first["upsert"]} == {"a0", "a1"}
+
+        for _ in range(5):
+            for i in range(100):
+                _append(events, _event(f"a{i % 2}", "agent.task_started", task=str(i)))
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        frames = []
+        while not client.queue.empty():
+            frames.append(json.loads(client.queue.get_nowait()))
+        assert 1 <= len(frames) <= 4
+        assert [f["seq"] for f in frames] == list(range(2, 2 + len(frames)))
+        final = {v["id"]: v["task"] for f in frames for v in f["upsert"]}
+        assert final == {"a0": "98", "a1": "99"}
+
+        broadcaster.unsubscribe(client)
+        broadcaster.stop()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(scenario())
+
+
+def test_run_loop_reads_files_off_the_event_loop(files):
+    """run 循环在线程池里读文件，不阻塞事件循环线程"""
+    agents, events = files
+    _append(agents, _agent("a0"))
+    model = AgentViewModel(agents, events)
+    threads = []
+    real_refresh = model.refresh
+
+    def refresh():
+        threads.append(threading.get_ident())
+        real_refresh()
+
+    model.refresh = refresh
+
+    async def scenario():
+        broadcaster = LiveBroadcaster(model, frame_rate=50)
+        task = asyncio.create_task(broadcaster.run())
+        client = broadcaster.subscribe()
+        await client.get()
+        first = json.loads(await asyncio.wait_for(client.get(), 1))
+        assert [v["id"] for v in first["upsert"]] == ["a0"]
+        broadcaster.stop()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(scenario())
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,105 @@
+"""
+Tests for the process-pool execution backend.
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.process_pool import (
+    ProcessPoolBackend,
+    TaskTimeoutError,
+    WorkerCrashedError,
+    register_task_type,
+    select_backend,
+)
+
+
+@pytest.fixture
+def backend():
+    pool = ProcessPoolBackend(size=2, preload=()).start()
+    yield pool
+    pool.shutdown()
+
+
+def test_results_and_exceptions(backend):
+    assert backend.submit(pow, 2, 10).result(timeout=30) == 1024
+    with pytest.raises(ZeroDivisionError):
+        backend.submit(divmod, 1, 0).result(timeout=30)
+
+
+def test_large_payload_goes_through_shared_memory(backend):
+    blob = b"x" * (2 << 20)
+    assert backend.submit(len, blob).result(timeout=30) == len(blob)
+    assert sum(w["shm_transfers"] for w in backend.stats()["workers"]) == 1
+
+
+def test_crash_is_isolated(backend):
+    with pytest.raises(WorkerCrashedError):
+        backend.submit(os._exit, 3).result(timeout=30)
+    # 池仍然可用
+    assert backend.submit(abs, -5).result(timeout=30) == 5
+    assert sum(w["crashes"] for w in backend.stats()["workers"]) == 1
+
+
+def test_timeout_replaces_worker(backend):
+    with pytest.raises(TaskTimeoutError):
+        backend.submit(time.sleep, 5, timeout=0.2).result(timeout=30)
+    assert backend.submit(abs, -1).result(timeout=30) == 1
+
+
+def test_timeout_error_matches_both_timeout_classes():
+    # 3.11 之前 concurrent.futures.TimeoutError 不是内置 TimeoutError
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+
+    assert issubclass(TaskTimeoutError, FutureTimeoutError)
+    assert issubclass(TaskTimeoutError, TimeoutError)
+
+
+def test_memory_limit_recycles_worker():
+    with ProcessPoolBackend(size=1, preload=(), memory_limit_mb=1) as pool:
+        pid = pool.submit(os.getpid).result(timeout=30)
+        assert pool.submit(os.getpid).result(timeout=30) != pid
+        assert pool.stats()["workers"][0]["recycles"] >= 1
+
+
+def test_task_type_routing():
+    assert select_backend("pattern_recognition") == "process"
+    assert select_backend(None) == "thread"
+    register_task_type("unit_test_type", "process")
+    assert select_backend("unit_test_type") == "process"
+    with pytest.raises(ValueError):
+        register_task_type("unit_test_type", "gpu")
+
+
+class _UnloadableResult:
+    def __reduce__(self):
+        return (_refuse_unpickle, ())
+
+
+def _refuse_unpickle():
+    raise RuntimeError("result cannot be rebuilt here")
+
+
+def _make_unloadable_result():
+    return _UnloadableResult()
+
+
+def test_unpicklable_result_fails_only_its_future(backend):
+    with pytest.raises(RuntimeError, match="cannot be rebuilt"):
+        backend.submit(_make_unloadable_result).result(timeout=30)
+    assert backend.submit(abs, -2).result(timeout=30) == 2
+    assert sum(w["tasks_failed"] for w in backend.stats()["workers"]) == 1
+
+
+def test_scheduler_shares_the_task_type_registry():
+    from core import process_pool, scheduler
+
+    assert scheduler.select_backend is process_pool.select_backend
+    register_task_type("unit_test_shared", "process")
+    assert scheduler.select_backend("unit_test_shared") == "process"
@@ -0,0 +1,103 @@
+"""
+Tests for streaming replay over an events.jsonl time slice.
+"""
+import json
+import random
+import sys
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+import core.engine as engine
+from core.engine import iter_events
+from scripts.replay import compare, load_slice, replay, replay_variants
+
+T0 = 1_700_000_000
+
+
+def _write_events(path, n=20000):
+    rng = random.Random(3)
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(n):
+            ev = {
+                "epoch": T0 + i * 10 + rng.randint(0, 5),
+                "layer": "TOOL",
+                "event": "tool_exec",
+                "status": "err" if i % 7 == 0 else "ok",
+                "latency_ms": 4000 if i % 10 == 0 else 300,
+                "payload": {"name": "web_fetch" if i % 2 else "shell"},
+            }
+            f.write(json.dumps(ev) + "\n")
+            if i % 1000 == 0:
+                f.write("not json\n")
+
+
+def test_iter_events_seeks_to_slice(tmp_path):
+    path = tmp_path / "events.jsonl"
+    _write_events(path)
+    start, end = T0 + 100_000, T0 + 130_000
+
+    expected = []
+    for line in path.read_text().splitlines():
+        try:
+            ev = json.loads(line)
+        except ValueError:
+            continue
+        if start <= ev["epoch"] <= end:
+            expected.append(ev)
+
+    assert list(iter_events(start, end, path=path)) == expected
+    assert load_slice(start, end, path=path) == expected
+    assert list(iter_events(T0 + 10**7, None, path=path)) == []
+
+
+def test_replay_uses_given_slice_without_touching_engine(tmp_path):
+    path = tmp_path / "events.jsonl"
+    _write_events(path, n=500)
+    original = engine._events_path
+    events = load_slice(T0, T0 + 10**6, path=path)
+
+    r = replay(T0, T0 + 10**6, events=events)
+    assert engine._events_path is original
+    assert r["events_count"] == len(events)
+    assert r["report"]["counts"]["tools"] == len(events)
+    assert 0.8 < r["report"]["reliability"]["tool_success_rate"] < 0.9
+
+
+def test_variants_report_suggestion_and_latency_diffs(tmp_path):
+    path = tmp_path / "events.jsonl"
+    _write_events(path, n=2000)
+    events = load_slice(T0, T0 + 10**6, path=path)
+
+    out = replay_variants(
+        T0, T0 + 10**6,
+        {"base": {}, "strict": {"slow_p95_ms": 3000}},
+        events=events,
+    )
+    diff = out["diffs"]["strict"]
+    assert diff["tool_suggestions"]["added"] == ["shell:optimize_or_cache"]
+    assert diff["correction_rate"]["delta"] == 0
+    assert "elapsed_ms" in diff
+    assert compare(out["variants"]["base"], out["variants"]["base"])["tool_p95_ms"] == {}
+
+
+def test_variants_share_one_scan_and_match_separate_replays(tmp_path, monkeypatch):
+    path = tmp_path / "events.jsonl"
+    _write_events(path, n=500)
+    events = load_slice(T0, T0 + 10**6, path=path)
+    variants = {"base": {}, "strict": {"slow_p95_ms": 3000, "repeat_fail_min": 1}}
+
+    from learning import analytics
+    fed = []
+    real_feed = analytics.AnalyticsEngine.feed
+    monkeypatch.setattr(analytics.AnalyticsEngine, "feed",
+                        lambda self, ev: fed.append(1) or real_feed(self, ev))
+    out = replay_variants(T0, T0 + 10**6, variants, events=events)
+    assert len(fed) == 1
+
+    for name, params in variants.items():
+        alone = replay(T0, T0 + 10**6, params=params, events=events)["report"]
+        shared = out["variants"][name]["report"]
+        for key in ("reliability", "tool_suggestions", "threshold_warnings", "alias_suggestions"):
+            assert shared[key] == alone[key]
@@ -0,0 +1,132 @@
+"""
+Tests for Score Engine rolling window and multi-resolution series.
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.score_series import MultiResolutionSeries, RollingWindow, load_series, trend
+
+
+def test_rolling_window_evicts_and_keeps_sums():
+    w = RollingWindow(size=3)
+    w.push({"outcome": "success", "latency_ms": 100})
+    w.push({"outcome": "failure"})
+    w.push({"outcome": "neutral", "resource_alert": True})
+    assert (w.successes, w.failures, w.alerts, len(w)) == (1, 1, 1, 3)
+
+    # 挤掉第一条 success
+    w.push({"outcome": "success", "latency_ms": 300})
+    assert w.successes == 1
+    assert w.latency_count == 1
+    assert w.latency_sum == 300
+    assert len(w) == 3
+    assert [r["outcome"] for r in w.records()] == ["failure", "neutral", "success"]
+
+
+def test_series_downsamples_into_buckets():
+    series = MultiResolutionSeries()
+    base = 1_700_000_000_000 - 1_700_000_000_000 % 3_600_000
+    for i in range(3):
+        series.add({"timestamp": base + i * 1000, "score": 0.9, "success_rate": 1.0})
+    series.add({"timestamp": base + 61_000, "score": 0.5, "success_rate": 0.5})
+
+    raw = series.query("raw")
+    assert len(raw) == 4
+
+    minutes = series.query("1m")
+    assert len(minutes) == 2
+    assert minutes[0]["samples"] == 3
+    assert abs(minutes[0]["score"] - 0.9) < 1e-9
+    assert series.query("1m", include_open=False) == minutes[:1]
+
+    hours = series.query("1h")
+    assert len(hours) == 1
+    assert abs(hours[0]["score"] - (0.9 * 3 + 0.5) / 4) < 1e-9
+
+
+def test_series_is_bounded():
+    series = MultiResolutionSeries({"raw": (0, 5), "1m": (60_000, 2)})
+    for i in range(50):
+        series.add({"timestamp": i * 60_000, "score": 1.0})
+    assert len(series.query("raw")) == 5
+    assert len(series.query("1m")) == 3  # 2 个闭合桶 + 当前桶
+
+
+def test_series_save_and_load():
+    path = Path(tempfile.mkdtemp()) / "score_series.json"
+    series = MultiResolutionSeries()
+    series.add({"timestamp": 120_000, "score": 0.8, "success_rate": 0.75})
+    series.save(path)
+
+    assert load_series("raw", path=path)[0]["score"] == 0.8
+    assert trend("success_rate", "1m", path=path) == [75]
+    assert load_series("1m", path=path.with_name("missing.json")) == []
+
+
+def test_series_load_round_trip_continues_open_bucket():
+    path = Path(tempfile.mkdtemp()) / "score_series.json"
+    series = MultiResolutionSeries({"raw": (0, 3), "1m": (60_000, 10)})
+    for i in range(5):
+        series.add({"timestamp": i * 60_000 + 1000, "score": 0.5})
+    series.add({"timestamp": 4 * 60_000 + 2000, "score": 1.0})
+    series.save(path)
+
+    restored = MultiResolutionSeries.load(path, {"raw": (0, 3), "1m": (60_000, 10)})
+    assert restored.to_dict() == series.to_dict()
+
+    # 重启后同一个分钟桶继续累积，而不是多出一个重复的点
+    for s in (series, restored):
+        s.add({"timestamp": 4 * 60_000 + 3000, "score": 1.0})
+        s.add({"timestamp": 5 * 60_000, "score": 0.0})
+    assert restored.to_dict() == series.to_dict()
+    assert len(restored.query("1m")) == 6
+    assert abs(restored.query("1m")[4]["score"] - (0.5 + 1.0 + 1.0) / 3) < 1e-9
+
+    assert MultiResolutionSeries.load(path.with_name("missing.json")).query("1m") == []
+
+
+class _FakeBus:
+    """只记录订阅和发出的事件，不做持久化"""
+
+    def __init__(self):
+        self.handlers, self.emitted = [], []
+
+    def subscribe(self, event_type, handler):
+        self.handlers.append(handler)
+
+    def unsubscribe(self, event_type, handler):
+        self.handlers.remove(handler)
+
+    def emit(self, event):
+        self.emitted.append(event)
+        for handler in list(self.handlers):
+            handler(event)
+
+
+def test_score_engine_saves_only_when_asked_and_on_stop(tmp_path):
+    import pytest
+
+    pytest.importorskip("aiosqlite")  # core.event_bus 依赖
+    from core.event import create_event
+    from core.score_engine import ToyScoreEngine
+
+    assert ToyScoreEngine(bus=_FakeBus()).series_path is None  # 默认不落盘
+
+    bus = _FakeBus()
+    path = tmp_path / "score_series.json"
+    engine = ToyScoreEngine(bus=bus, series_path=path)
+    engine.start()
+    for _ in range(5):
+        engine._handle_event(create_event("task.completed", "test", duration_ms=100))
+    assert len(load_series("raw", path=path)) == 1
+
+    for _ in range(10):
+        engine._handle_event(create_event("task.failed", "test"))
+    assert len(load_series("raw", path=path)) == 1  # SAVE_INTERVAL 内不重复写盘
+    engine.stop()
+    assert len(load_series("raw", path=path)) == 3
+    assert bus.handlers == []
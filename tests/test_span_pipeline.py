@@ -0,0 +1,116 @@
+"""
+Tests for the tracer span export pipeline.
+"""
+import sys
+import time
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+import pytest
+
+from observability.span_pipeline import (
+    BatchSpanProcessor, JsonlSpanExporter, SpanRing, TailSampler,
+    build_tree, critical_path, load_trace,
+)
+from observability import tracer
+from observability.tracer import add_span_processor, remove_span_processor, span, start_trace
+
+
+@pytest.fixture
+def processor(tmp_path):
+    proc = BatchSpanProcessor(exporter=JsonlSpanExporter(tmp_path),
+                              sampler=TailSampler(head_rate=0.0, slow_ms=50))
+    add_span_processor(proc)
+    yield proc
+    remove_span_processor(proc)
+    proc.shutdown()
+
+
+def test_ring_reports_overwritten_items():
+    ring = SpanRing(capacity=4)
+    for i in range(6):
+        ring.push(i)
+    assert ring.drain() == [2, 3, 4, 5]
+    assert ring.dropped == 2
+    ring.push(6)
+    assert ring.drain() == [6]
+
+
+def test_tail_sampling_keeps_error_and_slow_traces_only(processor, tmp_path):
+    with start_trace("fast"):
+        with span("child"):
+            pass
+    with pytest.raises(ValueError):
+        with start_trace("broken") as broken:
+            with span("child"):
+                raise ValueError("boom")
+    with start_trace("slow") as slow:
+        time.sleep(0.06)
+
+    processor.flush()
+    assert processor.sampler.stats["kept"] == 2
+    assert processor.sampler.stats["dropped"] == 1
+    files = list(tmp_path.glob("spans-*.jsonl"))
+    assert len(files) == 1
+
+    spans = load_trace(broken.trace_id, directory=tmp_path)
+    assert {s["name"] for s in spans} == {"broken", "child"}
+    assert all(s["status"] == "error" for s in spans)
+    assert load_trace(slow.trace_id, directory=tmp_path)[0]["name"] == "slow"
+
+
+def test_head_sampling_hashes_the_whole_trace_id():
+    sampler = TailSampler(head_rate=0.1)
+    # trace 序号间隔固定（每条 trace 的子 span 数相同）时也要均匀抽样
+    ids = [tracer._format_id("trace", k * 10000) for k in range(1, 2001)]
+    kept = sum(sampler.head_sampled(t) for t in ids)
+    assert 100 < kept < 300
+    other = TailSampler(head_rate=0.1)
+    assert [sampler.head_sampled(t) for t in ids] == [other.head_sampled(t) for t in ids]
+
+
+def test_child_span_hooks_and_lazy_fields():
+    ended = []
+
+    class EndOnly:
+        on_start = None
+
+        def on_end(self, sp):
+            ended.append(sp)
+
+    proc = EndOnly()
+    add_span_processor(proc)
+    try:
+        assert tracer._on_start == () and len(tracer._on_end) == 1
+        with start_trace("root") as root:
+            with span("child") as child:
+                pass
+    finally:
+        remove_span_processor(proc)
+    assert tracer._on_end == ()
+    assert ended == [child, root]
+    assert child.parent_span_id == root.span_id and root.parent_span_id is None
+    assert child.span_id.startswith("span:") and child.span_id is child.span_id
+    assert child.to_dict()["attributes"] == {}
+    child.set_error("bad")
+    assert child.status == "error" and child.attributes == {"error": "bad"}
+
+
+def _s(name, span_id, parent, start, end):
+    return {"trace_id": "t", "span_id": span_id, "parent_span_id": parent,
+            "name": name, "start_ns": start, "end_ns": end, "status": "ok"}
+
+
+def test_tree_and_critical_path():
+    spans = [
+        _s("root", "r", None, 0, 100),
+        _s("fetch", "a", "r", 0, 40),
+        _s("cache", "b", "r", 5, 20),      # 与 fetch 并行，不在关键路径上
+        _s("compute", "c", "r", 40, 95),
+        _s("inner", "d", "c", 50, 90),
+    ]
+    tree = build_tree(spans)
+    assert [n["span"]["name"] for n in tree[0]["children"]] == ["fetch", "cache", "compute"]
+    assert [s["name"] for s in critical_path(spans)] == ["root", "fetch", "compute", "inner"]
@@ -0,0 +1,172 @@
+"""
+Tests for the snapshot + delta log store behind the collaboration coordinators.
+"""
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from collaboration.consensus import Consensus, _request_active
+from collaboration.delegator import Delegator
+from collaboration.orchestrator import Orchestrator, _plan_active
+from collaboration.registry import AgentProfile, AgentRegistry
+from collaboration.state_store import StateStore
+from collaboration.transport import FileTransport
+
+
+def _store(tmp_path, name="objs", **kw):
+    kw.setdefault("is_active", lambda d: d["status"] == "open")
+    return StateStore(tmp_path, name, background=False, **kw)
+
+
+def test_log_replay_compaction_and_archive(tmp_path):
+    store = _store(tmp_path, snapshot_every=1000)
+    store.put("a", {"status": "open", "items": [], "created_at": time.time()})
+    store.put("b", {"status": "open", "items": [], "created_at": time.time() - 30 * 86400})
+    store.put("c", {"status": "open", "items": [], "created_at": time.time()})
+    store.update("a", set={"n": 1}, append={"items": {"x": 1}})
+    store.update("b", set={"status": "closed"})
+    store.update("c", set={"status": "closed"})
+    store.close()
+
+    reloaded = _store(tmp_path)
+    assert reloaded.get("a") == {
+        "status": "open", "items": [{"x": 1}], "created_at": reloaded.get("a")["created_at"], "n": 1,
+    }
+
+    # finished objects leave memory; the one past retention is pruned from the archive
+    assert reloaded.compact() == {"archived": 2, "active": 1, "pruned": 1}
+    assert reloaded.log_path.read_text() == ""
+    assert dict(reloaded.items()).keys() == {"a"}
+    assert reloaded.get("c")["status"] == "closed"  # read lazily from the archive
+    assert reloaded.get("b") is None
+
+    fresh = _store(tmp_path)
+    assert list(dict(fresh.items())) == ["a"]
+
+
+def test_orchestrator_and_delegator_persist_deltas(tmp_path):
+    plans = StateStore(tmp_path, "plans", is_active=_plan_active, background=False)
+    orch = Orchestrator(store=plans)
+    orch.create_plan("p1", "task", [
+        {"id": "t1", "description": "code", "role": "coder"},
+        {"id": "t2", "description": "review", "role": "reviewer", "depends_on": ["t1"]},
+    ])
+    orch.mark_spawned("p1", "t1", "collab_t1")
+    orch.mark_done("p1", "t1", "ok")
+    plans.close()
+
+    plans2 = StateStore(tmp_path, "plans", is_active=_plan_active, background=False)
+    orch2 = Orchestrator(store=plans2)
+    assert [st["id"] for st in orch2.get_ready_tasks(orch2.get_plan("p1"))] == ["t2"]
+    orch2.mark_done("p1", "t2", "lgtm")
+    assert orch2.get_plan("p1").status == "done"
+    plans2.compact()
+    assert "p1" not in dict(plans2.items())
+    assert Orchestrator(store=plans2).get_status("p1")["progress"] == "2/2"
+
+    registry = AgentRegistry(tmp_path / "agents.json")
+    registry.register(AgentProfile(agent_id="coder", name="coder", capabilities=["code"]))
+    dlg_store = StateStore(
+        tmp_path, "delegations", is_active=lambda d: d["status"] == "active", background=False
+    )
+    transport = FileTransport(tmp_path / "inboxes")
+    delegator = Delegator(registry, transport=transport, store=dlg_store)
+    dlg = delegator.create_delegation("job", [{"description": "write", "caps": ["code"]}])
+    assert [t.assigned_to for t in delegator.assign_ready_tasks(dlg.delegation_id)] == ["coder"]
+    delegator.update_task(f"{dlg.delegation_id}_0", "done", result={"ok": True})
+    dlg_store.close()
+
+    reloaded = Delegator(
+        registry,
+        transport=transport,
+        store=StateStore(tmp_path, "delegations", is_active=lambda d: d["status"] == "active"),
+    )
+    status = reloaded.get_status(dlg.delegation_id)
+    assert status["status"] == "completed"
+    assert status["subtasks"][0]["assigned_to"] == "coder"
+
+
+def test_consensus_log_grows_linearly(tmp_path):
+    store = StateStore(tmp_path, "votes", is_active=_request_active, background=False)
+    consensus = Consensus(store=store)
+    voters = [f"agent{i}" for i in range(40)]
+    req = consensus.create_request("q?", ["yes", "no"], required_voters=voters, min_voters=40)
+
+    sizes = []
+    for voter in voters:
+        consensus.cast_vote(req, voter, "yes")
+        sizes.append(len(store.log_path.read_text().splitlines()[-1]))
+    # every record carries one vote, not the whole request
+    assert max(sizes) - min(sizes) < 50
+    assert req.status == "decided"
+
+    store.close()
+    loaded = Consensus(store=StateStore(tmp_path, "votes", is_active=_request_active)).get_request(
+        req.request_id
+    )
+    assert loaded.decision == "yes" and len(loaded.votes) == 40
+    assert json.loads(json.dumps(loaded.votes)) == req.votes
+
+
+def test_torn_tail_and_bad_records_do_not_abort_startup(tmp_path):
+    store = _store(tmp_path)
+    store.put("a", {"status": "open", "items": []})
+    store.close()
+    with open(store.log_path, "a", encoding="utf-8") as f:
+        # a record that cannot be applied, then a half-written line from a crash
+        f.write(json.dumps({"op": "update", "id": "a", "seq": 2, "append": [[["missing"], 1]]}) + "\n")
+        f.write('{"op": "put", "id": "b", "se')
+
+    reloaded = _store(tmp_path)
+    assert reloaded.get("a") == {"status": "open", "items": []}
+    assert reloaded.log_path.read_text().endswith("\n")
+    reloaded.put("b", {"status": "open"})
+    reloaded.close()
+    assert _store(tmp_path).get("b") == {"status": "open"}
+
+
+def test_compaction_io_runs_outside_the_store_lock(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    store.put("a", {"status": "open"})
+    store.put("b", {"status": "closed"})
+
+    written = []
+    real_write_archive = store._write_archive
+
+    def slow_archive(entries):
+        # another thread can still write while the archive is being appended
+        t = threading.Thread(target=store.put, args=("c", {"status": "open"}))
+        t.start()
+        t.join(timeout=5)
+        written.append(not t.is_alive())
+        assert store.get("b") == {"status": "closed"}  # still readable mid-compaction
+        return real_write_archive(entries)
+
+    monkeypatch.setattr(store, "_write_archive", slow_archive)
+    assert store.compact()["archived"] == 1
+    assert written == [True]
+    assert not store.old_log_path.exists()
+    store.close()
+
+    reloaded = _store(tmp_path)
+    assert dict(reloaded.items()).keys() == {"a", "c"}
+    assert reloaded.get("b") == {"status": "closed"}
+
+
+def test_interrupted_compaction_is_finished_on_load(tmp_path):
+    store = _store(tmp_path)
+    store.put("a", {"status": "open"})
+    store.close()
+    store.log_path.rename(store.old_log_path)  # crash after rotating the log
+    with open(store.log_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "put", "id": "b", "obj": {"status": "open"}, "seq": 2}) + "\n")
+
+    reloaded = _store(tmp_path)
+    assert dict(reloaded.items()).keys() == {"a", "b"}
+    assert not reloaded.old_log_path.exists()
+    assert json.loads(reloaded.snapshot_path.read_text())["seq"] == 2
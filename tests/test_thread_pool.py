@@ -0,0 +1,112 @@
+"""
+Tests for the work-stealing ThreadPool.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+from pathlib import Path
+
+import pytest
+
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core.queues.thread_pool import ThreadPool
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(size):
+        pool = ThreadPool("test", size=size)
+        pool.start()
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.stop()
+
+
+def test_futures_resolve_and_idle_worker_steals(make_pool):
+    pool = make_pool(2)
+    assert pool.submit(lambda: 6 * 7).result(timeout=5) == 42
+    with pytest.raises(ZeroDivisionError):
+        pool.submit(lambda: 1 / 0).result(timeout=5)
+
+    # tasks submitted from inside a worker land on its own deque; while it stays
+    # busy, the idle sibling steals them oldest first
+    order = []
+    release = threading.Event()
+    steals_before = pool.stats()["total_steals"]
+
+    def child(i):
+        order.append((i, threading.current_thread().name))
+
+    def parent():
+        children = [pool.submit(lambda i=i: child(i)) for i in range(5)]
+        release.wait(5)
+        return children
+
+    children = pool.submit(parent)
+    deadline = time.monotonic() + 5
+    while len(order) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for f in children.result(timeout=5):
+        f.result(timeout=5)
+
+    assert [i for i, _ in order] == [0, 1, 2, 3, 4]
+    assert len({n for _, n in order}) == 1  # all run by the thief
+    stats = pool.stats()
+    assert stats["total_steals"] - steals_before >= 5
+    assert stats["pending_tasks"] == 0
+
+
+def test_resize_grows_and_moves_queued_tasks(make_pool):
+    pool = make_pool(1)
+    pool.resize(3)
+    running = threading.Barrier(3, timeout=5)
+    # three tasks can only pass the barrier together if three workers run them
+    futures = [pool.submit(running.wait) for _ in range(3)]
+    assert sorted(f.result(timeout=5) for f in futures) == [0, 1, 2]
+
+    gate = threading.Event()
+    blockers = [pool.submit(lambda: gate.wait(5)) for _ in range(3)]
+    queued = [pool.submit(lambda i=i: i) for i in range(9)]
+    shrink = threading.Thread(target=pool.resize, args=(1,))
+    shrink.start()
+    gate.set()
+    shrink.join(5)
+    assert not shrink.is_alive()
+    assert all(f.result(timeout=5) for f in blockers)
+    assert [f.result(timeout=5) for f in queued] == list(range(9))
+    assert pool.size == 1 and len(pool.stats()["workers"]) == 1
+    assert pool.stats()["pending_tasks"] == 0
+
+
+def test_stop_cancels_queued_futures():
+    pool = ThreadPool("test", size=1)
+    pool.start()
+    started, gate = threading.Event(), threading.Event()
+    running = pool.submit(lambda: started.set() or gate.wait(5))
+    queued = [pool.submit(lambda: "never") for _ in range(5)]
+    assert started.wait(5)
+
+    stopper = threading.Thread(target=pool.stop)
+    stopper.start()
+    deadline = time.monotonic() + 5
+    while not pool._workers[0].stopping and time.monotonic() < deadline:
+        time.sleep(0.005)
+    gate.set()
+    stopper.join(5)
+
+    assert running.result(timeout=5) is True
+    for f in queued:
+        assert f.cancelled()
+        with pytest.raises(CancelledError):
+            f.result(timeout=0)
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
@@ -0,0 +1,218 @@
+"""
+测试任务追踪器（索引 + 追加日志）
+验证：
+1. 索引查询与线性过滤结果一致，重新加载后不变
+2. 旧格式文件、其他进程追加的记录都能读入
+3. 点更新只追加一行，日志过长时压缩
+4. 后台压缩不丢其他进程的追加
+5. 截止时间通知由定时器触发，无需轮询
+"""
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# 添加路径
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from core import tracker
+from core.tracker import Task, TaskStore
+
+
+def _iso(delta: timedelta) -> str:
+    return (datetime.now() + delta).isoformat(timespec="seconds")
+
+
+def _lines(path: Path) -> int:
+    return len(path.read_text(encoding="utf-8").splitlines())
+
+
+@pytest.fixture
+def populated(tmp_path):
+    """40 个任务，优先级、标签、截止时间各不相同，部分改了状态、删了一个"""
+    store = TaskStore(tmp_path / "tasks.jsonl")
+    ids = []
+    for i in range(40):
+        t = Task(f"t{i}", priority=f"P{i % 4}", tags=["odd"] if i % 2 else [],
+                 deadline=_iso(timedelta(hours=i - 20)))
+        store.add(t)
+        ids.append(t.id)
+    for i, task_id in enumerate(ids[::3]):
+        store.update(task_id, status=[tracker.STATUS_BLOCKED, tracker.STATUS_DONE][i % 2])
+    store.delete(ids[1])
+    yield store, ids
+    store.close()
+
+
+def test_legacy_file_is_loaded(tmp_path):
+    """旧格式（每行一个完整任务）的文件可以直接读入"""
+    path = tmp_path / "tasks.jsonl"
+    legacy = [Task(f"old{i}", priority=f"P{i % 4}") for i in range(5)]
+    path.write_text("".join(json.dumps(t.to_dict()) + "\n" for t in legacy), encoding="utf-8")
+
+    store = TaskStore(path)
+    assert [t.id for t in store.load_all()] == [t.id for t in legacy]
+    assert store.get(legacy[2].id).priority == "P2"
+
+
+def test_delete_and_returned_copies(populated):
+    """删除后查不到；修改返回的副本不影响存储"""
+    store, ids = populated
+    assert store.get(ids[1]) is None
+    assert not store.delete(ids[1])
+    store.get(ids[2]).title = "mutating a returned copy does nothing"
+    assert store.get(ids[2]).title == "t2"
+    assert [t.id for t in store.load_all()] == [i for i in ids if i != ids[1]]
+
+
+def test_status_and_priority_index(populated):
+    """按状态 + 优先级查询与线性过滤一致"""
+    store, _ = populated
+    everything = store.load_all()
+    assert [t.id for t in store.query(status="BLOCKED", priority="P1")] == \
+        [t.id for t in everything if t.status == "BLOCKED" and t.priority == "P1"]
+
+
+def test_tag_index(populated):
+    """按标签查询与线性过滤一致"""
+    store, _ = populated
+    assert [t.id for t in store.query(tags=["odd"])] == \
+        [t.id for t in store.load_all() if "odd" in t.tags]
+
+
+def test_deadline_index(populated):
+    """overdue / due_between 与逐个判断一致"""
+    store, _ = populated
+    everything = store.load_all()
+    assert sorted(t.id for t in store.overdue()) == sorted(t.id for t in everything if t.is_overdue())
+    now = time.time()
+    assert sorted(t.id for t in store.due_between(now, now + 5 * 3600)) == \
+        sorted(t.id for t in everything if t.is_due_soon(5))
+
+
+def test_appends_from_other_process_are_picked_up(populated):
+    """其他进程追加的任务在下次调用时读入"""
+    store, _ = populated
+    with store.file_path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(Task("from cli").to_dict()) + "\n")
+    assert store.query()[-1].title == "from cli"
+
+
+def test_reload_matches(populated):
+    """重新打开后内容与内存中一致"""
+    store, _ = populated
+    reopened = TaskStore(store.file_path)
+    assert [t.to_dict() for t in reopened.load_all()] == [t.to_dict() for t in store.load_all()]
+
+
+def test_point_update_appends_one_line(tmp_path):
+    """点更新只追加一行，不重写整个文件"""
+    path = tmp_path / "tasks.jsonl"
+    store = TaskStore(path, background=False)
+    task = Task("hot")
+    store.add(task)
+    for i in range(100):
+        store.add(Task(f"cold{i}"))
+
+    lines = _lines(path)
+    for pct in range(50):
+        store.update(task.id, progress_pct=pct)
+        store.get(task.id)
+    assert _lines(path) == lines + 50
+    assert TaskStore(path).get(task.id).progress_pct == 49
+
+
+def test_log_is_compacted(tmp_path, monkeypatch):
+    """更新记录超过任务数后压缩，重新加载结果不变"""
+    path = tmp_path / "tasks.jsonl"
+    monkeypatch.setattr(TaskStore, "COMPACT_MIN", 50)
+    store = TaskStore(path, background=False)
+    task = Task("hot")
+    store.add(task)
+    for i in range(2000):
+        store.add(Task(f"cold{i}"))
+
+    for i in range(2200):
+        store.update(task.id, progress_pct=i % 100)
+    assert _lines(path) <= 2 * 2001 + 1
+    assert TaskStore(path).get(task.id).progress_pct == 2199 % 100
+
+
+def test_background_compaction_keeps_appends_from_other_processes(tmp_path, monkeypatch):
+    """后台压缩在锁外序列化期间，CLI 进程追加的任务不丢"""
+    path = tmp_path / "tasks.jsonl"
+    monkeypatch.setattr(TaskStore, "COMPACT_MIN", 50)
+    store = TaskStore(path)
+    tasks = [Task(f"t{i}") for i in range(60)]
+    for t in tasks:
+        store.add(t)
+
+    cli_task = Task("from cli")
+    real_to_dict = Task.to_dict
+
+    def to_dict(self):
+        if threading.current_thread().name == "tracker-compact" and not cli_task.notes:
+            cli_task.notes = "added"
+            TaskStore(path).add(cli_task)
+        return real_to_dict(self)
+
+    monkeypatch.setattr(Task, "to_dict", to_dict)
+    for i in range(120):
+        store.update(tasks[0].id, progress_pct=i % 100)
+    store.close()
+    monkeypatch.setattr(Task, "to_dict", real_to_dict)
+
+    assert cli_task.notes == "added"  # 压缩确实运行过
+    assert _lines(path) < 60 + 120
+    reloaded = TaskStore(path)
+    assert reloaded.get(cli_task.id).title == "from cli"
+    assert reloaded.get(tasks[0].id).progress_pct == store.get(tasks[0].id).progress_pct
+    assert len(reloaded) == 61
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """订阅 24 小时窗口的截止时间通知；"later" 过期时结束"""
+    store = TaskStore(tmp_path / "tasks.jsonl")
+    fired = []
+    done = threading.Event()
+
+    def on_deadline(event, task):
+        fired.append((event, task.title))
+        if (event, task.title) == ("overdue", "later"):
+            done.set()
+
+    later = Task("later", deadline=_iso(timedelta(days=3)))
+    store.add(later)
+    store.add(Task("stale", deadline=_iso(timedelta(hours=-1))))  # 已过期：不发事件
+    store.watch_deadlines(on_deadline, hours=24)
+
+    soon = Task("soon", deadline=(datetime.now() + timedelta(seconds=0.3)).isoformat())
+    finished = Task("finished", deadline=(datetime.now() + timedelta(seconds=0.2)).isoformat())
+    store.add(soon)
+    store.add(finished)
+    store.update(finished.id, status=tracker.STATUS_DONE)
+    store.update(later.id, deadline=(datetime.now() + timedelta(seconds=0.4)).isoformat())
+
+    assert done.wait(3)
+    time.sleep(0.1)
+    yield fired
+    store.close()
+
+
+def test_due_soon_fires_once_on_entering_window(watched):
+    """进入窗口立即发 due_soon，每个任务只发一次"""
+    due_soon = [title for event, title in watched if event == "due_soon"]
+    assert sorted(set(due_soon) - {"finished"}) == ["later", "soon"]
+    assert len(due_soon) == len(set(due_soon))
+    assert ("due_soon", "stale") not in watched
+
+
+def test_overdue_fires_in_order_and_skips_done(watched):
+    """过期事件按截止时间先后触发；已完成的任务不再发过期事件"""
+    assert [f for f in watched if f[0] == "overdue"] == [("overdue", "soon"), ("overdue", "later")]
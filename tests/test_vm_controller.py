@@ -0,0 +1,291 @@
+"""
+测试 VM 控制器（FakeBackend，无需 Docker）
+验证：
+1. 命令复用常驻执行代理；代理退出 / 不回应时重建，起不来时有限次重试后回退一次性 exec
+2. 预热池从不交出用过的容器：销毁后按同规格补建，受 max_idle 限制
+3. 重启后接管空闲容器，cleanup_all / drain 清理干净
+4. 状态来自事件流，无事件流时批量查询
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加路径
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from vm_controller import FakeBackend, VMController
+from vm_controller import vm_controller as vm_module
+from vm_controller.warm_pool import WarmPool
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = FakeBackend(tmp_path / "containers")
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def running(tmp_path, backend):
+    """一个已启动的 VM"""
+    ctl = VMController(tmp_path / "vm_data", backend=backend)
+    vm_id = ctl.create_vm("coder")
+    ctl.start_vm(vm_id)
+    yield ctl, vm_id
+    ctl.close()
+
+
+@pytest.fixture
+def pooled(tmp_path, backend):
+    """min_idle=1、max_idle=2 的预热池，已补足"""
+    ctl = VMController(tmp_path / "vm_data", backend=backend, pool_min_idle=1, pool_max_idle=2)
+    ctl.pool.refill(block=True)
+    yield ctl
+    ctl.close()
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+# ── 执行代理 ──
+
+def test_commands_reuse_one_exec_agent(running, backend):
+    """多条命令走同一个常驻代理，不再每条 fork 一次 exec"""
+    ctl, vm_id = running
+    for i in range(20):
+        result = ctl.execute_in_vm(vm_id, f"echo line{i} && echo err >&2 && exit {i % 3}")
+        assert result["stdout"] == f"line{i}\n"
+        assert result["stderr"] == "err\n"
+        assert result["exit_code"] == i % 3
+    assert ctl.execute_in_vm(vm_id, "pwd")["stdout"].strip().endswith("workspace")
+    assert backend.calls["spawn_agent"] == 1
+    assert backend.calls["exec"] == 0
+
+
+def test_dead_agent_is_respawned(running, backend):
+    """代理进程退出后，下一条命令重建通道"""
+    ctl, vm_id = running
+    ctl.execute_in_vm(vm_id, "true")
+    backend.containers[vm_id]["agents"][0].kill()
+    assert _wait_for(lambda: ctl.execute_in_vm(vm_id, "echo back")["stdout"] == "back\n")
+    assert backend.calls["spawn_agent"] == 2
+
+
+def test_without_persistent_exec_uses_one_shot_exec(tmp_path, backend):
+    """关闭常驻代理时每条命令走一次性 exec"""
+    ctl = VMController(tmp_path / "vm_plain", backend=backend, persistent_exec=False)
+    vm_id = ctl.create_vm("tester")
+    ctl.start_vm(vm_id)
+    assert ctl.execute_in_vm(vm_id, "echo once")["stdout"] == "once\n"
+    assert backend.calls["exec"] == 1 and backend.calls["spawn_agent"] == 0
+    ctl.close()
+
+
+def test_unanswered_agent_times_out_and_channel_is_rebuilt(running, backend, monkeypatch):
+    """代理不回应：超时返回错误、丢弃通道，下一条命令重建"""
+    monkeypatch.setattr(vm_module, "EXEC_TIMEOUT", 1)
+    monkeypatch.setattr(vm_module, "CHANNEL_GRACE", 0.5)
+    ctl, vm_id = running
+    assert ctl.execute_in_vm(vm_id, "echo up")["stdout"] == "up\n"
+
+    os.kill(backend.containers[vm_id]["agents"][0].pid, signal.SIGSTOP)
+    result = ctl.execute_in_vm(vm_id, "echo lost")
+    assert result["exit_code"] == -1
+    assert "did not answer" in result["stderr"]
+    assert vm_id not in ctl._channels
+
+    assert ctl.execute_in_vm(vm_id, "echo again")["stdout"] == "again\n"
+    assert backend.calls["spawn_agent"] == 2 and backend.calls["exec"] == 0
+
+
+def _flaky_spawn(backend, monkeypatch, failures):
+    """让接下来 failures[0] 次代理启动失败"""
+    spawn = backend.spawn_agent
+
+    def flaky(cid):
+        if failures[0]:
+            failures[0] -= 1
+            backend.calls["spawn_agent"] += 1
+            raise OSError("agent crashed")
+        return spawn(cid)
+
+    monkeypatch.setattr(backend, "spawn_agent", flaky)
+
+
+def test_agent_start_failure_is_retried(running, backend, monkeypatch):
+    """代理启动失败一次：本条命令走一次性 exec，下一条重试成功并清零计数"""
+    ctl, vm_id = running
+    _flaky_spawn(backend, monkeypatch, [1])
+    assert ctl.execute_in_vm(vm_id, "echo once")["stdout"] == "once\n"
+    assert ctl.execute_in_vm(vm_id, "echo agent")["stdout"] == "agent\n"
+    assert backend.calls["spawn_agent"] == 2 and backend.calls["exec"] == 1
+    assert vm_id not in ctl._agent_failures
+
+
+def test_agent_given_up_after_retries(running, backend, monkeypatch):
+    """连续 AGENT_RETRIES 次起不来后不再尝试，一直走一次性 exec"""
+    ctl, vm_id = running
+    _flaky_spawn(backend, monkeypatch, [vm_module.AGENT_RETRIES + 5])
+    for _ in range(vm_module.AGENT_RETRIES + 3):
+        assert ctl.execute_in_vm(vm_id, "echo plain")["stdout"] == "plain\n"
+    assert backend.calls["spawn_agent"] == vm_module.AGENT_RETRIES
+
+
+# ── 预热池 ──
+
+def test_create_vm_takes_idle_container(pooled, backend):
+    """create_vm 命中空闲容器：已在运行，start_vm 不再启动"""
+    assert backend.calls["create"] == 1 and pooled.pool_stats()["idle"] == 1
+    assert pooled.list_vms() == []
+
+    vm_id = pooled.create_vm("coder")
+    pooled.start_vm(vm_id)
+    assert pooled.get_vm_status(vm_id)["status"] == "running"
+    pooled.pool.refill(block=True)  # 补回 min_idle
+    assert backend.calls["create"] == 2
+    assert backend.calls["start"] == 2  # 每台只在预热时启动一次
+
+
+def test_used_container_is_destroyed_and_replaced(pooled, backend):
+    """用过的容器强制删除（连同代理），后台按同规格新建一台补上"""
+    vm_id = pooled.create_vm("coder")
+    pooled.execute_in_vm(vm_id, "mkdir -p out && echo data > out/file && echo x > ../outside")
+    pooled.pool.refill(block=True)
+    agent = backend.containers[vm_id]["agents"][0]
+
+    pooled.delete_vm(vm_id)
+    assert backend.calls["remove"] == 1 and backend.calls["stop"] == 0
+    assert vm_id not in backend.containers and agent.poll() is not None
+    pooled.pool.refill(block=True)
+    assert backend.calls["create"] == 3
+    assert pooled.list_vms() == [] and pooled.pool_stats()["idle"] == 2
+
+    reused = pooled.create_vm("tester")
+    assert reused != vm_id
+    assert pooled.execute_in_vm(reused, "ls -A . ..")["stdout"].split() == [".:", "..:", "workspace"]
+
+
+def test_pool_full_discards_instead_of_replacing(pooled, backend):
+    """池中已有 max_idle 台空闲时，删除的容器不再补建"""
+    first = pooled.create_vm("a")
+    second = pooled.create_vm("b")
+    pooled.delete_vm(first)
+    pooled.pool.refill(block=True)
+    assert pooled.pool_stats()["idle"] == 2
+    created = backend.calls["create"]
+
+    pooled.delete_vm(second)
+    pooled.pool.refill(block=True)
+    assert backend.calls["create"] == created
+    assert pooled.pool_stats()["idle"] == 2 and pooled.pool_stats()["discarded"] == 1
+
+
+def test_idle_containers_adopted_after_restart(tmp_path, pooled, backend):
+    """新控制器接管上一个留下的空闲容器，cleanup_all 全部清理"""
+    pooled.pool.replace(pooled.pool.spec)
+    pooled.pool.refill(block=True)
+    assert pooled.pool_stats()["idle"] == 2
+    pooled.close()
+
+    again = VMController(tmp_path / "vm_data", backend=backend, pool_min_idle=1, pool_max_idle=2)
+    assert again.pool_stats()["idle"] == 2
+    assert backend.calls["create"] == 2
+    again.cleanup_all()
+    assert backend.containers == {} and again.vms == {}
+
+
+def _pool(min_idle=0, max_idle=2, gate=None):
+    made = []
+
+    def provision(spec):
+        if gate is not None:
+            gate.wait(5)
+        made.append(spec["image"])
+        return f"vm{len(made)}"
+
+    spec = {"image": "img", "memory": "512m", "cpu": "1.0", "workdir": "/workspace"}
+    return WarmPool(spec, provision, min_idle=min_idle, max_idle=max_idle), spec, made
+
+
+def test_pool_replace_provisions_same_spec():
+    """replace 在后台按同规格新建一台补进池"""
+    pool, spec, made = _pool()
+    other = dict(spec, image="other")
+    assert pool.replace(other)
+    pool.refill(block=True)
+    assert made == ["other"]
+    assert pool.idle_count(other) == 1 and pool.idle_count() == 0
+    assert pool.acquire(other) == "vm1" and pool.stats["hits"] == 1
+
+
+def test_pool_replace_respects_max_idle():
+    """桶内空闲数加上排队中、正在新建的已达 max_idle 时不再补"""
+    gate = threading.Event()
+    pool, spec, made = _pool(max_idle=2, gate=gate)
+    assert pool.replace(spec) and pool.replace(spec)
+    assert not pool.replace(spec)
+    gate.set()
+    pool.refill(block=True)
+    assert pool.idle_count() == 2 and not pool.replace(spec)
+    assert pool.stats["replaced"] == 2 and pool.stats["discarded"] == 2
+    assert not pool.offer("adopted", spec)
+
+
+def test_pool_drain_waits_for_filler_and_closes():
+    """drain 等后台补足结束、返回全部空闲容器，之后不再接收"""
+    gate = threading.Event()
+    pool, spec, made = _pool(min_idle=2, max_idle=3, gate=gate)
+    pool.refill()
+    threading.Timer(0.1, gate.set).start()
+    assert pool.drain() == ["vm1"]  # 关闭后补足线程在下一台前退出
+    assert pool.idle_ids() == [] and pool.acquire(spec) is None
+    assert not pool.replace(spec) and not pool.offer("late", spec)
+
+
+# ── 状态 ──
+
+def test_status_comes_from_event_stream(running, backend):
+    """状态由事件流推送：查询不调 docker ps，也不重写 vms.json"""
+    ctl, vm_id = running
+    assert _wait_for(backend._events.empty)
+    time.sleep(0.05)  # 等事件线程处理完 start 事件
+    before = ctl.vms_file.stat().st_mtime_ns
+    for _ in range(50):
+        assert ctl.get_vm_status(vm_id)["docker_status"] == "running"
+    assert backend.calls["states"] == 0
+    assert ctl.vms_file.stat().st_mtime_ns == before
+
+
+def test_container_exit_is_seen_through_events(running, backend):
+    """容器在控制器之外退出：状态随事件更新，执行命令报错"""
+    ctl, vm_id = running
+    backend.kill(vm_id)
+    assert _wait_for(lambda: ctl.get_vm_status(vm_id)["status"] == "exited")
+    with pytest.raises(RuntimeError, match="not running"):
+        ctl.execute_in_vm(vm_id, "true")
+
+
+def test_without_events_status_is_batched(tmp_path):
+    """无事件流时，STATUS_TTL 内的所有查询共用一次批量查询"""
+    ctl = VMController(tmp_path / "vm_polled", backend=FakeBackend(tmp_path / "c2"),
+                       watch_events=False)
+    ids = [ctl.create_vm(f"a{i}") for i in range(5)]
+    for vm_id in ids:
+        ctl.start_vm(vm_id)
+    ctl.backend.calls["states"] = 0
+    assert {ctl.get_vm_status(vm_id)["docker_status"] for vm_id in ids} == {"running"}
+    assert ctl.backend.calls["states"] <= 1
+    ctl.cleanup_all()
+    ctl.close()
@@ -0,0 +1,15 @@
+"""
+AIOS VM Controller - 统一入口
+"""
+from .vm_controller import VMController, DEFAULT_SPEC
+from .container_backend import ContainerBackend, DockerBackend, FakeBackend
+from .warm_pool import WarmPool
+
+__all__ = [
+    "VMController",
+    "DEFAULT_SPEC",
+    "ContainerBackend",
+    "DockerBackend",
+    "FakeBackend",
+    "WarmPool",
+]
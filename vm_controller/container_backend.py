@@ -0,0 +1,288 @@
+"""
+Container Backend - 容器操作的后端抽象
+
+VMController 只通过这里的接口操作容器：
+- DockerBackend  调用 docker CLI；状态用一次 `docker ps` 批量取，变化走单条
+                 `docker events` 长连接流，不再每次查询都 `docker inspect`
+- FakeBackend    用本地目录 + 子进程模拟容器，不需要 Docker 即可测试
+
+失败统一抛 subprocess.CalledProcessError（与直接调用 docker CLI 时一致），
+由 VMController 转成 RuntimeError。
+"""
+
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from .exec_agent import AGENT_SOURCE
+
+# Docker 可执行文件路径
+DOCKER_EXE = os.environ.get('DOCKER_EXE', 'docker')
+if os.name == 'nt' and DOCKER_EXE == 'docker':
+    # Windows 默认路径
+    default_path = r"C:\Program Files\Docker\Docker\resources\bin\docker.exe"
+    if os.path.exists(default_path):
+        DOCKER_EXE = default_path
+
+NAME_PREFIX = "aios-vm-"
+
+# docker events 的 Action -> 容器状态（其余事件如 exec_start / attach 忽略）
+EVENT_STATES = {
+    'create': 'created',
+    'start': 'running',
+    'restart': 'running',
+    'unpause': 'running',
+    'pause': 'paused',
+    'die': 'exited',
+    'stop': 'exited',
+    'destroy': 'removed',
+}
+
+
+class ContainerBackend:
+    """后端接口"""
+
+    def create(self, name: str, image: str, memory: str, cpu: str, workdir: str) -> str:
+        raise NotImplementedError
+
+    def start(self, cid: str):
+        raise NotImplementedError
+
+    def stop(self, cid: str):
+        raise NotImplementedError
+
+    def remove(self, cid: str, force: bool = False):
+        """删除容器；force=True 时运行中的容器直接杀掉再删（docker rm -f）"""
+        raise NotImplementedError
+
+    def exec(self, cid: str, command: str, timeout: float) -> Tuple[str, str, int]:
+        """一次性执行（常驻代理不可用时的回退路径）；超时抛 TimeoutExpired"""
+        raise NotImplementedError
+
+    def spawn_agent(self, cid: str) -> subprocess.Popen:
+        """在容器里启动常驻执行代理，返回 stdin/stdout 为管道的进程"""
+        raise NotImplementedError
+
+    def states(self) -> Dict[str, str]:
+        """所有 AIOS 容器的当前状态 {cid: status}，一次调用取完"""
+        raise NotImplementedError
+
+    def events(self) -> Iterator[Tuple[str, str]]:
+        """阻塞产出 (cid, status) 状态变化；流断开时结束"""
+        raise NotImplementedError
+
+    def logs(self, cid: str, tail: int) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class DockerBackend(ContainerBackend):
+    """docker CLI 实现"""
+
+    def __init__(self, docker_exe: str = DOCKER_EXE):
+        self.docker = docker_exe
+        self._events_proc: Optional[subprocess.Popen] = None
+
+    def _run(self, *args, timeout: Optional[float] = None) -> str:
+        result = subprocess.run(
+            [self.docker, *args], capture_output=True, text=True, check=True, timeout=timeout
+        )
+        return result.stdout
+
+    def create(self, name, image, memory, cpu, workdir):
+        return self._run(
+            'create',
+            '--name', name,
+            '--memory', memory,
+            '--cpus', str(cpu),
+            '--workdir', workdir,
+            image,
+            'sleep', 'infinity'  # 保持容器运行
+        ).strip()
+
+    def start(self, cid):
+        self._run('start', cid)
+
+    def stop(self, cid):
+        self._run('stop', cid)
+
+    def remove(self, cid, force=False):
+        self._run('rm', *(['-f'] if force else []), cid)
+
+    def exec(self, cid, command, timeout):
+        result = subprocess.run(
+            [self.docker, 'exec', cid, 'sh', '-c', command],
+            capture_output=True, text=True, timeout=timeout
+        )
+        return result.stdout, result.stderr, result.returncode
+
+    def spawn_agent(self, cid):
+        return subprocess.Popen(
+            [self.docker, 'exec', '-i', cid, 'python3', '-u', '-c', AGENT_SOURCE],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def states(self):
+        out = self._run(
+            'ps', '-a', '--no-trunc',
+            '--filter', f'name={NAME_PREFIX}',
+            '--format', '{{.ID}} {{.State}}'
+        )
+        result = {}
+        for line in out.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                result[parts[0]] = parts[1]
+        return result
+
+    def events(self):
+        self._events_proc = proc = subprocess.Popen(
+            [self.docker, 'events',
+             '--filter', 'type=container',
+             '--filter', f'name={NAME_PREFIX}',
+             '--format', '{{json .}}'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        for line in proc.stdout:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            action = (event.get('Action') or event.get('status') or '').split(':')[0]
+            state = EVENT_STATES.get(action)
+            cid = event.get('id') or (event.get('Actor') or {}).get('ID')
+            if state and cid:
+                yield cid, state
+
+    def logs(self, cid, tail):
+        return self._run('logs', '--tail', str(tail), cid)
+
+    def close(self):
+        if self._events_proc is not None and self._events_proc.poll() is None:
+            self._events_proc.terminate()
+
+
+class FakeBackend(ContainerBackend):
+    """
+    本地模拟：每个"容器"是 root 下的一个目录，命令在该目录里用 sh 执行，
+    常驻代理就是本机 Python 进程。calls 记录各操作次数，供测试断言。
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.containers: Dict[str, dict] = {}
+        self.calls: Counter = Counter()
+        self._events: "queue.Queue" = queue.Queue()
+
+    def _get(self, cid, op):
+        info = self.containers.get(cid)
+        if info is None:
+            raise subprocess.CalledProcessError(1, op, stderr=f"No such container: {cid}")
+        return info
+
+    def _set(self, cid, status):
+        self.containers[cid]['status'] = status
+        self._events.put((cid, status))
+
+    def create(self, name, image, memory, cpu, workdir):
+        self.calls['create'] += 1
+        cid = uuid.uuid4().hex + uuid.uuid4().hex
+        path = self.root / cid / 'workspace'
+        path.mkdir(parents=True)
+        self.containers[cid] = {'name': name, 'image': image, 'dir': path,
+                                'status': 'created', 'agents': []}
+        self._events.put((cid, 'created'))
+        return cid
+
+    def start(self, cid):
+        self.calls['start'] += 1
+        self._get(cid, 'start')
+        self._set(cid, 'running')
+
+    def stop(self, cid):
+        self.calls['stop'] += 1
+        self.kill(cid)
+
+    def kill(self, cid):
+        """模拟容器退出（包括外部原因）：容器内进程全部结束"""
+        info = self._get(cid, 'stop')
+        for proc in info['agents']:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+        info['agents'] = []
+        self._set(cid, 'exited')
+
+    def remove(self, cid, force=False):
+        self.calls['remove'] += 1
+        info = self._get(cid, 'rm')
+        if info['status'] == 'running' and force:
+            self.kill(cid)
+        elif info['status'] == 'running':
+            raise subprocess.CalledProcessError(1, 'rm', stderr="container is running")
+        shutil.rmtree(info['dir'].parent, ignore_errors=True)
+        del self.containers[cid]
+        self._events.put((cid, 'removed'))
+
+    def _running(self, cid, op):
+        info = self._get(cid, op)
+        if info['status'] != 'running':
+            raise subprocess.CalledProcessError(1, op, stderr=f"container {cid} is not running")
+        return info
+
+    def exec(self, cid, command, timeout):
+        self.calls['exec'] += 1
+        info = self._running(cid, 'exec')
+        result = subprocess.run(['sh', '-c', command], cwd=info['dir'],
+                                capture_output=True, text=True, timeout=timeout)
+        return result.stdout, result.stderr, result.returncode
+
+    def spawn_agent(self, cid):
+        self.calls['spawn_agent'] += 1
+        info = self._running(cid, 'exec')
+        proc = subprocess.Popen(
+            [sys.executable, '-u', '-c', AGENT_SOURCE],
+            cwd=info['dir'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        info['agents'].append(proc)
+        return proc
+
+    def states(self):
+        self.calls['states'] += 1
+        return {cid: info['status'] for cid, info in self.containers.items()}
+
+    def events(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            yield item
+
+    def logs(self, cid, tail):
+        self._get(cid, 'logs')
+        return ''
+
+    def close(self):
+        for info in self.containers.values():
+            for proc in info['agents']:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+        self._events.put(None)
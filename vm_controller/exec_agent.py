@@ -0,0 +1,214 @@
+"""
+Exec Agent - 容器内常驻执行代理 + 宿主侧通道
+
+每次 `docker exec` 都要走一遍 API 请求、建 exec 实例、起 shell，几百毫秒的开销
+落在每条命令上。这里改为每个容器只 exec 一次，起一个常驻代理，之后的命令都通过
+它的 stdin/stdout 传过去。
+
+协议（双向相同）：4 字节大端长度 + UTF-8 JSON
+    {"id": 1, "op": "exec", "cmd": "ls", "timeout": 60}
+        -> {"id": 1, "stdout": "...", "stderr": "", "exit_code": 0, "duration_ms": 3}
+    {"id": 2, "op": "ping"}
+        -> {"id": 2, "pid": 42}
+
+代理部分只用标准库、兼容较老的 Python 3，整个文件作为 `python3 -u -c` 的源码
+送进容器执行（见 AGENT_SOURCE）。代理不负责重置容器：用过的容器由 VMController
+整个销毁，预热池补的都是按镜像新建的容器。
+"""
+
+import json
+import os
+import queue
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+def write_frame(stream, obj):
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    stream.write(HEADER.pack(len(body)) + body)
+    stream.flush()
+
+
+def read_frame(stream):
+    """读一帧；流结束返回 None"""
+    header = _read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError("frame too large: %d" % size)
+    body = _read_exact(stream, size)
+    if body is None:
+        return None
+    return json.loads(body.decode("utf-8"))
+
+
+def _read_exact(stream, size):
+    chunks = []
+    while size:
+        chunk = stream.read(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+# ── 容器内代理 ──
+
+class _Agent:
+    def handle(self, req):
+        op = req.get("op")
+        if op == "exec":
+            return self.execute(req.get("cmd", ""), req.get("timeout") or 60)
+        if op == "ping":
+            return {"pid": os.getpid()}
+        return {"error": "unknown op: %s" % op}
+
+    def execute(self, cmd, timeout):
+        start = time.time()
+        kwargs = {}
+        if hasattr(os, "setsid"):
+            kwargs["start_new_session"] = True
+        proc = subprocess.Popen(
+            ["sh", "-c", cmd],
+            stdin=subprocess.DEVNULL,  # stdin 是协议通道，不能让命令读走
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **kwargs
+        )
+        try:
+            out, err = proc.communicate(timeout=timeout)
+            code = proc.returncode
+        except subprocess.TimeoutExpired:
+            self._kill_group(proc.pid)
+            proc.kill()
+            proc.communicate()
+            out, err, code = b"", ("Command timeout (%ds)" % timeout).encode(), -1
+        return {
+            "stdout": out.decode("utf-8", "replace"),
+            "stderr": err.decode("utf-8", "replace"),
+            "exit_code": code,
+            "duration_ms": int((time.time() - start) * 1000),
+        }
+
+    @staticmethod
+    def _kill_group(pgid):
+        if not hasattr(os, "killpg"):
+            return False
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+            return True
+        except OSError:
+            return False
+
+
+def serve(stdin=None, stdout=None):
+    """代理主循环：读请求帧、串行执行、写回响应帧，stdin 关闭即退出"""
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    agent = _Agent()
+    while True:
+        req = read_frame(stdin)
+        if req is None:
+            return
+        try:
+            resp = agent.handle(req)
+        except Exception as e:
+            resp = {"error": "%s: %s" % (type(e).__name__, e)}
+        resp["id"] = req.get("id")
+        write_frame(stdout, resp)
+
+
+# 送进容器的源码（本文件自身，以 __main__ 运行即进入 serve）
+try:
+    AGENT_SOURCE = Path(__file__).read_text(encoding="utf-8")
+except NameError:  # 在容器内以 -c 运行时没有 __file__
+    AGENT_SOURCE = ""
+
+
+# ── 宿主侧通道 ──
+
+class ChannelError(RuntimeError):
+    """代理不可用（启动失败、进程退出或响应超时）"""
+
+
+class ExecChannel:
+    """到单个容器内代理的长连接；请求串行，线程安全"""
+
+    def __init__(self, proc: subprocess.Popen, handshake_timeout: float = 15.0):
+        self._proc = proc
+        self._lock = threading.Lock()
+        self._responses: "queue.Queue" = queue.Queue()
+        self._next_id = 0
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        try:
+            self.call({"op": "ping"}, timeout=handshake_timeout)
+        except ChannelError:
+            self.close()
+            raise
+
+    def _read_loop(self):
+        try:
+            while True:
+                frame = read_frame(self._proc.stdout)
+                self._responses.put(frame)
+                if frame is None:
+                    return
+        except (OSError, ValueError):
+            self._responses.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def call(self, request: dict, timeout: float) -> dict:
+        with self._lock:
+            self._next_id += 1
+            req_id = self._next_id
+            try:
+                write_frame(self._proc.stdin, dict(request, id=req_id))
+            except (OSError, ValueError) as e:
+                raise ChannelError(f"agent stdin closed: {e}")
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ChannelError(f"agent did not answer within {timeout:.0f}s")
+                try:
+                    resp = self._responses.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if resp is None:
+                    self._responses.put(None)  # 让后续调用也立刻失败
+                    raise ChannelError("agent exited")
+                if resp.get("id") == req_id:
+                    if "error" in resp:
+                        raise ChannelError(resp["error"])
+                    return resp
+                # 上一次超时请求的迟到响应，丢弃
+
+    def close(self):
+        try:
+            if self._proc.stdin:
+                self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+
+
+if __name__ == "__main__":
+    serve()
@@ -2,50 +2,228 @@
 VM Controller - 虚拟机控制器
 
 Phase 1: 使用 Docker 模拟 VM
+
+- 容器操作走 ContainerBackend（DockerBackend / 无需 Docker 的 FakeBackend）
+- 可选预热池：create_vm 优先取空闲容器；delete_vm 销毁用过的容器，
+  池按同规格在后台新建一台补上，从不把用过的容器交给下一个 Agent
+- 每个容器一个常驻执行代理（exec_agent），命令经 stdin/stdout 帧协议下发，
+  不再每条命令 fork 一次 `docker exec`；代理不可用时回退到一次性 exec
+- 状态由单条 events 流推送维护，查询不再逐个 `docker inspect`；
+  事件流不可用时按 STATUS_TTL 批量 `docker ps` 一次
+- vms.json 只在生命周期变化时原子写入
 """
 
 import json
+import sys
 import time
+import threading
 import subprocess
 from pathlib import Path
 from typing import Dict, List, Optional
 from datetime import datetime
 import os
 
-# Docker 可执行文件路径
-DOCKER_EXE = os.environ.get('DOCKER_EXE', 'docker')
-if os.name == 'nt' and DOCKER_EXE == 'docker':
-    # Windows 默认路径
-    default_path = r"C:\Program Files\Docker\Docker\resources\bin\docker.exe"
-    if os.path.exists(default_path):
-        DOCKER_EXE = default_path
+AIOS_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AIOS_ROOT))
+
+from vm_controller.container_backend import (
+    DOCKER_EXE, NAME_PREFIX, ContainerBackend, DockerBackend, FakeBackend,
+)
+from vm_controller.exec_agent import ChannelError, ExecChannel
+from vm_controller.warm_pool import WarmPool
+
+EXEC_TIMEOUT = 60  # 单条命令超时（秒）
+CHANNEL_GRACE = 10  # 代理自身超时之外，再等它回应的余量（秒）
+AGENT_RETRIES = 3  # 常驻代理连续起不来几次后放弃，改走一次性 exec
+STATUS_TTL = 1.0  # 无事件流时批量状态的缓存时间（秒）
+
+DEFAULT_SPEC = {
+    'image': 'python:3.12-slim',
+    'memory': '512m',
+    'cpu': '1.0',
+    'workdir': '/workspace',
+}
 
 
 class VMController:
     """VM 控制器（Docker 实现）"""
-    
-    def __init__(self, data_dir: str = "vm_data"):
+
+    def __init__(
+        self,
+        data_dir: str = "vm_data",
+        backend: Optional[ContainerBackend] = None,
+        pool_min_idle: int = 0,
+        pool_max_idle: int = 0,
+        pool_spec: Optional[Dict] = None,
+        persistent_exec: bool = True,
+        watch_events: bool = True,
+    ):
+        """
+        Args:
+            data_dir: vms.json 所在目录
+            backend: 容器后端（默认 DockerBackend）
+            pool_min_idle / pool_max_idle: 预热池大小，都为 0 表示不启用
+            pool_spec: 预热池默认规格（缺省字段取 DEFAULT_SPEC）
+            persistent_exec: 是否使用容器内常驻执行代理
+            watch_events: 是否订阅事件流维护状态
+        """
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         self.vms_file = self.data_dir / "vms.json"
+        self.backend = backend or DockerBackend()
+        self.persistent_exec = persistent_exec
+        self._lock = threading.RLock()
+        self._channels: Dict[str, ExecChannel] = {}
+        self._agent_failures: Dict[str, int] = {}  # 代理连续启动失败次数，达到 AGENT_RETRIES 走一次性 exec
+        self._states: Dict[str, str] = {}
+        self._states_at = 0.0
+        self._events_live = False
+        self._watcher: Optional[threading.Thread] = None
         self.vms = self._load_vms()
-    
+
+        self.pool: Optional[WarmPool] = None
+        if pool_min_idle or pool_max_idle:
+            self.pool = WarmPool(
+                {**DEFAULT_SPEC, **(pool_spec or {})},
+                self._provision,
+                min_idle=pool_min_idle,
+                max_idle=pool_max_idle,
+            )
+            self._adopt_idle()
+
+        if watch_events:
+            self._watcher = threading.Thread(target=self._watch_events, name="vm-events", daemon=True)
+            self._events_live = True
+            self._watcher.start()
+
+        if self.pool:
+            self.pool.refill()
+
     def _load_vms(self) -> Dict:
         """加载 VM 列表"""
         if self.vms_file.exists():
             with open(self.vms_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return {}
-    
+
     def _save_vms(self):
-        """保存 VM 列表"""
-        with open(self.vms_file, 'w', encoding='utf-8') as f:
-            json.dump(self.vms, f, indent=2, ensure_ascii=False)
-    
+        """保存 VM 列表（写临时文件再替换，避免半截文件）"""
+        with self._lock:
+            tmp = self.vms_file.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.vms, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.vms_file)
+
+    def _require(self, vm_id: str) -> Dict:
+        info = self.vms.get(vm_id)
+        if info is None or info.get('pool') == 'idle':
+            raise ValueError(f"VM not found: {vm_id}")
+        return info
+
+    # ── 状态 ──
+
+    def _watch_events(self):
+        """消费后端事件流，更新内存中的状态；只有状态真正变化才写盘"""
+        try:
+            for vm_id, state in self.backend.events():
+                if state == 'created':
+                    continue  # 创建只由本控制器发起，记录里已有
+                with self._lock:
+                    info = self.vms.get(vm_id)
+                    self._states[vm_id] = state
+                    if state != 'running':
+                        self._drop_channel(vm_id)
+                    if info is None or info.get('status') == state:
+                        continue
+                    if state == 'removed':
+                        # 被外部删掉：保留记录，状态与旧实现的 not_found 一致
+                        info['status'] = 'not_found'
+                    else:
+                        info['status'] = state
+                    if info.get('pool') == 'idle' and state != 'running':
+                        self.pool.discard(vm_id)
+                        del self.vms[vm_id]
+                    self._save_vms()
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"[VMController] event stream failed: {e}")
+        finally:
+            self._events_live = False
+
+    def _container_state(self, vm_id: str) -> str:
+        """事件流在线时用推送的状态；否则一次批量查询所有容器，缓存 STATUS_TTL 秒"""
+        with self._lock:
+            if self._events_live and vm_id in self._states:
+                return self._states[vm_id]
+            if time.time() - self._states_at > STATUS_TTL:
+                try:
+                    self._states = self.backend.states()
+                except (OSError, subprocess.SubprocessError):
+                    self._states = {}
+                self._states_at = time.time()
+            return self._states.get(vm_id, 'not_found')
+
+    # ── 生命周期 ──
+
+    def _cold_create(self, agent_id: str, spec: Dict) -> str:
+        # 容器名称
+        container_name = f"{NAME_PREFIX}{agent_id}-{int(time.time() * 1000)}"
+        try:
+            vm_id = self.backend.create(
+                container_name, spec['image'], spec['memory'], spec['cpu'], spec['workdir']
+            )
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to create VM: {e.stderr}")
+        with self._lock:
+            self._states.setdefault(vm_id, 'created')
+            self.vms[vm_id] = {
+                'agent_id': agent_id,
+                'container_name': container_name,
+                **spec,
+                'status': 'created',
+                'created_at': datetime.now().isoformat()
+            }
+        return vm_id
+
+    def _provision(self, spec: Dict) -> str:
+        """为预热池冷创建一台容器：启动并建立执行通道"""
+        vm_id = self._cold_create('pool', spec)
+        try:
+            self.backend.start(vm_id)
+        except subprocess.CalledProcessError as e:
+            self._destroy(vm_id)
+            raise RuntimeError(f"Failed to start VM: {e.stderr}")
+        with self._lock:
+            self._states[vm_id] = 'running'
+            self.vms[vm_id].update({
+                'agent_id': None,
+                'pool': 'idle',
+                'status': 'running',
+                'started_at': datetime.now().isoformat()
+            })
+            self._save_vms()
+        self._channel(vm_id)
+        return vm_id
+
+    def _adopt_idle(self):
+        """重启后接管上次留下的空闲容器；已不在运行的丢弃记录"""
+        idle = [vm_id for vm_id, info in self.vms.items() if info.get('pool') == 'idle']
+        if not idle:
+            return
+        try:
+            states = self.backend.states()
+        except (OSError, subprocess.SubprocessError):
+            states = {}
+        for vm_id in idle:
+            info = self.vms[vm_id]
+            spec = {k: info[k] for k in DEFAULT_SPEC}
+            if states.get(vm_id) != 'running' or not self.pool.offer(vm_id, spec):
+                self._destroy(vm_id)
+        self._save_vms()
+
     def create_vm(self, agent_id: str, config: Optional[Dict] = None) -> str:
         """
         创建 VM
-        
+
         Args:
             agent_id: Agent ID
             config: VM 配置（可选）
@@ -53,145 +231,189 @@ class VMController:
                 - memory: 内存限制（默认 512m）
                 - cpu: CPU 限制（默认 1.0）
                 - workdir: 工作目录（默认 /workspace）
-        
+
         Returns:
-            vm_id: VM ID（Docker 容器 ID）
+            vm_id: VM ID（Docker 容器 ID）。
+            启用预热池时优先返回已在运行的空闲容器（status 为 running，start_vm 为空操作）。
         """
-        config = config or {}
-        image = config.get('image', 'python:3.12-slim')
-        memory = config.get('memory', '512m')
-        cpu = config.get('cpu', '1.0')
-        workdir = config.get('workdir', '/workspace')
-        
-        # 容器名称
-        container_name = f"aios-vm-{agent_id}-{int(time.time())}"
-        
-        # 创建容器（不启动）
-        cmd = [
-            DOCKER_EXE, 'create',
-            '--name', container_name,
-            '--memory', memory,
-            '--cpus', str(cpu),
-            '--workdir', workdir,
-            image,
-            'sleep', 'infinity'  # 保持容器运行
-        ]
-        
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            vm_id = result.stdout.strip()
-            
-            # 保存 VM 信息
-            self.vms[vm_id] = {
-                'agent_id': agent_id,
-                'container_name': container_name,
-                'image': image,
-                'memory': memory,
-                'cpu': cpu,
-                'workdir': workdir,
-                'status': 'created',
-                'created_at': datetime.now().isoformat()
-            }
-            self._save_vms()
-            
+        spec = {k: (config or {}).get(k, v) for k, v in DEFAULT_SPEC.items()}
+
+        vm_id = self.pool.acquire(spec) if self.pool else None
+        if vm_id:
+            with self._lock:
+                self.vms[vm_id].update({
+                    'agent_id': agent_id,
+                    'pool': 'leased',
+                    'leased_at': datetime.now().isoformat()
+                })
+                self._save_vms()
             return vm_id
-        
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Failed to create VM: {e.stderr}")
-    
+
+        vm_id = self._cold_create(agent_id, spec)
+        with self._lock:
+            if self.pool:
+                self.vms[vm_id]['pool'] = 'leased'
+            self._save_vms()
+        return vm_id
+
     def start_vm(self, vm_id: str):
         """启动 VM"""
-        if vm_id not in self.vms:
-            raise ValueError(f"VM not found: {vm_id}")
-        
+        info = self._require(vm_id)
+        if info['status'] == 'running' and self._container_state(vm_id) == 'running':
+            return
+
         try:
-            subprocess.run([DOCKER_EXE, 'start', vm_id], check=True, capture_output=True)
-            self.vms[vm_id]['status'] = 'running'
-            self.vms[vm_id]['started_at'] = datetime.now().isoformat()
-            self._save_vms()
-        
+            self.backend.start(vm_id)
+            with self._lock:
+                self._states[vm_id] = 'running'
+                info['status'] = 'running'
+                info['started_at'] = datetime.now().isoformat()
+                self._save_vms()
+
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"Failed to start VM: {e.stderr}")
-    
+
     def stop_vm(self, vm_id: str):
         """停止 VM"""
-        if vm_id not in self.vms:
-            raise ValueError(f"VM not found: {vm_id}")
-        
+        info = self._require(vm_id)
+
         try:
-            subprocess.run([DOCKER_EXE, 'stop', vm_id], check=True, capture_output=True)
-            self.vms[vm_id]['status'] = 'stopped'
-            self.vms[vm_id]['stopped_at'] = datetime.now().isoformat()
-            self._save_vms()
-        
+            self._drop_channel(vm_id)
+            self.backend.stop(vm_id)
+            with self._lock:
+                self._states[vm_id] = 'exited'
+                info['status'] = 'stopped'
+                info['stopped_at'] = datetime.now().isoformat()
+                self._save_vms()
+
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"Failed to stop VM: {e.stderr}")
-    
-    def delete_vm(self, vm_id: str):
-        """删除 VM"""
-        if vm_id not in self.vms:
-            raise ValueError(f"VM not found: {vm_id}")
-        
+
+    def delete_vm(self, vm_id: str, force: bool = False):
+        """
+        删除 VM
+
+        来自预热池的 VM（未 force）直接强制删除（不等 stop），再让池按同规格
+        后台新建一台补上；容器本身从不复用。
+        """
+        info = self._require(vm_id)
+
+        if not force and self.pool and info.get('pool') == 'leased':
+            spec = {k: info[k] for k in DEFAULT_SPEC}
+            self._destroy(vm_id)
+            self._save_vms()
+            self.pool.replace(spec)
+            return
+
         # 先停止（如果正在运行）
-        if self.vms[vm_id]['status'] == 'running':
+        if info['status'] == 'running':
             self.stop_vm(vm_id)
-        
+
         try:
-            subprocess.run([DOCKER_EXE, 'rm', vm_id], check=True, capture_output=True)
-            del self.vms[vm_id]
-            self._save_vms()
-        
+            self.backend.remove(vm_id)
+            with self._lock:
+                del self.vms[vm_id]
+                self._states.pop(vm_id, None)
+                self._agent_failures.pop(vm_id, None)
+                self._save_vms()
+
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"Failed to delete VM: {e.stderr}")
-    
+
+    def _destroy(self, vm_id: str):
+        """尽力删除容器及其记录（池内部清理用，rm -f 不等容器优雅退出）"""
+        self._drop_channel(vm_id)
+        try:
+            self.backend.remove(vm_id, force=True)
+        except subprocess.CalledProcessError:
+            pass
+        with self._lock:
+            self.vms.pop(vm_id, None)
+            self._states.pop(vm_id, None)
+            self._agent_failures.pop(vm_id, None)
+
     def list_vms(self) -> List[Dict]:
-        """列出所有 VM"""
-        return [
-            {'vm_id': vm_id, **info}
-            for vm_id, info in self.vms.items()
-        ]
-    
+        """列出所有 VM（不含预热池中的空闲容器）"""
+        with self._lock:
+            return [
+                {'vm_id': vm_id, **info}
+                for vm_id, info in self.vms.items()
+                if info.get('pool') != 'idle'
+            ]
+
     def get_vm_status(self, vm_id: str) -> Dict:
-        """查询 VM 状态"""
-        if vm_id not in self.vms:
-            raise ValueError(f"VM not found: {vm_id}")
-        
-        # 从 Docker 获取实时状态
+        """查询 VM 状态（事件流推送 / 批量查询缓存，不逐个 inspect）"""
+        info = self._require(vm_id)
+        docker_status = self._container_state(vm_id)
+        if docker_status != 'not_found' and info['status'] != docker_status:
+            with self._lock:
+                info['status'] = docker_status
+                self._save_vms()
+        return {
+            'vm_id': vm_id,
+            **info,
+            'docker_status': docker_status
+        }
+
+    def pool_stats(self) -> Dict:
+        """预热池统计"""
+        if not self.pool:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'idle': len(self.pool.idle_ids()),
+            'min_idle': self.pool.min_idle,
+            'max_idle': self.pool.max_idle,
+            **self.pool.stats
+        }
+
+    # ── 执行 ──
+
+    def _channel(self, vm_id: str) -> Optional[ExecChannel]:
+        """取（必要时建立）到容器内代理的通道；连续 AGENT_RETRIES 次起不来则后续走一次性 exec"""
+        if not self.persistent_exec:
+            return None
+        with self._lock:
+            if self._agent_failures.get(vm_id, 0) >= AGENT_RETRIES:
+                return None
+            channel = self._channels.get(vm_id)
+            if channel is not None and channel.alive:
+                return channel
+        # 握手可能要等容器里的 Python 启动，不持锁
         try:
-            result = subprocess.run(
-                [DOCKER_EXE, 'inspect', vm_id, '--format', '{{.State.Status}}'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            docker_status = result.stdout.strip()
-            
-            # 更新状态
-            self.vms[vm_id]['status'] = docker_status
-            self._save_vms()
-            
-            return {
-                'vm_id': vm_id,
-                **self.vms[vm_id],
-                'docker_status': docker_status
-            }
-        
-        except subprocess.CalledProcessError:
-            # 容器可能已被手动删除
-            return {
-                'vm_id': vm_id,
-                **self.vms[vm_id],
-                'docker_status': 'not_found'
-            }
-    
+            channel = ExecChannel(self.backend.spawn_agent(vm_id))
+        except (OSError, ChannelError, subprocess.CalledProcessError) as e:
+            with self._lock:
+                failures = self._agent_failures.get(vm_id, 0) + 1
+                self._agent_failures[vm_id] = failures
+            print(f"[VMController] exec agent unavailable in {vm_id[:12]} "
+                  f"({failures}/{AGENT_RETRIES}): {e}")
+            return None
+        with self._lock:
+            self._agent_failures.pop(vm_id, None)
+            current = self._channels.get(vm_id)
+            if current is not None and current.alive:
+                stale, channel = channel, current  # 并发建立的通道，保留先到的
+            else:
+                stale, self._channels[vm_id] = None, channel
+        if stale is not None:
+            stale.close()
+        return channel
+
+    def _drop_channel(self, vm_id: str):
+        with self._lock:
+            channel = self._channels.pop(vm_id, None)
+        if channel is not None:
+            channel.close()
+
     def execute_in_vm(self, vm_id: str, command: str) -> Dict:
         """
         在 VM 中执行命令
-        
+
         Args:
             vm_id: VM ID
             command: 要执行的命令
-        
+
         Returns:
             {
                 'stdout': str,
@@ -200,40 +422,57 @@ class VMController:
                 'duration_ms': int
             }
         """
-        if vm_id not in self.vms:
-            raise ValueError(f"VM not found: {vm_id}")
-        
-        if self.vms[vm_id]['status'] != 'running':
+        info = self._require(vm_id)
+
+        if info['status'] != 'running':
             raise RuntimeError(f"VM is not running: {vm_id}")
-        
+
         start_time = time.time()
-        
+
+        channel = self._channel(vm_id)
+        if channel is not None:
+            try:
+                resp = channel.call(
+                    {'op': 'exec', 'cmd': command, 'timeout': EXEC_TIMEOUT},
+                    timeout=EXEC_TIMEOUT + CHANNEL_GRACE
+                )
+                return {
+                    'stdout': resp['stdout'],
+                    'stderr': resp['stderr'],
+                    'exit_code': resp['exit_code'],
+                    'duration_ms': int((time.time() - start_time) * 1000)
+                }
+            except ChannelError as e:
+                # 命令可能已经执行，不重试；下次调用重建通道
+                self._drop_channel(vm_id)
+                return {
+                    'stdout': '',
+                    'stderr': f'Exec channel lost: {e}',
+                    'exit_code': -1,
+                    'duration_ms': int((time.time() - start_time) * 1000)
+                }
+
         try:
-            result = subprocess.run(
-                [DOCKER_EXE, 'exec', vm_id, 'sh', '-c', command],
-                capture_output=True,
-                text=True,
-                timeout=60  # 60秒超时
-            )
-            
+            stdout, stderr, exit_code = self.backend.exec(vm_id, command, EXEC_TIMEOUT)
+
             duration_ms = int((time.time() - start_time) * 1000)
-            
+
             return {
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'exit_code': result.returncode,
+                'stdout': stdout,
+                'stderr': stderr,
+                'exit_code': exit_code,
                 'duration_ms': duration_ms
             }
-        
+
         except subprocess.TimeoutExpired:
             duration_ms = int((time.time() - start_time) * 1000)
             return {
                 'stdout': '',
-                'stderr': 'Command timeout (60s)',
+                'stderr': f'Command timeout ({EXEC_TIMEOUT}s)',
                 'exit_code': -1,
                 'duration_ms': duration_ms
             }
-        
+
         except subprocess.CalledProcessError as e:
             duration_ms = int((time.time() - start_time) * 1000)
             return {
@@ -242,46 +481,49 @@ class VMController:
                 'exit_code': e.returncode,
                 'duration_ms': duration_ms
             }
-    
+
     def get_logs(self, vm_id: str, tail: int = 100) -> str:
         """
         获取 VM 日志
-        
+
         Args:
             vm_id: VM ID
             tail: 最后 N 行（默认 100）
-        
+
         Returns:
             日志内容
         """
-        if vm_id not in self.vms:
-            raise ValueError(f"VM not found: {vm_id}")
-        
+        self._require(vm_id)
+
         try:
-            result = subprocess.run(
-                [DOCKER_EXE, 'logs', '--tail', str(tail), vm_id],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            return result.stdout
-        
+            return self.backend.logs(vm_id, tail)
+
         except subprocess.CalledProcessError as e:
             return f"Failed to get logs: {e.stderr}"
-    
+
     def cleanup_all(self):
-        """清理所有 VM（用于测试）"""
+        """清理所有 VM（用于测试），包括预热池中的空闲容器"""
+        if self.pool:
+            for vm_id in self.pool.drain():
+                self._destroy(vm_id)
+            self._save_vms()
         for vm_id in list(self.vms.keys()):
             try:
-                self.delete_vm(vm_id)
+                self.delete_vm(vm_id, force=True)
             except Exception as e:
                 print(f"Failed to delete VM {vm_id}: {e}")
 
+    def close(self):
+        """关闭执行通道和事件流（不删除容器）"""
+        for vm_id in list(self._channels):
+            self._drop_channel(vm_id)
+        self.backend.close()
+
 
 def main():
     """CLI 入口"""
     import sys
-    
+
     if len(sys.argv) < 2:
         print("Usage: python vm_controller.py <command> [args...]")
         print("Commands:")
@@ -295,63 +537,67 @@ def main():
         print("  logs <vm_id>                - 获取 VM 日志")
         print("  cleanup                     - 清理所有 VM")
         sys.exit(1)
-    
-    controller = VMController()
+
+    # CLI 每次只做一个操作，不需要事件流
+    controller = VMController(watch_events=False)
     command = sys.argv[1]
-    
+
     try:
         if command == 'create':
             agent_id = sys.argv[2]
             vm_id = controller.create_vm(agent_id)
             print(f"VM created: {vm_id}")
-        
+
         elif command == 'start':
             vm_id = sys.argv[2]
             controller.start_vm(vm_id)
             print(f"VM started: {vm_id}")
-        
+
         elif command == 'stop':
             vm_id = sys.argv[2]
             controller.stop_vm(vm_id)
             print(f"VM stopped: {vm_id}")
-        
+
         elif command == 'delete':
             vm_id = sys.argv[2]
             controller.delete_vm(vm_id)
             print(f"VM deleted: {vm_id}")
-        
+
         elif command == 'list':
             vms = controller.list_vms()
             print(json.dumps(vms, indent=2, ensure_ascii=False))
-        
+
         elif command == 'status':
             vm_id = sys.argv[2]
             status = controller.get_vm_status(vm_id)
             print(json.dumps(status, indent=2, ensure_ascii=False))
-        
+
         elif command == 'exec':
             vm_id = sys.argv[2]
             cmd = ' '.join(sys.argv[3:])
             result = controller.execute_in_vm(vm_id, cmd)
             print(json.dumps(result, indent=2, ensure_ascii=False))
-        
+
         elif command == 'logs':
             vm_id = sys.argv[2]
             logs = controller.get_logs(vm_id)
             print(logs)
-        
+
         elif command == 'cleanup':
             controller.cleanup_all()
             print("All VMs cleaned up")
-        
+
         else:
             print(f"Unknown command: {command}")
             sys.exit(1)
-    
+
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
 
+    finally:
+        controller.close()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,155 @@
+"""
+Warm Pool - 预热容器池
+
+- 按规格（image/memory/cpu/workdir）分桶保存空闲容器，已启动且常驻代理已就绪
+- acquire 命中直接返回，不再冷启动；未命中由调用方冷创建
+- 用过的容器从不放回：残留进程、装过的包、工作目录外的文件都清不干净，由调用方
+  销毁后调 replace，后台按同规格新建一台补上（桶内空闲数达到 max_idle 则不补）
+- 默认规格的空闲数低于 min_idle 时，后台线程补足
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+SpecKey = Tuple[str, str, str, str]
+
+
+def spec_key(spec: Dict) -> SpecKey:
+    return (spec['image'], str(spec['memory']), str(spec['cpu']), spec['workdir'])
+
+
+class WarmPool:
+    """空闲容器池（线程安全）"""
+
+    def __init__(
+        self,
+        spec: Dict,
+        provision: Callable[[Dict], str],
+        min_idle: int = 0,
+        max_idle: int = 0,
+    ):
+        """
+        Args:
+            spec: 默认规格，min_idle 按它补足
+            provision: 冷创建一台已启动、可执行的容器，返回 vm_id
+            min_idle: 默认规格最少保持的空闲容器数
+            max_idle: 每个规格最多保留的空闲容器数（归还超过即销毁）
+        """
+        self.spec = dict(spec)
+        self.provision = provision
+        self.min_idle = min_idle
+        self.max_idle = max(max_idle, min_idle)
+        self._idle: Dict[SpecKey, List[str]] = {}
+        self._wanted: List[Dict] = []  # replace 排队、尚未建好的规格
+        self._building: Optional[Dict] = None  # 后台正在新建的规格
+        self._lock = threading.Lock()
+        self._filler: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {'hits': 0, 'misses': 0, 'replaced': 0, 'discarded': 0, 'provisioned': 0}
+
+    def acquire(self, spec: Dict) -> Optional[str]:
+        """取一台匹配规格的空闲容器；没有返回 None（并触发后台补足）"""
+        with self._lock:
+            idle = self._idle.get(spec_key(spec))
+            vm_id = idle.pop() if idle else None
+            self.stats['hits' if vm_id else 'misses'] += 1
+        self.refill()
+        return vm_id
+
+    def offer(self, vm_id: str, spec: Dict) -> bool:
+        """放入一台从未租出过的空闲容器（重启后接管用）；池满返回 False，由调用方销毁"""
+        with self._lock:
+            if self._closed:
+                return False
+            idle = self._idle.setdefault(spec_key(spec), [])
+            if len(idle) >= self.max_idle:
+                return False
+            idle.append(vm_id)
+            return True
+
+    def replace(self, spec: Dict) -> bool:
+        """一台该规格的容器用完已被销毁：后台新建一台补进池；池满返回 False"""
+        key = spec_key(spec)
+        with self._lock:
+            if self._closed:
+                return False
+            queued = sum(1 for s in self._wanted if spec_key(s) == key)
+            if self._building is not None and spec_key(self._building) == key:
+                queued += 1
+            if len(self._idle.get(key, [])) + queued >= self.max_idle:
+                self.stats['discarded'] += 1
+                return False
+            self._wanted.append(dict(spec))
+            self.stats['replaced'] += 1
+        self.refill()
+        return True
+
+    def discard(self, vm_id: str) -> None:
+        """容器在池中失效（被外部停掉/删除）时移出"""
+        with self._lock:
+            for idle in self._idle.values():
+                if vm_id in idle:
+                    idle.remove(vm_id)
+
+    def idle_count(self, spec: Optional[Dict] = None) -> int:
+        with self._lock:
+            return len(self._idle.get(spec_key(spec or self.spec), []))
+
+    def idle_ids(self) -> List[str]:
+        with self._lock:
+            return [vm_id for idle in self._idle.values() for vm_id in idle]
+
+    # ── 补足 ──
+
+    def refill(self, block: bool = False) -> None:
+        """补足默认规格到 min_idle、新建 replace 排队的容器；block=True 时等补足完成"""
+        with self._lock:
+            running = self._filler is not None and self._filler.is_alive()
+            if not running and not self._closed and self._next_spec(pop=False):
+                self._filler = threading.Thread(target=self._fill, name="vm-pool-fill", daemon=True)
+                self._filler.start()
+            filler = self._filler
+        if block and filler is not None:
+            filler.join()
+
+    def _deficit(self) -> int:
+        return self.min_idle - len(self._idle.get(spec_key(self.spec), []))
+
+    def _next_spec(self, pop: bool = True) -> Optional[Dict]:
+        """下一台要新建的规格：先补默认规格的 min_idle，再按 replace 的顺序"""
+        if self._deficit() > 0:
+            return self.spec
+        if self._wanted:
+            return self._wanted.pop(0) if pop else self._wanted[0]
+        return None
+
+    def _fill(self) -> None:
+        while True:
+            with self._lock:
+                spec = self._building = None if self._closed else self._next_spec()
+            if spec is None:
+                return
+            try:
+                vm_id = self.provision(spec)
+            except Exception as e:
+                print(f"[WarmPool] provision failed: {e}")
+                with self._lock:
+                    self._building = None
+                return
+            with self._lock:
+                self._building = None
+                self.stats['provisioned'] += 1
+                self._idle.setdefault(spec_key(spec), []).append(vm_id)
+
+    def drain(self) -> List[str]:
+        """关闭池，返回全部空闲容器（由调用方销毁）"""
+        with self._lock:
+            self._closed = True
+            filler = self._filler
+        if filler is not None:
+            filler.join()
+        with self._lock:
+            ids = [vm_id for idle in self._idle.values() for vm_id in idle]
+            self._idle.clear()
+            self._wanted.clear()
+            return ids